@@ -5,11 +5,21 @@ AI 客户端
 
 from typing import Optional
 from dataclasses import dataclass
+from functools import lru_cache
+import hashlib
 import json
+import math
+import random
+import threading
 import time
 
 from .models import ChapterInfo
 from .logger import Logger
+from .prompt_template import CompiledPrompt, compile_prompt, placeholders_for, required_for
+
+
+# format_prompt 的任意模板按内容缓存，数量有上限
+_compile_adhoc = lru_cache(maxsize=64)(compile_prompt)
 
 
 @dataclass
@@ -20,6 +30,17 @@ class AIResponse:
     input_tokens: int = 0
     output_tokens: int = 0
     error: Optional[str] = None
+    truncated: bool = False  # 续写后仍因 token 上限被截断
+    continuations: int = 0  # 续写请求次数
+
+
+@dataclass
+class CompletionChunk:
+    """单次 API 调用结果"""
+    text: str
+    input_tokens: int = 0
+    output_tokens: int = 0
+    truncated: bool = False  # finish_reason 为 length / MAX_TOKENS
 
 
 class PromptTemplates:
@@ -170,6 +191,28 @@ class PromptTemplates:
 输出要求：
 - 语言简洁明了，重点突出
 - 不要输出任何问候语或解释性文字""",
+            'mindmap_chapter': """请为以下章节内容生成一个思维导图结构，以 JSON 格式输出：
+
+章节标题：{{title}}
+
+章节内容：
+{{content}}
+
+请生成 MindElixir 格式的思维导图数据，只输出 JSON，不要其他内容。
+JSON 格式示例：
+{
+  "nodeData": {
+    "id": "root",
+    "topic": "章节主题",
+    "children": [
+      {
+        "id": "point1",
+        "topic": "要点1",
+        "children": [...]
+      }
+    ]
+  }
+}""",
         }
     }
 
@@ -182,6 +225,7 @@ class PromptTemplates:
         """
         self.prompt_config = prompt_config
         self._cache = {}
+        self._compiled = {}
 
     def get_prompt(self, prompt_type: str, book_type: str = "non-fiction") -> str:
         """
@@ -230,13 +274,38 @@ class PromptTemplates:
         self._cache[cache_key] = prompt
         return prompt
 
+    def get_compiled(self, prompt_type: str, book_type: str = "non-fiction") -> CompiledPrompt:
+        """获取预编译的 Prompt 模板（每种类型只解析一次）"""
+        cache_key = f"{prompt_type}:{book_type}"
+        compiled = self._compiled.get(cache_key)
+        if compiled is None:
+            compiled = compile_prompt(
+                self.get_prompt(prompt_type, book_type),
+                placeholders_for(prompt_type),
+                prompt_type,
+                required_for(prompt_type)
+            )
+            self._compiled[cache_key] = compiled
+        return compiled
+
+    def render_prompt(self, prompt_type: str, book_type: str = "non-fiction", prefix: str = '', **kwargs) -> str:
+        """
+        渲染指定类型的 Prompt
+
+        Args:
+            prompt_type: prompt 类型
+            book_type: 书籍类型
+            prefix: 前缀（如语言指令），与模板一起单次拼接
+            **kwargs: 占位符取值
+
+        Returns:
+            渲染后的 Prompt 字符串
+        """
+        return self.get_compiled(prompt_type, book_type).render(prefix=prefix, **kwargs)
+
     def format_prompt(self, template: str, **kwargs) -> str:
-        """格式化 Prompt 模板"""
-        result = template
-        for key, value in kwargs.items():
-            placeholder = f'{{{{{key}}}}}'
-            result = result.replace(placeholder, str(value))
-        return result
+        """格式化任意 Prompt 模板（未提供的占位符保持原样）"""
+        return _compile_adhoc(template).render(strict=False, **kwargs)
 
 
 class AIClient:
@@ -253,6 +322,21 @@ class AIClient:
         'gpt-4': {'input': 30.0, 'output': 60.0},
     }
 
+    # 输出预算与续写配置
+    MIN_OUTPUT_TOKENS = 1024
+    MAX_CONTINUATIONS = 3
+    TRANSLATION_PROMPT = "请将以下内容翻译为{language}。保持原有的 Markdown 标题、列表和段落结构，只输出译文，不要添加任何说明。"
+    LANGUAGE_NAMES = {
+        'zh': '中文',
+        'en': 'English',
+        'ja': '日本語',
+        'fr': 'français',
+        'de': 'Deutsch',
+        'es': 'español',
+        'ru': 'русский',
+    }
+    CONTINUATION_PROMPT = "你的上一条回答因长度限制被截断。请从中断处直接继续输出，不要重复已输出的内容，也不要添加任何说明。"
+
     def __init__(self, config, logger: Logger, prompt_templates: PromptTemplates = None):
         self.config = config
         self.logger = logger
@@ -260,6 +344,48 @@ class AIClient:
         self.temperature = config.temperature
         self.prompts = prompt_templates or PromptTemplates()
 
+    def _output_budget(self, text: str, cap: int) -> int:
+        """
+        根据输入长度估算输出 token 预算
+
+        按约 2 字符/token 估算输入规模，输出预算不超过输入规模，
+        并限制在 [MIN_OUTPUT_TOKENS, cap] 区间内，避免短章节也预留满额 token
+        """
+        estimated_tokens = len(text) // 2
+        return max(self.MIN_OUTPUT_TOKENS, min(cap, estimated_tokens))
+
+    def _request(self, prompt: str, partial: str, max_tokens: int) -> CompletionChunk:
+        """执行单次 API 调用，partial 为已生成的部分内容（续写时非空）"""
+        raise NotImplementedError
+
+    def _complete(self, prompt: str, max_tokens: int) -> AIResponse:
+        """执行生成，输出被截断时发起续写请求拼接结果，而不是整体重新生成"""
+        chunk = self._request(prompt, '', max_tokens)
+        parts = [chunk.text]
+        input_tokens = chunk.input_tokens
+        output_tokens = chunk.output_tokens
+        continuations = 0
+
+        while chunk.truncated and chunk.text and continuations < self.MAX_CONTINUATIONS:
+            continuations += 1
+            self.logger.debug_log(f"输出达到 token 上限，发起第 {continuations} 次续写")
+            chunk = self._request(prompt, ''.join(parts), max_tokens)
+            parts.append(chunk.text)
+            input_tokens += chunk.input_tokens
+            output_tokens += chunk.output_tokens
+
+        if chunk.truncated:
+            self.logger.warning(f"输出在 {continuations} 次续写后仍被截断")
+
+        return AIResponse(
+            success=True,
+            content=''.join(parts),
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
+            truncated=chunk.truncated,
+            continuations=continuations
+        )
+
     def get_pricing(self) -> dict:
         """获取模型定价"""
         return self.MODEL_PRICING.get(self.model, {'input': 1.25, 'output': 18.75})
@@ -279,18 +405,46 @@ class AIClient:
         """总结章节"""
         raise NotImplementedError
 
+    def translate_text(self, text: str, language: str) -> AIResponse:
+        """将已有的总结翻译为目标语言（保留 Markdown 结构）"""
+        try:
+            target = self.LANGUAGE_NAMES.get(language, language)
+            prompt = ''.join([self.TRANSLATION_PROMPT.format(language=target), '\n\n', text])
+            return self._complete(prompt, self._output_budget(text, 8192))
+        except Exception as e:
+            self.logger.error(f"AI 翻译调用失败: {e}")
+            return AIResponse(success=False, content='', error=str(e))
+
     def generate_mindmap(self, chapter: ChapterInfo, language: str) -> AIResponse:
         """生成思维导图"""
         raise NotImplementedError
 
+    def _mindmap_prompt(self, chapter: ChapterInfo, prefix: str = '') -> str:
+        """渲染章节思维导图 Prompt；模板中没有 {{content}} 时与前端一样把章节标题与内容附加在指令之后"""
+        compiled = self.prompts.get_compiled('mindmap_chapter')
+        if 'content' in compiled.placeholders:
+            return compiled.render(prefix=prefix, title=chapter.title, content=chapter.content)
+        return ''.join([
+            compiled.render(prefix=prefix, strict=False, title=chapter.title),
+            '\n\n章节标题: ', chapter.title, '\n\n章节内容:\n', chapter.content
+        ])
+
     def analyze_connections(self, chapters: list[ChapterInfo], language: str) -> AIResponse:
         """分析章节关联"""
         raise NotImplementedError
 
-    def generate_overall_summary(self, title: str, chapters: list[ChapterInfo], connections: str, language: str) -> AIResponse:
-        """生成全书总结"""
+    def generate_overall_summary(self, title: str, chapters: list[ChapterInfo], connections: str, language: str,
+                                 with_summaries: bool = False) -> AIResponse:
+        """生成全书总结（with_summaries 时章节信息附带各章摘要正文）"""
         raise NotImplementedError
 
+    @staticmethod
+    def _chapter_info(chapters: list[ChapterInfo], with_summaries: bool = False) -> str:
+        """全书总结的章节信息：默认只列章节标题，with_summaries 时附带各章摘要（基于缓存摘要派生时使用）"""
+        if with_summaries:
+            return "\n\n".join(f"{c.title}\n{c.content}" for c in chapters)
+        return "\n".join(c.title for c in chapters)
+
 
 class GeminiClient(AIClient):
     """Gemini API 客户端"""
@@ -311,6 +465,52 @@ class GeminiClient(AIClient):
                 return None
         return self._client
 
+    def _request(self, prompt: str, partial: str, max_tokens: int) -> CompletionChunk:
+        """调用 Gemini API（partial 非空时以多轮对话形式续写）"""
+        client = self._get_client()
+
+        if partial:
+            contents = [
+                {'role': 'user', 'parts': [{'text': prompt}]},
+                {'role': 'model', 'parts': [{'text': partial}]},
+                {'role': 'user', 'parts': [{'text': self.CONTINUATION_PROMPT}]},
+            ]
+        else:
+            contents = prompt
+
+        response = client.models.generate_content(
+            model=self.model,
+            contents=contents,
+            config={
+                'temperature': self.temperature,
+                'max_output_tokens': max_tokens
+            }
+        )
+
+        content = ""
+        if hasattr(response, 'text'):
+            content = response.text or ""
+        elif hasattr(response, 'parts'):
+            content = ''.join([p.text or "" for p in response.parts])
+
+        usage = getattr(response, 'usage_metadata', None)
+        return CompletionChunk(
+            text=content,
+            input_tokens=(getattr(usage, 'prompt_token_count', 0) or 0) if usage else 0,
+            output_tokens=(getattr(usage, 'candidates_token_count', 0) or 0) if usage else 0,
+            truncated=self._is_truncated(response)
+        )
+
+    def _is_truncated(self, response) -> bool:
+        """检查 finish_reason 是否为 MAX_TOKENS"""
+        candidates = getattr(response, 'candidates', None) or []
+        if not candidates:
+            return False
+        reason = getattr(candidates[0], 'finish_reason', None)
+        if reason is None:
+            return False
+        return 'MAX_TOKENS' in (getattr(reason, 'name', None) or str(reason))
+
     def summarize_chapter(self, chapter: ChapterInfo, book_type: str, language: str) -> AIResponse:
         """使用 Gemini 总结章节"""
         try:
@@ -318,52 +518,17 @@ class GeminiClient(AIClient):
             if client is None:
                 return AIResponse(success=False, content='', error="客户端初始化失败")
 
-            # 从配置获取 Prompt 模板
-            prompt_template = self.prompts.get_prompt('chapterSummary', book_type)
-
-            # 格式化 Prompt
-            language_instruction = self._get_language_instruction(language)
-            prompt = self.prompts.format_prompt(
-                prompt_template,
+            # 使用预编译模板渲染 Prompt（语言指令作为前缀一并拼接）
+            prompt = self.prompts.render_prompt(
+                'chapterSummary',
+                book_type,
+                prefix=self._get_language_instruction(language),
                 title=chapter.title,
                 content=chapter.content
             )
 
-            # 添加语言指令
-            if language_instruction:
-                prompt = f"{language_instruction}\n\n{prompt}"
-
-            # 调用 API
-            response = client.models.generate_content(
-                model=self.model,
-                contents=prompt,
-                config={
-                    'temperature': self.temperature,
-                    'max_output_tokens': 4096
-                }
-            )
-
-            # 解析响应
-            content = ""
-            input_tokens = 0
-            output_tokens = 0
-
-            if hasattr(response, 'text'):
-                content = response.text
-            elif hasattr(response, 'parts'):
-                content = ''.join([p.text for p in response.parts])
-
-            # 获取 token 使用情况
-            if hasattr(response, 'usage_metadata'):
-                input_tokens = getattr(response.usage_metadata, 'prompt_token_count', 0)
-                output_tokens = getattr(response.usage_metadata, 'candidates_token_count', 0)
-
-            return AIResponse(
-                success=True,
-                content=content,
-                input_tokens=input_tokens,
-                output_tokens=output_tokens
-            )
+            # 调用 API（输出预算随章节长度调整，截断时自动续写）
+            return self._complete(prompt, self._output_budget(chapter.content, 4096))
 
         except Exception as e:
             self.logger.error(f"Gemini API 调用失败: {e}")
@@ -376,58 +541,13 @@ class GeminiClient(AIClient):
             if client is None:
                 return AIResponse(success=False, content='', error="客户端初始化失败")
 
-            language_instruction = self._get_language_instruction(language)
-
-            prompt = f"""{language_instruction}
-
-请为以下章节内容生成一个思维导图结构，以 JSON 格式输出：
-
-章节标题：{chapter.title}
+            prompt = self._mindmap_prompt(chapter, self._get_language_instruction(language))
 
-章节内容：
-{chapter.content}
-
-请生成 MindElixir 格式的思维导图数据，只输出 JSON，不要其他内容。
-JSON 格式示例：
-{{
-  "nodeData": {{
-    "id": "root",
-    "topic": "章节主题",
-    "children": [
-      {{
-        "id": "point1",
-        "topic": "要点1",
-        "children": [...]
-      }}
-    ]
-  }}
-}}
-"""
-
-            response = client.models.generate_content(
-                model=self.model,
-                contents=prompt,
-                config={
-                    'temperature': self.temperature,
-                    'max_output_tokens': 8192
-                }
-            )
-
-            content = ""
-            if hasattr(response, 'text'):
-                content = response.text or ""
-            elif hasattr(response, 'parts'):
-                content = ''.join([p.text or "" for p in response.parts])
+            response = self._complete(prompt, self._output_budget(chapter.content, 8192))
 
             # 清理 JSON
-            content = self._extract_json(content)
-
-            return AIResponse(
-                success=True,
-                content=content,
-                input_tokens=getattr(response.usage_metadata, 'prompt_token_count', 0) if hasattr(response, 'usage_metadata') else 0,
-                output_tokens=getattr(response.usage_metadata, 'candidates_token_count', 0) if hasattr(response, 'usage_metadata') else 0
-            )
+            response.content = self._extract_json(response.content)
+            return response
 
         except Exception as e:
             self.logger.error(f"Gemini API 调用失败: {e}")
@@ -440,99 +560,46 @@ JSON 格式示例：
             if client is None:
                 return AIResponse(success=False, content='', error="客户端初始化失败")
 
-            # 从配置获取 Prompt 模板
-            prompt_template = self.prompts.get_prompt('connectionAnalysis')
-
             # 构建章节摘要列表
             chapter_summaries = "\n".join([
                 f"第{i+1}章 {c.title}: {c.content[:200]}..."
                 for i, c in enumerate(chapters)
             ])
 
-            # 格式化 Prompt
-            prompt = self.prompts.format_prompt(
-                prompt_template,
+            # 使用预编译模板渲染 Prompt
+            prompt = self.prompts.render_prompt(
+                'connectionAnalysis',
+                prefix=self._get_language_instruction(language),
                 chapterSummaries=chapter_summaries
             )
 
-            # 添加语言指令
-            language_instruction = self._get_language_instruction(language)
-            if language_instruction:
-                prompt = f"{language_instruction}\n\n{prompt}"
-
-            response = client.models.generate_content(
-                model=self.model,
-                contents=prompt,
-                config={
-                    'temperature': self.temperature,
-                    'max_output_tokens': 4096
-                }
-            )
-
-            content = ""
-            if hasattr(response, 'text'):
-                content = response.text or ""
-            elif hasattr(response, 'parts'):
-                content = ''.join([p.text or "" for p in response.parts])
-
-            return AIResponse(
-                success=True,
-                content=content,
-                input_tokens=getattr(response.usage_metadata, 'prompt_token_count', 0) if hasattr(response, 'usage_metadata') else 0,
-                output_tokens=getattr(response.usage_metadata, 'candidates_token_count', 0) if hasattr(response, 'usage_metadata') else 0
-            )
+            return self._complete(prompt, 4096)
 
         except Exception as e:
             self.logger.error(f"Gemini API 调用失败: {e}")
             return AIResponse(success=False, content='', error=str(e))
 
-    def generate_overall_summary(self, title: str, chapters: list[ChapterInfo], connections: str, language: str) -> AIResponse:
+    def generate_overall_summary(self, title: str, chapters: list[ChapterInfo], connections: str, language: str,
+                                 with_summaries: bool = False) -> AIResponse:
         """生成全书总结"""
         try:
             client = self._get_client()
             if client is None:
                 return AIResponse(success=False, content='', error="客户端初始化失败")
 
-            # 从配置获取 Prompt 模板
-            prompt_template = self.prompts.get_prompt('overallSummary')
-
-            # 构建简化的章节列表
-            chapter_list = "\n".join([c.title for c in chapters])
+            # 构建章节列表（派生时附带章节摘要）
+            chapter_list = self._chapter_info(chapters, with_summaries)
 
-            # 格式化 Prompt
-            prompt = self.prompts.format_prompt(
-                prompt_template,
+            # 使用预编译模板渲染 Prompt
+            prompt = self.prompts.render_prompt(
+                'overallSummary',
+                prefix=self._get_language_instruction(language),
                 bookTitle=title,
                 chapterInfo=chapter_list,
                 connections=connections or "无关联分析"
             )
 
-            # 添加语言指令
-            language_instruction = self._get_language_instruction(language)
-            if language_instruction:
-                prompt = f"{language_instruction}\n\n{prompt}"
-
-            response = client.models.generate_content(
-                model=self.model,
-                contents=prompt,
-                config={
-                    'temperature': self.temperature,
-                    'max_output_tokens': 4096
-                }
-            )
-
-            content = ""
-            if hasattr(response, 'text'):
-                content = response.text or ""
-            elif hasattr(response, 'parts'):
-                content = ''.join([p.text or "" for p in response.parts])
-
-            return AIResponse(
-                success=True,
-                content=content,
-                input_tokens=getattr(response.usage_metadata, 'prompt_token_count', 0) if hasattr(response, 'usage_metadata') else 0,
-                output_tokens=getattr(response.usage_metadata, 'candidates_token_count', 0) if hasattr(response, 'usage_metadata') else 0
-            )
+            return self._complete(prompt, 4096)
 
         except Exception as e:
             self.logger.error(f"Gemini API 调用失败: {e}")
@@ -598,6 +665,31 @@ class OpenAIClient(AIClient):
                 return None
         return self._client
 
+    def _request(self, prompt: str, partial: str, max_tokens: int) -> CompletionChunk:
+        """调用 Chat Completions API（partial 非空时以多轮对话形式续写）"""
+        client = self._get_client()
+
+        messages = [{"role": "user", "content": prompt}]
+        if partial:
+            messages.append({"role": "assistant", "content": partial})
+            messages.append({"role": "user", "content": self.CONTINUATION_PROMPT})
+
+        response = client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=self.temperature,
+            max_tokens=max_tokens
+        )
+
+        choice = response.choices[0]
+        usage = response.usage if hasattr(response, 'usage') and response.usage else None
+        return CompletionChunk(
+            text=choice.message.content or "",
+            input_tokens=usage.prompt_tokens if usage else 0,
+            output_tokens=usage.completion_tokens if usage else 0,
+            truncated=getattr(choice, 'finish_reason', None) == 'length'
+        )
+
     def summarize_chapter(self, chapter: ChapterInfo, book_type: str, language: str) -> AIResponse:
         """使用 OpenAI 兼容 API 总结章节"""
         try:
@@ -605,40 +697,17 @@ class OpenAIClient(AIClient):
             if client is None:
                 return AIResponse(success=False, content='', error="客户端初始化失败")
 
-            # 构建提示词
-            book_type_prompt = "小说" if book_type == "fiction" else "非小说"
-            language_instruction = self._get_language_instruction(language)
-
-            prompt = f"""{language_instruction}
-
-请对以下{book_type_prompt}的章节内容进行总结：
-
-章节标题：{chapter.title}
-
-章节内容：
-{chapter.content}
-
-请用简洁的语言总结本章的主要内容和要点。
-"""
-
-            # 调用 API
-            response = client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=self.temperature,
-                max_tokens=4096
+            # 使用预编译模板渲染 Prompt（语言指令作为前缀一并拼接）
+            prompt = self.prompts.render_prompt(
+                'chapterSummary',
+                book_type,
+                prefix=self._get_language_instruction(language),
+                title=chapter.title,
+                content=chapter.content
             )
 
-            content = response.choices[0].message.content or ""
-            input_tokens = response.usage.prompt_tokens if hasattr(response, 'usage') and response.usage else 0
-            output_tokens = response.usage.completion_tokens if hasattr(response, 'usage') and response.usage else 0
-
-            return AIResponse(
-                success=True,
-                content=content,
-                input_tokens=input_tokens,
-                output_tokens=output_tokens
-            )
+            # 调用 API（输出预算随章节长度调整，截断时自动续写）
+            return self._complete(prompt, self._output_budget(chapter.content, 4096))
 
         except Exception as e:
             self.logger.error(f"OpenAI API 调用失败: {e}")
@@ -651,54 +720,13 @@ class OpenAIClient(AIClient):
             if client is None:
                 return AIResponse(success=False, content='', error="客户端初始化失败")
 
-            language_instruction = self._get_language_instruction(language)
-
-            prompt = f"""{language_instruction}
-
-请为以下章节内容生成一个思维导图结构，以 JSON 格式输出：
-
-章节标题：{chapter.title}
-
-章节内容：
-{chapter.content}
-
-请生成 MindElixir 格式的思维导图数据，只输出 JSON，不要其他内容。
-JSON 格式示例：
-{{
-  "nodeData": {{
-    "id": "root",
-    "topic": "章节主题",
-    "children": [
-      {{
-        "id": "point1",
-        "topic": "要点1",
-        "children": [...]
-      }}
-    ]
-  }}
-}}
-"""
-
-            response = client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=self.temperature,
-                max_tokens=8192
-            )
+            prompt = self._mindmap_prompt(chapter, self._get_language_instruction(language))
 
-            content = response.choices[0].message.content or ""
-            input_tokens = response.usage.prompt_tokens if hasattr(response, 'usage') and response.usage else 0
-            output_tokens = response.usage.completion_tokens if hasattr(response, 'usage') and response.usage else 0
+            response = self._complete(prompt, self._output_budget(chapter.content, 8192))
 
             # 清理 JSON
-            content = self._extract_json(content)
-
-            return AIResponse(
-                success=True,
-                content=content,
-                input_tokens=input_tokens,
-                output_tokens=output_tokens
-            )
+            response.content = self._extract_json(response.content)
+            return response
 
         except Exception as e:
             self.logger.error(f"OpenAI API 调用失败: {e}")
@@ -711,91 +739,46 @@ JSON 格式示例：
             if client is None:
                 return AIResponse(success=False, content='', error="客户端初始化失败")
 
-            # 从配置获取 Prompt 模板
-            prompt_template = self.prompts.get_prompt('connectionAnalysis')
-
             # 构建章节摘要列表
             chapter_summaries = "\n".join([
                 f"第{i+1}章 {c.title}: {c.content[:200]}..."
                 for i, c in enumerate(chapters)
             ])
 
-            # 格式化 Prompt
-            prompt = self.prompts.format_prompt(
-                prompt_template,
+            # 使用预编译模板渲染 Prompt
+            prompt = self.prompts.render_prompt(
+                'connectionAnalysis',
+                prefix=self._get_language_instruction(language),
                 chapterSummaries=chapter_summaries
             )
 
-            # 添加语言指令
-            language_instruction = self._get_language_instruction(language)
-            if language_instruction:
-                prompt = f"{language_instruction}\n\n{prompt}"
-
-            response = client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=self.temperature,
-                max_tokens=4096
-            )
-
-            content = response.choices[0].message.content or ""
-            input_tokens = response.usage.prompt_tokens if hasattr(response, 'usage') and response.usage else 0
-            output_tokens = response.usage.completion_tokens if hasattr(response, 'usage') and response.usage else 0
-
-            return AIResponse(
-                success=True,
-                content=content,
-                input_tokens=input_tokens,
-                output_tokens=output_tokens
-            )
+            return self._complete(prompt, 4096)
 
         except Exception as e:
             self.logger.error(f"OpenAI API 调用失败: {e}")
             return AIResponse(success=False, content='', error=str(e))
 
-    def generate_overall_summary(self, title: str, chapters: list[ChapterInfo], connections: str, language: str) -> AIResponse:
+    def generate_overall_summary(self, title: str, chapters: list[ChapterInfo], connections: str, language: str,
+                                 with_summaries: bool = False) -> AIResponse:
         """生成全书总结"""
         try:
             client = self._get_client()
             if client is None:
                 return AIResponse(success=False, content='', error="客户端初始化失败")
 
-            # 从配置获取 Prompt 模板
-            prompt_template = self.prompts.get_prompt('overallSummary')
-
-            # 构建简化的章节列表
-            chapter_list = "\n".join([c.title for c in chapters])
+            # 构建章节列表（派生时附带章节摘要）
+            chapter_list = self._chapter_info(chapters, with_summaries)
 
-            # 格式化 Prompt
-            prompt = self.prompts.format_prompt(
-                prompt_template,
+            # 使用预编译模板渲染 Prompt
+            prompt = self.prompts.render_prompt(
+                'overallSummary',
+                prefix=self._get_language_instruction(language),
                 bookTitle=title,
                 chapterInfo=chapter_list,
                 connections=connections or "无关联分析"
             )
 
-            # 添加语言指令
-            language_instruction = self._get_language_instruction(language)
-            if language_instruction:
-                prompt = f"{language_instruction}\n\n{prompt}"
-
-            response = client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=self.temperature,
-                max_tokens=4096
-            )
-
-            content = response.choices[0].message.content or ""
-            input_tokens = response.usage.prompt_tokens if hasattr(response, 'usage') and response.usage else 0
-            output_tokens = response.usage.completion_tokens if hasattr(response, 'usage') and response.usage else 0
-
-            return AIResponse(
-                success=True,
-                content=content,
-                input_tokens=input_tokens,
-                output_tokens=output_tokens
-            )
+            return self._complete(prompt, 4096)
 
         except Exception as e:
             self.logger.error(f"OpenAI API 调用失败: {e}")
@@ -835,6 +818,179 @@ JSON 格式示例：
         return text
 
 
+class MockAPIError(Exception):
+    """Mock 提供商注入的 API 错误"""
+
+    def __init__(self, message: str, status_code: int = 500):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class MockClient(AIClient):
+    """
+    确定性 Mock 客户端（离线压测与延迟测试用）
+
+    通过 customFields 配置：
+        seed: 随机种子（默认 0）
+        latencyMs: 平均延迟毫秒数（默认 200）
+        latencyJitterMs: 延迟抖动（默认 0，即固定延迟）
+        latencyDistribution: fixed / uniform / normal / lognormal（默认 fixed）
+        outputTokens: 平均输出 token 数（默认 800）
+        outputTokensJitter: 输出 token 相对抖动（默认 0.2）
+        errorRate: 注入 500 错误的概率（默认 0）
+        rateLimitRate: 注入 429 错误的概率（默认 0）
+        timeScale: 延迟缩放系数，0 表示不等待（默认 1.0）
+
+    每个请求的随机序列由 seed、prompt 摘要和该 prompt 的第几次调用决定，
+    与并发调度顺序无关，重试时会得到新的结果。生成文本每个字符计为一个 token，
+    续写请求只生成首次请求采样的输出长度中尚未生成的部分。
+    """
+
+    VOCABULARY = (
+        '观点', '案例', '研究', '概念', '结论', '方法', '影响', '框架',
+        '论证', '历史', '社会', '个人', '实践', '洞见', '数据', '趋势',
+    )
+
+    def __init__(self, config, logger: Logger, prompt_templates: PromptTemplates = None):
+        super().__init__(config, logger, prompt_templates)
+        fields = getattr(config, 'customFields', None)
+        fields = fields if isinstance(fields, dict) else {}
+
+        self.seed = int(fields.get('seed', 0))
+        self.latency_ms = float(fields.get('latencyMs', 200))
+        self.latency_jitter_ms = float(fields.get('latencyJitterMs', 0))
+        self.latency_distribution = str(fields.get('latencyDistribution', 'fixed'))
+        self.output_tokens = int(fields.get('outputTokens', 800))
+        self.output_tokens_jitter = float(fields.get('outputTokensJitter', 0.2))
+        self.error_rate = float(fields.get('errorRate', 0.0))
+        self.rate_limit_rate = float(fields.get('rateLimitRate', 0.0))
+        self.time_scale = float(fields.get('timeScale', 1.0))
+
+        self._call_counts = {}
+        self._targets = {}  # prompt 摘要 -> 首次请求采样的总输出 token 数
+        self._lock = threading.Lock()
+
+    def _rng_for(self, prompt: str, partial: str) -> random.Random:
+        """为单次请求创建确定性的随机数生成器"""
+        digest = hashlib.sha1()
+        digest.update(prompt.encode('utf-8', errors='ignore'))
+        digest.update(partial.encode('utf-8', errors='ignore'))
+        key = digest.hexdigest()
+
+        with self._lock:
+            attempt = self._call_counts.get(key, 0)
+            self._call_counts[key] = attempt + 1
+
+        return random.Random(f"{self.seed}:{key}:{attempt}")
+
+    def _sample_latency(self, rng: random.Random) -> float:
+        """按配置的分布采样延迟（秒）"""
+        mean = self.latency_ms
+        jitter = self.latency_jitter_ms
+
+        if self.latency_distribution == 'uniform':
+            value = rng.uniform(mean - jitter, mean + jitter)
+        elif self.latency_distribution == 'normal':
+            value = rng.gauss(mean, jitter)
+        elif self.latency_distribution == 'lognormal' and mean > 0:
+            # 以 mean 为中位数、jitter/mean 为对数标准差
+            value = rng.lognormvariate(math.log(mean), jitter / mean)
+        else:
+            value = mean
+
+        return max(0.0, value) / 1000
+
+    def _request(self, prompt: str, partial: str, max_tokens: int) -> CompletionChunk:
+        """模拟一次 API 调用"""
+        rng = self._rng_for(prompt, partial)
+
+        delay = self._sample_latency(rng) * self.time_scale
+        if delay > 0:
+            time.sleep(delay)
+
+        roll = rng.random()
+        if roll < self.rate_limit_rate:
+            raise MockAPIError("429 Too Many Requests (mock)", status_code=429)
+        if roll < self.rate_limit_rate + self.error_rate:
+            raise MockAPIError("500 Internal Server Error (mock)", status_code=500)
+
+        key = hashlib.sha1(prompt.encode('utf-8', errors='ignore')).hexdigest()
+        with self._lock:
+            total = self._targets.get(key) if partial else None
+            if total is None:
+                jitter = self.output_tokens * self.output_tokens_jitter
+                total = max(1, int(rng.uniform(self.output_tokens - jitter, self.output_tokens + jitter)))
+                self._targets[key] = total
+        # 续写时只生成上次输出之后仍缺少的部分
+        wanted = max(1, total - len(partial))
+        produced = min(wanted, max_tokens)
+        if wanted <= max_tokens:
+            with self._lock:
+                self._targets.pop(key, None)
+
+        return CompletionChunk(
+            text=''.join(rng.choice(self.VOCABULARY) for _ in range(produced // 2 + 1))[:produced],
+            input_tokens=len(prompt) // 2 + len(partial) // 2,
+            output_tokens=produced,
+            truncated=wanted > max_tokens
+        )
+
+    def summarize_chapter(self, chapter: ChapterInfo, book_type: str, language: str) -> AIResponse:
+        """模拟章节总结"""
+        try:
+            prompt = self.prompts.render_prompt(
+                'chapterSummary', book_type, title=chapter.title, content=chapter.content
+            )
+            return self._complete(prompt, self._output_budget(chapter.content, 4096))
+        except Exception as e:
+            self.logger.error(f"Mock API 调用失败: {e}")
+            return AIResponse(success=False, content='', error=str(e))
+
+    def generate_mindmap(self, chapter: ChapterInfo, language: str) -> AIResponse:
+        """模拟思维导图生成"""
+        try:
+            response = self._complete(
+                self._mindmap_prompt(chapter), self._output_budget(chapter.content, 8192)
+            )
+            response.content = json.dumps(
+                {'nodeData': {'id': 'root', 'topic': chapter.title, 'children': [
+                    {'id': 'point1', 'topic': response.content[:50], 'children': []}
+                ]}},
+                ensure_ascii=False
+            )
+            return response
+        except Exception as e:
+            self.logger.error(f"Mock API 调用失败: {e}")
+            return AIResponse(success=False, content='', error=str(e))
+
+    def analyze_connections(self, chapters: list[ChapterInfo], language: str) -> AIResponse:
+        """模拟章节关联分析"""
+        try:
+            prompt = self.prompts.render_prompt(
+                'connectionAnalysis',
+                chapterSummaries="\n".join(f"{c.title}: {c.content[:200]}" for c in chapters)
+            )
+            return self._complete(prompt, 4096)
+        except Exception as e:
+            self.logger.error(f"Mock API 调用失败: {e}")
+            return AIResponse(success=False, content='', error=str(e))
+
+    def generate_overall_summary(self, title: str, chapters: list[ChapterInfo], connections: str, language: str,
+                                 with_summaries: bool = False) -> AIResponse:
+        """模拟全书总结"""
+        try:
+            prompt = self.prompts.render_prompt(
+                'overallSummary',
+                bookTitle=title,
+                chapterInfo=self._chapter_info(chapters, with_summaries),
+                connections=connections or "无关联分析"
+            )
+            return self._complete(prompt, 4096)
+        except Exception as e:
+            self.logger.error(f"Mock API 调用失败: {e}")
+            return AIResponse(success=False, content='', error=str(e))
+
+
 def create_ai_client(config, logger: Logger, prompt_templates: PromptTemplates = None) -> Optional[AIClient]:
     """创建 AI 客户端（支持多提供商）"""
     # 检查是否为多提供商配置
@@ -864,6 +1020,10 @@ def _create_client_for_provider(provider_config, full_config, logger: Logger, pr
         # OpenAI 兼容 API（包括自定义端点如 302.ai）
         provider_config.model = getattr(provider_config, 'model', '') or full_config.model
         return OpenAIClient(provider_config, logger, prompt_templates)
+    elif provider == 'mock':
+        # 离线 Mock 提供商（压测 / 延迟测试）
+        provider_config.model = getattr(provider_config, 'model', '') or full_config.model or 'mock'
+        return MockClient(provider_config, logger, prompt_templates)
     elif provider == 'ollama':
         logger.warning("Ollama 客户端待实现")
         return None
@@ -4,12 +4,15 @@
 """
 
 import time
+import hashlib
 import json
+import shutil
 import sys
 import os
+from collections import Counter
 from datetime import datetime
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Iterable, Iterator, Optional, Union
 import random
 import tempfile
 
@@ -18,14 +21,34 @@ from .webdav_client import WebDAVClientWrapper
 from .ai_client import create_ai_client, AIClient, AIResponse, PromptTemplates
 from .formatter import ResultFormatter
 from .logger import Logger
-from .chapter_extractor import ChapterExtractorFactory, Chapter, BookContent
+from .chapter_extractor import (
+    ChapterExtractorFactory, Chapter, BookContent, BookSource, BookStream, PageFailure, PDFExtractor
+)
+from .cassette import attach_cassette, Cassette
+from .extraction_cache import ExtractionCache
+from .extraction_sandbox import FAILURE_LABELS, ExtractionError, book_task, iter_sandboxed, sandbox_available
+from .pdf_cleanup import NoiseStats
+from .remote_file import RemoteFile, open_remote_file
+from .library_snapshot import LibrarySnapshot, snapshot_path
+from .upload_queue import UploadQueue
+from .cache_manifest import ManifestEntry
 from .models import BookFile, BatchResult, ProcessingResult, ChapterInfo
 
 
 class BatchProcessor:
     """批量处理器"""
 
-    def __init__(self, config: Config, logger: Logger):
+    # 达到该大小的书籍输出下载进度
+    PROGRESS_MIN_BYTES = 32 * 1024 * 1024
+
+    def __init__(
+        self,
+        config: Config,
+        logger: Logger,
+        record_path: Optional[str] = None,
+        replay_path: Optional[str] = None,
+        replay_speed: float = 1.0,
+    ):
         self.config = config
         self.logger = logger
         self.webdav = WebDAVClientWrapper(config.webdav, logger)
@@ -36,7 +59,29 @@ class BatchProcessor:
         self.ai_client: Optional[AIClient] = create_ai_client(
             config.ai, logger, prompt_templates
         )
+
+        # 录制 / 回放（cassette）
+        self._replay = bool(replay_path)
+        self.ai_client, self.webdav, self._cassette = attach_cassette(
+            self.ai_client,
+            self.webdav,
+            logger,
+            record_path=record_path,
+            replay_path=replay_path,
+            time_scale=replay_speed,
+        )
         self.formatter = ResultFormatter(logger)
+
+        # 章节提取缓存（按文件内容哈希）
+        self.extraction_cache: Optional[ExtractionCache] = None
+        if config.advanced.extractionCacheMaxMB > 0:
+            self.extraction_cache = ExtractionCache(
+                config.advanced.extractionCacheDir,
+                config.advanced.extractionCacheMaxMB * 1024 * 1024,
+            )
+
+        self.library_snapshot: Optional[LibrarySnapshot] = None
+        self.uploader: Optional[UploadQueue] = None
         self._start_time: Optional[float] = None
         self._temp_dir: Optional[str] = None
 
@@ -73,52 +118,82 @@ class BatchProcessor:
             print(f"   - 服务器: {self.config.webdav.serverUrl}")
             print(f"   - 同步路径: {self.config.webdav.syncPath}")
 
+            # 后台上传队列：回放时不读写持久化目录
+            if self.config.output.syncToWebDAV:
+                output = self.config.output
+                self.uploader = UploadQueue(
+                    self.webdav, self.logger,
+                    journal_dir=None if self._replay else output.uploadQueueDir,
+                    workers=output.uploadWorkers, max_retries=output.uploadRetries,
+                )
+                resumed = self.uploader.resume()
+                if resumed:
+                    print(f"☁️  继续上次未完成的上传: {resumed} 个文件")
+
             # 发现书籍
             print(f"\n📋 扫描文件夹: {self.config.batch.sourcePath}")
             books = self._discover_books()
-
-            if not books:
-                print("\n⚠️  未找到可处理的电子书")
-                return BatchResult()
-
+            stream = self.config.batch.order == "stream"
+            scan_stats = {"found": 0, "skipped": 0, "queued": 0}
             cached_files = self._load_cached_file_names()
             skipped = 0
-            if self.config.batch.skipProcessed and cached_files:
-                original_count = len(books)
-                books = [
-                    book
-                    for book in books
-                    if f"{book.sanitized_name}-完整摘要.md" not in cached_files
-                ]
-                skipped = original_count - len(books)
-                if skipped > 0:
-                    print(f"   ⏭️  已过滤已处理文件: {skipped} 本")
-
-            # 排序
-            if self.config.batch.order == "random":
-                random.shuffle(books)
-                print("🎲 处理顺序: 随机")
+
+            if stream:
+                # 边扫描边处理：不等待完整列表，按发现顺序过滤与限量
+                books = self._stream_books(books, cached_files, scan_stats)
+                print("🌊 处理顺序: 按发现顺序（边扫描边处理）")
+                if self.config.batch.maxFiles > 0:
+                    print(f"📊 限制处理数量: {self.config.batch.maxFiles}")
             else:
-                books.sort(key=lambda b: b.name)
-                print("📄 处理顺序: 顺序")
+                books = list(books)
+                self._report_scan()
+                if not books:
+                    print("\n⚠️  未找到可处理的电子书")
+                    return BatchResult()
+
+                if self.config.batch.skipProcessed and cached_files:
+                    original_count = len(books)
+                    books = [
+                        book
+                        for book in books
+                        if f"{book.sanitized_name}-完整摘要.md" not in cached_files
+                    ]
+                    skipped = original_count - len(books)
+                    if skipped > 0:
+                        print(f"   ⏭️  已过滤已处理文件: {skipped} 本")
+
+                # 排序
+                if self.config.batch.order == "random":
+                    random.shuffle(books)
+                    print("🎲 处理顺序: 随机")
+                else:
+                    books.sort(key=lambda b: b.name)
+                    print("📄 处理顺序: 顺序")
 
-            # 限制数量
-            if self.config.batch.maxFiles > 0:
-                books = books[: self.config.batch.maxFiles]
-                print(f"📊 限制处理数量: {len(books)}")
+                # 限制数量
+                if self.config.batch.maxFiles > 0:
+                    books = books[: self.config.batch.maxFiles]
+                    print(f"📊 限制处理数量: {len(books)}")
 
-            print(f"\n📚 找到 {len(books)} 本待处理书籍")
+                print(f"\n📚 找到 {len(books)} 本待处理书籍")
 
             # 显示配置摘要
             self._print_config_summary()
 
-            # 确认开始
+            # 确认开始（回放模式无需确认）
             print("\n" + "-" * 60)
-            input("按 Enter 开始处理... (Ctrl+C 取消) ")
+            if not self._replay:
+                input("按 Enter 开始处理... (Ctrl+C 取消) ")
             print("-" * 60)
 
             # 处理每本书
             result = self._process_books(books, log_file, cached_files)
+            if stream:
+                skipped = scan_stats["skipped"]
+                print(f"\n📋 扫描完成: 发现 {scan_stats['found']} 本，跳过已处理 {skipped} 本")
+                self._report_scan()
+                if not scan_stats["found"]:
+                    print("\n⚠️  未找到可处理的电子书")
             if skipped > 0:
                 result.skipped += skipped
 
@@ -138,11 +213,15 @@ class BatchProcessor:
         finally:
             # 清理临时目录
             if self._temp_dir and os.path.exists(self._temp_dir):
-                import shutil
-
                 shutil.rmtree(self._temp_dir, ignore_errors=True)
+            self._close_uploader()
             self.webdav.disconnect()
 
+            # 保存录制结果
+            if self._cassette is not None and not self._replay:
+                self._cassette.save()
+                print(f"\n📼 已保存录制文件: {self._cassette.path}")
+
     def _init_progress_log(self) -> str:
         """初始化进度日志文件"""
         log_dir = self.config.output.logDir
@@ -173,6 +252,9 @@ class BatchProcessor:
             return set()
 
         cached_files = self.webdav.list_cache_files()
+        if self.uploader is not None:
+            # 已处理、仍在等待上传的摘要同样视为已处理
+            cached_files |= {n for n in self.uploader.pending_names() if n.endswith("-完整摘要.md")}
         if cached_files:
             print(f"☁️  已获取缓存列表: {len(cached_files)} 项")
         return cached_files
@@ -200,29 +282,73 @@ class BatchProcessor:
             f"   - 同步到 WebDAV: {'是' if self.config.output.syncToWebDAV else '否'}"
         )
 
-    def _discover_books(self) -> list[BookFile]:
-        """发现待处理的书籍"""
-        books = self.webdav.list_books(self.config.batch.sourcePath)
+    def _discover_books(self) -> Iterator[BookFile]:
+        """发现待处理的书籍（递归扫描，边扫描边返回）"""
+        batch = self.config.batch
+        # 书库快照：回放时不访问真实书库，不读写快照
+        if batch.snapshotDir and not self._replay:
+            root = "/" + batch.sourcePath.strip("/")
+            options = {"maxDepth": batch.scanMaxDepth, "include": list(batch.include), "exclude": list(batch.exclude)}
+            self.library_snapshot = LibrarySnapshot.load(
+                snapshot_path(batch.snapshotDir, self.config.webdav.serverUrl, root), root, options,
+                reuse_dirs=batch.reuseUnchangedDirs
+            )
+            if batch.changedOnly and self.library_snapshot.entries:
+                print("🔍 差异模式: 只处理上次扫描后新增或修改的书籍")
 
         # 跳过已处理的逻辑改为在批量阶段统一处理
-        return books
+        return self.webdav.scan_books(
+            batch.sourcePath, max_depth=batch.scanMaxDepth, include=batch.include,
+            exclude=batch.exclude, concurrency=batch.scanConcurrency,
+            snapshot=self.library_snapshot, changed_only=batch.changedOnly
+        )
+
+    def _report_scan(self):
+        """输出与上次快照相比的书库变化"""
+        if self.library_snapshot is None:
+            return
+        diff = self.library_snapshot.diff
+        print(
+            f"🗂️  书库变化: 新增 {diff.new} | 修改 {diff.changed} | 未变 {diff.unchanged} | 删除 {diff.removed}"
+            f"（列出 {diff.listed_dirs} 个文件夹，沿用快照 {diff.skipped_dirs} 个）"
+        )
+        if not diff.complete:
+            print("   ⚠️  扫描未完整结束（提前停止或有文件夹无法列出），快照未更新")
+
+    def _stream_books(self, books: Iterator[BookFile], cached_files: set[str],
+                      stats: dict) -> Iterator[BookFile]:
+        """按发现顺序过滤已处理的书籍并限制数量（stats 累计发现、跳过与排队数）"""
+        limit = self.config.batch.maxFiles
+        for book in books:
+            stats["found"] += 1
+            if self.config.batch.skipProcessed and f"{book.sanitized_name}-完整摘要.md" in cached_files:
+                stats["skipped"] += 1
+                continue
+            stats["queued"] += 1
+            yield book
+            if 0 < limit <= stats["queued"]:
+                return
 
     def _process_books(
-        self, books: list[BookFile], log_file: str, cached_files: set[str]
+        self, books: Iterable[BookFile], log_file: str, cached_files: set[str]
     ) -> BatchResult:
-        """处理书籍列表"""
+        """处理书籍列表（边扫描边处理时总数未知，显示为 ?）"""
         skipped = 0
-        result = BatchResult(total=len(books))
+        total = len(books) if isinstance(books, list) else None
+        result = BatchResult(total=total or 0)
+        count = "?" if total is None else total
 
         for i, book in enumerate(books):
+            if total is None:
+                result.total = i + 1
             self._log_progress(
-                log_file, f"开始处理 [{i + 1}/{len(books)}]: {book.name}"
+                log_file, f"开始处理 [{i + 1}/{count}]: {book.name}"
             )
 
             book_start_time = time.time()
 
             print(f"\n{'=' * 60}")
-            print(f"[{i + 1:02d}/{len(books)}] 📖 开始处理: {book.name}")
+            print(f"[{i + 1:02d}/{count}] 📖 开始处理: {book.name}")
             print(f"{'=' * 60}")
 
             try:
@@ -249,19 +375,20 @@ class BatchProcessor:
 
                     self._log_progress(
                         log_file,
-                        f"完成 [{i + 1}/{len(books)}]: {book.name} - 成功 - 耗时 {book_time:.1f}s - 费用 ${book_result.cost_usd:.5f}",
+                        f"完成 [{i + 1}/{count}]: {book.name} - 成功 - 耗时 {book_time:.1f}s - 费用 ${book_result.cost_usd:.5f}",
                     )
                 else:
                     result.failed += 1
-                    result.failed_books.append(
-                        {"name": book.name, "error": book_result.error}
-                    )
+                    failure = {"name": book.name, "error": book_result.error}
+                    if book_result.error_kind:
+                        failure["kind"] = book_result.error_kind
+                    result.failed_books.append(failure)
 
                     print(f"\n❌ 处理失败: {book.name}")
                     print(f"   错误: {book_result.error}")
                     self._log_progress(
                         log_file,
-                        f"失败 [{i + 1}/{len(books)}]: {book.name} - {book_result.error}",
+                        f"失败 [{i + 1}/{count}]: {book.name} - {book_result.error}",
                     )
 
             except KeyboardInterrupt:
@@ -274,7 +401,7 @@ class BatchProcessor:
                 print(f"\n❌ 处理异常: {book.name}")
                 print(f"   错误: {error_msg}")
                 self._log_progress(
-                    log_file, f"异常 [{i + 1}/{len(books)}]: {book.name} - {error_msg}"
+                    log_file, f"异常 [{i + 1}/{count}]: {book.name} - {error_msg}"
                 )
 
         # 计算总时间
@@ -282,6 +409,27 @@ class BatchProcessor:
 
         return result
 
+    def _should_stream(self, book: BookFile, source: BookSource) -> bool:
+        """页数达到阈值的 PDF 使用流式提取（不使用沙箱时在当前进程内读取页数）"""
+        if book.extension != '.pdf':
+            return False
+        return PDFExtractor.needs_streaming(source, self.config.advanced.pdfStreamingPages)
+
+    def _report_page_failures(self, failures: list[PageFailure]):
+        """输出页面提取失败报告"""
+        if not failures:
+            return
+        pages = ", ".join(str(f.page) for f in failures[:10])
+        more = " ..." if len(failures) > 10 else ""
+        print(f"   ⚠️  {len(failures)} 个页面提取失败: {pages}{more}")
+        for failure in failures:
+            self.logger.debug_log(f"页面 {failure.page} 提取失败: {failure.error}")
+
+    def _report_noise(self, noise: NoiseStats):
+        """输出噪声清理统计（页眉页脚、页码、注释等）"""
+        if noise.chars:
+            print(f"   ✂️  去除页眉页脚 / 注释 {noise.chars:,} 字符，约节省 {noise.tokens:,} tokens")
+
     def _process_single_book(
         self, book: BookFile, cached_files: set[str]
     ) -> ProcessingResult:
@@ -290,23 +438,46 @@ class BatchProcessor:
 
         # 1. 下载书籍到临时目录
         print(f"\n📥 正在下载: {book.name}...")
-        local_path = self._download_book(book)
-        if not local_path:
+        source = self._download_book(book)
+        if source is None:
             return ProcessingResult(
                 success=False, book_name=book.name, error="下载书籍失败"
             )
 
         # 2. 提取章节
         print(f"📖 正在提取章节...")
+        streaming = False
         try:
-            book_content = ChapterExtractorFactory.extract(local_path)
-            chapter_count = len(book_content.chapters)
-            total_chars = sum(len(ch.content) for ch in book_content.chapters)
-
-            print(f"   ✅ 提取到 {chapter_count} 个章节")
-            print(f"   📊 总字符数: {total_chars:,}")
-
+            cache_hits = self.extraction_cache.hits if self.extraction_cache else 0
+            book_content = self._extract_book(book, source)
+            streaming = isinstance(book_content, BookStream)
+            if streaming:
+                # 超大 PDF：章节在 AI 处理时逐个提取，不在内存中保留整本书
+                chapter_count = 0
+                total_chars = 0
+                print(f"   🌊 使用流式提取，章节将逐个处理")
+            else:
+                if self.extraction_cache and self.extraction_cache.hits > cache_hits:
+                    print(f"   ♻️  使用提取缓存")
+                chapter_count = len(book_content.chapters)
+                total_chars = sum(len(ch.content) for ch in book_content.chapters)
+
+                print(f"   ✅ 提取到 {chapter_count} 个章节")
+                print(f"   📊 总字符数: {total_chars:,}")
+                self._report_page_failures(book_content.page_failures)
+                self._report_noise(book_content.noise)
+                if isinstance(source, RemoteFile):
+                    saved = 1 - source.bytes_fetched / source.size
+                    print(f"   🌐 按需读取 {source.bytes_fetched / 1024:,.0f} KB / {source.size / 1024:,.0f} KB"
+                          f"（{source.requests} 次请求，节省 {saved:.0%}）")
+
+        except ExtractionError as e:
+            self._release_book(source)
+            return ProcessingResult(
+                success=False, book_name=book.name, error=f"章节提取失败: {e}", error_kind=e.kind
+            )
         except Exception as e:
+            self._release_book(source)
             return ProcessingResult(
                 success=False, book_name=book.name, error=f"章节提取失败: {e}"
             )
@@ -315,6 +486,7 @@ class BatchProcessor:
         cache_name = f"{book.sanitized_name}-完整摘要.md"
         if cache_name in cached_files:
             print(f"\n⏭️  发现缓存，跳过处理")
+            self._release_book(source)
             return ProcessingResult(
                 success=True,
                 book_name=book.name,
@@ -326,15 +498,33 @@ class BatchProcessor:
         total_input_tokens = 0
         total_output_tokens = 0
         chapter_results = {}
+        chapters_info = []
+        truncated_chapters = 0
         connections = AIResponse(success=False, content="")
         overall_summary = AIResponse(success=False, content="")
 
-        if self.ai_client:
+        if not self.ai_client:
+            print("   ⚠️  AI 客户端未初始化，跳过 AI 处理")
+
+        try:
             for idx, chapter in enumerate(book_content.chapters):
                 chapter_num = idx + 1
+                chapters_info.append(ChapterInfo(
+                    id=str(chapter_num),
+                    title=chapter.title,
+                    content=chapter.content[:500] if chapter.content else "",  # 只传前500字符
+                    order=idx,
+                ))
+                if streaming:
+                    chapter_count = chapter_num
+                    total_chars += len(chapter.content)
+
+                if not self.ai_client:
+                    chapter_results[str(chapter_num)] = f"（AI 客户端未配置）"
+                    continue
 
                 print(
-                    f"   🔄 处理章节 {chapter_num}/{chapter_count}: {chapter.title[:30]}..."
+                    f"   🔄 处理章节 {chapter_num}/{chapter_count if not streaming else '?'}: {chapter.title[:30]}..."
                 )
 
                 response = self.ai_client.summarize_chapter(
@@ -356,6 +546,11 @@ class BatchProcessor:
                     print(
                         f"      ✅ 完成 (input: {response.input_tokens:,}, output: {response.output_tokens:,})"
                     )
+                    if response.continuations:
+                        print(f"      ↪️  续写 {response.continuations} 次")
+                    if response.truncated:
+                        truncated_chapters += 1
+                        print(f"      ⚠️  输出仍被截断")
                 else:
                     chapter_results[str(chapter_num)] = (
                         f"（处理失败: {response.error}）"
@@ -364,20 +559,18 @@ class BatchProcessor:
 
                 # 短暂延迟避免 API 限流
                 time.sleep(0.5)
-        else:
-            print("   ⚠️  AI 客户端未初始化，跳过 AI 处理")
-            for idx, chapter in enumerate(book_content.chapters):
-                chapter_results[str(idx + 1)] = f"（AI 客户端未配置）"
-
-        chapters_info = [
-            ChapterInfo(
-                id=str(idx + 1),
-                title=ch.title,
-                content=ch.content[:500] if ch.content else "",  # 只传前500字符
-                order=idx,
+        except Exception as e:
+            if not streaming:
+                raise
+            return ProcessingResult(
+                success=False, book_name=book.name, error=f"章节提取失败: {e}",
+                error_kind=getattr(e, 'kind', None)
             )
-            for idx, ch in enumerate(book_content.chapters)
-        ]
+
+        if streaming:
+            print(f"   ✅ 流式提取 {chapter_count} 个章节，总字符数: {total_chars:,}")
+            self._report_page_failures(book_content.page_failures)
+            self._report_noise(book_content.noise)
 
         # 5. 生成关联分析
         if (
@@ -448,12 +641,22 @@ class BatchProcessor:
             "fileName": book.name,
             "processedAt": datetime.now().isoformat(),
             "model": self.config.ai.model,
+            "promptVersion": self.config.prompts.currentVersion,
             "chapterDetectionMode": self.config.processing.chapterDetectionMode,
             "chapterCount": chapter_count,
             "originalCharCount": total_chars,
             "processedCharCount": len(local_content),
             "inputTokens": total_input_tokens,
             "outputTokens": total_output_tokens,
+            "truncatedChapters": truncated_chapters,
+            "pageFailures": [
+                {"page": f.page, "error": f.error} for f in book_content.page_failures
+            ],
+            "noiseRemoved": {
+                "lines": book_content.noise.lines,
+                "chars": book_content.noise.chars,
+                "tokens": book_content.noise.tokens,
+            },
             "costUSD": cost_usd,
             "costRMB": cost_cny,
         }
@@ -465,26 +668,26 @@ class BatchProcessor:
         )
         print(f"   💾 元数据已保存: {meta_file}")
 
-        # 同步到 WebDAV
-        if self.config.output.syncToWebDAV:
+        # 同步到 WebDAV（交给后台上传队列，不阻塞后续处理）
+        if self.uploader is not None:
             # 生成带元数据的内容
             webdav_content = self.formatter.format_with_metadata(
                 local_content, metadata, self.config.advanced.exchangeRate
             )
 
-            sync_path = (
-                f"{self.config.webdav.syncPath}/{book.sanitized_name}-完整摘要.md"
+            sync_dir = self.config.webdav.syncPath
+            sync_path = f"{sync_dir}/{book.sanitized_name}-完整摘要.md"
+            self.uploader.submit(sync_path, webdav_content, manifest=(
+                book.sanitized_name,
+                ManifestEntry.for_content(webdav_content, metadata["model"], metadata["promptVersion"]),
+            ))
+            self.uploader.submit(
+                f"{sync_dir}/{book.sanitized_name}.meta.json", self.formatter.format_json(metadata)
             )
-            if self.webdav.upload_file(sync_path, webdav_content):
-                print(f"   ☁️  已同步到 WebDAV: {sync_path}")
-            else:
-                print(f"   ⚠️  WebDAV 同步失败")
+            print(f"   ☁️  已加入上传队列: {sync_path}")
 
         # 清理临时文件
-        try:
-            os.remove(local_path)
-        except Exception:
-            pass
+        self._release_book(source)
 
         return ProcessingResult(
             success=True,
@@ -498,15 +701,44 @@ class BatchProcessor:
             processing_time=time.time() - start_time,
         )
 
-    def _download_book(self, book: BookFile) -> Optional[str]:
-        """下载书籍到临时目录"""
+    def _close_uploader(self):
+        """等待后台上传完成并输出统计，超时未完成的上传留到下次运行"""
+        if self.uploader is None:
+            return
+        if self.uploader.stats().pending:
+            print("\n⏳ 等待后台上传完成...")
+        timeout = self.config.output.uploadFlushTimeout or None
+        done = self.uploader.close(timeout)
+        stats = self.uploader.stats()
+        if stats.uploaded or stats.failed or stats.pending:
+            print(f"☁️  WebDAV 同步: 成功 {stats.uploaded} 个文件，重试 {stats.retried} 次，失败 {stats.failed} 个")
+        if not done or stats.failed:
+            print("   ⚠️  未完成的上传已保存，下次运行时继续")
+        self.uploader = None
+
+    def _download_book(self, book: BookFile) -> Optional[BookSource]:
+        """
+        下载书籍
+
+        EPUB 优先通过 Range 请求按需读取；其余 EPUB 与单进程提取的 PDF 下载到内存缓冲区
+        （超过 inMemoryMaxMB 时自动转存到临时文件），多进程提取的 PDF 下载到临时目录——
+        各工作进程需要按路径重新打开文件
+        """
         try:
-            # 下载到临时目录
-            if not self._temp_dir:
-                raise RuntimeError("临时目录未初始化")
-            local_path = os.path.join(self._temp_dir, book.name)
+            if book.extension == '.epub' and self.config.advanced.epubRangeRequests:
+                remote = self._open_remote_book(book)
+                if remote is not None:
+                    return remote
+
+            # 分块下载，大小与扫描时的 getcontentlength 一致才开始提取
+            progress = self._download_progress(book)
+            max_memory = self.config.advanced.inMemoryMaxMB * 1024 * 1024
+            if max_memory > 0 and (book.extension == '.epub' or self.config.advanced.pdfWorkers == 1):
+                return self.webdav.download_to_buffer(book.path, max_memory, book.size, progress)
 
-            if self.webdav.download_file(book.path, local_path):
+            local_path = self._download_path(book)
+
+            if self.webdav.download_file(book.path, local_path, book.size, progress):
                 return local_path
             else:
                 return None
@@ -515,6 +747,148 @@ class BatchProcessor:
             self.logger.error(f"下载书籍失败: {e}")
             return None
 
+    def _download_path(self, book: BookFile) -> str:
+        """
+        书籍下载到磁盘的路径：配置了 downloadDir 时按远程路径、大小与修改时间命名，
+        中断留下的 .part 在下次运行时续传（远程文件变化后不会续传到旧版本上）；否则下载到临时目录
+        """
+        download_dir = self.config.advanced.downloadDir
+        if download_dir and not self._replay:
+            directory = os.path.expanduser(download_dir)
+            key = f"{self.config.webdav.serverUrl}\n{book.path}\n{book.size}\n{book.last_modified.isoformat()}"
+            digest = hashlib.sha256(key.encode('utf-8')).hexdigest()[:16]
+            return os.path.join(directory, f"{digest}-{book.name}")
+
+        if not self._temp_dir:
+            raise RuntimeError("临时目录未初始化")
+        return os.path.join(self._temp_dir, book.name)
+
+    def _download_progress(self, book: BookFile) -> Optional[Callable[[int, Optional[int]], None]]:
+        """大文件的下载进度回调：每完成 25% 输出一次"""
+        if book.size < self.PROGRESS_MIN_BYTES:
+            return None
+        reported = [0]
+
+        def progress(done: int, total: Optional[int]):
+            if not total:
+                return
+            step = done * 4 // total
+            if step > reported[0]:
+                reported[0] = step
+                print(f"   ⬇️  已下载 {done / 1024 / 1024:.1f} / {total / 1024 / 1024:.1f} MB（{min(step, 4) * 25}%）")
+
+        return progress
+
+    def _extract_book(self, book: BookFile, source: BookSource) -> Union[BookContent, BookStream]:
+        """
+        提取章节（使用提取缓存）；页数达到 pdfStreamingPages 的 PDF 返回流式结果
+
+        启用沙箱时读取页数与提取都在独立子进程中进行，超时或超出内存上限只终止该子进程，
+        流式提取的章节也经由子进程逐个返回；按需读取的远程 EPUB 仍在当前进程内提取——
+        Range 请求要经过本进程的 HTTP 连接与录制器
+        """
+        advanced = self.config.advanced
+        options = dict(
+            pdf_workers=advanced.pdfWorkers,
+            pdf_page_timeout=advanced.pdfPageTimeout,
+            pdf_engine=advanced.pdfEngine,
+            epub_notes=advanced.epubNotes,
+            source=source,
+            detection=self.config.processing.chapterDetectionMode,
+            target_tokens=self.config.processing.chapterTargetTokens,
+        )
+
+        if not advanced.extractionSandbox or isinstance(source, RemoteFile) or not sandbox_available():
+            if self._should_stream(book, source):
+                return ChapterExtractorFactory.stream(book.name, **options)
+            return ChapterExtractorFactory.extract(book.name, cache=self.extraction_cache, **options)
+
+        sandbox_source, spooled = self._sandbox_source(source)
+        messages = iter_sandboxed(
+            book_task, (book.name, sandbox_source, advanced, self.config.processing, self.extraction_cache),
+            advanced.extractionTimeout, advanced.extractionMaxMemoryMB
+        )
+        try:
+            first = next(messages)
+        except BaseException:
+            self._remove_spooled(spooled)
+            raise
+
+        if first[0] == 'book':
+            _, book_content, cache_stats = first
+            for _ in messages:
+                pass
+            self._remove_spooled(spooled)
+            if cache_stats is not None:
+                self.extraction_cache.hits, self.extraction_cache.misses = cache_stats  # 同步子进程中的缓存命中统计
+            return book_content
+
+        _, title, author, file_type = first
+        stream = BookStream(title=title, author=author, chapters=iter(()), file_path=book.name, file_type=file_type)
+
+        def chapters() -> Iterator[Chapter]:
+            try:
+                for message in messages:
+                    if message[0] == 'chapter':
+                        yield message[1]
+                    else:
+                        stream.page_failures.extend(message[1])
+                        stream.noise = message[2]
+            finally:
+                messages.close()
+                self._remove_spooled(spooled)
+
+        stream.chapters = chapters()
+        return stream
+
+    def _sandbox_source(self, source: BookSource) -> tuple[Union[str, bytes], Optional[str]]:
+        """
+        沙箱子进程可接收的书籍内容：路径原样传递，内存中的小文件以字节传递，
+        超过 inMemoryMaxMB 的转存为临时文件（同时返回该路径，提取结束后删除）
+        """
+        if isinstance(source, (str, bytes)):
+            return source, None
+        source.seek(0, os.SEEK_END)
+        size = source.tell()
+        source.seek(0)
+        if size <= self.config.advanced.inMemoryMaxMB * 1024 * 1024:
+            return source.read(), None
+        fd, path = tempfile.mkstemp(prefix="fastreader_", dir=self._temp_dir)
+        with os.fdopen(fd, 'wb') as f:
+            shutil.copyfileobj(source, f)
+        return path, path
+
+    @staticmethod
+    def _remove_spooled(path: Optional[str]):
+        if path:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _open_remote_book(self, book: BookFile) -> Optional[RemoteFile]:
+        """按需读取的远程文件，服务器不支持 Range 请求时返回 None（改为完整下载）"""
+        try:
+            remote = open_remote_file(
+                self.webdav, book.path, book.size, book.last_modified.isoformat()
+            )
+        except Exception as e:
+            self.logger.warning(f"按需读取失败，改为完整下载: {e}")
+            return None
+        if remote is None:
+            self.logger.debug_log(f"服务器不支持 Range 请求，完整下载: {book.path}")
+        return remote
+
+    def _release_book(self, source: BookSource):
+        """删除下载的临时文件或关闭内存缓冲区"""
+        try:
+            if isinstance(source, str):
+                os.remove(source)
+            elif hasattr(source, 'close'):
+                source.close()
+        except Exception:
+            pass
+
     def _generate_report(self, result: BatchResult):
         """生成处理报告"""
         print("\n" + "=" * 60)
@@ -530,6 +904,10 @@ class BatchProcessor:
         print(f"   跳过: {result.skipped}")
         print(f"   总费用: ${result.total_cost_usd:.5f} / ¥{result.total_cost_cny:.5f}")
         print(f"   总耗时: {self._format_time(result.processing_time)}")
+        pool = getattr(self.webdav, 'pool_stats', lambda: None)()
+        if pool is not None and pool.requests:
+            print(f"   🔌 WebDAV 连接: {pool.requests} 次请求，新建 {pool.opened} · 复用 {pool.reused}"
+                  f"（{pool.reuse_rate:.0%}）· 等待 {pool.waited}")
         print("=" * 60)
 
         # 失败列表
@@ -537,6 +915,9 @@ class BatchProcessor:
             print("\n❌ 失败列表:")
             for item in result.failed_books:
                 print(f"   - {item['name']}: {item['error']}")
+            kinds = Counter(item['kind'] for item in result.failed_books if 'kind' in item)
+            if kinds:
+                print("   提取失败类型: " + "，".join(f"{FAILURE_LABELS.get(k, k)} {n}" for k, n in kinds.items()))
 
         # 生成报告文件
         report_file = self._create_report_file(result)
@@ -0,0 +1,67 @@
+"""
+云端缓存清单
+syncPath 下的单个 gzip 压缩 JSON 文件，记录每本已处理书籍（清理后的名称）的内容哈希、模型、
+Prompt 版本与处理时间。跳过已处理书籍时只需一次 GET，不再 PROPFIND 整个同步目录
+"""
+
+import gzip
+import hashlib
+import json
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional
+
+
+MANIFEST_NAME = ".fastreader-manifest.json.gz"
+MANIFEST_VERSION = 1
+SUMMARY_SUFFIX = "-完整摘要.md"
+
+
+@dataclass
+class ManifestEntry:
+    """一本已处理书籍的记录"""
+    hash: str = ""           # 摘要内容的 SHA-256 前 16 位（重建时为服务器 ETag）
+    model: str = ""
+    promptVersion: str = ""
+    updatedAt: str = ""
+
+    @classmethod
+    def for_content(cls, content: str, model: str = "", prompt_version: str = "") -> 'ManifestEntry':
+        return cls(
+            hash=hashlib.sha256(content.encode('utf-8')).hexdigest()[:16],
+            model=model,
+            promptVersion=prompt_version,
+            updatedAt=datetime.now().isoformat(timespec='seconds'),
+        )
+
+
+@dataclass
+class CacheManifest:
+    """缓存清单（清理后的书名 -> ManifestEntry），etag 为读取时服务器返回的版本"""
+    entries: dict = field(default_factory=dict)
+    etag: Optional[str] = None
+
+    def summary_names(self) -> set[str]:
+        """对应的完整摘要文件名集合（与 list_cache_files 的目录列表结果一致）"""
+        return {f"{name}{SUMMARY_SUFFIX}" for name in self.entries}
+
+    def encode(self) -> bytes:
+        data = {
+            'version': MANIFEST_VERSION,
+            'entries': {
+                name: [e.hash, e.model, e.promptVersion, e.updatedAt]
+                for name, e in sorted(self.entries.items())
+            },
+        }
+        raw = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        # mtime=0：内容相同的清单编码结果一致
+        return gzip.compress(raw, mtime=0)
+
+    @classmethod
+    def decode(cls, payload: bytes, etag: Optional[str] = None) -> 'CacheManifest':
+        """解析清单内容；版本不支持时抛出 ValueError"""
+        data = json.loads(gzip.decompress(payload).decode('utf-8'))
+        if data.get('version') != MANIFEST_VERSION:
+            raise ValueError(f"不支持的缓存清单版本: {data.get('version')}")
+        entries = {name: ManifestEntry(*values) for name, values in data.get('entries', {}).items()}
+        return cls(entries=entries, etag=etag)
@@ -0,0 +1,407 @@
+"""
+录制 / 回放层
+将一次真实运行中的 AI 请求与 WebDAV 操作录制为压缩的 cassette 文件，
+之后可在无网络环境下按原始（或缩放后的）耗时回放整个批量流程，
+用于不同代码版本之间的确定性端到端性能对比
+"""
+
+import dataclasses
+import gzip
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Optional
+
+from .ai_client import AIResponse
+from .models import BookFile, ChapterInfo
+from .logger import Logger
+
+
+CASSETTE_VERSION = 1
+
+
+class CassetteMissError(KeyError):
+    """回放时找不到对应的录制记录"""
+    pass
+
+
+def _digest(data: Any) -> str:
+    """计算任意可 JSON 序列化数据的摘要"""
+    if isinstance(data, bytes):
+        return hashlib.sha256(data).hexdigest()
+    if isinstance(data, str):
+        return hashlib.sha256(data.encode('utf-8', errors='ignore')).hexdigest()
+    return hashlib.sha256(
+        json.dumps(data, ensure_ascii=False, sort_keys=True).encode('utf-8')
+    ).hexdigest()
+
+
+def _chapter_key(chapter: ChapterInfo) -> list:
+    """章节的匹配键（标题 + 内容摘要，不依赖具体 Prompt）"""
+    return [chapter.title, _digest(chapter.content)]
+
+
+class Cassette:
+    """
+    Cassette 文件（gzip 压缩的 JSON Lines）
+
+    记录类型：
+        header: 版本与创建时间
+        call:   一次操作（kind / op / key / elapsed / result / error）
+
+    录制时每条记录立即追加到 gzip 流，中途崩溃也能保留已录制的部分；
+    二进制内容（如下载的书籍文件）按 SHA-256 去重保存在同名的 .blobs 目录中，不在内存中保留
+    """
+
+    BLOB_CHUNK = 1024 * 1024  # 保存 / 哈希二进制内容时的分块大小
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.blob_dir = self.path.with_name(self.path.name + '.blobs')
+        self.header: dict = {}
+        self._calls: dict[str, list] = {}
+        self._writer = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: str) -> 'Cassette':
+        """从文件加载 cassette（录制中断导致 gzip 流不完整时读取到中断处为止）"""
+        cassette = cls(path)
+        with gzip.open(cassette.path, 'rt', encoding='utf-8') as f:
+            try:
+                for line in f:
+                    if not line.endswith('\n') or not line.strip():
+                        continue
+                    record = json.loads(line)
+                    record_type = record.get('type')
+                    if record_type == 'header':
+                        cassette.header = record
+                    elif record_type == 'call':
+                        cassette._calls.setdefault(record['key'], []).append(record)
+            except EOFError:
+                pass
+        return cassette
+
+    def _open_writer(self):
+        """首次写入时创建文件并写入 header（需持有锁）"""
+        if self._writer is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._writer = gzip.open(self.path, 'wt', encoding='utf-8', compresslevel=6)
+            self._writer.write(json.dumps({
+                'type': 'header',
+                'version': CASSETTE_VERSION,
+                'createdAt': datetime.now().isoformat(),
+            }, ensure_ascii=False) + '\n')
+
+    def _write(self, record: dict):
+        """追加一条记录并刷新到文件（需持有锁）"""
+        self._open_writer()
+        self._writer.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._writer.flush()
+
+    def record_call(self, kind: str, op: str, key: str, elapsed: float, result: Any = None, error: Optional[str] = None):
+        """追加一条操作记录"""
+        with self._lock:
+            self._write({
+                'type': 'call',
+                'kind': kind,
+                'op': op,
+                'key': key,
+                'elapsed': round(elapsed, 4),
+                'result': result,
+                'error': error,
+            })
+
+    def add_blob(self, data: bytes) -> str:
+        """保存二进制内容，返回其 SHA-256"""
+        return self.add_blob_stream(io.BytesIO(data))
+
+    def add_blob_stream(self, f: BinaryIO) -> str:
+        """从文件对象的当前位置分块读取并保存（不整体读入内存），返回其 SHA-256"""
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=self.blob_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                for chunk in iter(lambda: f.read(self.BLOB_CHUNK), b''):
+                    digest.update(chunk)
+                    out.write(chunk)
+            sha = digest.hexdigest()
+            os.replace(tmp_path, self.blob_dir / sha)
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+        return sha
+
+    def blob_path(self, sha: str) -> Path:
+        """二进制内容的文件路径"""
+        path = self.blob_dir / sha
+        if not path.is_file():
+            raise CassetteMissError(f"cassette 中缺少数据块: {sha}")
+        return path
+
+    def get_blob(self, sha: str) -> bytes:
+        """读取二进制内容"""
+        return self.blob_path(sha).read_bytes()
+
+    def next_call(self, key: str, op: str) -> dict:
+        """按录制顺序取出下一条匹配的记录"""
+        with self._lock:
+            queue = self._calls.get(key)
+            if not queue:
+                raise CassetteMissError(f"cassette 中没有匹配的 {op} 记录")
+            return queue.pop(0)
+
+    def save(self):
+        """结束录制：写入 gzip 结尾（没有任何记录时只写入 header）"""
+        with self._lock:
+            self._open_writer()
+            self._writer.close()
+            self._writer = None
+
+
+class _CassetteProxy:
+    """录制 / 回放代理基类"""
+
+    KIND = ''
+
+    def __init__(self, inner, cassette: Cassette, replay: bool = False, time_scale: float = 1.0):
+        self.inner = inner
+        self.cassette = cassette
+        self.replay = replay
+        self.time_scale = time_scale
+
+    def __getattr__(self, name):
+        inner = self.__dict__.get('inner')
+        if inner is None:
+            raise AttributeError(name)
+        return getattr(inner, name)
+
+    def _call(self, op: str, key_parts: list, live: Callable[[], Any],
+              encode: Callable[[Any], Any] = lambda v: v,
+              decode: Callable[[Any], Any] = lambda v: v) -> Any:
+        """执行（录制）或回放一次操作"""
+        key = _digest([self.KIND, op, key_parts])
+
+        if self.replay:
+            record = self.cassette.next_call(key, op)
+            delay = record.get('elapsed', 0) * self.time_scale
+            if delay > 0:
+                time.sleep(delay)
+            if record.get('error') is not None:
+                raise RuntimeError(record['error'])
+            return decode(record.get('result'))
+
+        start = time.perf_counter()
+        try:
+            value = live()
+        except Exception as e:
+            self.cassette.record_call(self.KIND, op, key, time.perf_counter() - start, error=str(e))
+            raise
+        self.cassette.record_call(self.KIND, op, key, time.perf_counter() - start, result=encode(value))
+        return value
+
+
+class CassetteAIClient(_CassetteProxy):
+    """AI 客户端录制 / 回放代理（按章节内容匹配，不依赖具体 Prompt 文本）"""
+
+    KIND = 'ai'
+
+    @staticmethod
+    def _encode(response: AIResponse) -> dict:
+        return dataclasses.asdict(response)
+
+    @staticmethod
+    def _decode(data: dict) -> AIResponse:
+        return AIResponse(**data)
+
+    def summarize_chapter(self, chapter: ChapterInfo, book_type: str, language: str) -> AIResponse:
+        return self._call(
+            'summarize_chapter', [_chapter_key(chapter), book_type, language],
+            lambda: self.inner.summarize_chapter(chapter, book_type, language),
+            self._encode, self._decode
+        )
+
+    def generate_mindmap(self, chapter: ChapterInfo, language: str) -> AIResponse:
+        return self._call(
+            'generate_mindmap', [_chapter_key(chapter), language],
+            lambda: self.inner.generate_mindmap(chapter, language),
+            self._encode, self._decode
+        )
+
+    def analyze_connections(self, chapters: list[ChapterInfo], language: str) -> AIResponse:
+        return self._call(
+            'analyze_connections', [[_chapter_key(c) for c in chapters], language],
+            lambda: self.inner.analyze_connections(chapters, language),
+            self._encode, self._decode
+        )
+
+    def translate_text(self, text: str, language: str) -> AIResponse:
+        return self._call(
+            'translate_text', [_digest(text), language],
+            lambda: self.inner.translate_text(text, language),
+            self._encode, self._decode
+        )
+
+    def generate_overall_summary(self, title: str, chapters: list[ChapterInfo], connections: str, language: str,
+                                 with_summaries: bool = False) -> AIResponse:
+        return self._call(
+            'generate_overall_summary',
+            [title, [_chapter_key(c) for c in chapters], _digest(connections or ''), language, with_summaries],
+            lambda: self.inner.generate_overall_summary(title, chapters, connections, language, with_summaries),
+            self._encode, self._decode
+        )
+
+
+class CassetteWebDAV(_CassetteProxy):
+    """WebDAV 客户端录制 / 回放代理（回放时不访问网络，上传只返回录制结果）"""
+
+    KIND = 'webdav'
+
+    @staticmethod
+    def _encode_books(books: list[BookFile]) -> list:
+        return [
+            {**dataclasses.asdict(b), 'last_modified': b.last_modified.isoformat()}
+            for b in books
+        ]
+
+    @staticmethod
+    def _decode_books(data: list) -> list[BookFile]:
+        return [
+            BookFile(**{**item, 'last_modified': datetime.fromisoformat(item['last_modified'])})
+            for item in data
+        ]
+
+    def connect(self) -> bool:
+        return self._call('connect', [], lambda: self.inner.connect())
+
+    def disconnect(self):
+        if not self.replay:
+            self.inner.disconnect()
+
+    def is_connected(self) -> bool:
+        return True if self.replay else self.inner.is_connected()
+
+    def list_books(self, source_path: str) -> list[BookFile]:
+        return self._call(
+            'list_books', [source_path],
+            lambda: self.inner.list_books(source_path),
+            self._encode_books, self._decode_books
+        )
+
+    def scan_books(self, source_path: str, max_depth: int = 0, include=(), exclude=(), concurrency: int = 4,
+                   snapshot=None, changed_only: bool = False):
+        """录制时完整扫描后记录，回放时按记录顺序返回（并发数与快照不影响匹配）"""
+        books = self._call(
+            'scan_books', [source_path, max_depth, list(include), list(exclude), changed_only],
+            lambda: list(self.inner.scan_books(source_path, max_depth, include, exclude, concurrency,
+                                               snapshot, changed_only)),
+            self._encode_books, self._decode_books
+        )
+        return iter(books)
+
+    def list_cache_files(self) -> set[str]:
+        return self._call(
+            'list_cache_files', [],
+            lambda: self.inner.list_cache_files(),
+            lambda v: sorted(v), lambda v: set(v)
+        )
+
+    def record_manifest(self, name: str, entry) -> bool:
+        return self._call('record_manifest', [name], lambda: self.inner.record_manifest(name, entry))
+
+    def file_exists(self, path: str) -> bool:
+        return self._call('file_exists', [path], lambda: self.inner.file_exists(path))
+
+    def download_file(self, remote_path: str, local_path: str, expected_size: int = 0, progress=None) -> bool:
+        def live():
+            ok = self.inner.download_file(remote_path, local_path, expected_size, progress)
+            if not ok:
+                return ok, None
+            with open(local_path, 'rb') as f:
+                return ok, self.cassette.add_blob_stream(f)
+
+        def decode(value):
+            ok, sha = value
+            if ok and sha:
+                Path(local_path).parent.mkdir(parents=True, exist_ok=True)
+                shutil.copyfile(self.cassette.blob_path(sha), local_path)
+            return ok, sha
+
+        ok, _ = self._call('download_file', [remote_path], live, lambda v: list(v), decode)
+        return ok
+
+    def download_to_buffer(self, remote_path: str, max_memory: int, expected_size: int = 0, progress=None):
+        def live():
+            buffer = self.inner.download_to_buffer(remote_path, max_memory, expected_size, progress)
+            if buffer is None:
+                return buffer, None
+            sha = self.cassette.add_blob_stream(buffer)
+            buffer.seek(0)
+            return buffer, sha
+
+        def decode(sha):
+            # 回放时直接打开数据块文件（调用方负责关闭），不读入内存
+            return (open(self.cassette.blob_path(sha), 'rb') if sha else None), sha
+
+        buffer, _ = self._call('download_to_buffer', [remote_path], live, lambda v: v[1], decode)
+        return buffer
+
+    def get_file_info(self, path: str) -> dict:
+        return self._call('get_file_info', [path], lambda: self.inner.get_file_info(path))
+
+    def read_range(self, remote_path: str, start: int, end: int) -> bytes:
+        return self._call(
+            'read_range', [remote_path, start, end],
+            lambda: self.inner.read_range(remote_path, start, end),
+            self.cassette.add_blob, self.cassette.get_blob
+        )
+
+    def download_file_as_text(self, remote_path: str) -> tuple[bool, str]:
+        return tuple(self._call(
+            'download_file_as_text', [remote_path],
+            lambda: self.inner.download_file_as_text(remote_path),
+            lambda v: list(v)
+        ))
+
+    def upload_file(self, remote_path: str, content: str) -> bool:
+        # 键中不含内容，不同代码版本生成的结果可以匹配同一条上传记录
+        return self._call('upload_file', [remote_path], lambda: self.inner.upload_file(remote_path, content))
+
+
+def attach_cassette(ai_client, webdav, logger: Logger,
+                    record_path: Optional[str] = None,
+                    replay_path: Optional[str] = None,
+                    time_scale: float = 1.0):
+    """
+    为 AI 客户端与 WebDAV 客户端挂载录制或回放代理
+
+    Returns:
+        (ai_client, webdav, cassette)，未启用时 cassette 为 None
+    """
+    if replay_path:
+        cassette = Cassette.load(replay_path)
+        logger.info(f"▶️  回放模式: {replay_path} (时间缩放 x{time_scale})")
+        return (
+            CassetteAIClient(ai_client, cassette, replay=True, time_scale=time_scale),
+            CassetteWebDAV(webdav, cassette, replay=True, time_scale=time_scale),
+            cassette,
+        )
+
+    if record_path:
+        cassette = Cassette(record_path)
+        logger.info(f"⏺️  录制模式: {record_path}")
+        return (
+            CassetteAIClient(ai_client, cassette) if ai_client else None,
+            CassetteWebDAV(webdav, cassette),
+            cassette,
+        )
+
+    return ai_client, webdav, None
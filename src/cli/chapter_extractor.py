@@ -4,13 +4,56 @@
 """
 
 import io
+import os
+import posixpath
 import re
+import signal
+import tempfile
+import threading
+import zipfile
+import xml.etree.ElementTree as ET
 from abc import ABC, abstractmethod
-from dataclasses import dataclass
-from typing import Optional
-from ebooklib import epub
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import BinaryIO, Iterable, Iterator, Optional, Union
+from urllib.parse import unquote
 from pypdf import PdfReader
 
+from .chapter_segmenter import (
+    DEFAULT_TARGET_TOKENS, DETECTION_BALANCED, DETECTION_NORMAL, DETECTION_TOC, balance_chapters,
+    normalize_detection_mode
+)
+from .html_text import NOTE_MODES, NOTES_COMPACT, NOTES_DROP, NOTES_KEEP, compact_note, html_to_text
+from .pdf_cleanup import NoiseStats, RunningLineDetector, strip_running_lines
+from .pdf_engines import DEFAULT_ENGINE, get_engine
+
+
+# 提取结果格式或算法变化时递增，使旧的提取缓存失效
+EXTRACTOR_VERSION = "3"
+
+
+# 书籍来源：文件路径、内存中的字节，或可随机访问（seekable）的二进制文件对象
+BookSource = Union[str, bytes, BinaryIO]
+
+
+def open_source(source: BookSource) -> Union[str, BinaryIO]:
+    """转换为 zipfile / PdfReader 可直接打开的形式（路径，或回到开头的文件对象）"""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source)
+    if not isinstance(source, str):
+        source.seek(0)
+    return source
+
+
+def source_name(source: BookSource) -> str:
+    """来源的文件路径（内存中的来源取文件对象的 name 属性，没有时为空字符串）"""
+    if isinstance(source, str):
+        return source
+    name = getattr(source, 'name', '')
+    return name if isinstance(name, str) else ''
+
 
 @dataclass
 class Chapter:
@@ -20,6 +63,13 @@ class Chapter:
     index: int
 
 
+@dataclass
+class PageFailure:
+    """页面提取失败记录"""
+    page: int  # 页码（从 1 开始）
+    error: str
+
+
 @dataclass
 class BookContent:
     """书籍内容"""
@@ -28,19 +78,65 @@ class BookContent:
     chapters: list[Chapter]
     file_path: str
     file_type: str  # 'epub' or 'pdf'
+    page_failures: list[PageFailure] = field(default_factory=list)
+    noise: NoiseStats = field(default_factory=NoiseStats)  # 提取时去除的噪声（页眉页脚等）
+
+
+@dataclass
+class BookStream:
+    """流式提取的书籍（章节逐个生成，峰值内存取决于最大的章节）"""
+    title: str
+    author: str
+    chapters: Iterator[Chapter]
+    file_path: str
+    file_type: str
+    page_failures: list[PageFailure] = field(default_factory=list)  # 随章节迭代逐步填充
+    noise: NoiseStats = field(default_factory=NoiseStats)  # 随章节迭代逐步累计
 
 
 class ChapterExtractor(ABC):
     """章节提取器基类"""
 
     @abstractmethod
-    def extract(self, file_path: str) -> BookContent:
+    def extract(self, source: BookSource) -> BookContent:
         """提取章节内容"""
         pass
 
+    def stream(self, source: BookSource) -> BookStream:
+        """流式提取章节（默认实现：完整提取后逐个返回）"""
+        book = self.extract(source)
+        return BookStream(
+            title=book.title,
+            author=book.author,
+            chapters=iter(book.chapters),
+            file_path=book.file_path,
+            file_type=book.file_type,
+            page_failures=book.page_failures,
+            noise=book.noise
+        )
+
+    def cache_variant(self) -> str:
+        """影响提取结果的非默认选项（作为提取缓存键的一部分）"""
+        return ''
+
+
+@dataclass
+class EPUBPackage:
+    """EPUB 包信息（来自 container.xml 与 OPF）"""
+    title: str
+    author: str
+    opf_path: str
+    spine: list[str]  # 阅读顺序中的 XHTML 文档（zip 内路径）
+    toc: list[tuple[str, str]] = field(default_factory=list)  # 目录 [(文档路径, 标题)]，同一层级
+
 
 class EPUBExtractor(ChapterExtractor):
-    """EPUB 章节提取器"""
+    """
+    EPUB 章节提取器
+
+    直接用 zipfile 读取 container.xml / OPF，并按 spine 顺序惰性解压 XHTML 文档，
+    图片、字体、CSS 等资源不会被读取
+    """
 
     # Skip chapter keywords (same as frontend)
     SKIP_CHAPTER_KEYWORDS = [
@@ -50,89 +146,296 @@ class EPUBExtractor(ChapterExtractor):
         'isbn', '书号', '定价', '出版', '印刷', 'contents'
     ]
 
-    def extract(self, file_path: str) -> BookContent:
+    CONTAINER_PATH = 'META-INF/container.xml'
+    NAMESPACES = {
+        'container': 'urn:oasis:names:tc:opendocument:xmlns:container',
+        'opf': 'http://www.idpf.org/2007/opf',
+        'dc': 'http://purl.org/dc/elements/1.1/',
+        'xhtml': 'http://www.w3.org/1999/xhtml',
+        'ncx': 'http://www.daisy.org/z3986/2005/ncx/',
+    }
+    EPUB_TYPE = '{http://www.idpf.org/2007/ops}type'
+    NCX_MEDIA_TYPE = 'application/x-dtbncx+xml'
+    DOCUMENT_MEDIA_TYPES = {'application/xhtml+xml', 'text/html', 'application/x-dtbook+xml'}
+
+    # 整个文档都是注释或参考文献的章节标题
+    NOTE_SECTION_TITLE = re.compile(
+        r'^(?:(?:foot|end)?notes?|references|bibliography|works cited|sources'
+        r'|注释?|注解|尾注|脚注|参考文献|参考书目|引用文献)$',
+        re.IGNORECASE
+    )
+
+    def __init__(self, notes: str = NOTES_DROP, toc: bool = False):
+        """
+        Args:
+            notes: 注释处理方式：drop 删除脚注、尾注、参考文献与注释引用，compact 压缩为短摘录，keep 保留
+            toc: 按目录分章（一个目录条目到下一个条目之间的 spine 文档合并为一章），没有目录时按文档分章
+        """
+        if notes not in NOTE_MODES:
+            raise ValueError(f"未知的注释处理方式: {notes}（可选: {', '.join(NOTE_MODES)}）")
+        self.notes = notes
+        self.toc = toc
+
+    def cache_variant(self) -> str:
+        variant = [] if self.notes == NOTES_DROP else [f"notes-{self.notes}"]
+        if self.toc:
+            variant.append('toc')
+        return '-'.join(variant)
+
+    def extract(self, source: BookSource) -> BookContent:
         """从 EPUB 文件提取章节"""
         try:
-            # Read file
-            with open(file_path, 'rb') as f:
-                book = epub.read_epub(f)
-
-            # Get metadata
-            title = self._get_metadata(book, 'title', 'Unknown Title')
-            author = self._get_metadata(book, 'creator', 'Unknown Author')
-
-            # Extract chapters from spine
-            chapters = []
-            chapter_index = 0
-
-            for item in book.get_items():
-                if item.get_type() == epub.ITEM_DOCUMENT:
-                    # Get chapter title from nav or spine
-                    item_name = item.get_name()
-                    chapter_title = self._extract_title(item.get_content())
-
-                    # Skip short or non-content chapters
-                    if self._should_skip_chapter(chapter_title, item.get_content()):
-                        continue
-
-                    # Clean and extract content
-                    content = self._clean_content(item.get_content())
-
-                    if len(content) > 100:  # Only include substantial chapters
-                        chapters.append(Chapter(
-                            title=chapter_title or f"Chapter {chapter_index + 1}",
-                            content=content,
-                            index=chapter_index
-                        ))
-                        chapter_index += 1
+            noise = NoiseStats()
+            with zipfile.ZipFile(open_source(source)) as archive:
+                package = self._read_package(archive)
+                chapters = list(self._iter_chapters(archive, package, noise))
 
             return BookContent(
-                title=title,
-                author=author,
+                title=package.title,
+                author=package.author,
                 chapters=chapters,
-                file_path=file_path,
-                file_type='epub'
+                file_path=source_name(source),
+                file_type='epub',
+                noise=noise
             )
 
         except Exception as e:
             raise Exception(f"EPUB 解析失败: {e}")
 
-    def _get_metadata(self, book, key: str, default: str) -> str:
-        """获取元数据"""
-        meta = book.get_metadata(key)
-        if meta:
-            return meta[0][0]
-        return default
-
-    def _extract_title(self, content: bytes) -> str:
-        """从章节内容提取标题"""
+    def stream(self, source: BookSource) -> BookStream:
+        """流式提取章节"""
         try:
-            html_content = content.decode('utf-8', errors='ignore')
-
-            # Try to find title in common patterns
-            patterns = [
-                r'<h[1-6][^>]*>([^<]+)</h[1-6]>',
-                r'<title>([^<]+)</title>',
-                r'<p[^>]*class="title"[^>]*>([^<]+)</p>',
-            ]
-
-            for pattern in patterns:
-                match = re.search(pattern, html_content, re.IGNORECASE)
-                if match:
-                    return match.group(1).strip()
-
-            # Try to get from first substantial paragraph
-            paragraphs = re.findall(r'<p[^>]*>([^<]+)</p>', html_content)
-            for p in paragraphs:
-                if len(p.strip()) > 10:
-                    return p.strip()[:100]
+            with zipfile.ZipFile(open_source(source)) as archive:
+                package = self._read_package(archive)
+        except Exception as e:
+            raise Exception(f"EPUB 解析失败: {e}")
 
-        except Exception:
-            pass
+        noise = NoiseStats()
+        return BookStream(
+            title=package.title,
+            author=package.author,
+            chapters=self.iter_chapters(source, noise),
+            file_path=source_name(source),
+            file_type='epub',
+            noise=noise
+        )
+
+    def iter_chapters(self, source: BookSource, noise: Optional[NoiseStats] = None) -> Iterator[Chapter]:
+        """按阅读顺序逐个生成章节（每次只解压一个文档）"""
+        with zipfile.ZipFile(open_source(source)) as archive:
+            package = self._read_package(archive)
+            yield from self._iter_chapters(archive, package, noise or NoiseStats())
+
+    def _sections(self, package: EPUBPackage) -> list[tuple[Optional[str], list[str]]]:
+        """
+        把 spine 文档分组为章节 [(目录标题, 文档列表)]
+
+        常规模式下每个文档一章（标题取自文档）；目录模式下从一个目录条目所在文档起，
+        到下一个条目之前的文档合并为一章，第一个条目之前的文档（封面、前言等）仍各自成章
+        """
+        starts = dict(package.toc) if self.toc else {}
+        sections: list[tuple[Optional[str], list[str]]] = []
+        for name in package.spine:
+            title = starts.get(name)
+            if title is not None or not sections or sections[-1][0] is None:
+                sections.append((title, [name]))
+            else:
+                sections[-1][1].append(name)
+        return sections
+
+    def _iter_chapters(self, archive: zipfile.ZipFile, package: EPUBPackage,
+                       noise: NoiseStats) -> Iterator[Chapter]:
+        """遍历 spine 文档并生成章节，去除的注释计入 noise"""
+        chapter_index = 0
 
-        return ""
+        for toc_title, names in self._sections(package):
+            raws = []
+            for name in names:
+                try:
+                    raws.append(archive.read(name))
+                except KeyError:
+                    continue
+            if not raws:
+                continue
+
+            # 单次扫描得到标题与正文
+            documents = [html_to_text(raw, self.notes) for raw in raws]
+            chapter_title = toc_title if toc_title is not None else documents[0].title
+
+            # Skip short or non-content chapters
+            if self._should_skip_chapter(chapter_title, sum(len(raw) for raw in raws)):
+                continue
+
+            noise.lines += sum(document.removed_blocks for document in documents)
+            noise.chars += sum(document.removed_chars for document in documents)
+            content = '\n'.join(document.text for document in documents if document.text)
+
+            # 独立的注释 / 参考文献章节整体删除或压缩（注释块已计入 removed_*）
+            if self.notes != NOTES_KEEP and self.NOTE_SECTION_TITLE.match(chapter_title.strip()):
+                blocks = [block for document in documents for block in document.blocks]
+                body = [block.text for block in blocks if not block.note]
+                noise.lines += len(body)
+                if self.notes == NOTES_DROP:
+                    noise.chars += sum(len(text) for text in body)
+                    continue
+                noise.chars += sum(len(text) - len(compact_note(text)) for text in body)
+                content = '\n'.join(compact_note(block.text) for block in blocks)
+
+            if len(content) > 100:  # Only include substantial chapters
+                yield Chapter(
+                    title=chapter_title or f"Chapter {chapter_index + 1}",
+                    content=content,
+                    index=chapter_index
+                )
+                chapter_index += 1
+
+    def _read_package(self, archive: zipfile.ZipFile) -> EPUBPackage:
+        """解析 container.xml 与 OPF，得到元数据和 spine 顺序"""
+        exact = set(archive.namelist())
+        folded = {name.lower(): name for name in exact}
+
+        def resolve(path: str) -> Optional[str]:
+            return path if path in exact else folded.get(path.lower())
+
+        container_name = resolve(self.CONTAINER_PATH)
+        if container_name is None:
+            raise ValueError("缺少 META-INF/container.xml")
+
+        container = ET.fromstring(archive.read(container_name))
+        rootfile = container.find('.//container:rootfile', self.NAMESPACES)
+        if rootfile is None or not rootfile.get('full-path'):
+            raise ValueError("container.xml 中未找到 OPF 路径")
+
+        opf_path = resolve(rootfile.get('full-path'))
+        if opf_path is None:
+            raise ValueError(f"OPF 文件不存在: {rootfile.get('full-path')}")
+
+        opf = ET.fromstring(archive.read(opf_path))
+        opf_dir = posixpath.dirname(opf_path)
+
+        # Metadata
+        title = self._find_text(opf, 'opf:metadata/dc:title') or 'Unknown Title'
+        author = self._find_text(opf, 'opf:metadata/dc:creator') or 'Unknown Author'
+
+        # Manifest
+        manifest = {}
+        nav_path = None
+        for item in opf.iterfind('opf:manifest/opf:item', self.NAMESPACES):
+            href = item.get('href')
+            if not item.get('id') or not href:
+                continue
+            path = posixpath.normpath(posixpath.join(opf_dir, unquote(href.split('#', 1)[0])))
+            manifest[item.get('id')] = (path, item.get('media-type', ''))
+            if 'nav' in item.get('properties', '').split():
+                nav_path = path
+
+        # Spine（跳过 linear="no" 的辅助文档，如弹出式注释）
+        spine = []
+        for itemref in opf.iterfind('opf:spine/opf:itemref', self.NAMESPACES):
+            if itemref.get('linear', 'yes').lower() == 'no':
+                continue
+            entry = manifest.get(itemref.get('idref'))
+            if entry is None:
+                continue
+            path = resolve(entry[0])
+            if path is not None and path not in spine:
+                spine.append(path)
+
+        # 没有 spine 时退回到清单顺序
+        if not spine:
+            for path, media_type in manifest.values():
+                path = resolve(path)
+                if media_type in self.DOCUMENT_MEDIA_TYPES and path is not None:
+                    spine.append(path)
+
+        # 目录：EPUB 3 导航文档优先，其次 EPUB 2 的 NCX
+        toc = []
+        if self.toc:
+            spine_element = opf.find('opf:spine', self.NAMESPACES)
+            ncx_entry = manifest.get(spine_element.get('toc', '')) if spine_element is not None else None
+            if ncx_entry is None:
+                ncx_entry = next((e for e in manifest.values() if e[1] == self.NCX_MEDIA_TYPE), None)
+            for path, reader in ((nav_path, self._read_nav), (ncx_entry and ncx_entry[0], self._read_ncx)):
+                path = resolve(path) if path else None
+                if path is None:
+                    continue
+                try:
+                    entries = reader(ET.fromstring(archive.read(path)))
+                except ET.ParseError:
+                    continue
+                toc = self._toc_level(entries, posixpath.dirname(path), resolve, spine)
+                if toc:
+                    break
 
-    def _should_skip_chapter(self, title: str, content: bytes) -> bool:
+        return EPUBPackage(title=title, author=author, opf_path=opf_path, spine=spine, toc=toc)
+
+    def _read_nav(self, root) -> list:
+        """解析 EPUB 3 导航文档中的 toc 列表，返回 [(href, 标题, 子条目)]"""
+        navs = list(root.iter(f"{{{self.NAMESPACES['xhtml']}}}nav"))
+        nav = next((n for n in navs if 'toc' in n.get(self.EPUB_TYPE, '').split()), navs[0] if navs else None)
+        if nav is None:
+            return []
+
+        def entries(ol) -> list:
+            result = []
+            for li in ol.iterfind('xhtml:li', self.NAMESPACES):
+                link = li.find('xhtml:a', self.NAMESPACES)
+                label = link if link is not None else li.find('xhtml:span', self.NAMESPACES)
+                children = li.find('xhtml:ol', self.NAMESPACES)
+                result.append((
+                    link.get('href', '') if link is not None else '',
+                    ''.join(label.itertext()).strip() if label is not None else '',
+                    entries(children) if children is not None else [],
+                ))
+            return result
+
+        ol = nav.find('xhtml:ol', self.NAMESPACES)
+        return entries(ol) if ol is not None else []
+
+    def _read_ncx(self, root) -> list:
+        """解析 EPUB 2 的 NCX navMap，返回 [(href, 标题, 子条目)]"""
+        def entries(parent) -> list:
+            result = []
+            for point in parent.iterfind('ncx:navPoint', self.NAMESPACES):
+                content = point.find('ncx:content', self.NAMESPACES)
+                result.append((
+                    content.get('src', '') if content is not None else '',
+                    (point.findtext('ncx:navLabel/ncx:text', '', self.NAMESPACES) or '').strip(),
+                    entries(point),
+                ))
+            return result
+
+        nav_map = root.find('ncx:navMap', self.NAMESPACES)
+        return entries(nav_map) if nav_map is not None else []
+
+    def _toc_level(self, entries: list, base_dir: str, resolve, spine: list[str]) -> list[tuple[str, str]]:
+        """
+        选取一个目录层级并解析为 [(spine 文档路径, 标题)]
+
+        与 PDF 书签相同，只使用一个层级：顶层条目不足两个（如只有书名一个根节点）时改用其子层级；
+        指向同一文档内不同锚点的条目只保留第一个
+        """
+        level = entries
+        while len(level) < 2 and level and level[0][2]:
+            level = level[0][2]
+
+        result = {}
+        for href, title, _ in level:
+            if not href:
+                continue
+            path = resolve(posixpath.normpath(posixpath.join(base_dir, unquote(href.split('#', 1)[0]))))
+            if path in spine and path not in result:
+                result[path] = title
+        return sorted(result.items(), key=lambda item: spine.index(item[0]))
+
+    def _find_text(self, element, path: str) -> str:
+        """读取 XML 子元素文本"""
+        found = element.find(path, self.NAMESPACES)
+        if found is None or not found.text:
+            return ''
+        return found.text.strip()
+
+    def _should_skip_chapter(self, title: str, content_length: int) -> bool:
         """判断是否应该跳过该章节"""
         title_lower = title.lower()
 
@@ -142,139 +445,420 @@ class EPUBExtractor(ChapterExtractor):
                 return True
 
         # Skip very short chapters
-        content_length = len(content)
         if content_length < 200:
             return True
 
         return False
 
-    def _clean_content(self, content: bytes) -> str:
-        """清理章节内容"""
+
+class PageTimeoutError(Exception):
+    """单页提取超时"""
+    pass
+
+
+@contextmanager
+def _page_deadline(seconds: float):
+    """
+    单页提取超时（SIGALRM）
+
+    仅在支持 setitimer 的平台且位于主线程时生效（进程池的工作进程满足该条件）
+    """
+    if seconds <= 0 or not hasattr(signal, 'setitimer') \
+            or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def on_timeout(signum, frame):
+        raise PageTimeoutError(f"超过 {seconds:g} 秒")
+
+    previous = signal.signal(signal.SIGALRM, on_timeout)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+# 当前线程已打开的文档（同一本书的各页区间复用；工作进程内随进程池退出释放）
+_open_documents = threading.local()
+
+
+def _open_document(source: Union[str, BinaryIO], engine_name: str) -> tuple:
+    """打开文档并缓存，来源、文件版本或引擎变化时关闭旧文档后重新打开"""
+    if isinstance(source, str):
+        stat = os.stat(source)
+        key = (source, stat.st_mtime_ns, stat.st_size, engine_name)
+    else:
+        key = (id(source), engine_name)
+
+    cached = getattr(_open_documents, 'entry', None)
+    if cached is None or cached[0] != key:
+        _close_documents()
+        engine = get_engine(engine_name)
+        cached = _open_documents.entry = (key, engine, engine.open(open_source(source)))
+    return cached[1], cached[2]
+
+
+def _close_documents():
+    """关闭当前线程缓存的文档"""
+    cached = getattr(_open_documents, 'entry', None)
+    if cached is not None:
+        _open_documents.entry = None
+        cached[1].close(cached[2])
+
+
+def _extract_page_range(source: Union[str, BinaryIO], start: int, end: int, timeout: float,
+                        engine_name: str = DEFAULT_ENGINE) -> list[tuple]:
+    """
+    提取 [start, end) 范围内的页面文本（进程池任务，同一进程内复用已打开的文档）
+
+    Returns:
+        [(页下标, 文本, 错误信息)]
+    """
+    engine, document = _open_document(source, engine_name)
+    results = []
+    for i in range(start, end):
         try:
-            html_content = content.decode('utf-8', errors='ignore')
-
-            # Remove HTML tags but keep line breaks
-            text = re.sub(r'<br\s*/?>', '\n', html_content, flags=re.IGNORECASE)
-            text = re.sub(r'</p>', '\n\n', text)
-            text = re.sub(r'</div>', '\n', text)
-            text = re.sub(r'</h[1-6]>', '\n', text)
-            text = re.sub(r'<[^>]+>', '', text)
-
-            # Decode HTML entities
-            text = text.replace('&nbsp;', ' ')
-            text = text.replace('&amp;', '&')
-            text = text.replace('&lt;', '<')
-            text = text.replace('&gt;', '>')
-            text = text.replace('&quot;', '"')
-
-            # Clean up whitespace
-            lines = []
-            for line in text.split('\n'):
-                line = line.strip()
-                if line:
-                    lines.append(line)
-
-            return '\n'.join(lines)
+            with _page_deadline(timeout):
+                text = engine.page_text(document, i)
+            results.append((i, text or "", None))
+        except Exception as e:
+            results.append((i, "", f"{type(e).__name__}: {e}"))
+    return results
 
-        except Exception:
-            return ""
 
+class PageSpool:
+    """
+    页面文本暂存区
 
-class PDFExtractor(ChapterExtractor):
-    """PDF 章节提取器"""
+    页面文本依次写入临时文件，只在内存中保留各页的偏移量，按页区间读回
+    """
+
+    def __init__(self):
+        self._file = tempfile.TemporaryFile()
+        self._offsets = [0]
+
+    def __enter__(self) -> 'PageSpool':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def append(self, text: str):
+        """追加一页"""
+        data = (text + '\n').encode('utf-8')
+        self._file.seek(0, io.SEEK_END)
+        self._file.write(data)
+        self._offsets.append(self._offsets[-1] + len(data))
+
+    def read(self, start: int, end: int) -> str:
+        """读取 [start, end) 页（以换行分隔）"""
+        self._file.seek(self._offsets[start])
+        return self._file.read(self._offsets[end] - self._offsets[start]).decode('utf-8')
+
+    def close(self):
+        self._file.close()
 
-    def extract(self, file_path: str) -> BookContent:
+
+class PDFExtractor(ChapterExtractor):
+    """
+    PDF 章节提取器
+
+    页面文本按页码区间分发到进程池并行提取，结果按页序重新组装；
+    单页超时或解析失败不会中断整本书，而是记录在 page_failures 中
+    """
+
+    PAGES_PER_TASK = 25  # 每个进程池任务处理的页数
+    RUNNING_LINE_LOOKAHEAD = 50  # 流式提取时识别页眉页脚的前瞻页数
+
+    # 章节标题模式（仅匹配页面开头的行）
+    CHAPTER_HEADING = re.compile(
+        r'^(?:第\s*[一二三四五六七八九十百零〇两\d]+\s*[章回篇卷部]'
+        r'|(?:chapter|part)\s+(?:\d+|[ivxlc]+|one|two|three|four|five|six|seven|eight|nine|ten)\b)',
+        re.IGNORECASE
+    )
+    HEADING_LINES = 3
+    HEADING_MAX_LENGTH = 50
+
+    def __init__(self, workers: int = 0, page_timeout: float = 60.0, engine: str = DEFAULT_ENGINE):
+        """
+        Args:
+            workers: 进程数，0 表示按 CPU 核数自动选择，1 表示在当前进程内顺序提取
+            page_timeout: 单页提取超时（秒），0 表示不限制
+            engine: 页面文本引擎（见 pdf_engines），元数据与书签仍由 pypdf 读取
+        """
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+        self.page_timeout = page_timeout
+        self.engine = get_engine(engine).name
+
+    def cache_variant(self) -> str:
+        return '' if self.engine == DEFAULT_ENGINE else self.engine
+
+    def extract(self, source: BookSource) -> BookContent:
         """从 PDF 文件提取章节"""
         try:
-            reader = PdfReader(file_path)
+            source = open_source(source)
+            reader = PdfReader(source)
 
             # Get metadata
             title = reader.metadata.get('/Title', 'Unknown Title') if reader.metadata else 'Unknown Title'
             author = reader.metadata.get('/Author', 'Unknown Author') if reader.metadata else 'Unknown Author'
 
             # Extract text from all pages
-            all_text = []
-            for i, page in enumerate(reader.pages):
-                try:
-                    text = page.extract_text()
-                    if text:
-                        all_text.append((i + 1, text))
-                except Exception as e:
-                    print(f"⚠️  页面 {i + 1} 提取失败: {e}")
+            texts, failures = self._extract_pages(source, len(reader.pages))
 
-            # Split into chapters (simple approach: split by double newlines and look for chapter markers)
-            chapters = self._split_into_chapters(all_text)
+            # 分章前去除页眉页脚，避免页眉中的 "Chapter N" 被识别为章节标题
+            noise = NoiseStats()
+            texts = strip_running_lines(texts, noise)
+
+            # 优先按书签（outline）分章，没有书签时按标题模式识别
+            chapters = self._split_into_chapters(texts, self._read_outline(reader))
 
             return BookContent(
                 title=title or 'Unknown Title',
                 author=author or 'Unknown Author',
                 chapters=chapters,
-                file_path=file_path,
-                file_type='pdf'
+                file_path=source_name(source),
+                file_type='pdf',
+                page_failures=failures,
+                noise=noise
             )
 
         except Exception as e:
             raise Exception(f"PDF 解析失败: {e}")
 
-    def _split_into_chapters(self, pages: list[tuple[int, str]]) -> list[Chapter]:
-        """将 PDF 页面分割成章节"""
-        chapters = []
-        chapter_index = 0
-
-        # Combine all text
-        full_text = '\n'.join([text for _, text in pages])
-
-        # Try to split by chapter markers
-        chapter_patterns = [
-            r'(?:^|\n)\s*(?:第[一二三四五六七八九十]+章|Chapter\s+\d+)\s*[\n:]',
-            r'(?:^|\n)\s*\d+\s*\n(?:第[一二三四五六七八九十]+章|Chapter\s+\d+)',
-        ]
-
-        # Simple approach: split by large gaps or chapter patterns
-        chunks = []
-        current_chunk = ""
-        current_page_start = 1
-
-        for page_num, text in pages:
-            # Add page break marker
-            text_with_break = f"\n[Page {page_num}]\n"
-            current_chunk += text_with_break
-
-            # Check if this page starts a new chapter
-            is_chapter_start = False
-            for pattern in chapter_patterns:
-                if re.search(pattern, text, re.IGNORECASE):
-                    is_chapter_start = True
-                    break
-
-            if is_chapter_start and current_chunk.strip():
-                chunks.append((current_page_start, current_chunk.strip()))
-                current_chunk = ""
-                current_page_start = page_num
+    def stream(self, source: BookSource) -> BookStream:
+        """
+        流式提取章节
 
-        # Add remaining content
-        if current_chunk.strip():
-            chunks.append((current_page_start, current_chunk.strip()))
+        页面文本暂存到临时文件，章节边界在逐页提取时增量识别，
+        每识别出一个完整章节就读回并交给调用方，峰值内存取决于最大的章节而不是整本书
+        """
+        try:
+            source = open_source(source)
+            reader = PdfReader(source)
+            title = reader.metadata.get('/Title', 'Unknown Title') if reader.metadata else 'Unknown Title'
+            author = reader.metadata.get('/Author', 'Unknown Author') if reader.metadata else 'Unknown Author'
+            page_count = len(reader.pages)
+            outline = self._read_outline(reader)
+        except Exception as e:
+            raise Exception(f"PDF 解析失败: {e}")
 
-        # Create Chapter objects
-        for page_start, content in chunks:
-            # Clean content
-            cleaned = self._clean_content(content)
-            if len(cleaned) > 200:  # Only substantial content
-                # Extract title from first line
-                lines = cleaned.split('\n')
-                title = lines[0][:100] if lines else f"Chapter {chapter_index + 1}"
+        failures: list[PageFailure] = []
+        noise = NoiseStats()
+        return BookStream(
+            title=title or 'Unknown Title',
+            author=author or 'Unknown Author',
+            chapters=self._stream_chapters(source, page_count, outline, failures, noise),
+            file_path=source_name(source),
+            file_type='pdf',
+            page_failures=failures,
+            noise=noise
+        )
 
-                chapters.append(Chapter(
-                    title=title,
-                    content=cleaned,
-                    index=chapter_index
-                ))
-                chapter_index += 1
+    @staticmethod
+    def count_pages(source: BookSource) -> int:
+        """读取页数（只解析交叉引用表与页面树）"""
+        return len(PdfReader(open_source(source)).pages)
+
+    @classmethod
+    def needs_streaming(cls, source: BookSource, threshold: int) -> bool:
+        """页数是否达到流式提取阈值（无法读取页数时返回 False，由完整提取报告解析错误）"""
+        if threshold <= 0:
+            return False
+        try:
+            return cls.count_pages(source) >= threshold
+        except Exception:
+            return False
+
+    def _stream_chapters(self, source: Union[str, BinaryIO], page_count: int, outline: list[tuple[int, str]],
+                         failures: list[PageFailure], noise: NoiseStats) -> Iterator[Chapter]:
+        """逐页提取并增量分章（页眉页脚按前瞻窗口识别后去除）"""
+        with PageSpool() as spool:
+            def extracted() -> Iterator[tuple[int, str]]:
+                for i, text, error in self._iter_pages(source, page_count):
+                    if error is not None:
+                        failures.append(PageFailure(page=i + 1, error=error))
+                    yield i, text
+
+            def pages() -> Iterator[tuple[int, str]]:
+                detector = RunningLineDetector(noise)
+                for i, text in detector.strip_pages(extracted(), self.RUNNING_LINE_LOOKAHEAD):
+                    spool.append(text)
+                    yield i, text
+
+            index = 0
+            for start, end, title in self._iter_ranges(pages(), outline):
+                chapter = self._make_chapter(spool.read(start, end), title, index)
+                if chapter is not None:
+                    index += 1
+                    yield chapter
+
+            # If no chapters found, treat entire PDF as one chapter
+            if index == 0 and len(spool):
+                content = self._clean_content(spool.read(0, len(spool)))
+                if content:
+                    yield Chapter(title="全文", content=content, index=0)
+
+    def _iter_pages(self, source: Union[str, BinaryIO], page_count: int) -> Iterator[tuple[int, str, Optional[str]]]:
+        """
+        按页序逐页生成 (页下标, 文本, 错误信息)
+
+        并行时最多保留 workers * 2 个区间任务在途，已完成但尚未轮到的区间不会无限堆积；
+        内存中的来源无法由工作进程按路径重新打开，始终在当前进程内顺序提取
+        """
+        ranges = [
+            (start, min(start + self.PAGES_PER_TASK, page_count))
+            for start in range(0, page_count, self.PAGES_PER_TASK)
+        ]
+        workers = min(self.workers, len(ranges)) if isinstance(source, str) else 1
+
+        if workers <= 1:
+            try:
+                for start, end in ranges:
+                    yield from _extract_page_range(source, start, end, self.page_timeout, self.engine)
+            finally:
+                _close_documents()
+            return
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            remaining = iter(ranges)
+            pending = deque()
+
+            def submit_next():
+                for start, end in remaining:
+                    pending.append((start, end, pool.submit(
+                        _extract_page_range, source, start, end, self.page_timeout, self.engine
+                    )))
+                    return
+
+            for _ in range(workers * 2):
+                submit_next()
+
+            while pending:
+                start, end, future = pending.popleft()
+                try:
+                    results = future.result()
+                except Exception as e:
+                    # 工作进程崩溃等情况：整个区间记为失败
+                    results = [(i, "", f"{type(e).__name__}: {e}") for i in range(start, end)]
+                submit_next()
+                yield from results
+
+    def _extract_pages(self, source: Union[str, BinaryIO], page_count: int) -> tuple[list[str], list[PageFailure]]:
+        """提取全部页面文本，返回（按页序的文本列表, 失败记录）"""
+        texts = [""] * page_count
+        failures = []
+        for i, text, error in self._iter_pages(source, page_count):
+            texts[i] = text
+            if error is not None:
+                failures.append(PageFailure(page=i + 1, error=error))
+
+        return texts, failures
+
+    def _read_outline(self, reader: PdfReader) -> list[tuple[int, str]]:
+        """
+        读取书签，返回按页序排列的 [(页下标, 标题)]
+
+        只使用一个层级：顶层书签不足两个（如只有书名一个根节点）时改用其子层级
+        """
+        try:
+            outline = reader.outline
+        except Exception:
+            return []
+
+        level = outline
+        while True:
+            entries = [item for item in level if not isinstance(item, list)]
+            children = [item for item in level if isinstance(item, list)]
+            if len(entries) >= 2 or not children:
+                break
+            level = children[0]
+
+        result = {}
+        for item in entries:
+            try:
+                page = reader.get_destination_page_number(item)
+            except Exception:
+                continue
+            title = str(getattr(item, 'title', '') or '').strip()
+            if page is not None and page >= 0 and page not in result:
+                result[page] = title
+        return sorted(result.items())
+
+    def _heading_title(self, text: str) -> Optional[str]:
+        """页面开头是否为章节标题，是则返回标题"""
+        # 只检查页面开头几行，避免正文中的 "见第三章" 之类引用
+        checked = 0
+        for line in text.split('\n', 8)[:8]:
+            line = line.strip()
+            if not line:
+                continue
+            if len(line) <= self.HEADING_MAX_LENGTH and self.CHAPTER_HEADING.match(line):
+                return line[:100]
+            checked += 1
+            if checked >= self.HEADING_LINES:
+                break
+        return None
+
+    def _iter_ranges(self, pages: Iterable[tuple[int, str]],
+                     outline: Optional[list[tuple[int, str]]] = None) -> Iterator[tuple[int, int, str]]:
+        """
+        增量识别章节边界，每当一个章节的页码区间闭合时生成 (起始页, 结束页, 标题)
+
+        书签至少两个时按书签分章，否则按页首标题模式识别；
+        第一个起点之前的页面（封面、目录等）单独成块，标题为空
+        """
+        starts = dict(outline) if outline and len(outline) >= 2 else None
+
+        current_start, current_title = 0, ''
+        count = 0
+        for i, text in pages:
+            count = i + 1
+            title = starts.get(i) if starts is not None else self._heading_title(text)
+            if title is None:
+                continue
+            if i > current_start:
+                yield current_start, i, current_title
+            current_start, current_title = i, title
+
+        if count > current_start:
+            yield current_start, count, current_title
+
+    def _make_chapter(self, text: str, title: str, index: int) -> Optional[Chapter]:
+        """清理页区间文本并构造章节，内容过短时返回 None"""
+        cleaned = self._clean_content(text)
+        if len(cleaned) <= 200:  # Only substantial content
+            return None
+        return Chapter(
+            title=title or cleaned.split('\n', 1)[0][:100],
+            content=cleaned,
+            index=index
+        )
+
+    def _split_into_chapters(self, texts: list[str], outline: Optional[list[tuple[int, str]]] = None) -> list[Chapter]:
+        """
+        将 PDF 页面分割成章节
+
+        Args:
+            texts: 按页序的页面文本
+            outline: 书签 [(页下标, 标题)]，至少两个时按书签分章
+
+        章节按页码区间一次性拼接，总耗时与页数成线性关系
+        """
+        chapters = []
+        for start, end, title in self._iter_ranges(enumerate(texts), outline):
+            chapter = self._make_chapter('\n'.join(texts[start:end]), title, len(chapters))
+            if chapter is not None:
+                chapters.append(chapter)
 
         # If no chapters found, treat entire PDF as one chapter
         if not chapters:
-            full_text_cleaned = self._clean_content(full_text)
+            full_text_cleaned = self._clean_content('\n'.join(texts))
             if full_text_cleaned:
                 chapters.append(Chapter(
                     title="全文",
@@ -285,38 +869,93 @@ class PDFExtractor(ChapterExtractor):
         return chapters
 
     def _clean_content(self, content: str) -> str:
-        """清理内容"""
-        # Remove page numbers
-        content = re.sub(r'\[Page \d+\]', '', content)
-
-        # Remove excessive newlines
-        content = re.sub(r'\n{3,}', '\n\n', content)
-
-        # Clean up whitespace
-        lines = []
-        for line in content.split('\n'):
-            line = line.strip()
-            if line:
-                lines.append(line)
-
-        return '\n'.join(lines)
+        """清理内容（去除空行与首尾空白）"""
+        return '\n'.join(line.strip() for line in content.split('\n') if line.strip())
 
 
 class ChapterExtractorFactory:
     """章节提取器工厂"""
 
     @staticmethod
-    def create(file_path: str) -> ChapterExtractor:
-        """根据文件类型创建提取器"""
+    def create(file_path: str, pdf_workers: int = 0, pdf_page_timeout: float = 60.0,
+               pdf_engine: str = DEFAULT_ENGINE, epub_notes: str = NOTES_DROP,
+               detection: str = DETECTION_NORMAL) -> ChapterExtractor:
+        """
+        根据文件类型（扩展名）创建提取器
+
+        Args:
+            detection: 分章模式；toc / balanced 时 EPUB 按目录分章，PDF 本就优先按书签分章
+        """
+        detection = normalize_detection_mode(detection)
         if file_path.lower().endswith('.epub'):
-            return EPUBExtractor()
+            return EPUBExtractor(notes=epub_notes, toc=detection in (DETECTION_TOC, DETECTION_BALANCED))
         elif file_path.lower().endswith('.pdf'):
-            return PDFExtractor()
+            return PDFExtractor(workers=pdf_workers, page_timeout=pdf_page_timeout, engine=pdf_engine)
         else:
             raise ValueError(f"不支持的文件格式: {file_path}")
 
     @staticmethod
-    def extract(file_path: str) -> BookContent:
-        """直接提取章节内容"""
-        extractor = ChapterExtractorFactory.create(file_path)
-        return extractor.extract(file_path)
+    def stream(file_path: str, pdf_workers: int = 0, pdf_page_timeout: float = 60.0,
+               pdf_engine: str = DEFAULT_ENGINE, epub_notes: str = NOTES_DROP,
+               source: Optional[BookSource] = None, detection: str = DETECTION_NORMAL,
+               target_tokens: int = DEFAULT_TARGET_TOKENS) -> BookStream:
+        """
+        流式提取章节内容（章节逐个生成）
+
+        Args:
+            source: 书籍内容（字节或文件对象），默认从 file_path 读取；此时 file_path 只用于识别文件类型
+            detection: 分章模式（normal / toc / balanced）
+            target_tokens: balanced 模式下每个处理单元的目标 token 数
+        """
+        extractor = ChapterExtractorFactory.create(
+            file_path, pdf_workers, pdf_page_timeout, pdf_engine, epub_notes, detection
+        )
+        book = extractor.stream(file_path if source is None else source)
+        book.file_path = file_path
+        if normalize_detection_mode(detection) == DETECTION_BALANCED:
+            book.chapters = balance_chapters(book.chapters, target_tokens)
+        return book
+
+    @staticmethod
+    def extract(file_path: str, pdf_workers: int = 0, pdf_page_timeout: float = 60.0,
+                pdf_engine: str = DEFAULT_ENGINE, epub_notes: str = NOTES_DROP, cache=None,
+                source: Optional[BookSource] = None, detection: str = DETECTION_NORMAL,
+                target_tokens: int = DEFAULT_TARGET_TOKENS) -> BookContent:
+        """
+        直接提取章节内容
+
+        Args:
+            cache: 可选的 ExtractionCache，命中时跳过解析
+            source: 书籍内容（字节或文件对象），默认从 file_path 读取；此时 file_path 只用于识别文件类型
+            detection: 分章模式（normal / toc / balanced）
+            target_tokens: balanced 模式下每个处理单元的目标 token 数
+        """
+        extractor = ChapterExtractorFactory.create(
+            file_path, pdf_workers, pdf_page_timeout, pdf_engine, epub_notes, detection
+        )
+        balanced = normalize_detection_mode(detection) == DETECTION_BALANCED
+        if source is None:
+            source = file_path
+
+        def run() -> BookContent:
+            book = extractor.extract(source)
+            book.file_path = file_path
+            if balanced:
+                book.chapters = list(balance_chapters(book.chapters, target_tokens))
+            return book
+
+        if cache is None:
+            return run()
+
+        variant = [extractor.cache_variant()] + ([f"balanced-{target_tokens}"] if balanced else [])
+        key = cache.key(source, '-'.join(v for v in variant if v))
+        book = cache.get(file_path, key)
+        if book is not None:
+            return book
+
+        book = run()
+        try:
+            cache.put(file_path, book, key)
+        except OSError:
+            pass  # 缓存写入失败不影响本次提取
+        return book
@@ -0,0 +1,95 @@
+"""
+章节分段模式
+normal 按提取器的常规规则分章；toc 按目录（EPUB 导航文档 / NCX、PDF 书签）分章；
+balanced 在目录分章的基础上合并过短、拆分过长的章节，使各处理单元接近目标 token 数，
+并发处理章节时负载更均匀，不会被个别超长章节拖慢整本书
+"""
+
+from dataclasses import replace
+from typing import Iterable, Iterator
+
+
+DETECTION_NORMAL = 'normal'
+DETECTION_TOC = 'toc'
+DETECTION_BALANCED = 'balanced'
+DETECTION_MODES = (DETECTION_NORMAL, DETECTION_TOC, DETECTION_BALANCED)
+
+# 前端的模式名称
+DETECTION_ALIASES = {
+    'epub-toc': DETECTION_TOC,
+    'smart': DETECTION_NORMAL,
+}
+
+DEFAULT_TARGET_TOKENS = 6000
+MIN_RATIO = 0.5   # 低于目标的一半时尽量与后续章节合并
+MAX_RATIO = 1.5   # 超过目标的 1.5 倍时拆分
+
+
+def normalize_detection_mode(mode: str) -> str:
+    """规范化分章模式（兼容前端的 epub-toc / smart）"""
+    mode = DETECTION_ALIASES.get((mode or DETECTION_NORMAL).lower(), (mode or '').lower())
+    if mode not in DETECTION_MODES:
+        raise ValueError(f"未知的分章模式: {mode}（可选: {', '.join(DETECTION_MODES)}）")
+    return mode
+
+
+def _split_text(content: str, parts: int) -> list[str]:
+    """按行把文本切成长度接近的 parts 段，每段不超过 ceil(len / parts) 个字符（单行过长时在行内切分）"""
+    size = -(-len(content) // parts)
+    chunks, current, current_len = [], [], 0
+    for line in content.split('\n'):
+        # 当前段放不下这一行时先结束当前段，再把仍然超长的行按 size 切开
+        if current and current_len + len(line) > size:
+            chunks.append('\n'.join(current))
+            current, current_len = [], 0
+        while len(line) > size:
+            chunks.append(line[:size])
+            line = line[size:]
+        current.append(line)
+        current_len += len(line) + 1
+    if current:
+        chunks.append('\n'.join(current))
+    return [chunk.strip('\n') for chunk in chunks if chunk.strip()]
+
+
+def balance_chapters(chapters: Iterable, target_tokens: int = DEFAULT_TARGET_TOKENS) -> Iterator:
+    """
+    合并过短、拆分过长的章节（流式：最多缓存待合并的几个短章节）
+
+    Args:
+        chapters: 原始章节（Chapter），输出的章节按顺序重新编号
+        target_tokens: 每个处理单元的目标 token 数（按 2 字符 / token 估算）
+    """
+    target = max(target_tokens, 1) * 2
+    min_chars, max_chars = int(target * MIN_RATIO), int(target * MAX_RATIO)
+    index = 0
+    pending = []
+
+    def merged():
+        title = pending[0].title if len(pending) == 1 else f"{pending[0].title} ~ {pending[-1].title}"
+        return replace(pending[0], title=title, content='\n\n'.join(c.content for c in pending), index=index)
+
+    for chapter in chapters:
+        length = len(chapter.content)
+        if length > max_chars:
+            if pending:
+                yield merged()
+                index += 1
+                pending = []
+            pieces = _split_text(chapter.content, max(round(length / target), 2))
+            for i, piece in enumerate(pieces):
+                yield replace(chapter, title=f"{chapter.title}（{i + 1}/{len(pieces)}）", content=piece, index=index)
+                index += 1
+            continue
+
+        # 已够一半目标时，加入后超过目标就另起一段；不足一半时允许放宽到上限
+        pending_length = sum(len(c.content) for c in pending)
+        combined = pending_length + length
+        if pending and (combined > max_chars or (pending_length >= min_chars and combined > target)):
+            yield merged()
+            index += 1
+            pending = []
+        pending.append(chapter)
+
+    if pending:
+        yield merged()
@@ -10,6 +10,11 @@ from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Optional
 
+from .chapter_segmenter import normalize_detection_mode
+from .html_text import NOTE_MODES
+from .pdf_engines import get_engine
+from .prompt_template import PromptTemplateError, compile_prompt, placeholders_for, required_for
+
 
 @dataclass
 class WebDAVConfig:
@@ -18,6 +23,15 @@ class WebDAVConfig:
     username: str = ""
     password: str = ""
     syncPath: str = "/fastReader"
+    maxConnections: int = 16  # 连接池最大连接数（下载 / 上传线程共用），0 表示不限制
+    maxKeepaliveConnections: int = 8  # 保留的空闲 keep-alive 连接数
+    keepaliveExpiry: float = 30.0  # 空闲连接保留时间（秒）
+    http2: bool = False  # 启用 HTTP/2（需要 pip install 'httpx[http2]'）
+    connectTimeout: float = 10.0  # 建立连接超时（秒）
+    readTimeout: float = 60.0  # 读取超时（秒），0 表示不限制
+    downloadChunkKB: int = 1024  # 流式下载的分块大小（KB）
+    downloadRetries: int = 3  # 下载中断后用 Range 请求续传的次数
+    cacheManifest: bool = True  # 通过 syncPath 下的缓存清单判断已处理的书籍，不列出整个同步目录
 
 
 @dataclass
@@ -50,7 +64,8 @@ class ProcessingConfig:
     """处理选项配置"""
     mode: str = "summary"
     bookType: str = "non-fiction"
-    chapterDetectionMode: str = "normal"
+    chapterDetectionMode: str = "normal"  # normal / toc（兼容 epub-toc）/ balanced
+    chapterTargetTokens: int = 6000  # balanced 模式下每个处理单元的目标 token 数
     outputLanguage: str = "zh"
 
 
@@ -60,10 +75,17 @@ class BatchConfig:
     sourcePath: str = ""
     maxFiles: int = 0
     skipProcessed: bool = True
-    order: str = "sequential"
+    order: str = "sequential"  # sequential 按名称 / random 随机 / stream 按发现顺序边扫描边处理
     concurrency: int = 1
     maxRetries: int = 3
     retryDelays: list = field(default_factory=lambda: [60, 120, 240, 480])
+    scanMaxDepth: int = 0  # 递归扫描的最大层数，1 表示只扫描 sourcePath 本身，0 表示不限制
+    scanConcurrency: int = 4  # 并行列出的文件夹数上限
+    include: list = field(default_factory=list)  # 包含的 glob 模式（相对 sourcePath 的路径或文件名）
+    exclude: list = field(default_factory=list)  # 排除的 glob 模式，匹配的文件夹整体跳过
+    snapshotDir: str = "~/.cache/fastreader/snapshots"  # 书库快照目录，空字符串表示不保存快照
+    changedOnly: bool = False  # 只处理相对上次扫描新增或修改过的书籍
+    reuseUnchangedDirs: bool = False  # ETag 未变的文件夹沿用快照子树（仅当服务器会把子项变化传播到父文件夹 ETag 时开启）
 
 
 @dataclass
@@ -72,6 +94,10 @@ class OutputConfig:
     localDir: str = "output/"
     logDir: str = "log/"
     syncToWebDAV: bool = True
+    uploadWorkers: int = 2  # 后台上传线程数
+    uploadRetries: int = 5  # 上传失败后的重试次数（间隔指数增长），仍失败的留到下次运行
+    uploadQueueDir: str = "~/.cache/fastreader/uploads"  # 待上传文件的持久化目录
+    uploadFlushTimeout: float = 300.0  # 结束时等待上传完成的最长时间（秒），0 表示不限制
 
 
 @dataclass
@@ -80,6 +106,19 @@ class AdvancedConfig:
     exchangeRate: float = 7.0
     debug: bool = False
     queuePrefetchCount: int = 10
+    pdfWorkers: int = 0  # PDF 页面提取进程数，0 为按 CPU 核数自动选择
+    pdfPageTimeout: float = 60.0  # PDF 单页提取超时（秒）
+    pdfStreamingPages: int = 1000  # 页数达到该值的 PDF 使用流式提取，0 表示禁用
+    pdfEngine: str = "pypdf"  # PDF 文本引擎：pypdf / pymupdf / pypdfium2 / pdfminer / auto
+    epubNotes: str = "drop"  # EPUB 脚注、尾注与参考文献：drop 删除 / compact 压缩 / keep 保留
+    epubRangeRequests: bool = True  # EPUB 通过 HTTP Range 请求按需读取文本条目，不下载图片等资源
+    inMemoryMaxMB: int = 64  # 书籍下载到内存的上限，超过时转存到临时文件；0 表示始终下载到磁盘
+    downloadDir: str = "~/.cache/fastreader/downloads"  # 下载到磁盘的书籍目录，中断留下的 .part 下次运行续传；空字符串表示使用临时目录
+    extractionCacheDir: str = "~/.cache/fastreader/extraction"  # 章节提取缓存目录
+    extractionCacheMaxMB: int = 1024  # 提取缓存容量上限，0 表示禁用
+    extractionSandbox: bool = True  # 在独立子进程中提取章节（损坏的书籍不会拖垮整个批次）
+    extractionTimeout: float = 600.0  # 单本书提取超时（秒），0 表示不限制
+    extractionMaxMemoryMB: int = 4096  # 提取子进程的地址空间上限，0 表示不限制
 
 
 @dataclass
@@ -162,6 +201,9 @@ class ConfigLoader:
         except yaml.YAMLError as e:
             print(f"❌ YAML 解析错误: {e}")
             return None
+        except PromptTemplateError as e:
+            print(f"❌ Prompt 模板错误: {e}")
+            return None
         except Exception as e:
             print(f"❌ 配置加载失败: {e}")
             return None
@@ -192,7 +234,16 @@ class ConfigLoader:
             serverUrl=self._replace_env_vars(data.get('serverUrl', data.get('server_url', ''))),
             username=self._replace_env_vars(data.get('username', '')),
             password=self._replace_env_vars(data.get('password', '')),
-            syncPath=data.get('syncPath', data.get('sync_path', '/fastReader'))
+            syncPath=data.get('syncPath', data.get('sync_path', '/fastReader')),
+            maxConnections=int(data.get('maxConnections', 16)),
+            maxKeepaliveConnections=int(data.get('maxKeepaliveConnections', 8)),
+            keepaliveExpiry=float(data.get('keepaliveExpiry', 30.0)),
+            http2=bool(data.get('http2', False)),
+            connectTimeout=float(data.get('connectTimeout', 10.0)),
+            readTimeout=float(data.get('readTimeout', 60.0)),
+            downloadChunkKB=int(data.get('downloadChunkKB', 1024)),
+            downloadRetries=int(data.get('downloadRetries', 3)),
+            cacheManifest=bool(data.get('cacheManifest', True))
         )
 
     def _parse_ai(self, data: dict) -> AIConfig:
@@ -252,6 +303,7 @@ class ConfigLoader:
             mode=data.get('processingMode', data.get('mode', 'summary')),
             bookType=data.get('bookType', data.get('book_type', 'non-fiction')),
             chapterDetectionMode=data.get('chapterDetectionMode', data.get('chapter_detection_mode', 'normal')),
+            chapterTargetTokens=int(data.get('chapterTargetTokens', data.get('chapter_target_tokens', 6000))),
             outputLanguage=data.get('outputLanguage', data.get('output_language', 'zh'))
         )
 
@@ -275,7 +327,14 @@ class ConfigLoader:
             concurrency=int(os.environ.get('FASTREADER_CONCURRENCY', data.get('concurrency', 1))),
             # 环境变量: FASTREADER_MAX_RETRIES
             maxRetries=int(os.environ.get('FASTREADER_MAX_RETRIES', data.get('maxRetries', 3))),
-            retryDelays=list(data.get('retryDelays', [60, 120, 240, 480]))
+            retryDelays=list(data.get('retryDelays', [60, 120, 240, 480])),
+            scanMaxDepth=int(data.get('scanMaxDepth', 0)),
+            scanConcurrency=int(data.get('scanConcurrency', 4)),
+            include=list(data.get('include') or []),
+            exclude=list(data.get('exclude') or []),
+            snapshotDir=data.get('snapshotDir', '~/.cache/fastreader/snapshots'),
+            changedOnly=bool(data.get('changedOnly', False)),
+            reuseUnchangedDirs=bool(data.get('reuseUnchangedDirs', False))
         )
 
     def _parse_output(self, data: dict) -> OutputConfig:
@@ -286,7 +345,11 @@ class ConfigLoader:
         return OutputConfig(
             localDir=data.get('localDir', 'output/'),
             logDir=data.get('logDir', 'log/'),
-            syncToWebDAV=bool(data.get('syncToWebDAV', True))
+            syncToWebDAV=bool(data.get('syncToWebDAV', True)),
+            uploadWorkers=int(data.get('uploadWorkers', 2)),
+            uploadRetries=int(data.get('uploadRetries', 5)),
+            uploadQueueDir=data.get('uploadQueueDir', '~/.cache/fastreader/uploads'),
+            uploadFlushTimeout=float(data.get('uploadFlushTimeout', 300.0))
         )
 
     def _parse_advanced(self, data: dict) -> AdvancedConfig:
@@ -297,7 +360,20 @@ class ConfigLoader:
         return AdvancedConfig(
             exchangeRate=float(data.get('exchangeRate', 7.0)),
             debug=bool(data.get('debug', False)),
-            queuePrefetchCount=int(data.get('queuePrefetchCount', 10))
+            queuePrefetchCount=int(data.get('queuePrefetchCount', 10)),
+            pdfWorkers=int(data.get('pdfWorkers', 0)),
+            pdfPageTimeout=float(data.get('pdfPageTimeout', 60.0)),
+            pdfStreamingPages=int(data.get('pdfStreamingPages', 1000)),
+            pdfEngine=data.get('pdfEngine', 'pypdf'),
+            epubNotes=data.get('epubNotes', 'drop'),
+            epubRangeRequests=bool(data.get('epubRangeRequests', True)),
+            inMemoryMaxMB=int(data.get('inMemoryMaxMB', 64)),
+            downloadDir=data.get('downloadDir', '~/.cache/fastreader/downloads'),
+            extractionCacheDir=data.get('extractionCacheDir', '~/.cache/fastreader/extraction'),
+            extractionCacheMaxMB=int(data.get('extractionCacheMaxMB', 1024)),
+            extractionSandbox=bool(data.get('extractionSandbox', True)),
+            extractionTimeout=float(data.get('extractionTimeout', 600.0)),
+            extractionMaxMemoryMB=int(data.get('extractionMaxMemoryMB', 4096))
         )
 
     def _parse_prompts(self, data: dict, current_version: str = 'v2') -> PromptConfig:
@@ -317,12 +393,20 @@ class ConfigLoader:
                 connectionAnalysis=version_data.get('connectionAnalysis', ''),
                 overallSummary=version_data.get('overallSummary', '')
             )
+            self._validate_prompt_version(version_name, versions[version_name])
 
         return PromptConfig(
             versions=versions,
             currentVersion=current_version
         )
 
+    def _validate_prompt_version(self, version_name: str, version_config: PromptVersionConfig):
+        """预编译单版本 Prompt，尽早发现未知或缺少的占位符"""
+        for prompt_type, template in vars(version_config).items():
+            if template:
+                compile_prompt(template, placeholders_for(prompt_type), f"{version_name}.{prompt_type}",
+                               required_for(prompt_type))
+
 
 def validate_config(config: Config) -> list:
     """验证配置有效性"""
@@ -343,4 +427,21 @@ def validate_config(config: Config) -> list:
     if not config.batch.sourcePath:
         errors.append("批量处理 sourcePath 不能为空")
 
+    if config.batch.order not in ('sequential', 'random', 'stream'):
+        errors.append(f"未知的处理顺序: {config.batch.order}")
+
+    try:
+        normalize_detection_mode(config.processing.chapterDetectionMode)
+    except ValueError as e:
+        errors.append(str(e))
+
+    # 提取选项：拼写错误在加载时报错，而不是每本书提取时失败
+    try:
+        get_engine(config.advanced.pdfEngine)
+    except ValueError as e:
+        errors.append(str(e))
+
+    if config.advanced.epubNotes not in NOTE_MODES:
+        errors.append(f"未知的注释处理方式: {config.advanced.epubNotes}（可选: {', '.join(NOTE_MODES)}）")
+
     return errors
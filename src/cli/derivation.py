@@ -0,0 +1,322 @@
+"""
+派生处理
+基于已生成的章节摘要（本地缓存或 WebDAV 上的 `-完整摘要.md`）派生新的输出：
+思维导图、译文或新的全书总结，无需再次把整本原书发送给模型
+"""
+
+import re
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from .ai_client import AIClient, AIResponse
+from .config import Config
+from .formatter import ResultFormatter
+from .logger import Logger
+from .models import BatchResult, ChapterInfo, ProcessingResult
+
+
+CACHE_SUFFIX = "-完整摘要.md"
+
+_CHAPTER_HEADING = re.compile(r'^### 第(\d+)章\s*$')
+_FOOTER = re.compile(r'^\*由 fastReader (?:CLI )?自动生成')
+
+
+@dataclass
+class CachedSummary:
+    """已缓存的处理结果"""
+    title: str
+    author: str = ""
+    overall_summary: str = ""
+    connections: str = ""
+    chapters: list[ChapterInfo] = field(default_factory=list)  # content 为章节摘要
+    metadata: dict = field(default_factory=dict)
+
+
+def parse_summary_markdown(text: str) -> CachedSummary:
+    """
+    解析 ResultFormatter 生成的完整摘要 Markdown
+
+    支持可选的 HTML 注释元数据头（WebDAV 版本）、`## 全书总结`、
+    `## 章节关联分析` 以及 `## 章节摘要` 下以 `### ` 开头的各章节
+    """
+    metadata = {}
+    lines = text.splitlines()
+    start = 0
+
+    # 1. 元数据注释
+    if lines and lines[0].strip() == '<!--':
+        for i in range(1, len(lines)):
+            line = lines[i]
+            if line.strip() == '-->':
+                start = i + 1
+                break
+            key, sep, value = line.partition(':')
+            if sep:
+                metadata[key.strip()] = value.strip()
+
+    title = ""
+    author = ""
+    sections: dict[str, list[str]] = {}
+    current: Optional[list[str]] = None
+
+    for line in lines[start:]:
+        if not title and line.startswith('# '):
+            title = line[2:].strip()
+            continue
+        if not author and current is None and line.startswith('**作者**:'):
+            author = line.split(':', 1)[1].strip()
+            continue
+        if line in ('## 全书总结', '## 章节关联分析', '## 章节摘要') and line[3:] not in sections:
+            current = sections.setdefault(line[3:], [])
+            continue
+        if current is not None:
+            current.append(line)
+
+    # 2. 章节：CLI 输出使用 "### 第N章"，否则退回到任意三级标题
+    chapter_lines = sections.get('章节摘要', [])
+    numbered = any(_CHAPTER_HEADING.match(line) for line in chapter_lines)
+    chapters: list[ChapterInfo] = []
+    chapter_title: Optional[str] = None
+    body: list[str] = []
+
+    def flush():
+        if chapter_title is not None:
+            index = len(chapters)
+            chapters.append(ChapterInfo(
+                id=str(index + 1),
+                title=chapter_title,
+                content='\n'.join(body).strip(),
+                order=index
+            ))
+
+    for line in chapter_lines:
+        is_heading = _CHAPTER_HEADING.match(line) if numbered else line.startswith('### ')
+        if is_heading:
+            flush()
+            chapter_title = line[4:].strip()
+            body = []
+        elif _FOOTER.match(line):
+            continue
+        else:
+            body.append(line)
+    flush()
+
+    return CachedSummary(
+        title=title or metadata.get('fileName', ''),
+        author=author,
+        overall_summary='\n'.join(sections.get('全书总结', [])).strip(),
+        connections='\n'.join(sections.get('章节关联分析', [])).strip(),
+        chapters=chapters,
+        metadata=metadata
+    )
+
+
+class SummaryDeriver:
+    """基于章节摘要派生新输出"""
+
+    def __init__(self, config: Config, logger: Logger, ai_client: Optional[AIClient], webdav=None):
+        self.config = config
+        self.logger = logger
+        self.ai_client = ai_client
+        self.webdav = webdav
+        self.formatter = ResultFormatter(logger)
+
+    def _sync_path(self) -> str:
+        sync_path = self.config.webdav.syncPath
+        if not sync_path.startswith("/"):
+            sync_path = "/" + sync_path
+        return sync_path.rstrip("/")
+
+    def list_sources(self) -> list[str]:
+        """列出可用的完整摘要文件名（本地优先，其次 WebDAV）"""
+        names = set()
+        local_dir = Path(self.config.output.localDir)
+        if local_dir.is_dir():
+            names.update(p.name for p in local_dir.glob(f"*{CACHE_SUFFIX}"))
+
+        if self.webdav is not None and self.webdav.is_connected():
+            names.update(self.webdav.list_cache_files())
+
+        return sorted(names)
+
+    def load(self, file_name: str) -> Optional[CachedSummary]:
+        """读取并解析完整摘要"""
+        local_file = Path(self.config.output.localDir) / file_name
+        if local_file.is_file():
+            return parse_summary_markdown(local_file.read_text(encoding='utf-8'))
+
+        if self.webdav is not None and self.webdav.is_connected():
+            ok, content = self.webdav.download_file_as_text(f"{self._sync_path()}/{file_name}")
+            if ok:
+                return parse_summary_markdown(content)
+
+        return None
+
+    def derive(self, file_name: str, mode: str, language: str, translate: bool = False) -> ProcessingResult:
+        """
+        从单本书的章节摘要派生输出
+
+        Args:
+            file_name: 完整摘要文件名（{sanitizedName}-完整摘要.md）
+            mode: 目标处理模式（summary / mindmap / combined-mindmap）
+            language: 目标输出语言
+            translate: 是否将章节摘要翻译为目标语言
+
+        Returns:
+            ProcessingResult
+        """
+        start_time = time.time()
+
+        cached = self.load(file_name)
+        if cached is None or not cached.chapters:
+            return ProcessingResult(success=False, book_name=file_name, error="未找到可用的章节摘要")
+        if self.ai_client is None:
+            return ProcessingResult(success=False, book_name=file_name, error="AI 客户端未初始化")
+
+        input_tokens = 0
+        output_tokens = 0
+
+        def track(response: AIResponse) -> AIResponse:
+            nonlocal input_tokens, output_tokens
+            input_tokens += response.input_tokens
+            output_tokens += response.output_tokens
+            return response
+
+        chapters = cached.chapters
+        print(f"   📑 章节摘要: {len(chapters)} 章")
+
+        # 1. 翻译章节摘要
+        if translate:
+            print(f"   🌐 正在翻译章节摘要 → {language}")
+            translated = []
+            for chapter in chapters:
+                response = track(self.ai_client.translate_text(chapter.content, language))
+                content = response.content if response.success else chapter.content
+                translated.append(ChapterInfo(
+                    id=chapter.id, title=chapter.title, content=content, order=chapter.order
+                ))
+            chapters = translated
+
+        chapter_results = {chapter.id: chapter.content for chapter in chapters}
+
+        # 2. 章节思维导图
+        if mode in ("mindmap", "combined-mindmap"):
+            print(f"   🧠 正在生成章节思维导图...")
+            for chapter in chapters:
+                response = track(self.ai_client.generate_mindmap(chapter, language))
+                if response.success:
+                    chapter_results[chapter.id] = f"```json\n{response.content}\n```"
+                else:
+                    chapter_results[chapter.id] = f"（处理失败: {response.error}）"
+
+        # 3. 章节关联分析（只在生成全书总结时需要，缓存中已有时直接沿用）
+        connections = cached.connections
+        if mode == "combined-mindmap" and not connections:
+            print(f"   🔗 正在生成章节关联分析...")
+            response = track(self.ai_client.analyze_connections(chapters, language))
+            if response.success:
+                connections = response.content
+
+        # 4. 全书总结（以完整章节摘要为输入，而不只是章节标题）
+        overall_summary = cached.overall_summary
+        if mode in ("summary", "combined-mindmap"):
+            print(f"   📝 正在生成全书总结...")
+            response = track(self.ai_client.generate_overall_summary(
+                cached.title, chapters, connections, language, with_summaries=True
+            ))
+            if response.success:
+                overall_summary = response.content
+        elif translate and overall_summary:
+            response = track(self.ai_client.translate_text(overall_summary, language))
+            if response.success:
+                overall_summary = response.content
+
+        cost_usd, cost_cny = self.ai_client.calculate_cost(input_tokens, output_tokens)
+
+        # 5. 保存结果
+        content = self.formatter.format_result(
+            title=cached.title,
+            author=cached.author,
+            chapters=chapter_results,
+            overall_summary=overall_summary,
+            mode=mode,
+        )
+
+        base_name = file_name[: -len(CACHE_SUFFIX)] if file_name.endswith(CACHE_SUFFIX) else file_name
+        output_name = f"{base_name}-完整摘要-{mode}-{language}.md"
+        metadata = {
+            "fileName": cached.metadata.get("fileName", file_name),
+            "derivedFrom": file_name,
+            "processedAt": datetime.now().isoformat(),
+            "model": self.config.ai.model,
+            "processingMode": mode,
+            "outputLanguage": language,
+            "chapterCount": len(chapters),
+            "processedCharCount": len(content),
+            "inputTokens": input_tokens,
+            "outputTokens": output_tokens,
+            "costUSD": cost_usd,
+            "costRMB": cost_cny,
+        }
+
+        local_file = self.formatter.save_to_file(content, self.config.output.localDir, output_name)
+        self.formatter.save_to_file(
+            self.formatter.format_json(metadata),
+            self.config.output.localDir,
+            f"{base_name}-{mode}-{language}.meta.json",
+        )
+        print(f"   💾 已保存到本地: {local_file}")
+
+        if self.config.output.syncToWebDAV and self.webdav is not None and self.webdav.is_connected():
+            webdav_content = self.formatter.format_with_metadata(
+                content, metadata, self.config.advanced.exchangeRate
+            )
+            if self.webdav.upload_file(f"{self._sync_path()}/{output_name}", webdav_content):
+                print(f"   ☁️  已同步到 WebDAV: {output_name}")
+            else:
+                print(f"   ⚠️  WebDAV 同步失败")
+
+        return ProcessingResult(
+            success=True,
+            book_name=file_name,
+            metadata=metadata,
+            content=content,
+            cost_usd=cost_usd,
+            cost_cny=cost_cny,
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
+            processing_time=time.time() - start_time,
+        )
+
+    def run(self, mode: str, language: str, translate: bool = False) -> BatchResult:
+        """对所有可用的完整摘要执行派生"""
+        start_time = time.time()
+        sources = self.list_sources()
+        if self.config.batch.maxFiles > 0:
+            sources = sources[: self.config.batch.maxFiles]
+
+        result = BatchResult(total=len(sources))
+        print(f"\n📚 找到 {len(sources)} 份章节摘要")
+
+        for i, file_name in enumerate(sources):
+            print(f"\n[{i + 1:02d}/{len(sources)}] 🔁 派生: {file_name}")
+            try:
+                book_result = self.derive(file_name, mode, language, translate)
+            except Exception as e:
+                book_result = ProcessingResult(success=False, book_name=file_name, error=str(e))
+
+            if book_result.success:
+                result.success += 1
+                result.total_cost_usd += book_result.cost_usd
+                result.total_cost_cny += book_result.cost_cny
+                print(f"   ✅ 完成 (input: {book_result.input_tokens:,}, output: {book_result.output_tokens:,})")
+            else:
+                result.failed += 1
+                result.failed_books.append({"name": file_name, "error": book_result.error})
+                print(f"   ❌ 失败: {book_result.error}")
+
+        result.processing_time = time.time() - start_time
+        return result
@@ -0,0 +1,126 @@
+"""
+章节提取缓存
+以书籍文件内容的 SHA-256 与提取器版本为键，将 BookContent 序列化后 gzip 压缩保存到磁盘，
+重复运行（调整 Prompt、切换模式）时无需再次解析同一本书
+"""
+
+import dataclasses
+import gzip
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Optional
+
+from .chapter_extractor import EXTRACTOR_VERSION, BookContent, BookSource, Chapter, PageFailure, open_source
+from .pdf_cleanup import NoiseStats
+
+
+CACHE_SUFFIX = ".json.gz"
+
+
+def file_sha256(source: BookSource, chunk_size: int = 1024 * 1024) -> str:
+    """分块计算文件（路径、字节或文件对象）的 SHA-256；远程文件使用其 cache_id，不下载内容"""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return hashlib.sha256(source).hexdigest()
+    if hasattr(source, 'cache_id'):
+        return source.cache_id
+
+    digest = hashlib.sha256()
+    source = open_source(source)
+    f = open(source, 'rb') if isinstance(source, str) else source
+    try:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    finally:
+        if f is not source:
+            f.close()
+        else:
+            f.seek(0)
+    return digest.hexdigest()
+
+
+class ExtractionCache:
+    """
+    磁盘上的提取结果缓存
+
+    按最近使用时间（文件 mtime）做 LRU 淘汰，总大小不超过 max_bytes
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int, version: str = EXTRACTOR_VERSION):
+        self.cache_dir = Path(os.path.expanduser(cache_dir))
+        self.max_bytes = max_bytes
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, source: BookSource, variant: str = '') -> str:
+        """缓存键：内容哈希 + 提取器版本（+ 影响输出的选项，如非默认的 PDF 文本引擎）"""
+        key = f"{file_sha256(source)}-v{self.version}"
+        return f"{key}-{variant}" if variant else key
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}{CACHE_SUFFIX}"
+
+    def get(self, file_path: str, key: Optional[str] = None) -> Optional[BookContent]:
+        """读取缓存，未命中或缓存损坏时返回 None"""
+        path = self._path(key or self.key(file_path))
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                data = json.load(f)
+            os.utime(path)  # 标记为最近使用
+        except (OSError, ValueError, EOFError):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return BookContent(
+            title=data['title'],
+            author=data['author'],
+            chapters=[Chapter(**c) for c in data['chapters']],
+            file_path=file_path,
+            file_type=data['file_type'],
+            page_failures=[PageFailure(**f) for f in data.get('page_failures', [])],
+            noise=NoiseStats(**data.get('noise', {})),
+        )
+
+    def put(self, file_path: str, book: BookContent, key: Optional[str] = None):
+        """写入缓存（原子替换），并按容量淘汰旧条目"""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self._path(key or self.key(file_path))
+        tmp_path = path.with_name(path.name + '.tmp')
+
+        data = dataclasses.asdict(book)
+        data.pop('file_path', None)
+        with gzip.open(tmp_path, 'wt', encoding='utf-8', compresslevel=6) as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+        self.evict()
+
+    def evict(self) -> int:
+        """淘汰最久未使用的条目直到总大小不超过上限，返回删除的条目数"""
+        if not self.cache_dir.is_dir():
+            return 0
+
+        entries = []
+        total = 0
+        for path in self.cache_dir.glob(f"*{CACHE_SUFFIX}"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
@@ -0,0 +1,218 @@
+"""
+提取沙箱
+在独立子进程中执行章节提取，限制墙钟时间与地址空间（RLIMIT_AS）；
+损坏的书籍导致解析死循环或内存暴涨时只终止该子进程，批量处理继续进行。
+
+子进程由 forkserver 派生：批量处理时本进程已有扫描、上传与 HTTP 连接池线程，
+直接 fork 可能继承其他线程持有的锁而死锁；fork 服务器是单线程的，任务与参数通过管道序列化传入
+"""
+
+import multiprocessing
+import os
+import signal
+from typing import Any, Callable, Iterator
+
+from .chapter_extractor import ChapterExtractorFactory, PDFExtractor
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+FAILURE_TIMEOUT = 'timeout'
+FAILURE_MEMORY = 'memory'
+FAILURE_PARSE = 'parse'
+FAILURE_CRASH = 'crash'
+
+FAILURE_LABELS = {
+    FAILURE_TIMEOUT: '提取超时',
+    FAILURE_MEMORY: '内存超限',
+    FAILURE_PARSE: '解析失败',
+    FAILURE_CRASH: '提取进程崩溃',
+}
+
+# 子进程被 SIGKILL 终止（通常是系统 OOM killer）
+_SIGKILL_EXIT = -9
+
+
+class ExtractionError(Exception):
+    """沙箱内提取失败（kind 为失败类型：timeout / memory / parse / crash）"""
+
+    def __init__(self, kind: str, message: str):
+        super().__init__(f"{FAILURE_LABELS.get(kind, kind)}: {message}")
+        self.kind = kind
+
+
+_START_METHOD = 'forkserver'
+_context = None
+
+
+def sandbox_available() -> bool:
+    """是否支持沙箱（需要 forkserver，即 POSIX 平台）"""
+    return _START_METHOD in multiprocessing.get_all_start_methods()
+
+
+def _get_context():
+    global _context
+    if _context is None:
+        _context = multiprocessing.get_context(_START_METHOD)
+        # fork 服务器预先导入提取模块，每个子进程不必重新导入 pypdf 等依赖
+        _context.set_forkserver_preload([__name__])
+    return _context
+
+
+def _limit_memory(max_memory_mb: int):
+    """限制当前进程的地址空间"""
+    if resource is None or max_memory_mb <= 0:
+        return
+    limit = max_memory_mb * 1024 * 1024
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+
+def _sandbox_main(conn, func: Callable, args: tuple, max_memory_mb: int, stream: bool):
+    """子进程入口：执行 func 并通过管道返回结果（stream 时逐条返回生成的结果）或分类后的错误"""
+    try:
+        # 独立进程组：超时时连同 PDF 并行提取的工作进程一起终止
+        os.setpgrp()
+        _limit_memory(max_memory_mb)
+        if stream:
+            for item in func(*args):
+                conn.send(('item', item))
+            message = ('done',)
+        else:
+            message = ('ok', func(*args))
+    except MemoryError:
+        message = ('error', FAILURE_MEMORY, f"超过 {max_memory_mb} MB")
+    except Exception as e:
+        # 提取器会把底层异常包装为 "xx 解析失败"，内存不足时仍按 OOM 归类
+        kind = FAILURE_MEMORY if isinstance(e.__cause__ or e.__context__, MemoryError) else FAILURE_PARSE
+        message = ('error', kind, str(e) or type(e).__name__)
+
+    try:
+        conn.send(message)
+    except Exception as e:
+        try:
+            conn.send(('error', FAILURE_CRASH, f"无法返回提取结果: {e}"))
+        except OSError:
+            pass  # 父进程已停止读取
+    finally:
+        conn.close()
+
+
+def _kill(process):
+    """终止子进程及其进程组"""
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        process.kill()
+    process.join()
+
+
+def _start(func: Callable, args: tuple, max_memory_mb: int, stream: bool):
+    context = _get_context()
+    receiver, sender = context.Pipe(duplex=False)
+    # 非 daemon：PDF 并行提取需要在子进程中再创建进程池
+    process = context.Process(target=_sandbox_main, args=(sender, func, args, max_memory_mb, stream))
+    process.start()
+    sender.close()
+    return process, receiver
+
+
+def _receive(process, receiver, timeout: float) -> tuple:
+    """等待子进程的下一条消息"""
+    if not receiver.poll(timeout if timeout > 0 else None):
+        _kill(process)
+        raise ExtractionError(FAILURE_TIMEOUT, f"超过 {timeout:g} 秒")
+    try:
+        return receiver.recv()
+    except EOFError:
+        process.join()
+        if process.exitcode == _SIGKILL_EXIT:
+            raise ExtractionError(FAILURE_MEMORY, "提取进程被系统终止（可能内存不足）")
+        raise ExtractionError(FAILURE_CRASH, f"退出码 {process.exitcode}")
+
+
+def run_sandboxed(func: Callable, args: tuple = (), timeout: float = 0, max_memory_mb: int = 0) -> Any:
+    """
+    在子进程中执行 func(*args) 并返回其结果
+
+    Args:
+        func: 模块级可调用对象（与 args、返回值一样需可序列化）
+        args: 参数
+        timeout: 墙钟超时（秒），0 表示不限制
+        max_memory_mb: 子进程地址空间上限（MB），0 表示不限制
+
+    Raises:
+        ExtractionError: 超时、内存超限、解析异常或子进程意外退出
+    """
+    process, receiver = _start(func, args, max_memory_mb, stream=False)
+    try:
+        message = _receive(process, receiver, timeout)
+        process.join()
+    finally:
+        receiver.close()
+        if process.exitcode is None:
+            _kill(process)
+
+    if message[0] == 'ok':
+        return message[1]
+    raise ExtractionError(message[1], message[2])
+
+
+def iter_sandboxed(func: Callable, args: tuple = (), timeout: float = 0, max_memory_mb: int = 0) -> Iterator:
+    """
+    在子进程中迭代生成器函数 func(*args)，逐条返回结果
+
+    子进程在管道写满时阻塞，调用方处理速度决定提取进度；timeout 为等待每条结果的上限。
+    提前停止迭代时终止子进程
+
+    Raises:
+        ExtractionError: 同 run_sandboxed
+    """
+    process, receiver = _start(func, args, max_memory_mb, stream=True)
+    try:
+        while True:
+            message = _receive(process, receiver, timeout)
+            if message[0] == 'done':
+                break
+            if message[0] == 'error':
+                raise ExtractionError(message[1], message[2])
+            yield message[1]
+        process.join()
+    finally:
+        receiver.close()
+        if process.exitcode is None:
+            _kill(process)
+
+
+def book_task(name: str, source, advanced, processing, cache=None) -> Iterator[tuple]:
+    """
+    沙箱内的提取任务：在子进程中读取 PDF 页数，再决定完整提取还是流式提取
+
+    生成的消息：
+    - 完整提取：('book', BookContent, 缓存命中统计)
+    - 流式提取：('stream', 书名, 作者, 文件类型)，随后逐个 ('chapter', Chapter)，最后 ('end', 页面失败, 噪声统计)
+    """
+    options = dict(
+        pdf_workers=advanced.pdfWorkers,
+        pdf_page_timeout=advanced.pdfPageTimeout,
+        pdf_engine=advanced.pdfEngine,
+        epub_notes=advanced.epubNotes,
+        source=source,
+        detection=processing.chapterDetectionMode,
+        target_tokens=processing.chapterTargetTokens,
+    )
+    if name.lower().endswith('.pdf') and PDFExtractor.needs_streaming(source, advanced.pdfStreamingPages):
+        book = ChapterExtractorFactory.stream(name, **options)
+        yield 'stream', book.title, book.author, book.file_type
+        for chapter in book.chapters:
+            yield 'chapter', chapter
+        yield 'end', book.page_failures, book.noise
+        return
+
+    book = ChapterExtractorFactory.extract(name, cache=cache, **options)
+    yield 'book', book, (cache.hits, cache.misses) if cache else None
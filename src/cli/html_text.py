@@ -0,0 +1,349 @@
+"""
+HTML 文本提取器
+单次扫描 XHTML 文档，同时得到标题、清理后的正文和块结构，并完整解码 HTML 实体；
+可选去除或压缩脚注、尾注、参考文献等辅助内容
+"""
+
+import codecs
+import re
+from dataclasses import dataclass
+from functools import cached_property, lru_cache
+from html import unescape
+from typing import Optional, Union
+
+
+# 单个正则完成分词：只有块级边界、<br>、注释/CDATA 以及需要跳过的元素会回到 Python 处理，
+# 行内标签（span / em / a ...）在块内文本中一次性删除。标签名不区分大小写（HTML 风格的 <P> 等），
+# 匹配后统一转为小写；按常见程度排列，前置的首字母检查让行内标签（span / em / a ...）尽快失配
+_TAG_NAMES = (
+    'p|div|h[1-6]|li|br|blockquote|section|body|head|title|table|tr|td|th|ul|ol|dl|dt|dd|pre|hr|'
+    'aside|article|figure|figcaption|header|footer|nav|main|address|caption|tbody|thead|tfoot|'
+    'script|style|svg|math|template'
+)
+_TOKEN = re.compile(
+    r'<(?:!--.*?--|!\[CDATA\[(.*?)\]\]'
+    rf'|(/?)((?=[abcdfhlmnopstu])(?:{_TAG_NAMES}))(?=[\s/>])([^>]*))>',
+    re.S | re.I
+)
+_INLINE = re.compile(r'<[^>\x01]*>')
+_ENTITY = re.compile(r'&(?:#[0-9]{1,7}|#[xX][0-9a-fA-F]{1,6}|[A-Za-z][A-Za-z0-9]{1,31});')
+_ENCODING = re.compile(rb'encoding=["\']([A-Za-z0-9_.-]+)["\']')
+_ATTR = re.compile(r'([A-Za-z_:][A-Za-z0-9_:.-]*)\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s"\'>]+))')
+
+# <br> 在块内产生的换行标记（与源码中的普通空白区分）
+_LINE_BREAK = '\x00'
+# 块之间的分隔符：所有块合并后只做一次行内标签删除和实体解码
+_BLOCK_SEP = '\x01'
+
+HEADING_TAGS = frozenset({'h1', 'h2', 'h3', 'h4', 'h5', 'h6'})
+SKIP_TAGS = frozenset({'head', 'script', 'style', 'svg', 'math', 'template'})
+
+# 注释处理方式：保留 / 删除 / 压缩（每条注释截断到 NOTE_COMPACT_LENGTH）
+NOTES_KEEP = 'keep'
+NOTES_DROP = 'drop'
+NOTES_COMPACT = 'compact'
+NOTE_MODES = (NOTES_KEEP, NOTES_DROP, NOTES_COMPACT)
+NOTE_COMPACT_LENGTH = 60
+
+# 注释容器的语义标记（EPUB 3 epub:type、DPUB-ARIA role 以及常见排版工具的 class）
+NOTE_TYPES = frozenset({
+    'footnote', 'footnotes', 'endnote', 'endnotes', 'rearnote', 'rearnotes', 'note', 'notes',
+    'bibliography', 'biblioentry',
+    'doc-footnote', 'doc-endnote', 'doc-endnotes', 'doc-bibliography', 'doc-biblioentry',
+})
+NOTE_CLASSES = frozenset({
+    'footnote', 'footnotes', 'endnote', 'endnotes', 'bibliography',
+    'duokan-footnote-content', 'duokan-footnote-item',
+})
+# 链接文字占比达到该值的块视为仅有引用的内容（如回链、引文编号列表）
+LINK_DENSITY = 0.8
+
+# 正文中的注释引用：epub:type="noteref" 的链接，或文字仅为编号 / 符号的页内锚点链接
+_NOTEREF = re.compile(
+    r'<a\b(?=[^>]*(?:epub:type|role)\s*=\s*["\'][^"\']*noteref)[^>]*>.*?</a>'
+    r'|<a\b[^>]*href\s*=\s*["\'][^"\']*#[^"\']*["\'][^>]*>(?:\s|<[^>]*>)*'
+    r'(?:[\[(（【〔]?\s*(?:\d{1,4}|[*†‡§]|[①-⑳])\s*[\])）】〕]?)?(?:\s|<[^>]*>)*</a>',
+    re.S
+)
+_ANCHOR = re.compile(r'<a\b[^>]*>(.*?)</a>', re.S)
+
+
+@dataclass
+class TextBlock:
+    """文本块"""
+    tag: str  # 所属块级元素，如 p / h1 / li
+    text: str
+    raw_attrs: str = ''  # 块级元素的原始属性文本
+    note: bool = False  # 是否为注释 / 参考文献等辅助内容（仅在去除注释时识别）
+
+    @cached_property
+    def attrs(self) -> dict:
+        """块级元素属性（按需解析）"""
+        return parse_attrs(self.raw_attrs) if '=' in self.raw_attrs else {}
+
+
+@dataclass
+class HTMLDocument:
+    """文本提取结果"""
+    title: str
+    text: str
+    blocks: list[TextBlock]
+    removed_blocks: int = 0  # 去除或压缩的注释块数
+    removed_chars: int = 0   # 去除的注释字符数（含正文中的注释引用）
+
+
+def decode_html(data: Union[bytes, str]) -> str:
+    """按 XML 声明中的编码解码（默认 UTF-8，忽略非法字节）"""
+    if isinstance(data, str):
+        return data
+
+    encoding = 'utf-8'
+    match = _ENCODING.search(data[:200])
+    if match:
+        try:
+            encoding = codecs.lookup(match.group(1).decode('ascii')).name
+        except LookupError:
+            pass
+    return data.decode(encoding, errors='ignore')
+
+
+def parse_attrs(raw: str) -> dict:
+    """解析标签属性（值已解码实体）"""
+    attrs = {}
+    for match in _ATTR.finditer(raw):
+        value = match.group(2)
+        if value is None:
+            value = match.group(3) if match.group(3) is not None else match.group(4)
+        attrs[match.group(1).lower()] = _unescape(value) if '&' in value else value
+    return attrs
+
+
+def _normalize(raw: str, preserve: bool) -> str:
+    """规范块内空白（<pre> 内保留换行），<br> 产生的换行会保留"""
+    if preserve:
+        lines = (line.strip() for line in raw.replace(_LINE_BREAK, '\n').split('\n'))
+    elif _LINE_BREAK in raw:
+        lines = (' '.join(line.split()) for line in raw.split(_LINE_BREAK))
+    else:
+        return ' '.join(raw.split())
+    return '\n'.join(line for line in lines if line)
+
+
+def _unescape(text: str) -> str:
+    """
+    解码 HTML 实体（HTML5 命名实体与数字引用）
+
+    单次扫描逐个替换，解码结果不会被再次解码（如 &#38;lt; 得到 &lt; 而不是 <）
+    """
+    return _ENTITY.sub(_decode_entity, text)
+
+
+@lru_cache(maxsize=1024)
+def _decode(entity: str) -> str:
+    return unescape(entity)
+
+
+def _decode_entity(match: re.Match) -> str:
+    return _decode(match.group())
+
+
+def _is_note(raw_attrs: str) -> bool:
+    """块级元素属性是否标记为注释容器"""
+    lowered = raw_attrs.lower()
+    if 'note' not in lowered and 'biblio' not in lowered:
+        return False
+    attrs = parse_attrs(raw_attrs)
+    for name in ('epub:type', 'role'):
+        if NOTE_TYPES.intersection(attrs.get(name, '').lower().split()):
+            return True
+    return bool(NOTE_CLASSES.intersection(attrs.get('class', '').lower().split()))
+
+
+def _visible_length(raw: str) -> int:
+    """删除标签与空白后的字符数"""
+    return len(''.join(_INLINE.sub('', raw).split()))
+
+
+def _link_density(raw: str) -> float:
+    """块中链接文字的占比"""
+    total = _visible_length(raw)
+    if not total:
+        return 0.0
+    return sum(_visible_length(text) for text in _ANCHOR.findall(raw)) / total
+
+
+def compact_note(text: str) -> str:
+    """压缩注释：合并为一行并截断"""
+    text = ' '.join(text.split())
+    if len(text) <= NOTE_COMPACT_LENGTH:
+        return text
+    return text[:NOTE_COMPACT_LENGTH] + '…'
+
+
+def _clean(raw_parts: list[str]) -> list[str]:
+    """一次性删除所有块中的行内标签并解码实体"""
+    joined = _BLOCK_SEP.join(raw_parts)
+    if '<' in joined:
+        joined = _INLINE.sub('', joined)
+    if '&' in joined:
+        joined = _unescape(joined)
+    return joined.split(_BLOCK_SEP)
+
+
+def html_to_text(data: Union[bytes, str], notes: str = NOTES_KEEP) -> HTMLDocument:
+    """
+    将 XHTML 文档转换为纯文本（单次扫描）
+
+    Args:
+        data: 文档内容（bytes 或 str）
+        notes: 注释处理方式（keep / drop / compact）。drop 与 compact 会删除正文中的注释引用，
+            并按语义属性与链接密度识别脚注、尾注、参考文献块
+
+    Returns:
+        HTMLDocument：标题、按块换行的正文、块列表
+    """
+    html = decode_html(data)
+    if _BLOCK_SEP in html:
+        html = html.replace(_BLOCK_SEP, '')
+
+    strip_notes = notes != NOTES_KEEP
+    removed_chars = 0
+    if strip_notes and '<a' in html:
+        noterefs = []
+        html = _NOTEREF.sub(lambda m: noterefs.append(m.group()) or '', html)
+        removed_chars = sum(_visible_length(ref) for ref in noterefs)
+
+    # 使用 split 一次切分：[文本, cdata, close, tag, attrs, 文本, ...]
+    parts = _TOKEN.split(html)
+
+    raw_blocks: list[tuple] = []  # (tag, raw_attrs, raw, preserve, note)
+    buffer: list[str] = [parts[0]]
+    block_stack: list[tuple] = []  # (tag, raw_attrs)
+    note_level = None  # 最外层注释容器在 block_stack 中的位置
+    skipping = None  # 正在跳过的元素（head / script / style ...）
+    title_parts: Optional[list[str]] = None
+    head_title = ""
+    pre_depth = 0
+
+    for i in range(1, len(parts), 5):
+        cdata, closing, name, raw_attrs, text = parts[i:i + 5]
+        if name is not None:
+            name = name.lower()
+
+        if skipping is not None:
+            if name == 'title' and skipping == 'head':
+                if closing:
+                    if title_parts is not None and not head_title:
+                        head_title = ' '.join(_clean([''.join(title_parts)])[0].split())
+                    title_parts = None
+                else:
+                    title_parts = []
+            elif closing and name == skipping:
+                skipping = None
+                title_parts = None
+                buffer.append(text)
+                continue
+            if title_parts is not None:
+                title_parts.append(text)
+            continue
+
+        if name is None:
+            # 注释或 CDATA（CDATA 内容按字面保留）
+            if cdata:
+                buffer.append(cdata.replace('&', '&amp;').replace('<', '&lt;'))
+        elif name == 'br':
+            buffer.append(_LINE_BREAK)
+        elif name in SKIP_TAGS:
+            if not closing and not raw_attrs.endswith('/'):
+                skipping = name
+                continue
+        elif name != 'title':
+            # 块级边界：结束当前块
+            raw = ''.join(buffer)
+            if raw and not raw.isspace():
+                tag, attrs = block_stack[-1] if block_stack else ('body', '')
+                raw_blocks.append((tag, attrs, raw, pre_depth > 0, note_level is not None))
+            buffer.clear()
+
+            if closing:
+                # 弹出到匹配的块元素（容忍未闭合的标签）
+                for j in range(len(block_stack) - 1, -1, -1):
+                    if block_stack[j][0] == name:
+                        del block_stack[j:]
+                        if note_level is not None and j <= note_level:
+                            note_level = None
+                        break
+                if name == 'pre':
+                    pre_depth = max(0, pre_depth - 1)
+            elif name != 'hr' and not raw_attrs.endswith('/'):
+                if strip_notes and note_level is None and raw_attrs and _is_note(raw_attrs):
+                    note_level = len(block_stack)
+                block_stack.append((name, raw_attrs))
+                if name == 'pre':
+                    pre_depth += 1
+
+        buffer.append(text)
+
+    if skipping is None:
+        raw = ''.join(buffer)
+        if raw and not raw.isspace():
+            tag, attrs = block_stack[-1] if block_stack else ('body', '')
+            raw_blocks.append((tag, attrs, raw, pre_depth > 0, note_level is not None))
+
+    blocks = []
+    if raw_blocks:
+        for (tag, attrs, source, preserve, note), raw in zip(raw_blocks, _clean([b[2] for b in raw_blocks])):
+            text = _normalize(raw, preserve)
+            if text:
+                if strip_notes and not note and '<a' in source:
+                    note = _link_density(source) >= LINK_DENSITY
+                blocks.append(TextBlock(tag, text, attrs, note))
+
+    if not strip_notes:
+        return HTMLDocument(
+            title=_pick_title(blocks, head_title),
+            text='\n'.join(block.text for block in blocks),
+            blocks=blocks
+        )
+
+    lines = []
+    removed_blocks = 0
+    for block in blocks:
+        if not block.note:
+            lines.append(block.text)
+            continue
+        removed_blocks += 1
+        if notes == NOTES_COMPACT:
+            compacted = compact_note(block.text)
+            lines.append(compacted)
+            removed_chars += len(block.text) - len(compacted)
+        else:
+            removed_chars += len(block.text)
+
+    return HTMLDocument(
+        title=_pick_title([block for block in blocks if not block.note], head_title),
+        text='\n'.join(lines),
+        blocks=blocks,
+        removed_blocks=removed_blocks,
+        removed_chars=removed_chars
+    )
+
+
+def _pick_title(blocks: list[TextBlock], head_title: str) -> str:
+    """选择标题：首个标题元素 > <title> > class="title" 段落 > 首个较长段落"""
+    for block in blocks:
+        if block.tag in HEADING_TAGS:
+            return ' '.join(block.text.split())
+
+    if head_title:
+        return head_title
+
+    for block in blocks:
+        if block.tag == 'p' and 'title' in block.attrs.get('class', '').split():
+            return ' '.join(block.text.split())
+
+    for block in blocks:
+        if block.tag == 'p' and len(block.text) > 10:
+            return block.text[:100]
+
+    return ""
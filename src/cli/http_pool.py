@@ -0,0 +1,136 @@
+"""
+HTTP 连接池
+为 WebDAV 客户端创建显式配置的共享 httpx 客户端：连接数上限、keep-alive、可选 HTTP/2、连接 / 读取超时，
+并统计新建、复用与等待空闲连接的请求数。httpx.Client 本身线程安全，可供多个下载 / 上传线程共用
+"""
+
+import threading
+from dataclasses import dataclass
+from typing import Any, Optional
+
+try:
+    import httpx
+except ImportError:  # webdav4 的依赖，未安装 webdav4 时同样缺失
+    httpx = None
+
+try:
+    import h2  # noqa: F401  HTTP/2 需要 httpx[http2]
+    _http2_available = True
+except ImportError:
+    _http2_available = False
+
+
+@dataclass
+class PoolStats:
+    """连接池统计"""
+    requests: int = 0
+    opened: int = 0      # 新建的连接数
+    reused: int = 0      # 复用已有连接的请求数
+    waited: int = 0      # 发起时连接数已满、需要等待空闲连接的请求数
+    open: int = 0        # 当前池中的连接数（含空闲的 keep-alive 连接）
+
+    @property
+    def reuse_rate(self) -> float:
+        return self.reused / self.requests if self.requests else 0.0
+
+
+class _PoolTracer:
+    """统计连接池事件（httpcore trace 扩展）"""
+
+    def __init__(self, max_connections: int):
+        self.max_connections = max_connections
+        self.stats = PoolStats()
+        self._lock = threading.Lock()
+
+    def before_request(self, pool) -> dict:
+        """请求发起前检查连接池是否已满，返回本次请求的状态"""
+        connections = list(getattr(pool, 'connections', []))
+        busy = sum(1 for c in connections if not c.is_idle())
+        with self._lock:
+            self.stats.requests += 1
+            if self.max_connections and busy >= self.max_connections:
+                self.stats.waited += 1
+        return {'opened': False}
+
+    def trace(self, state: dict):
+        """生成 httpcore trace 回调：建立 TCP 连接时计为新建连接"""
+        def callback(event: str, info: dict):
+            if event == 'connection.connect_tcp.complete':
+                state['opened'] = True
+                with self._lock:
+                    self.stats.opened += 1
+        return callback
+
+    def after_request(self, state: dict):
+        if not state['opened']:
+            with self._lock:
+                self.stats.reused += 1
+
+
+if httpx is not None:
+    class PooledTransport(httpx.HTTPTransport):
+        """带统计的 httpx 传输层"""
+
+        def __init__(self, limits: 'httpx.Limits', **kwargs: Any):
+            super().__init__(limits=limits, **kwargs)
+            self.tracer = _PoolTracer(limits.max_connections or 0)
+
+        def handle_request(self, request: 'httpx.Request') -> 'httpx.Response':
+            state = self.tracer.before_request(self._pool)
+            outer = request.extensions.get('trace')
+            callback = self.tracer.trace(state)
+
+            def trace(event: str, info: dict):
+                callback(event, info)
+                if outer is not None:
+                    outer(event, info)
+
+            request.extensions['trace'] = trace
+            response = super().handle_request(request)
+            self.tracer.after_request(state)
+            return response
+
+        def stats(self) -> PoolStats:
+            with self.tracer._lock:
+                stats = PoolStats(**vars(self.tracer.stats))
+            stats.open = len(getattr(self._pool, 'connections', []))
+            return stats
+else:
+    PooledTransport = None
+
+
+def create_transport(max_connections: int = 16, max_keepalive: int = 8, keepalive_expiry: float = 30.0,
+                     http2: bool = False, retries: int = 0) -> Optional['PooledTransport']:
+    """
+    创建带连接池统计的传输层
+
+    Args:
+        max_connections: 最大并发连接数（0 表示不限制）
+        max_keepalive: 最多保留的空闲 keep-alive 连接数
+        keepalive_expiry: 空闲连接保留时间（秒）
+        http2: 启用 HTTP/2（需要安装 httpx[http2]，未安装时退回 HTTP/1.1）
+        retries: 建立连接失败时的重试次数
+
+    Returns:
+        传输层，未安装 httpx 时返回 None
+    """
+    if httpx is None:
+        return None
+    limits = httpx.Limits(
+        max_connections=max_connections or None,
+        max_keepalive_connections=max_keepalive,
+        keepalive_expiry=keepalive_expiry,
+    )
+    return PooledTransport(limits=limits, http2=http2 and _http2_available, retries=retries)
+
+
+def http2_available() -> bool:
+    return _http2_available
+
+
+def create_timeout(connect: float = 10.0, read: float = 60.0) -> Optional['httpx.Timeout']:
+    """连接 / 读取超时（写入与等待连接池沿用读取超时），0 表示不限制"""
+    if httpx is None:
+        return None
+    read = read or None
+    return httpx.Timeout(read, connect=connect or None)
@@ -0,0 +1,146 @@
+"""
+书库快照
+保存上一次完整扫描的结果（路径、大小、修改时间、ETag），下次扫描时：
+- 只报告新增或修改过的书籍（差异模式）
+- 开启沿用时，ETag 未变化的文件夹直接沿用快照中的子树，不再发起 PROPFIND
+  （只适用于会把子项变化传播到父文件夹 ETag 的服务器；Apache mod_dav、nginx、rclone serve 等不会）
+"""
+
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterator, Optional
+
+
+SNAPSHOT_VERSION = 1
+
+STATUS_NEW = 'new'
+STATUS_CHANGED = 'changed'
+STATUS_UNCHANGED = 'unchanged'
+
+
+def snapshot_path(snapshot_dir: str, server_url: str, root: str) -> str:
+    """快照文件路径：每个服务器 + 源路径一个文件"""
+    digest = hashlib.sha256(f"{server_url.rstrip('/')}|{root}".encode('utf-8')).hexdigest()[:16]
+    return os.path.join(os.path.expanduser(snapshot_dir), f"{digest}.json")
+
+
+@dataclass
+class SnapshotEntry:
+    """快照中的一个文件或文件夹"""
+    is_dir: bool
+    size: int = 0
+    modified: Optional[str] = None  # ISO 格式
+    etag: Optional[str] = None
+
+    def same_as(self, other: 'SnapshotEntry') -> bool:
+        """
+        是否未变化：优先比较 ETag；文件在服务器不提供 ETag 时比较修改时间与大小，
+        文件夹只认 ETag（修改时间通常不随深层子项变化）
+        """
+        if self.etag and other.etag:
+            return self.etag == other.etag
+        if self.is_dir or not self.modified or not other.modified:
+            return False
+        return self.modified == other.modified and self.size == other.size
+
+
+@dataclass
+class ScanDiff:
+    """与上次快照相比的变化统计"""
+    new: int = 0
+    changed: int = 0
+    unchanged: int = 0
+    removed: int = 0
+    skipped_dirs: int = 0   # 未变化、沿用快照的文件夹数
+    listed_dirs: int = 0    # 实际发起 PROPFIND 的文件夹数
+    complete: bool = False  # 是否完成了完整扫描（未完成时不更新快照）
+
+
+@dataclass
+class LibrarySnapshot:
+    """
+    一个源路径的书库快照（只记录文件夹与电子书文件）
+
+    options 记录扫描参数（层数、包含 / 排除模式），参数变化后旧快照中的子树不完整，不再沿用；
+    reuse_dirs 需显式开启（确认服务器会向上传播子项变化），否则每个文件夹都重新列出
+    """
+    path: Path
+    root: str
+    options: dict = field(default_factory=dict)
+    entries: dict = field(default_factory=dict)   # 路径 -> SnapshotEntry
+    reuse_dirs: bool = False  # 是否可沿用未变化文件夹的子树
+    diff: ScanDiff = field(default_factory=ScanDiff)
+    _scanned: dict = field(default_factory=dict, repr=False)
+    _children: Optional[dict] = field(default=None, repr=False)
+
+    @classmethod
+    def load(cls, path: str, root: str, options: dict, reuse_dirs: bool = False) -> 'LibrarySnapshot':
+        """加载快照文件；不存在、版本或源路径不一致时返回空快照"""
+        snapshot = cls(Path(os.path.expanduser(path)), root, options)
+        try:
+            data = json.loads(snapshot.path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return snapshot
+
+        if data.get('version') != SNAPSHOT_VERSION or data.get('root') != root:
+            return snapshot
+        snapshot.entries = {
+            p: SnapshotEntry(bool(is_dir), size, modified, etag)
+            for p, (is_dir, size, modified, etag) in data.get('entries', {}).items()
+        }
+        # 扫描参数变化时只用于文件级比较，不沿用文件夹子树
+        snapshot.reuse_dirs = reuse_dirs and data.get('options') == options
+        return snapshot
+
+    def classify(self, path: str, entry: SnapshotEntry) -> str:
+        """记录本次扫描到的条目，返回它相对上次快照的状态"""
+        self._scanned[path] = entry
+        old = self.entries.get(path)
+        if old is None:
+            status = STATUS_NEW
+        elif old.same_as(entry):
+            status = STATUS_UNCHANGED
+        else:
+            status = STATUS_CHANGED
+        if not entry.is_dir:
+            setattr(self.diff, status, getattr(self.diff, status) + 1)
+        return status
+
+    def subtree(self, folder: str) -> Iterator[tuple[str, SnapshotEntry]]:
+        """上次快照中某个文件夹下的全部条目（按层级展开）"""
+        if self._children is None:
+            self._children = {}
+            for p in self.entries:
+                self._children.setdefault(p.rsplit('/', 1)[0], []).append(p)
+
+        stack = [folder]
+        while stack:
+            for child in self._children.get(stack.pop(), []):
+                entry = self.entries[child]
+                yield child, entry
+                if entry.is_dir:
+                    stack.append(child)
+
+    def commit(self):
+        """完整扫描结束后保存本次结果（先写临时文件再替换，中断不会留下损坏的快照）"""
+        self.diff.complete = True
+        self.diff.removed = sum(
+            1 for p, e in self.entries.items() if not e.is_dir and p not in self._scanned
+        )
+        self.entries, self._scanned, self._children = self._scanned, {}, None
+
+        data = {
+            'version': SNAPSHOT_VERSION,
+            'root': self.root,
+            'options': self.options,
+            'entries': {
+                p: [e.is_dir, e.size, e.modified, e.etag] for p, e in self.entries.items()
+            },
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(self.path.suffix + '.tmp')
+        tmp.write_text(json.dumps(data, ensure_ascii=False, separators=(',', ':')), encoding='utf-8')
+        os.replace(tmp, self.path)
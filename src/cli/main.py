@@ -11,6 +11,7 @@ Usage:
 import argparse
 import sys
 import os
+import time
 from pathlib import Path
 
 # 添加项目根目录到 Python 路径
@@ -65,6 +66,10 @@ Examples:
         epilog="""
 Examples:
     python -m src.cli.main batch -c config.yaml
+
+    # 录制一次真实运行，之后离线回放（耗时缩放为 0.1 倍）
+    python -m src.cli.main batch -c config.yaml --record run.cassette.gz
+    python -m src.cli.main batch -c config.yaml --replay run.cassette.gz --replay-speed 0.1
         """
     )
     batch_parser.add_argument(
@@ -77,6 +82,119 @@ Examples:
         action='store_true',
         help='试运行模式，不实际执行处理'
     )
+    batch_parser.add_argument(
+        '--changed-only',
+        action='store_true',
+        help='只处理相对上次扫描新增或修改过的书籍（需要书库快照）'
+    )
+    cassette_group = batch_parser.add_mutually_exclusive_group()
+    cassette_group.add_argument(
+        '--record',
+        metavar='CASSETTE',
+        help='录制 AI 与 WebDAV 流量到 cassette 文件（如 run.cassette.gz）'
+    )
+    cassette_group.add_argument(
+        '--replay',
+        metavar='CASSETTE',
+        help='从 cassette 文件回放，不访问网络'
+    )
+    batch_parser.add_argument(
+        '--replay-speed',
+        type=float,
+        default=1.0,
+        help='回放耗时缩放系数（1.0 为原始耗时，0 为不等待）'
+    )
+
+    # derive 命令
+    derive_parser = subparsers.add_parser(
+        'derive',
+        help='基于已有章节摘要派生思维导图、译文或新的全书总结',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+    # 从已有摘要生成综合思维导图
+    python -m src.cli.main derive -c config.yaml --mode combined-mindmap
+
+    # 将已有摘要翻译为英文并重写全书总结
+    python -m src.cli.main derive -c config.yaml --language en --translate
+        """
+    )
+    derive_parser.add_argument(
+        '-c', '--config',
+        required=True,
+        help='配置文件路径 (YAML 格式)'
+    )
+    derive_parser.add_argument(
+        '--mode',
+        choices=['summary', 'mindmap', 'combined-mindmap'],
+        help='目标处理模式（默认使用配置中的 processing.mode）'
+    )
+    derive_parser.add_argument(
+        '--language',
+        help='目标输出语言（默认使用配置中的 processing.outputLanguage）'
+    )
+    derive_parser.add_argument(
+        '--translate',
+        action='store_true',
+        help='将章节摘要翻译为目标语言'
+    )
+
+    # bench-pdf 命令
+    bench_parser = subparsers.add_parser(
+        'bench-pdf',
+        help='对比各 PDF 文本引擎的速度与输出相似度',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+    # 对比所有已安装引擎（相似度以 pypdf 输出为参照）
+    python -m src.cli.main bench-pdf samples/*.pdf
+
+    # 只对比指定引擎，每个文件最多 50 页
+    python -m src.cli.main bench-pdf samples/*.pdf --engines pypdf,pymupdf --pages 50
+        """
+    )
+    bench_parser.add_argument(
+        'files',
+        nargs='+',
+        help='样本 PDF 文件'
+    )
+    bench_parser.add_argument(
+        '--engines',
+        help='逗号分隔的引擎名称（默认所有已安装引擎）'
+    )
+    bench_parser.add_argument(
+        '--pages',
+        type=int,
+        default=0,
+        help='每个文件最多提取的页数（默认全部）'
+    )
+
+    # manifest 命令
+    manifest_parser = subparsers.add_parser(
+        'manifest',
+        help='管理 WebDAV 同步目录中的缓存清单',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+    # 从同步目录的完整列表重新生成缓存清单
+    python -m src.cli.main manifest rebuild -c config.yaml
+        """
+    )
+    manifest_parser.add_argument(
+        'action',
+        choices=['rebuild'],
+        help='rebuild: 列出同步目录并覆盖写入缓存清单'
+    )
+    manifest_parser.add_argument(
+        '-c', '--config',
+        required=True,
+        help='配置文件路径 (YAML 格式)'
+    )
+    manifest_parser.add_argument(
+        '--no-metadata',
+        action='store_true',
+        help='不读取各书的 .meta.json（更快，但清单中缺少模型与 Prompt 版本）'
+    )
 
     # version 命令
     version_parser = subparsers.add_parser(
@@ -122,6 +240,8 @@ def cmd_batch(args: argparse.Namespace) -> int:
         print(f"   - WebDAV: {config.webdav.serverUrl}")
         print(f"   - 源路径: {config.batch.sourcePath}")
         print(f"   - 跳过已处理: {config.batch.skipProcessed}")
+        if args.changed_only:
+            config.batch.changedOnly = True
 
         # 试运行模式
         if args.dry_run:
@@ -132,7 +252,13 @@ def cmd_batch(args: argparse.Namespace) -> int:
 
         # 初始化批量处理器
         print("\n🚀 初始化批量处理器...")
-        processor = BatchProcessor(config, logger)
+        processor = BatchProcessor(
+            config,
+            logger,
+            record_path=args.record,
+            replay_path=args.replay,
+            replay_speed=args.replay_speed,
+        )
 
         # 执行批量处理
         print("\n⏳ 开始批量处理...")
@@ -160,6 +286,111 @@ def cmd_batch(args: argparse.Namespace) -> int:
         return 1
 
 
+def cmd_derive(args: argparse.Namespace) -> int:
+    """执行派生命令"""
+    from .ai_client import create_ai_client, PromptTemplates
+    from .derivation import SummaryDeriver
+    from .webdav_client import WebDAVClientWrapper
+
+    if not os.path.exists(args.config):
+        print(f"❌ 配置文件不存在: {args.config}")
+        return 1
+
+    logger = Logger()
+    config = ConfigLoader(args.config).load()
+    if config is None:
+        print("❌ 配置加载失败")
+        return 1
+
+    mode = args.mode or config.processing.mode
+    language = args.language or config.processing.outputLanguage
+
+    ai_client = create_ai_client(config.ai, logger, PromptTemplates(prompt_config=config.prompts))
+    webdav = WebDAVClientWrapper(config.webdav, logger)
+    if config.webdav.serverUrl and not webdav.connect():
+        print("⚠️  WebDAV 连接失败，仅使用本地缓存")
+
+    try:
+        print(f"\n🔁 派生模式: {mode} / 语言: {language}{' / 翻译' if args.translate else ''}")
+        result = SummaryDeriver(config, logger, ai_client, webdav).run(mode, language, args.translate)
+    except KeyboardInterrupt:
+        print("\n⚠️ 用户中断处理")
+        return 130
+    finally:
+        webdav.disconnect()
+
+    print("\n" + "=" * 50)
+    print(f"   总数: {result.total}")
+    print(f"   成功: {result.success}")
+    print(f"   失败: {result.failed}")
+    print(f"   总费用: ${result.total_cost_usd:.5f} / ¥{result.total_cost_cny:.5f}")
+    print("=" * 50)
+
+    return 0 if result.failed == 0 else 1
+
+
+def cmd_bench_pdf(args: argparse.Namespace) -> int:
+    """执行 PDF 文本引擎基准命令"""
+    from .pdf_engines import available_engines, benchmark_engines
+
+    files = [f for f in args.files if os.path.exists(f)]
+    for missing in set(args.files) - set(files):
+        print(f"⚠️  文件不存在: {missing}")
+    if not files:
+        print("❌ 没有可用的样本文件")
+        return 1
+
+    engines = [e.strip() for e in args.engines.split(',') if e.strip()] if args.engines else None
+    print(f"📊 已安装引擎: {', '.join(available_engines())}")
+    print(f"📚 样本: {len(files)} 个文件{f'，每个最多 {args.pages} 页' if args.pages else ''}\n")
+
+    results = benchmark_engines(files, engines, args.pages)
+
+    print(f"{'引擎':<12}{'页数':>8}{'耗时(s)':>10}{'页/秒':>10}{'相似度':>10}")
+    for result in sorted(results, key=lambda r: r.pages_per_sec, reverse=True):
+        print(
+            f"{result.engine:<12}{result.pages:>8}{result.seconds:>10.2f}"
+            f"{result.pages_per_sec:>10.1f}{result.similarity:>10.3f}"
+        )
+        for error in result.errors:
+            print(f"   ⚠️  {error}")
+
+    return 0
+
+
+def cmd_manifest(args: argparse.Namespace) -> int:
+    """执行缓存清单命令"""
+    from .webdav_client import WebDAVClientWrapper
+
+    if not os.path.exists(args.config):
+        print(f"❌ 配置文件不存在: {args.config}")
+        return 1
+
+    logger = Logger()
+    config = ConfigLoader(args.config).load()
+    if config is None:
+        print("❌ 配置加载失败")
+        return 1
+
+    webdav = WebDAVClientWrapper(config.webdav, logger)
+    if not webdav.connect():
+        print("❌ WebDAV 连接失败")
+        return 1
+
+    try:
+        print(f"📋 正在列出同步目录: {config.webdav.syncPath}")
+        start = time.time()
+        manifest = webdav.rebuild_manifest(fetch_metadata=not args.no_metadata)
+    except Exception as e:
+        print(f"❌ 重建缓存清单失败: {e}")
+        return 1
+    finally:
+        webdav.disconnect()
+
+    print(f"✅ 缓存清单已重建: {len(manifest.entries)} 本书，耗时 {time.time() - start:.1f}s")
+    return 0
+
+
 def cmd_version() -> int:
     """显示版本信息"""
     from . import __version__
@@ -178,6 +409,12 @@ def main():
 
     if args.command == 'batch':
         return cmd_batch(args)
+    elif args.command == 'derive':
+        return cmd_derive(args)
+    elif args.command == 'bench-pdf':
+        return cmd_bench_pdf(args)
+    elif args.command == 'manifest':
+        return cmd_manifest(args)
     elif args.command == 'version':
         return cmd_version()
     else:
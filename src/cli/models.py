@@ -65,6 +65,7 @@ class ProcessingResult:
     success: bool
     book_name: str
     error: Optional[str] = None
+    error_kind: Optional[str] = None  # 提取失败类型：timeout / memory / parse / crash
     metadata: Optional[dict] = None
     content: Optional[str] = None
     cost_usd: float = 0.0
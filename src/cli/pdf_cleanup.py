@@ -0,0 +1,210 @@
+"""
+PDF 页眉页脚清理
+识别每页首尾重复出现的行（页眉、页脚、页码），在分章之前去除，避免重复内容被成百上千次发送给模型
+"""
+
+import re
+from collections import deque
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Optional
+
+
+_DIGITS = re.compile(r'\d+')
+_EDGE_DIGITS = re.compile(r'^\d+|\d+$')
+_ROMAN = re.compile(r'(?=[ivxlcdm])m{0,3}(?:cm|cd|d?c{0,3})(?:xc|xl|l?x{0,3})(?:ix|iv|v?i{0,3})')
+# 归一化后的页码行：# / - # - / page # / p. # of # / 第 # 页 / # / #
+_PAGE_NUMBER = re.compile(
+    r'^(?:[\W_]*#[\W_]*'
+    r'|(?:page|p\.?)\s*#(?:\s*(?:of|/)\s*#)?'
+    r'|第\s*#\s*页(?:\s*[/,，]?\s*共\s*#\s*页)?'
+    r'|#\s*/\s*#)$'
+)
+_ROMAN_VALUES = {'i': 1, 'v': 5, 'x': 10, 'l': 50, 'c': 100, 'd': 500, 'm': 1000}
+
+
+def _roman_value(numeral: str) -> int:
+    """罗马数字的值（调用方保证格式合法）"""
+    total = 0
+    for i, char in enumerate(numeral):
+        value = _ROMAN_VALUES[char]
+        if i + 1 < len(numeral) and value < _ROMAN_VALUES[numeral[i + 1]]:
+            total -= value
+        else:
+            total += value
+    return total
+
+
+@dataclass
+class NoiseStats:
+    """清理掉的噪声统计（页眉页脚、脚注等）"""
+    lines: int = 0
+    chars: int = 0
+
+    @property
+    def tokens(self) -> int:
+        """估算节省的 token 数（与 AIClient 的估算方式一致）"""
+        return self.chars // 2
+
+
+@dataclass
+class _LineStat:
+    """行的出现统计"""
+    count: int
+    first: int           # 首次出现的页下标
+    last: int            # 最近出现的页下标
+    offset: int = 0      # 最近一次出现时 行首行尾数字 - 页下标
+    aligned: int = 0     # 与上次出现的 offset 相同的次数（数字随页码递增）
+
+    def is_dense(self, min_repeats: int, min_density: float) -> bool:
+        return self.count >= min_repeats and self.count / (self.last - self.first + 1) >= min_density
+
+
+class RunningLineDetector:
+    """
+    页眉页脚检测器
+
+    统计每页开头和结尾几行的出现情况，出现次数足够多、且在出现区间内足够密集的行判定为页眉页脚：
+
+    - 原文相同的行（书名、章节名页眉）：章节内的页眉只在该章节的页面上密集出现
+    - 行首行尾数字替换为 # 后相同、且数字随页码同步递增的行（"12  书名"、"章节名  13"）
+    - 单独的页码行（"12"、"- 12 -"、"xiv"）：同一格式、页码与页下标之差相同的行密集出现
+
+    各章的真实标题（"Chapter 1"、"Chapter 2" ...）原文各不相同，编号也不随页码递增，不会被误删；
+    只出现一次的数字或单词（年份、章节编号、"mix" 这类形似罗马数字的词）也不会被当作页码
+    """
+
+    EDGE_LINES = 2      # 每页检查的首尾行数
+    MIN_REPEATS = 3     # 最少出现页数
+    MIN_DENSITY = 0.4   # 出现页数 / 出现区间页数（奇偶页交替的页眉约为 0.5）
+    MIN_ALIGNED = 0.8   # 数字随页码递增的出现比例
+
+    def __init__(self, stats: NoiseStats = None):
+        self.stats = stats if stats is not None else NoiseStats()
+        self._lines: dict[str, _LineStat] = {}
+        self._numbered: dict[str, _LineStat] = {}
+        self._page_numbers: dict[tuple[str, int], _LineStat] = {}  # (页码格式, 页码 - 页下标)
+
+    @staticmethod
+    def normalize(line: str) -> str:
+        """归一化：忽略大小写与多余空白"""
+        return ' '.join(line.lower().split())
+
+    @staticmethod
+    def numbered_key(key: str) -> Optional[tuple[str, int]]:
+        """行首或行尾带数字时返回（数字替换为 # 的行, 数字），否则返回 None"""
+        match = _EDGE_DIGITS.search(key)
+        if match is None:
+            return None
+        return key[:match.start()] + '#' + key[match.end():], int(match.group())
+
+    @staticmethod
+    def page_number_key(key: str) -> Optional[tuple[str, int]]:
+        """
+        形如单独页码的行（"12"、"- 12 -"、"Page 3 of 300"、"第 12 页"、"xiv" 等）返回（页码格式, 页码），否则返回 None
+        """
+        shape = _DIGITS.sub('#', key)
+        if shape != key and _PAGE_NUMBER.match(shape):
+            return shape, int(_DIGITS.search(key).group())
+        if key and _ROMAN.fullmatch(key):
+            return 'roman', _roman_value(key)
+        return None
+
+    def _edges(self, lines: list[str]) -> set[int]:
+        """首尾 EDGE_LINES 个非空行的下标"""
+        indexes = [i for i, line in enumerate(lines) if line.strip()]
+        return set(indexes[:self.EDGE_LINES] + indexes[-self.EDGE_LINES:])
+
+    def observe(self, page: int, text: str):
+        """记录一页的首尾行"""
+        lines = text.split('\n')
+        for key in {self.normalize(lines[i]) for i in self._edges(lines)}:
+            page_number = self.page_number_key(key)
+            if page_number is not None:
+                shape, number = page_number
+                stat = self._page_numbers.get((shape, number - page))
+                if stat is None:
+                    self._page_numbers[(shape, number - page)] = _LineStat(count=1, first=page, last=page)
+                else:
+                    stat.count += 1
+                    stat.last = page
+                continue
+
+            stat = self._lines.get(key)
+            if stat is None:
+                self._lines[key] = _LineStat(count=1, first=page, last=page)
+            else:
+                stat.count += 1
+                stat.last = page
+
+            numbered = self.numbered_key(key)
+            if numbered is None:
+                continue
+            key, number = numbered
+            stat = self._numbered.get(key)
+            if stat is None:
+                self._numbered[key] = _LineStat(count=1, first=page, last=page, offset=number - page, aligned=1)
+            else:
+                stat.count += 1
+                stat.last = page
+                stat.aligned += stat.offset == number - page
+                stat.offset = number - page
+
+    def is_noise(self, line: str, page: int) -> bool:
+        """第 page 页的首尾行是否为页码或页眉页脚（页码须与其他页的页码同步递增）"""
+        key = self.normalize(line)
+        page_number = self.page_number_key(key)
+        if page_number is not None:
+            shape, number = page_number
+            stat = self._page_numbers.get((shape, number - page))
+            return stat is not None and stat.is_dense(self.MIN_REPEATS, self.MIN_DENSITY)
+
+        stat = self._lines.get(key)
+        if stat is not None and stat.is_dense(self.MIN_REPEATS, self.MIN_DENSITY):
+            return True
+
+        numbered = self.numbered_key(key)
+        if numbered is None:
+            return False
+        stat = self._numbered.get(numbered[0])
+        return (stat is not None
+                and stat.is_dense(self.MIN_REPEATS, self.MIN_DENSITY)
+                and stat.aligned >= stat.count * self.MIN_ALIGNED)
+
+    def strip(self, text: str, page: int) -> str:
+        """去除第 page 页首尾的页眉页脚行"""
+        lines = text.split('\n')
+        removed = {i for i in self._edges(lines) if self.is_noise(lines[i], page)}
+        if not removed:
+            return text
+
+        self.stats.lines += len(removed)
+        self.stats.chars += sum(len(lines[i].strip()) for i in removed)
+        return '\n'.join(line for i, line in enumerate(lines) if i not in removed)
+
+    def strip_pages(self, pages: Iterable[tuple[int, str]], lookahead: int) -> Iterator[tuple[int, str]]:
+        """
+        逐页检测并去除页眉页脚
+
+        每页在其后 lookahead 页都被统计过之后才输出，内存中最多保留 lookahead 页
+
+        Args:
+            pages: (页下标, 文本)
+            lookahead: 前瞻页数
+        """
+        buffer = deque()
+        for page, text in pages:
+            self.observe(page, text)
+            buffer.append((page, text))
+            if len(buffer) > lookahead:
+                page, text = buffer.popleft()
+                yield page, self.strip(text, page)
+
+        while buffer:
+            page, text = buffer.popleft()
+            yield page, self.strip(text, page)
+
+
+def strip_running_lines(texts: list[str], stats: NoiseStats = None) -> list[str]:
+    """去除整本书的页眉页脚（统计全部页面后再清理）"""
+    detector = RunningLineDetector(stats)
+    return [text for _, text in detector.strip_pages(enumerate(texts), lookahead=len(texts))]
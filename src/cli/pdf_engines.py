@@ -0,0 +1,303 @@
+"""
+PDF 文本引擎
+PDFExtractor 通过 PDFTextEngine 接口提取页面文本：pypdf 为默认引擎，
+PyMuPDF / pypdfium2 / pdfminer.six 等可选后端在导入时自动检测
+"""
+
+import io
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from difflib import SequenceMatcher
+from typing import Any, BinaryIO, Optional, Union
+
+from pypdf import PdfReader
+
+try:
+    import pymupdf as fitz  # PyMuPDF >= 1.24
+except ImportError:
+    try:
+        import fitz
+    except ImportError:
+        fitz = None
+
+try:
+    import pypdfium2 as pdfium
+except ImportError:
+    pdfium = None
+
+try:
+    from pdfminer.converter import TextConverter
+    from pdfminer.layout import LAParams
+    from pdfminer.pdfdocument import PDFDocument
+    from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+    from pdfminer.pdfpage import PDFPage
+    from pdfminer.pdfparser import PDFParser
+    PDFMINER_AVAILABLE = True
+except ImportError:
+    PDFMINER_AVAILABLE = False
+
+
+DEFAULT_ENGINE = 'pypdf'
+
+
+class PDFTextEngine(ABC):
+    """PDF 文本引擎接口（open 接受路径或文件对象，返回的文档对象只在同一进程内使用）"""
+
+    name = ''
+
+    @classmethod
+    def available(cls) -> bool:
+        """依赖是否已安装"""
+        return True
+
+    @abstractmethod
+    def open(self, file_path: Union[str, BinaryIO]) -> Any:
+        """打开文档"""
+        pass
+
+    @abstractmethod
+    def page_count(self, document: Any) -> int:
+        """页数"""
+        pass
+
+    @abstractmethod
+    def page_text(self, document: Any, index: int) -> str:
+        """提取单页文本"""
+        pass
+
+    def close(self, document: Any):
+        """关闭文档"""
+        pass
+
+
+class PypdfEngine(PDFTextEngine):
+    """pypdf（纯 Python，默认）"""
+
+    name = 'pypdf'
+
+    def open(self, file_path: Union[str, BinaryIO]) -> PdfReader:
+        return PdfReader(file_path)
+
+    def page_count(self, document: PdfReader) -> int:
+        return len(document.pages)
+
+    def page_text(self, document: PdfReader, index: int) -> str:
+        return document.pages[index].extract_text() or ""
+
+
+class PyMuPDFEngine(PDFTextEngine):
+    """PyMuPDF（MuPDF，C 实现）"""
+
+    name = 'pymupdf'
+
+    @classmethod
+    def available(cls) -> bool:
+        return fitz is not None
+
+    def open(self, file_path: Union[str, BinaryIO]):
+        if isinstance(file_path, str):
+            return fitz.open(file_path)
+        # 内存中的来源直接共享缓冲区，不再复制整本书
+        if isinstance(file_path, io.BytesIO):
+            return fitz.open(stream=file_path.getbuffer(), filetype='pdf')
+        return fitz.open(stream=file_path.read(), filetype='pdf')
+
+    def page_count(self, document) -> int:
+        return document.page_count
+
+    def page_text(self, document, index: int) -> str:
+        return document.load_page(index).get_text() or ""
+
+    def close(self, document):
+        document.close()
+
+
+class PdfiumEngine(PDFTextEngine):
+    """pypdfium2（PDFium，C++ 实现）"""
+
+    name = 'pypdfium2'
+
+    @classmethod
+    def available(cls) -> bool:
+        return pdfium is not None
+
+    def open(self, file_path: Union[str, BinaryIO]):
+        return pdfium.PdfDocument(file_path)
+
+    def page_count(self, document) -> int:
+        return len(document)
+
+    def page_text(self, document, index: int) -> str:
+        page = document[index]
+        textpage = page.get_textpage()
+        try:
+            return textpage.get_text_range() or ""
+        finally:
+            textpage.close()
+            page.close()
+
+    def close(self, document):
+        document.close()
+
+
+class PdfminerEngine(PDFTextEngine):
+    """pdfminer.six（纯 Python，版面分析更完整）"""
+
+    name = 'pdfminer'
+
+    @classmethod
+    def available(cls) -> bool:
+        return PDFMINER_AVAILABLE
+
+    def open(self, file_path: Union[str, BinaryIO]):
+        # 只关闭自己打开的文件，调用方传入的文件对象由调用方管理
+        owned = isinstance(file_path, str)
+        f = open(file_path, 'rb') if owned else file_path
+        try:
+            pages = list(PDFPage.create_pages(PDFDocument(PDFParser(f))))
+        except Exception:
+            if owned:
+                f.close()
+            raise
+        return f, pages, owned
+
+    def page_count(self, document) -> int:
+        return len(document[1])
+
+    def page_text(self, document, index: int) -> str:
+        manager = PDFResourceManager()
+        output = io.StringIO()
+        device = TextConverter(manager, output, laparams=LAParams())
+        try:
+            PDFPageInterpreter(manager, device).process_page(document[1][index])
+        finally:
+            device.close()
+        return output.getvalue()
+
+    def close(self, document):
+        if document[2]:
+            document[0].close()
+
+
+# 按速度从快到慢排列，auto 选择第一个可用的引擎
+ENGINES: dict[str, type[PDFTextEngine]] = {
+    engine.name: engine for engine in (PyMuPDFEngine, PdfiumEngine, PdfminerEngine, PypdfEngine)
+}
+
+
+def available_engines() -> list[str]:
+    """已安装的引擎名称（按速度排序）"""
+    return [name for name, engine in ENGINES.items() if engine.available()]
+
+
+def get_engine(name: str = DEFAULT_ENGINE) -> PDFTextEngine:
+    """
+    获取引擎实例
+
+    Args:
+        name: 引擎名称，auto 表示选择最快的可用引擎
+    """
+    if name == 'auto':
+        name = available_engines()[0]
+    engine = ENGINES.get(name)
+    if engine is None:
+        raise ValueError(f"未知的 PDF 文本引擎: {name}（可选: auto, {', '.join(ENGINES)}）")
+    if not engine.available():
+        raise ValueError(f"PDF 文本引擎 {name} 未安装")
+    return engine()
+
+
+@dataclass
+class EngineBenchmark:
+    """单个引擎的基准结果"""
+    engine: str
+    pages: int = 0
+    seconds: float = 0.0
+    similarity: float = 1.0  # 与 pypdf 输出的平均相似度
+    errors: list[str] = field(default_factory=list)
+
+    @property
+    def pages_per_sec(self) -> float:
+        return self.pages / self.seconds if self.seconds > 0 else 0.0
+
+
+def text_similarity(a: str, b: str) -> float:
+    """忽略空白差异的文本相似度（0~1）"""
+    a = ''.join(a.split())
+    b = ''.join(b.split())
+    if not a and not b:
+        return 1.0
+    return SequenceMatcher(None, a, b, autojunk=False).ratio()
+
+
+def _extract_sample(engine: PDFTextEngine, file_path: str, max_pages: int) -> tuple[list[str], float]:
+    """提取样本页面，返回（页面文本, 耗时）"""
+    start = time.perf_counter()
+    document = engine.open(file_path)
+    try:
+        count = engine.page_count(document)
+        if max_pages > 0:
+            count = min(count, max_pages)
+        texts = [engine.page_text(document, i) for i in range(count)]
+    finally:
+        engine.close(document)
+    return texts, time.perf_counter() - start
+
+
+def benchmark_engines(files: list[str], engines: Optional[list[str]] = None,
+                      max_pages: int = 0) -> list[EngineBenchmark]:
+    """
+    在样本文件上对比各引擎的速度与输出相似度
+
+    Args:
+        files: 样本 PDF 路径
+        engines: 参与对比的引擎，默认所有已安装引擎
+        max_pages: 每个文件最多提取的页数，0 表示全部
+
+    Returns:
+        每个引擎的 EngineBenchmark（similarity 以 pypdf 输出为参照）
+    """
+    names = engines or available_engines()
+    reference_engine = get_engine(DEFAULT_ENGINE)
+    references = {}
+    for file_path in files:
+        try:
+            references[file_path] = _extract_sample(reference_engine, file_path, max_pages)
+        except Exception:
+            references[file_path] = None
+
+    results = []
+    for name in names:
+        result = EngineBenchmark(engine=name)
+        try:
+            engine = get_engine(name)
+        except ValueError as e:
+            result.errors.append(str(e))
+            results.append(result)
+            continue
+
+        scores = []
+        for file_path in files:
+            reference = references[file_path]
+            try:
+                if name == DEFAULT_ENGINE and reference is not None:
+                    texts, seconds = reference
+                else:
+                    texts, seconds = _extract_sample(engine, file_path, max_pages)
+            except Exception as e:
+                result.errors.append(f"{file_path}: {type(e).__name__}: {e}")
+                continue
+
+            result.pages += len(texts)
+            result.seconds += seconds
+            if reference is not None:
+                scores.extend(
+                    text_similarity(text, ref_text)
+                    for text, ref_text in zip(texts, reference[0])
+                )
+
+        result.similarity = sum(scores) / len(scores) if scores else 0.0
+        results.append(result)
+
+    return results
@@ -0,0 +1,138 @@
+"""
+Prompt 模板编译器
+将 {{placeholder}} 模板预先解析为片段列表，渲染时只做一次 join，
+避免对整章内容反复 str.replace / f-string 拼接产生多份拷贝
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+
+PLACEHOLDER_PATTERN = re.compile(r'\{\{\s*([A-Za-z_][A-Za-z0-9_]*)\s*\}\}')
+
+# 各类 Prompt 允许使用的占位符（与调用方实际传入的变量保持一致）
+PROMPT_PLACEHOLDERS = {
+    'chapterSummary': frozenset({'title', 'content'}),
+    'mindmap': frozenset({'title', 'content'}),
+    'connectionAnalysis': frozenset({'chapterSummaries'}),
+    'overallSummary': frozenset({'bookTitle', 'chapterInfo', 'connections'}),
+}
+
+# 各类 Prompt 必须包含的占位符：缺少时不会把章节内容发送给模型
+# （思维导图 Prompt 与前端一致，可以只写指令，章节内容附加在模板之后）
+PROMPT_REQUIRED = {
+    'chapterSummary': frozenset({'content'}),
+    'connectionAnalysis': frozenset({'chapterSummaries'}),
+    'overallSummary': frozenset({'chapterInfo'}),
+}
+
+
+class PromptTemplateError(ValueError):
+    """Prompt 模板错误（未知或缺少必需的占位符，或渲染时缺少变量）"""
+    pass
+
+
+@dataclass(frozen=True)
+class CompiledPrompt:
+    """
+    预编译的 Prompt 模板
+
+    segments 中偶数位为字面量文本，奇数位为占位符名称，
+    例如 "A{{x}}B" -> ("A", "x", "B")
+    """
+    source: str
+    segments: tuple
+
+    @property
+    def placeholders(self) -> frozenset:
+        """模板中出现的占位符集合"""
+        return frozenset(self.segments[1::2])
+
+    def render(self, prefix: str = '', strict: bool = True, **values) -> str:
+        """
+        渲染模板（单次 join）
+
+        Args:
+            prefix: 可选前缀（如语言指令），与正文之间以空行分隔
+            strict: 为 True 时缺少变量抛出 PromptTemplateError，
+                    为 False 时保留原占位符文本
+            **values: 占位符取值
+
+        Returns:
+            渲染后的 Prompt
+        """
+        parts = [prefix, '\n\n'] if prefix else []
+        segments = self.segments
+        for i, segment in enumerate(segments):
+            if i % 2 == 0:
+                if segment:
+                    parts.append(segment)
+                continue
+
+            value = values.get(segment)
+            if value is None:
+                if strict:
+                    raise PromptTemplateError(f"缺少 Prompt 变量: {segment}")
+                value = f'{{{{{segment}}}}}'
+            elif not isinstance(value, str):
+                value = str(value)
+            parts.append(value)
+
+        return ''.join(parts)
+
+
+def compile_prompt(template: str, allowed: Optional[frozenset] = None, name: str = '',
+                   required: frozenset = frozenset()) -> CompiledPrompt:
+    """
+    将模板解析为片段列表
+
+    Args:
+        template: 模板字符串
+        allowed: 允许的占位符集合，为 None 时不校验
+        name: 模板名称（用于错误信息）
+        required: 必须出现的占位符集合
+
+    Returns:
+        CompiledPrompt
+
+    Raises:
+        PromptTemplateError: 模板包含未知占位符或缺少必需的占位符
+    """
+    segments = []
+    last = 0
+    for match in PLACEHOLDER_PATTERN.finditer(template):
+        segments.append(template[last:match.start()])
+        segments.append(match.group(1))
+        last = match.end()
+    segments.append(template[last:])
+
+    compiled = CompiledPrompt(source=template, segments=tuple(segments))
+
+    label = f"{name} " if name else ''
+    if allowed is not None:
+        unknown = compiled.placeholders - allowed
+        if unknown:
+            raise PromptTemplateError(
+                f"Prompt 模板 {label}包含未知占位符: "
+                f"{', '.join(sorted(unknown))}（可用: {', '.join(sorted(allowed))}）"
+            )
+
+    missing = required - compiled.placeholders
+    if missing:
+        raise PromptTemplateError(
+            f"Prompt 模板 {label}缺少必需的占位符: {', '.join('{{' + m + '}}' for m in sorted(missing))}"
+        )
+
+    return compiled
+
+
+def placeholders_for(prompt_type: str) -> Optional[frozenset]:
+    """根据 Prompt 类型（如 chapterSummary_fiction、mindmap_arrow）获取允许的占位符"""
+    base = prompt_type.split('_', 1)[0]
+    return PROMPT_PLACEHOLDERS.get(base)
+
+
+def required_for(prompt_type: str) -> frozenset:
+    """根据 Prompt 类型获取必须包含的占位符"""
+    return PROMPT_REQUIRED.get(prompt_type.split('_', 1)[0], frozenset())
@@ -0,0 +1,156 @@
+"""
+远程随机访问文件
+基于 HTTP Range 请求的只读文件对象：按块读取并缓存，顺序读取时自动扩大预读范围。
+EPUB（zip）的中央目录位于文件末尾，解析文本只需读取 OPF 与 XHTML 条目，图片等资源不会被下载
+"""
+
+import hashlib
+import io
+from collections import OrderedDict
+from typing import Callable, Optional
+
+
+class RangeNotSupportedError(Exception):
+    """服务器不支持 Range 请求"""
+    pass
+
+
+class RemoteFile(io.RawIOBase):
+    """
+    只读、可随机访问的远程文件
+
+    Args:
+        fetch: fetch(start, end) 返回 [start, end) 范围的字节
+        size: 文件大小
+        name: 远程路径
+        fingerprint: 远程文件标识（路径、大小、修改时间），用于提取缓存的键
+    """
+
+    BLOCK_SIZE = 64 * 1024
+    READ_AHEAD = 2          # 随机读取时一次请求的块数
+    MAX_READ_AHEAD = 32     # 顺序读取时预读块数的上限（每次连续命中后翻倍）
+    MAX_BLOCKS = 256        # 缓存的块数上限（LRU）
+
+    def __init__(self, fetch: Callable[[int, int], bytes], size: int, name: str = '',
+                 fingerprint: str = ''):
+        super().__init__()
+        self._fetch = fetch
+        self.size = size
+        self.name = name
+        self.fingerprint = fingerprint
+        self._position = 0
+        self._blocks: OrderedDict[int, bytes] = OrderedDict()
+        self._next_block = -1  # 上次请求结束的块下标，用于识别顺序读取
+        self._read_ahead = self.READ_AHEAD
+        self.requests = 0
+        self.bytes_fetched = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError(f"无效的 whence: {whence}")
+        if position < 0:
+            raise ValueError("不能定位到文件开头之前")
+        self._position = position
+        return position
+
+    def readinto(self, buffer) -> int:
+        view = memoryview(buffer).cast('B')
+        written = 0
+        while written < len(view) and self._position < self.size:
+            index, offset = divmod(self._position, self.BLOCK_SIZE)
+            block = self._block(index)
+            chunk = block[offset:offset + len(view) - written]
+            if not chunk:
+                break
+            view[written:written + len(chunk)] = chunk
+            written += len(chunk)
+            self._position += len(chunk)
+        return written
+
+    def _block(self, index: int) -> bytes:
+        """读取一个块（未缓存时连同后续未缓存的块一次请求）"""
+        block = self._blocks.get(index)
+        if block is not None:
+            self._blocks.move_to_end(index)
+            return block
+
+        # 顺序读取时加倍预读，随机跳转时恢复默认
+        if index == self._next_block:
+            self._read_ahead = min(self._read_ahead * 2, self.MAX_READ_AHEAD, self.MAX_BLOCKS)
+        else:
+            self._read_ahead = self.READ_AHEAD
+
+        last_block = (self.size - 1) // self.BLOCK_SIZE
+        end_index = index + 1
+        while end_index < min(index + self._read_ahead, last_block + 1) and end_index not in self._blocks:
+            end_index += 1
+
+        start = index * self.BLOCK_SIZE
+        end = min(end_index * self.BLOCK_SIZE, self.size)
+        data = self._fetch(start, end)
+        if len(data) != end - start:
+            raise IOError(f"Range 请求返回 {len(data)} 字节，预期 {end - start} 字节")
+        self.requests += 1
+        self.bytes_fetched += len(data)
+        self._next_block = end_index
+
+        for i in range(index, end_index):
+            offset = (i - index) * self.BLOCK_SIZE
+            self._blocks[i] = data[offset:offset + self.BLOCK_SIZE]
+        while len(self._blocks) > self.MAX_BLOCKS:
+            self._blocks.popitem(last=False)
+        return data[:self.BLOCK_SIZE]
+
+    @property
+    def cache_id(self) -> str:
+        """提取缓存使用的标识（无法对远程内容计算哈希）"""
+        return hashlib.sha256(f"remote:{self.fingerprint or self.name}:{self.size}".encode('utf-8')).hexdigest()
+
+
+def open_remote_file(webdav, remote_path: str, size: int = 0, modified: str = '') -> Optional[RemoteFile]:
+    """
+    打开远程文件（通过 webdav.read_range 读取）
+
+    先读取文件末尾的块（zip 中央目录所在位置）以确认服务器支持 Range 请求
+
+    Args:
+        webdav: 提供 read_range / get_file_info 的 WebDAV 客户端
+        size: 已知的文件大小，0 表示查询服务器
+        modified: 修改时间，作为缓存标识的一部分
+
+    Returns:
+        RemoteFile，文件大小未知或服务器不支持 Range 请求时返回 None
+    """
+    if size <= 0:
+        size = int(webdav.get_file_info(remote_path).get('size', 0) or 0)
+    if size <= 0:
+        return None
+
+    remote = RemoteFile(
+        lambda start, end: webdav.read_range(remote_path, start, end),
+        size,
+        name=remote_path,
+        fingerprint=f"{remote_path}:{size}:{modified}",
+    )
+    try:
+        remote.seek(-1, io.SEEK_END)
+        remote.read(1)
+    except RangeNotSupportedError:
+        return None
+    remote.seek(0)
+    return remote
@@ -0,0 +1,250 @@
+"""
+后台上传队列
+摘要与元数据的 WebDAV 上传交给独立的工作线程，AI 处理不再等待网络 I/O；
+待上传的文件先写入本地日志目录，上传成功（摘要还需写入缓存清单）后删除——失败或中途退出的任务在下次运行时继续上传；
+同一远程路径同时只有一个上传在进行，尚未开始的旧内容直接被新内容取代
+"""
+
+import dataclasses
+import hashlib
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from .cache_manifest import ManifestEntry
+from .logger import Logger
+
+
+# 重试间隔（秒）：按失败次数指数增长
+RETRY_BASE_DELAY = 5.0
+RETRY_MAX_DELAY = 300.0
+
+
+@dataclass
+class UploadJob:
+    """一个待上传的文件（manifest 为上传成功后写入缓存清单的 (书名, 记录)）"""
+    remote_path: str
+    content: str
+    manifest: Optional[tuple] = None
+    attempts: int = 0
+
+    @property
+    def job_id(self) -> str:
+        """同一远程路径只保留最新的一份内容"""
+        return hashlib.sha256(self.remote_path.encode('utf-8')).hexdigest()[:32]
+
+    @property
+    def digest(self) -> str:
+        return hashlib.sha256(self.content.encode('utf-8')).hexdigest()
+
+
+@dataclass
+class UploadStats:
+    """上传统计"""
+    uploaded: int = 0
+    retried: int = 0    # 失败后重新排队的次数
+    failed: int = 0     # 超过重试次数、留待下次运行的任务数
+    pending: int = 0    # 尚未完成（排队中或上传中）的任务数
+
+
+class UploadQueue:
+    """
+    带持久化重试的上传队列
+
+    journal_dir 为空时只在内存中排队（如回放模式），不跨运行保留
+    """
+
+    def __init__(self, webdav, logger: Logger, journal_dir: Optional[str] = None,
+                 workers: int = 2, max_retries: int = 5):
+        self.webdav = webdav
+        self.logger = logger
+        self.journal_dir = Path(os.path.expanduser(journal_dir)) if journal_dir else None
+        self.max_retries = max_retries
+        self._stats = UploadStats()
+        self._heap: list = []   # (可执行时间, 序号, 任务)
+        self._queued: dict = {}  # 远程路径 -> 排队中的堆条目（每个路径最多一个）
+        self._uploading: set[str] = set()  # 正在上传的远程路径
+        self._seq = itertools.count()
+        self._active = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._journal_lock = threading.Lock()
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"upload-{i}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def resume(self) -> int:
+        """重新排队上次运行未完成的上传，返回任务数"""
+        if self.journal_dir is None or not self.journal_dir.exists():
+            return 0
+        count = 0
+        for path in sorted(self.journal_dir.glob('*.json')):
+            try:
+                data = json.loads(path.read_text(encoding='utf-8'))
+                manifest = data.get('manifest')
+                job = UploadJob(data['remote_path'], data['content'],
+                                (manifest[0], ManifestEntry(**manifest[1])) if manifest else None)
+            except (OSError, ValueError, KeyError, TypeError):
+                self.logger.warning(f"跳过损坏的上传记录: {path.name}")
+                continue
+            self._push(job, 0.0)
+            count += 1
+        return count
+
+    def submit(self, remote_path: str, content: str, manifest: Optional[tuple[str, ManifestEntry]] = None):
+        """加入上传队列（先持久化，再交给工作线程）；manifest 为上传成功后写入缓存清单的 (书名, 记录)"""
+        job = UploadJob(remote_path, content, manifest)
+        self._write_journal(job)
+        self._push(job, 0.0)
+
+    def pending_names(self) -> set[str]:
+        """已持久化、尚未上传成功的文件名（用于跳过已处理的书籍；只读取文件名旁注，不解析上传内容）"""
+        if self.journal_dir is None or not self.journal_dir.exists():
+            return set()
+        names = set()
+        for path in self.journal_dir.glob('*.json'):
+            try:
+                names.add(path.with_suffix('.name').read_text(encoding='utf-8'))
+            except OSError:
+                continue
+        return names
+
+    def stats(self) -> UploadStats:
+        with self._cond:
+            return UploadStats(self._stats.uploaded, self._stats.retried, self._stats.failed,
+                               len(self._heap) + self._active)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """等待队列清空（包括等待重试的任务），超时返回 False"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._heap or self._active:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self, timeout: Optional[float] = None) -> bool:
+        """清空队列后停止工作线程；超时未完成的任务保留在日志目录中，下次运行继续"""
+        done = self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=1.0)
+        return done
+
+    def _push(self, job: UploadJob, delay: float):
+        with self._cond:
+            self._enqueue(job, delay)
+            self._cond.notify_all()
+
+    def _enqueue(self, job: UploadJob, delay: float):
+        """加入队列（需持有锁）；同一路径尚未开始上传的旧任务被取代"""
+        previous = self._queued.pop(job.remote_path, None)
+        if previous is not None:
+            self._heap.remove(previous)
+            heapq.heapify(self._heap)
+        entry = (time.monotonic() + delay, next(self._seq), job)
+        self._queued[job.remote_path] = entry
+        heapq.heappush(self._heap, entry)
+
+    def _next_job(self) -> Optional[UploadJob]:
+        """取出下一个已到执行时间、且同一路径没有上传在进行的任务，关闭后返回 None"""
+        with self._cond:
+            while not self._closed:
+                runnable = [entry for entry in self._heap if entry[2].remote_path not in self._uploading]
+                if not runnable:
+                    self._cond.wait()
+                    continue
+                entry = min(runnable)
+                wait = entry[0] - time.monotonic()
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+                self._heap.remove(entry)
+                heapq.heapify(self._heap)
+                job = entry[2]
+                del self._queued[job.remote_path]
+                self._uploading.add(job.remote_path)
+                self._active += 1
+                return job
+            return None
+
+    def _worker(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            try:
+                ok = self.webdav.upload_file(job.remote_path, job.content)
+                if ok and job.manifest is not None:
+                    # 清单更新失败时整个任务重试（重复上传同一内容无副作用）
+                    ok = self.webdav.record_manifest(*job.manifest)
+            except Exception as e:
+                self.logger.error(f"上传异常: {job.remote_path}: {e}")
+                ok = False
+            self._finish(job, ok)
+
+    def _finish(self, job: UploadJob, ok: bool):
+        if ok:
+            self._remove_journal(job)
+        with self._cond:
+            self._active -= 1
+            self._uploading.discard(job.remote_path)
+            if ok:
+                self._stats.uploaded += 1
+            elif job.remote_path in self._queued:
+                # 同一路径已有更新的内容排队，旧内容不再重试
+                pass
+            elif job.attempts < self.max_retries:
+                job.attempts += 1
+                self._stats.retried += 1
+                delay = min(RETRY_BASE_DELAY * 2 ** (job.attempts - 1), RETRY_MAX_DELAY)
+                self._enqueue(job, delay)
+                self.logger.warning(f"上传失败，{delay:.0f} 秒后重试（{job.attempts}/{self.max_retries}）: {job.remote_path}")
+            else:
+                self._stats.failed += 1
+                self.logger.error(f"上传失败，已保留到下次运行: {job.remote_path}")
+            self._cond.notify_all()
+
+    def _journal_path(self, job: UploadJob) -> Optional[Path]:
+        return self.journal_dir / f"{job.job_id}.json" if self.journal_dir is not None else None
+
+    def _write_journal(self, job: UploadJob):
+        path = self._journal_path(job)
+        if path is None:
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix('.tmp')
+        with self._journal_lock:
+            data = {'remote_path': job.remote_path, 'content': job.content}
+            if job.manifest is not None:
+                data['manifest'] = [job.manifest[0], dataclasses.asdict(job.manifest[1])]
+            path.with_suffix('.name').write_text(Path(job.remote_path).name, encoding='utf-8')
+            tmp.write_text(json.dumps(data, ensure_ascii=False), encoding='utf-8')
+            os.replace(tmp, path)
+
+    def _remove_journal(self, job: UploadJob):
+        """上传成功后删除记录；同一路径已有更新的内容排队时保留"""
+        path = self._journal_path(job)
+        if path is None:
+            return
+        with self._journal_lock:
+            try:
+                data = json.loads(path.read_text(encoding='utf-8'))
+                if UploadJob(data['remote_path'], data['content']).digest == job.digest:
+                    path.unlink()
+                    path.with_suffix('.name').unlink(missing_ok=True)
+            except (OSError, ValueError, KeyError):
+                pass
@@ -3,12 +3,17 @@ WebDAV 客户端封装
 使用 webdav4 库 (https://github.com/skshetry/webdav4)
 """
 
-from typing import Optional, Any, List
+from typing import Optional, Any, Callable, List, BinaryIO, Iterator, Sequence
 
 
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from fnmatch import fnmatch
 from pathlib import Path
 from datetime import datetime
+import json
 import os
+import tempfile
+import threading
 import time
 
 # 尝试导入 webdav4 库
@@ -16,14 +21,52 @@ _webdav_available = False
 try:
     from webdav4.client import Client as _WebDAVClient
     from webdav4.client import HTTPError
+    import httpx
 
     _webdav_available = True
+    # 可通过续传恢复的网络错误（连接断开、读取超时、响应体不完整）
+    _TRANSPORT_ERRORS: tuple = (httpx.TransportError,)
 except ImportError:
     _WebDAVClient = None
     HTTPError = Exception
+    _TRANSPORT_ERRORS = (ConnectionError, TimeoutError)
 
 from .models import BookFile
 from .logger import Logger
+from .http_pool import PoolStats, create_timeout, create_transport, http2_available
+from .remote_file import RangeNotSupportedError
+from .cache_manifest import MANIFEST_NAME, SUMMARY_SUFFIX, CacheManifest, ManifestEntry
+from .library_snapshot import STATUS_NEW, STATUS_UNCHANGED, LibrarySnapshot, SnapshotEntry
+
+
+ProgressCallback = Callable[[int, Optional[int]], None]
+
+
+class IncompleteDownloadError(IOError):
+    """下载结束后文件大小与服务器报告的 getcontentlength 不一致"""
+    pass
+
+
+def _range_total(response) -> Optional[int]:
+    """Content-Range 中的文件总大小（bytes 0-99/1000 或 416 响应的 bytes */1000）"""
+    content_range = response.headers.get("Content-Range", "")
+    if "/" in content_range and not content_range.endswith("/*"):
+        return int(content_range.rsplit("/", 1)[1])
+    return None
+
+
+def _response_total(response, offset: int) -> Optional[int]:
+    """从 Content-Range（206）或 Content-Length（200）得到文件总大小"""
+    total = _range_total(response)
+    if total is not None:
+        return total
+    length = response.headers.get("Content-Length")
+    return offset + int(length) if length else None
+
+
+def _matches(patterns: Sequence[str], relative: str, name: str) -> bool:
+    """相对路径或名称是否匹配任一 glob 模式"""
+    return any(fnmatch(relative, p) or fnmatch(name, p) for p in patterns)
 
 
 class WebDAVClientWrapper:
@@ -46,6 +89,9 @@ class WebDAVClientWrapper:
         self.config = config
         self.logger = logger
         self.client: Optional[Any] = None
+        self._transport = None
+        self._manifest: Optional[CacheManifest] = None
+        self._manifest_lock = threading.Lock()
 
         self._connected = False
 
@@ -85,10 +131,21 @@ class WebDAVClientWrapper:
             # 构建 WebDAV URL（webdav4 会自动处理尾部斜杠）
             server_url = self.config.serverUrl.rstrip("/")
 
-            # 创建客户端（使用 auth 元组）
+            # 创建客户端（使用 auth 元组）：所有请求共用一个带 keep-alive 的连接池
             assert _WebDAVClient is not None
+            if self.config.http2 and not http2_available():
+                self.logger.warning("未安装 h2，HTTP/2 已禁用（pip install 'httpx[http2]'）")
+            self._transport = create_transport(
+                max_connections=self.config.maxConnections,
+                max_keepalive=self.config.maxKeepaliveConnections,
+                keepalive_expiry=self.config.keepaliveExpiry,
+                http2=self.config.http2,
+            )
             self.client = _WebDAVClient(
-                server_url, auth=(self.config.username, self.config.password)
+                server_url,
+                auth=(self.config.username, self.config.password),
+                transport=self._transport,
+                timeout=create_timeout(self.config.connectTimeout, self.config.readTimeout),
             )
 
             # 测试连接 - 检查同步路径是否存在（带重试）
@@ -113,10 +170,19 @@ class WebDAVClientWrapper:
             return False
 
     def disconnect(self):
-        """断开连接"""
+        """断开连接（关闭连接池）"""
         self._connected = False
+        if self.client is not None:
+            try:
+                self.client.http.close()
+            except Exception:
+                pass
         self.client = None
 
+    def pool_stats(self) -> Optional[PoolStats]:
+        """连接池统计（新建、复用、等待的请求数与当前连接数），未连接时返回 None"""
+        return self._transport.stats() if self._transport is not None else None
+
     def is_connected(self) -> bool:
         """检查是否已连接"""
         return self._connected and self.client is not None
@@ -141,54 +207,121 @@ class WebDAVClientWrapper:
             return []
 
     def list_books(self, source_path: str) -> List[BookFile]:
-        """列出源路径下的电子书文件"""
-        if not self.is_connected():
-            return []
-
-        books = []
-        full_path = source_path
-        if not full_path.startswith("/"):
-            full_path = "/" + full_path
-
-        try:
-            items = self.list_files(full_path, detail=True)
+        """列出源路径下的电子书文件（不含子文件夹）"""
+        return list(self.scan_books(source_path, max_depth=1))
 
-            for item in items:
-                if isinstance(item, str):
-                    file_name = item
-                    size = 0
-                    modified = "2000-01-01T00:00:00"
-                else:
-                    file_name = item.get("name") or item.get("path") or ""
-                    size = item.get("size", 0) or 0
-                    modified = (
-                        item.get("modified", "2000-01-01T00:00:00")
-                        or "2000-01-01T00:00:00"
-                    )
-
-                ext = Path(file_name).suffix.lower()
-                if ext in self.SUPPORTED_EXTENSIONS:
-                    # webdav4 返回完整路径，需要提取文件名
-                    file_name_only = Path(file_name).name
-                    if full_path.endswith("/"):
-                        file_path = f"{full_path}{file_name_only}"
-                    else:
-                        file_path = f"{full_path}/{file_name_only}"
-
-                    books.append(
-                        BookFile(
-                            name=file_name_only,
-                            path=file_path,
-                            extension=ext,
-                            size=size,
-                            last_modified=datetime.fromisoformat(modified),
-                        )
-                    )
+    def scan_books(self, source_path: str, max_depth: int = 0, include: Sequence[str] = (),
+                   exclude: Sequence[str] = (), concurrency: int = 4,
+                   snapshot: Optional[LibrarySnapshot] = None, changed_only: bool = False) -> Iterator[BookFile]:
+        """
+        递归扫描源路径下的电子书，边扫描边返回
 
-        except Exception as e:
-            self.logger.error(f"扫描电子书失败: {e}")
+        每个文件夹发起一次 PROPFIND（Depth: 1），子文件夹在线程池中并行列出
 
-        return books
+        Args:
+            source_path: 源路径
+            max_depth: 最大扫描层数（1 表示只扫描源路径本身），0 表示不限制
+            include: 包含的 glob 模式（匹配相对源路径的路径或文件名），为空表示全部
+            exclude: 排除的 glob 模式，匹配的文件夹不再进入
+            concurrency: 同时列出的文件夹数上限
+            snapshot: 上次扫描的书库快照；开启 reuse_dirs 时 ETag 未变的文件夹沿用快照，完整扫描后更新
+            changed_only: 只返回相对快照新增或修改过的书籍
+
+        Yields:
+            BookFile: 按发现顺序返回的电子书
+        """
+        if not self.is_connected():
+            return
+
+        root = "/" + source_path.strip("/")
+        complete = True
+
+        def book_for(path: str, entry: SnapshotEntry, status: str) -> Optional[BookFile]:
+            name = path.rsplit("/", 1)[-1]
+            if changed_only and status == STATUS_UNCHANGED:
+                return None
+            if include and not _matches(include, path[len(root):].lstrip("/"), name):
+                return None
+            modified = datetime.fromisoformat(entry.modified) if entry.modified else datetime(2000, 1, 1)
+            return BookFile(name=name, path=path, extension=Path(name).suffix.lower(), size=entry.size,
+                            last_modified=modified)
+
+        executor = ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="webdav-scan")
+        pending = {executor.submit(self._list_dir, root): (root, 1)}
+        try:
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    folder, depth = pending.pop(future)
+                    try:
+                        listing = future.result()
+                    except Exception as e:
+                        # 快照中不能记录不完整的子树，本次不更新快照
+                        self.logger.warning(f"列出文件夹失败 {folder}: {e}")
+                        complete = False
+                        continue
+
+                    if snapshot is not None:
+                        snapshot.diff.listed_dirs += 1
+                    files = []
+                    for name, entry in listing:
+                        path = f"{folder.rstrip('/')}/{name}"
+                        if _matches(exclude, path[len(root):].lstrip("/"), name):
+                            continue
+                        if not entry.is_dir and Path(name).suffix.lower() not in self.SUPPORTED_EXTENSIONS:
+                            continue
+                        status = snapshot.classify(path, entry) if snapshot is not None else STATUS_NEW
+                        if not entry.is_dir:
+                            files.append((path, entry, status))
+                        elif max_depth and depth >= max_depth:
+                            continue
+                        elif status == STATUS_UNCHANGED and snapshot.reuse_dirs:
+                            # 未变化的文件夹：沿用快照中的整个子树，不再列出
+                            snapshot.diff.skipped_dirs += 1
+                            for child, child_entry in snapshot.subtree(path):
+                                child_status = snapshot.classify(child, child_entry)
+                                if not child_entry.is_dir:
+                                    files.append((child, child_entry, child_status))
+                        else:
+                            # 先提交子文件夹，调用方处理书籍时后台继续扫描
+                            pending[executor.submit(self._list_dir, path)] = (path, depth + 1)
+
+                    for path, entry, status in files:
+                        book = book_for(path, entry, status)
+                        if book is not None:
+                            yield book
+
+            if snapshot is not None and complete:
+                snapshot.commit()
+        finally:
+            # 提前停止迭代（如达到 maxFiles）时取消尚未开始的列目录请求
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _list_dir(self, path: str) -> List[tuple[str, SnapshotEntry]]:
+        """列出一个文件夹（PROPFIND Depth: 1），返回 (名称, 条目) 列表，失败时抛出异常"""
+        assert self.client is not None
+        entries = []
+        for item in self.client.ls(path.lstrip("/"), detail=True):
+            if isinstance(item, str):
+                name, entry = item, SnapshotEntry(is_dir=item.endswith("/"))
+            else:
+                name = item.get("name") or item.get("path") or ""
+                modified = item.get("modified")
+                if isinstance(modified, datetime):
+                    modified = modified.isoformat()
+                entry = SnapshotEntry(
+                    is_dir=item.get("type") == "directory",
+                    # webdav4 的 getcontentlength 字段名为 content_length
+                    size=item.get("content_length", item.get("size")) or 0,
+                    modified=modified,
+                    etag=item.get("etag"),
+                )
+
+            # webdav4 返回相对服务器根的路径，只取最后一级名称
+            name = Path(name.rstrip("/")).name
+            if name and name not in (".", ".."):
+                entries.append((name, entry))
+        return entries
 
     def get_file_info(self, path: str) -> dict:
         """获取文件信息"""
@@ -205,7 +338,7 @@ class WebDAVClientWrapper:
             info = self.client.info(path)
             if info:
                 return {
-                    "size": info.get("size", 0) or 0,
+                    "size": info.get("content_length", info.get("size")) or 0,
                     "modified": info.get("modified", "2000-01-01T00:00:00")
                     or "2000-01-01T00:00:00",
                 }
@@ -228,24 +361,147 @@ class WebDAVClientWrapper:
         except Exception:
             return False
 
-    def download_file(self, remote_path: str, local_path: str) -> bool:
-        """下载文件"""
+    def download_file(self, remote_path: str, local_path: str, expected_size: int = 0,
+                      progress: Optional[ProgressCallback] = None) -> bool:
+        """
+        分块下载文件到本地
+
+        先写入 local_path + ".part"，中断后再次调用时从已下载的位置续传；
+        大小与 PROPFIND 的 getcontentlength 一致后才改名为 local_path
+
+        Args:
+            remote_path: 远程路径
+            local_path: 本地路径
+            expected_size: 预期大小（如扫描得到的 BookFile.size），0 表示通过 PROPFIND 获取
+            progress: 进度回调 (已下载字节数, 总字节数)
+        """
         if not self.is_connected():
             return False
 
+        part_path = local_path + ".part"
         try:
             # 确保本地目录存在
-            local_dir = Path(local_path).parent
-            local_dir.mkdir(parents=True, exist_ok=True)
+            Path(local_path).parent.mkdir(parents=True, exist_ok=True)
+            with open(part_path, "ab") as f:
+                self._download_to(remote_path, f, expected_size, progress)
+            os.replace(part_path, local_path)
+            return True
+        except Exception as e:
+            self.logger.error(f"下载文件失败: {e}")
+            return False
 
-            # 下载文件 - webdav4 使用 download_file
-            assert self.client is not None
-            self.client.download_file(remote_path, local_path)
+    def download_to_buffer(self, remote_path: str, max_memory: int, expected_size: int = 0,
+                           progress: Optional[ProgressCallback] = None) -> Optional[BinaryIO]:
+        """
+        流式下载到内存缓冲区（连接中断时在当前进程内续传）
 
-            return os.path.exists(local_path)
+        Args:
+            remote_path: 远程路径
+            max_memory: 内存中保留的最大字节数，超过后自动转存到临时文件
+            expected_size: 预期大小，0 表示通过 PROPFIND 获取
+            progress: 进度回调 (已下载字节数, 总字节数)
+
+        Returns:
+            定位到开头的文件对象（调用方负责关闭），失败时返回 None
+        """
+        if not self.is_connected():
+            return None
+
+        buffer = tempfile.SpooledTemporaryFile(max_size=max_memory, prefix="fastreader_")
+        try:
+            self._download_to(remote_path, buffer, expected_size, progress)
+            buffer.seek(0)
+            return buffer
         except Exception as e:
+            buffer.close()
             self.logger.error(f"下载文件失败: {e}")
-            return False
+            return None
+
+    def _download_to(self, remote_path: str, f: BinaryIO, expected_size: int = 0,
+                     progress: Optional[ProgressCallback] = None):
+        """
+        分块 GET 写入 f 的末尾：已有内容视为已下载部分，用 Range 请求续传；
+        连接中断时最多重试 downloadRetries 次，每次从已写入的位置继续
+
+        Raises:
+            IncompleteDownloadError: 下载结束后大小与 getcontentlength 不一致
+        """
+        assert self.client is not None
+        if not expected_size:
+            expected_size = self.get_file_info(remote_path).get("size", 0)
+
+        url = self.client.join_url(remote_path)
+        chunk_size = max(1, self.config.downloadChunkKB) * 1024
+        f.seek(0, os.SEEK_END)
+        offset = f.tell()
+        failures = 0
+        error: Optional[Exception] = None
+        while True:
+            if expected_size and offset == expected_size:
+                break
+            headers = {"Range": f"bytes={offset}-"} if offset else {}
+            try:
+                with self.client.http.stream("GET", url, headers=headers) as response:
+                    if response.status_code == 416:
+                        # 续传位置不在文件范围内：已下载部分恰好等于 Content-Range 报告的总大小才算完成
+                        total = _range_total(response) or expected_size
+                        if not total:
+                            raise IncompleteDownloadError(f"服务器拒绝续传且未报告文件大小: {remote_path}")
+                        if offset == total:
+                            # 与预期大小不一致时由下方的大小核对报告
+                            break
+                    if response.status_code == 416 or (offset and response.status_code == 200):
+                        # 服务器忽略 Range 或已下载部分已失效：从头下载
+                        f.seek(0)
+                        f.truncate()
+                        offset = 0
+                        if response.status_code == 416:
+                            continue
+                    response.raise_for_status()
+                    total = _response_total(response, offset) or expected_size or None
+                    for chunk in response.iter_bytes(chunk_size):
+                        f.write(chunk)
+                        offset += len(chunk)
+                        if progress is not None:
+                            progress(offset, total)
+                if not expected_size or offset >= expected_size:
+                    break
+                error = IncompleteDownloadError("响应体提前结束")
+            except _TRANSPORT_ERRORS as e:
+                error = e
+
+            failures += 1
+            if failures > self.config.downloadRetries:
+                break
+            self.logger.warning(
+                f"下载中断，从 {offset:,} 字节处续传（{failures}/{self.config.downloadRetries}）: {error}"
+            )
+            time.sleep(min(2 ** (failures - 1), 10))
+
+        f.flush()
+        if failures > self.config.downloadRetries and not isinstance(error, IncompleteDownloadError):
+            raise error
+        if expected_size and offset != expected_size:
+            raise IncompleteDownloadError(f"下载不完整: {remote_path} 已下载 {offset:,} / 预期 {expected_size:,} 字节")
+
+    def read_range(self, remote_path: str, start: int, end: int) -> bytes:
+        """
+        读取远程文件 [start, end) 范围的字节（HTTP Range 请求）
+
+        Raises:
+            RangeNotSupportedError: 服务器忽略 Range 头返回完整文件（此时不读取响应体）
+        """
+        if not self.is_connected():
+            raise ConnectionError("WebDAV 未连接")
+
+        assert self.client is not None
+        url = self.client.join_url(remote_path)
+        headers = {"Range": f"bytes={start}-{end - 1}"}
+        with self.client.http.stream("GET", url, headers=headers) as response:
+            if response.status_code == 200:
+                raise RangeNotSupportedError(f"服务器不支持 Range 请求: {remote_path}")
+            response.raise_for_status()
+            return response.read()
 
     def download_file_as_text(self, remote_path: str) -> tuple[bool, str]:
         """下载文件作为文本"""
@@ -302,31 +558,182 @@ class WebDAVClientWrapper:
             return False
 
     def check_cache_exists(self, book: BookFile) -> bool:
-        """检查缓存是否存在"""
-        sync_path = self.config.syncPath
-        if not sync_path.startswith("/"):
-            sync_path = "/" + sync_path
+        """检查缓存是否存在（启用缓存清单时查询清单，不逐个请求）"""
+        if self.config.cacheManifest:
+            manifest = self._manifest if self._manifest is not None else self.load_manifest()
+            if manifest is not None:
+                return book.sanitized_name in manifest.entries
 
-        cache_file = f"{book.sanitized_name}-完整摘要.md"
-        cache_path = f"{sync_path}/{cache_file}"
+        cache_file = f"{book.sanitized_name}{SUMMARY_SUFFIX}"
+        cache_path = f"{self._sync_dir()}/{cache_file}"
 
         return self.file_exists(cache_path)
 
     def list_cache_files(self) -> set[str]:
-        """列出云端缓存文件名集合（{sanitizedName}-完整摘要.md）"""
-        sync_path = self.config.syncPath
-        if not sync_path.startswith("/"):
-            sync_path = "/" + sync_path
+        """列出云端缓存文件名集合（{sanitizedName}-完整摘要.md）：优先读取缓存清单，没有清单时列出同步目录"""
+        if self.config.cacheManifest:
+            manifest = self.load_manifest()
+            if manifest is not None:
+                return manifest.summary_names()
+            if self.is_connected():
+                self.logger.info("未找到缓存清单，改为列出同步目录（可运行 manifest rebuild 生成清单）")
 
         cached = set()
-        items = self.list_files(sync_path, detail=True)
+        items = self.list_files(self._sync_dir(), detail=True)
         for item in items:
             if isinstance(item, str):
                 file_name = Path(item).name
             else:
                 file_name = Path(item.get("name") or item.get("path") or "").name
 
-            if file_name.endswith("-完整摘要.md"):
+            if file_name.endswith(SUMMARY_SUFFIX):
                 cached.add(file_name)
 
         return cached
+
+    def _sync_dir(self) -> str:
+        return "/" + self.config.syncPath.strip("/")
+
+    def load_manifest(self) -> Optional[CacheManifest]:
+        """读取缓存清单（一次 GET），不存在或无法读取时返回 None"""
+        if not self.is_connected():
+            return None
+        with self._manifest_lock:
+            try:
+                self._manifest = self._fetch_manifest()
+            except Exception as e:
+                self.logger.warning(f"读取缓存清单失败: {e}")
+                self._manifest = None
+            return self._manifest
+
+    def record_manifest(self, name: str, entry: ManifestEntry) -> bool:
+        """
+        在缓存清单中记录一本书（上传摘要成功后调用）
+
+        读取-修改-条件写入（If-Match），其他进程抢先更新时重新读取后重试；
+        清单尚不存在时先从同步目录的完整列表生成，避免遗漏已有的摘要
+        """
+        if not self.config.cacheManifest:
+            return True
+        if not self.is_connected():
+            return False
+
+        with self._manifest_lock:
+            for _ in range(self.MAX_RETRIES):
+                try:
+                    if self._manifest is None:
+                        self._manifest = self._fetch_manifest() or self._manifest_from_listing()
+                    self._manifest.entries[name] = entry
+                    if self._put_manifest(self._manifest):
+                        return True
+                    self._manifest = None
+                except Exception as e:
+                    self.logger.error(f"更新缓存清单失败: {e}")
+                    self._manifest = None
+                    return False
+            self.logger.error("更新缓存清单失败: 多次写入冲突")
+            return False
+
+    def rebuild_manifest(self, fetch_metadata: bool = True, concurrency: int = 8) -> Optional[CacheManifest]:
+        """
+        从同步目录的完整列表重新生成缓存清单并覆盖写入
+
+        Args:
+            fetch_metadata: 读取各书的 .meta.json 补全模型与 Prompt 版本（每本一次 GET）
+            concurrency: 并行读取 .meta.json 的线程数
+        """
+        if not self.is_connected():
+            return None
+
+        with self._manifest_lock:
+            manifest = self._manifest_from_listing(fetch_metadata, concurrency)
+            manifest.etag = None
+            self._put_manifest(manifest, overwrite=True)
+            self._manifest = manifest
+            return manifest
+
+    def _fetch_manifest(self) -> Optional[CacheManifest]:
+        assert self.client is not None
+        response = self.client.http.get(self.client.join_url(f"{self._sync_dir()}/{MANIFEST_NAME}"))
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return CacheManifest.decode(response.content, response.headers.get("ETag"))
+
+    def _put_manifest(self, manifest: CacheManifest, overwrite: bool = False) -> bool:
+        """
+        条件写入清单：有 ETag 时 If-Match，新建时 If-None-Match: *；
+        服务器只提供弱 ETag（W/"..."）时 If-Match 的强比较永远失败，改为写入后重新读取核对；
+        返回 False 表示清单已被其他进程修改
+        """
+        assert self.client is not None
+        if not overwrite and manifest.etag and manifest.etag.startswith("W/"):
+            return self._put_manifest_verified(manifest)
+
+        headers = {}
+        if not overwrite:
+            headers = {"If-Match": manifest.etag} if manifest.etag else {"If-None-Match": "*"}
+        response = self.client.http.put(
+            self.client.join_url(f"{self._sync_dir()}/{MANIFEST_NAME}"),
+            content=manifest.encode(), headers=headers,
+        )
+        if response.status_code == 412:
+            return False
+        response.raise_for_status()
+        manifest.etag = response.headers.get("ETag") or self._head_manifest_etag(len(manifest.encode()))
+        return True
+
+    def _put_manifest_verified(self, manifest: CacheManifest) -> bool:
+        """无条件写入后重新读取：其他进程的写入覆盖了本次的条目时返回 False，由调用方重新读取合并后重试"""
+        assert self.client is not None
+        response = self.client.http.put(
+            self.client.join_url(f"{self._sync_dir()}/{MANIFEST_NAME}"), content=manifest.encode()
+        )
+        response.raise_for_status()
+        current = self._fetch_manifest()
+        if current is None or any(current.entries.get(name) != entry for name, entry in manifest.entries.items()):
+            return False
+        manifest.etag = current.etag
+        return True
+
+    def _head_manifest_etag(self, size: int) -> Optional[str]:
+        """
+        PUT 响应没有 ETag 时用 HEAD 读取；大小与刚写入的内容不一致（已被其他进程覆盖）时返回 None，
+        下次写入会因 If-None-Match 冲突而重新读取
+        """
+        assert self.client is not None
+        try:
+            response = self.client.http.head(self.client.join_url(f"{self._sync_dir()}/{MANIFEST_NAME}"))
+        except Exception:
+            return None
+        if response.status_code != 200 or response.headers.get("Content-Length") not in (None, str(size)):
+            return None
+        return response.headers.get("ETag")
+
+    def _manifest_from_listing(self, fetch_metadata: bool = False, concurrency: int = 8) -> CacheManifest:
+        """列出同步目录生成清单（内容哈希用服务器 ETag 代替）"""
+        listing = dict(self._list_dir(self._sync_dir()))
+        manifest = CacheManifest()
+        for file_name, entry in listing.items():
+            if entry.is_dir or not file_name.endswith(SUMMARY_SUFFIX):
+                continue
+            name = file_name[: -len(SUMMARY_SUFFIX)]
+            manifest.entries[name] = ManifestEntry(
+                hash=(entry.etag or "").strip('"'), updatedAt=entry.modified or ""
+            )
+
+        if fetch_metadata:
+            names = [n for n in manifest.entries if f"{n}.meta.json" in listing]
+
+            def read_meta(name: str) -> tuple[str, dict]:
+                ok, content = self.download_file_as_text(f"{self._sync_dir()}/{name}.meta.json")
+                try:
+                    return name, json.loads(content) if ok else {}
+                except ValueError:
+                    return name, {}
+
+            with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+                for name, meta in executor.map(read_meta, names):
+                    manifest.entries[name].model = meta.get("model", "")
+                    manifest.entries[name].promptVersion = meta.get("promptVersion", "")
+        return manifest
@@ -0,0 +1,137 @@
+"""
+提取器基准语料生成
+按规格生成可复现的 EPUB / PDF：章节数、每章字数、图片体积与中英文比例均可配置
+
+命令行用法：
+    python tests/python/bench_corpus.py OUT_DIR [--scale 2]
+"""
+
+import argparse
+import random
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+
+from test_chapter_extractor import build_epub, build_pdf
+
+
+# 常用汉字，组成中文句子
+CJK_CHARS = (
+    "的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说产种面而方后多定行学法所"
+    "民得经十三之进着等部度家电力里如水化高自二理起小物现实加量都两体制机当使点从业本去把性好应开它合还因由其些然前外天政四日"
+)
+LATIN_WORDS = (
+    "the of and to in is was he for it with as his on be at by had are but from or have an they which one you were her all she there"
+    " would their we him been has when who will more no if out so said what up its about into than them can only other new some could"
+).split()
+
+CJK_LINE_CHARS = 40     # PDF 每行汉字数
+LATIN_LINE_CHARS = 80   # PDF 每行拉丁字符数
+PDF_PAGE_LINES = 40     # PDF 每页行数
+
+
+@dataclass
+class CorpusSpec:
+    """语料规格"""
+    name: str
+    format: str                 # epub / pdf
+    chapters: int = 10
+    chapter_chars: int = 20_000  # 每章正文字符数
+    image_kb: int = 0           # 图片总体积
+    cjk_ratio: float = 0.5      # 中文段落比例
+    seed: int = 0
+
+    def scaled(self, scale: float) -> 'CorpusSpec':
+        """按比例放大章节数（BENCH_SCALE）"""
+        return CorpusSpec(self.name, self.format, max(int(self.chapters * scale), 1),
+                          self.chapter_chars, int(self.image_kb * scale), self.cjk_ratio, self.seed)
+
+
+# 基准套件使用的默认语料
+DEFAULT_CORPUS = [
+    CorpusSpec("epub-cjk", "epub", chapters=30, cjk_ratio=1.0),
+    CorpusSpec("epub-mixed-images", "epub", chapters=30, image_kb=4096, cjk_ratio=0.5),
+    CorpusSpec("pdf-latin", "pdf", chapters=20, chapter_chars=12_000, cjk_ratio=0.0),
+    CorpusSpec("pdf-mixed-images", "pdf", chapters=20, chapter_chars=12_000, image_kb=2048, cjk_ratio=0.5),
+]
+
+
+def paragraphs(rng: random.Random, chars: int, cjk_ratio: float) -> list[str]:
+    """生成总长约 chars 个字符的段落（中文段落比例为 cjk_ratio）"""
+    result = []
+    total = 0
+    while total < chars:
+        if rng.random() < cjk_ratio:
+            text = "。".join(
+                "".join(rng.choice(CJK_CHARS) for _ in range(rng.randint(8, 24)))
+                for _ in range(rng.randint(3, 8))
+            ) + "。"
+        else:
+            text = " ".join(
+                " ".join(rng.choice(LATIN_WORDS) for _ in range(rng.randint(6, 16))).capitalize() + "."
+                for _ in range(rng.randint(3, 8))
+            )
+        result.append(text)
+        total += len(text)
+    return result
+
+
+def chapter_title(index: int, cjk_ratio: float) -> str:
+    """章节标题（两种语言都能被 PDF 标题识别匹配）"""
+    return f"第 {index + 1} 章" if cjk_ratio >= 0.5 else f"Chapter {index + 1}"
+
+
+def wrap(text: str) -> list[str]:
+    """按 PDF 行宽折行"""
+    width = CJK_LINE_CHARS if max(text, default='') > '\xff' else LATIN_LINE_CHARS
+    return [text[i:i + width] for i in range(0, len(text), width)]
+
+
+def build_book(spec: CorpusSpec, out_dir: Path) -> Path:
+    """按规格生成一本书，返回文件路径"""
+    rng = random.Random(spec.seed)
+    chapters = [
+        (chapter_title(i, spec.cjk_ratio), paragraphs(rng, spec.chapter_chars, spec.cjk_ratio))
+        for i in range(spec.chapters)
+    ]
+    path = out_dir / f"{spec.name}.{spec.format}"
+
+    if spec.format == 'epub':
+        return build_epub(
+            path,
+            [(title, "".join(f"<p>{text}</p>" for text in texts)) for title, texts in chapters],
+            image_size=spec.image_kb * 1024,
+            title=spec.name,
+        )
+
+    pages = []
+    chapter_starts = []
+    for title, texts in chapters:
+        lines = [line for text in texts for line in wrap(text)]
+        chapter_starts.append(len(pages))
+        pages.append([title] + lines[:PDF_PAGE_LINES - 1])
+        pages.extend(lines[i:i + PDF_PAGE_LINES] for i in range(PDF_PAGE_LINES - 1, len(lines), PDF_PAGE_LINES))
+
+    images = {}
+    if spec.image_kb:
+        per_chapter = spec.image_kb * 1024 // len(chapter_starts)
+        images = {start: per_chapter for start in chapter_starts}
+    return build_pdf(path, pages, images=images)
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="生成提取器基准语料")
+    parser.add_argument("out_dir", help="输出目录")
+    parser.add_argument("--scale", type=float, default=1.0, help="章节数与图片体积的放大倍数")
+    args = parser.parse_args(argv)
+
+    out_dir = Path(args.out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for spec in DEFAULT_CORPUS:
+        path = build_book(spec.scaled(args.scale), out_dir)
+        print(f"{path}  {path.stat().st_size / 1024 / 1024:.1f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
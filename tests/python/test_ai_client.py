@@ -6,6 +6,8 @@ AI 客户端测试
 import os
 import sys
 import tempfile
+import time
+import timeit
 import pytest
 from pathlib import Path
 from unittest.mock import Mock, patch, MagicMock
@@ -16,10 +18,12 @@ sys.path.insert(0, str(project_root))
 
 from src.cli.config import ConfigLoader, AIConfig, AIProviderConfig
 from src.cli.ai_client import (
-    AIClient, GeminiClient, OpenAIClient, PromptTemplates,
+    AIClient, GeminiClient, OpenAIClient, MockClient, PromptTemplates,
     create_ai_client, AIResponse
 )
 from src.cli.logger import Logger
+from src.cli.models import ChapterInfo
+from src.cli.prompt_template import compile_prompt, PromptTemplateError, PROMPT_PLACEHOLDERS
 
 
 class TestAIClientCreation:
@@ -186,16 +190,16 @@ currentPromptVersion: v2
 promptVersionConfig:
   v1:
     chapterSummary:
-      fiction: "v1 fiction prompt"
-      nonFiction: "v1 non-fiction prompt"
-    connectionAnalysis: "v1 connection prompt"
-    overallSummary: "v1 summary prompt"
+      fiction: "v1 fiction prompt {{content}}"
+      nonFiction: "v1 non-fiction prompt {{content}}"
+    connectionAnalysis: "v1 connection prompt {{chapterSummaries}}"
+    overallSummary: "v1 summary prompt {{chapterInfo}}"
   v2:
     chapterSummary:
-      fiction: "v2 fiction prompt"
-      nonFiction: "v2 non-fiction prompt"
-    connectionAnalysis: "v2 connection prompt"
-    overallSummary: "v2 summary prompt"
+      fiction: "v2 fiction prompt {{content}}"
+      nonFiction: "v2 non-fiction prompt {{content}}"
+    connectionAnalysis: "v2 connection prompt {{chapterSummaries}}"
+    overallSummary: "v2 summary prompt {{chapterInfo}}"
 """
         f_name = write_config_file(config_content)
         try:
@@ -268,5 +272,273 @@ processingOptions:
                 os.unlink(f_name)
 
 
+def make_openai_response(text, finish_reason, prompt_tokens=10, completion_tokens=5):
+    """辅助函数：构造 OpenAI Chat Completions 响应"""
+    response = MagicMock()
+    response.choices = [MagicMock()]
+    response.choices[0].message.content = text
+    response.choices[0].finish_reason = finish_reason
+    response.usage.prompt_tokens = prompt_tokens
+    response.usage.completion_tokens = completion_tokens
+    return response
+
+
+class TestContinuation:
+    """截断输出续写测试"""
+
+    def make_client(self, cls):
+        config = Mock()
+        config.model = "test-model"
+        config.apiKey = "key"
+        config.apiUrl = ""
+        config.temperature = 0.7
+        client = cls(config, Logger(), PromptTemplates())
+        client._client = MagicMock()
+        return client
+
+    def test_openai_continues_truncated_output(self):
+        """测试 OpenAI 在 finish_reason == length 时续写"""
+        client = self.make_client(OpenAIClient)
+        create = client._client.chat.completions.create
+        create.side_effect = [
+            make_openai_response("第一部分", "length"),
+            make_openai_response("第二部分", "stop"),
+        ]
+
+        chapter = ChapterInfo(id="1", title="T", content="内容" * 100)
+        response = client.summarize_chapter(chapter, "non-fiction", "zh")
+
+        assert response.success is True
+        assert response.content == "第一部分第二部分"
+        assert response.continuations == 1
+        assert response.truncated is False
+        assert response.input_tokens == 20
+        assert response.output_tokens == 10
+
+        # 续写请求应携带已生成内容，而不是重新生成
+        messages = create.call_args_list[1].kwargs['messages']
+        assert messages[1] == {"role": "assistant", "content": "第一部分"}
+        assert messages[2]["role"] == "user"
+
+    def test_continuation_limit(self):
+        """测试续写次数上限"""
+        client = self.make_client(OpenAIClient)
+        client._client.chat.completions.create.return_value = make_openai_response("x", "length")
+
+        response = client.analyze_connections([ChapterInfo(id="1", title="T", content="c")], "zh")
+
+        assert response.truncated is True
+        assert response.continuations == AIClient.MAX_CONTINUATIONS
+        assert response.content == "x" * (AIClient.MAX_CONTINUATIONS + 1)
+
+    def test_gemini_detects_max_tokens(self):
+        """测试 Gemini 识别 MAX_TOKENS 并续写"""
+        client = self.make_client(GeminiClient)
+
+        def make_response(text, reason):
+            response = MagicMock()
+            response.text = text
+            response.candidates = [MagicMock()]
+            response.candidates[0].finish_reason.name = reason
+            response.usage_metadata.prompt_token_count = 10
+            response.usage_metadata.candidates_token_count = 5
+            return response
+
+        generate = client._client.models.generate_content
+        generate.side_effect = [make_response("A", "MAX_TOKENS"), make_response("B", "STOP")]
+
+        chapter = ChapterInfo(id="1", title="T", content="内容" * 100)
+        response = client.summarize_chapter(chapter, "non-fiction", "zh")
+
+        assert response.content == "AB"
+        assert response.continuations == 1
+        contents = generate.call_args_list[1].kwargs['contents']
+        assert contents[1] == {'role': 'model', 'parts': [{'text': 'A'}]}
+
+    def test_output_budget_adapts_to_chapter_length(self):
+        """测试输出预算随章节长度调整"""
+        client = self.make_client(OpenAIClient)
+        create = client._client.chat.completions.create
+        create.return_value = make_openai_response("ok", "stop")
+
+        client.summarize_chapter(ChapterInfo(id="1", title="T", content="短"), "non-fiction", "zh")
+        assert create.call_args.kwargs['max_tokens'] == AIClient.MIN_OUTPUT_TOKENS
+
+        client.summarize_chapter(ChapterInfo(id="1", title="T", content="长" * 100_000), "non-fiction", "zh")
+        assert create.call_args.kwargs['max_tokens'] == 4096
+
+
+class TestMockClient:
+    """Mock 提供商测试"""
+
+    def make_client(self, **fields):
+        fields.setdefault('timeScale', 0)
+        config = AIConfig(
+            providers=[AIProviderConfig(provider="mock", model="mock-model", customFields=fields)],
+            currentProviderIndex=0
+        )
+        return create_ai_client(config, Logger(), PromptTemplates())
+
+    def test_create_mock_client(self):
+        """测试创建 Mock 客户端"""
+        client = self.make_client(seed=7)
+        assert isinstance(client, MockClient)
+        assert client.seed == 7
+
+    def test_seeded_output_is_deterministic(self):
+        """测试相同种子输出一致"""
+        chapter = ChapterInfo(id="1", title="T", content="内容" * 2000)
+        first = self.make_client(seed=1).summarize_chapter(chapter, "non-fiction", "zh")
+        second = self.make_client(seed=1).summarize_chapter(chapter, "non-fiction", "zh")
+        other = self.make_client(seed=2).summarize_chapter(chapter, "non-fiction", "zh")
+
+        assert first.success is True
+        assert first.content == second.content
+        assert first.output_tokens == second.output_tokens
+        assert first.content != other.content
+
+    def test_rate_limit_injection(self):
+        """测试 429 注入"""
+        client = self.make_client(rateLimitRate=1.0)
+        response = client.summarize_chapter(ChapterInfo(id="1", title="T", content="c"), "fiction", "zh")
+        assert response.success is False
+        assert "429" in response.error
+
+    def test_error_rate_statistics(self):
+        """测试错误注入比例"""
+        client = self.make_client(seed=3, errorRate=0.3)
+        results = [
+            client.summarize_chapter(ChapterInfo(id=str(i), title=f"T{i}", content="c"), "fiction", "zh")
+            for i in range(200)
+        ]
+        failures = sum(1 for r in results if not r.success)
+        assert 30 <= failures <= 90
+
+    def test_long_output_triggers_continuation(self):
+        """测试超出输出预算时走续写流程"""
+        client = self.make_client(outputTokens=3000, outputTokensJitter=0)
+        response = client.summarize_chapter(ChapterInfo(id="1", title="T", content="短"), "fiction", "zh")
+        assert response.success is True
+        # 3000 = 1024 + 1024 + 952：两次续写补齐剩余部分
+        assert response.continuations == 2
+        assert response.truncated is False
+        assert response.output_tokens == len(response.content) == 3000
+
+    def test_continuation_rounds_capped(self):
+        """测试剩余部分超过续写次数上限时仍标记为截断"""
+        client = self.make_client(outputTokens=5000, outputTokensJitter=0)
+        response = client.analyze_connections([ChapterInfo(id="1", title="T", content="c")], "zh")
+        assert response.continuations == 1
+        assert response.truncated is False
+
+        client = self.make_client(outputTokens=20000, outputTokensJitter=0)
+        response = client.analyze_connections([ChapterInfo(id="1", title="T", content="c")], "zh")
+        assert response.continuations == AIClient.MAX_CONTINUATIONS
+        assert response.truncated is True
+        assert response.output_tokens == 4096 * (AIClient.MAX_CONTINUATIONS + 1)
+
+    def test_latency_is_applied(self):
+        """测试延迟注入"""
+        client = self.make_client(latencyMs=20, timeScale=1)
+        start = time.perf_counter()
+        client.summarize_chapter(ChapterInfo(id="1", title="T", content="c"), "fiction", "zh")
+        assert time.perf_counter() - start >= 0.02
+
+
+class TestCompiledPrompt:
+    """预编译 Prompt 模板测试"""
+
+    def test_render_matches_replace(self):
+        """测试渲染结果与逐个 replace 一致"""
+        prompts = PromptTemplates()
+        template = prompts.get_prompt('chapterSummary', 'non-fiction')
+        expected = "请用中文回答。\n\n" + template.replace('{{title}}', 'T').replace('{{content}}', 'C' * 1000)
+
+        rendered = prompts.render_prompt(
+            'chapterSummary', 'non-fiction',
+            prefix="请用中文回答。", title='T', content='C' * 1000
+        )
+        assert rendered == expected
+
+    def test_content_placeholders_not_expanded(self):
+        """测试章节内容中的占位符文本不会被再次替换"""
+        compiled = compile_prompt("{{title}}|{{content}}")
+        assert compiled.render(title="{{content}}", content="x") == "{{content}}|x"
+
+    def test_unknown_placeholder_rejected(self):
+        """测试未知占位符在编译时报错"""
+        with pytest.raises(PromptTemplateError):
+            compile_prompt("{{title}} {{chapter}}", PROMPT_PLACEHOLDERS['chapterSummary'])
+
+    def test_missing_value_rejected(self):
+        """测试渲染时缺少变量报错"""
+        compiled = compile_prompt("{{title}} {{content}}")
+        with pytest.raises(PromptTemplateError):
+            compiled.render(title="t")
+
+    def test_required_placeholder_enforced(self):
+        """测试缺少必需占位符时编译报错"""
+        with pytest.raises(PromptTemplateError):
+            compile_prompt("总结：{{title}}", PROMPT_PLACEHOLDERS['chapterSummary'], required={'content'})
+
+    def test_instruction_only_mindmap_appends_chapter(self):
+        """测试仅含指令的思维导图模板与前端一样在末尾附加章节"""
+        client = TestContinuation().make_client(OpenAIClient)
+        chapter = ChapterInfo(id="1", title="T", content="正文")
+
+        assert client._mindmap_prompt(chapter) == compile_prompt(
+            client.prompts.get_prompt('mindmap_chapter')
+        ).render(title="T", content="正文")
+
+        client.prompts.get_prompt = lambda *args: "生成思维导图"
+        client.prompts._compiled.clear()
+        assert client._mindmap_prompt(chapter) == "生成思维导图\n\n章节标题: T\n\n章节内容:\n正文"
+
+    def test_openai_summary_uses_template(self):
+        """测试 OpenAI 章节总结使用配置的模板而不是内置文本"""
+        client = TestContinuation().make_client(OpenAIClient)
+        client.prompts.get_prompt = lambda *args: "自定义 {{title}}：{{content}}"
+        create = client._client.chat.completions.create
+        create.return_value = make_openai_response("ok", "stop")
+
+        client.summarize_chapter(ChapterInfo(id="1", title="T", content="正文"), "non-fiction", "zh")
+
+        prompt = create.call_args.kwargs['messages'][-1]['content']
+        assert prompt.endswith("自定义 T：正文")
+
+    def test_format_prompt_cache_bounded(self):
+        """测试任意模板的编译缓存有上限"""
+        from src.cli.ai_client import _compile_adhoc
+
+        prompts = PromptTemplates()
+        for i in range(200):
+            assert prompts.format_prompt(f"{i} {{{{name}}}}", name="x") == f"{i} x"
+        assert _compile_adhoc.cache_info().currsize <= 64
+
+    def test_render_benchmark(self):
+        """微基准：预编译渲染不慢于 replace 链 + f-string 拼接"""
+        prompts = PromptTemplates()
+        template = prompts.get_prompt('chapterSummary', 'non-fiction')
+        content = "正文内容。" * 400_000  # ~2M 字符
+        instruction = "请用中文回答。"
+
+        def legacy():
+            prompt = template
+            for key, value in (('title', 'Title'), ('content', content)):
+                prompt = prompt.replace(f'{{{{{key}}}}}', str(value))
+            return f"{instruction}\n\n{prompt}"
+
+        def compiled():
+            return prompts.render_prompt(
+                'chapterSummary', 'non-fiction', prefix=instruction, title='Title', content=content
+            )
+
+        assert legacy() == compiled()
+        legacy_time = min(timeit.repeat(legacy, number=5, repeat=5))
+        compiled_time = min(timeit.repeat(compiled, number=5, repeat=5))
+        print(f"\nlegacy: {legacy_time * 200:.2f}ms/op, compiled: {compiled_time * 200:.2f}ms/op")
+        assert compiled_time <= legacy_time * 1.2
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -0,0 +1,252 @@
+"""
+云端缓存清单测试
+"""
+
+import json
+import sys
+import pytest
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.cli.cache_manifest import MANIFEST_NAME, CacheManifest, ManifestEntry
+from src.cli.config import WebDAVConfig
+from src.cli.logger import Logger
+from src.cli.models import BookFile
+from src.cli.upload_queue import UploadQueue
+from src.cli.webdav_client import WebDAVClientWrapper
+
+httpx = pytest.importorskip("httpx")
+
+MANIFEST_PATH = f"/sync/{MANIFEST_NAME}"
+
+
+class FakeServer:
+    """内存中的 WebDAV 同步目录：GET / HEAD / PUT 支持 ETag 与条件请求，记录请求方法"""
+
+    def __init__(self, files: dict, put_etag: bool = True, weak: bool = False):
+        self.files = {path: (content, f'"{i}"') for i, (path, content) in enumerate(files.items())}
+        self.version = len(self.files)
+        self.requests = []
+        self.put_etag = put_etag  # PUT 响应是否带 ETag
+        self.weak = weak  # 以弱验证器 W/"..." 返回 ETag
+        self.on_put = None  # 每次 PUT 之后调用（模拟其他进程的写入）
+
+    def store(self, path: str, content: bytes) -> str:
+        self.version += 1
+        etag = f'"{self.version}"'
+        self.files[path] = (content, etag)
+        return etag
+
+    def handle(self, request):
+        path = request.url.path.removeprefix("/dav")
+        self.requests.append((request.method, path))
+        current = self.files.get(path)
+        if request.method in ("GET", "HEAD"):
+            if current is None:
+                return httpx.Response(404)
+            headers = {"ETag": self.etag(current[1]), "Content-Length": str(len(current[0]))}
+            return httpx.Response(200, content=current[0] if request.method == "GET" else b"", headers=headers)
+
+        if_match = request.headers.get("If-Match")
+        # If-Match 为强比较：只提供弱 ETag 的服务器总是返回 412
+        if if_match and (current is None or self.weak or current[1] != if_match):
+            return httpx.Response(412)
+        if request.headers.get("If-None-Match") == "*" and current is not None:
+            return httpx.Response(412)
+        etag = self.store(path, request.content)
+        if self.on_put is not None:
+            self.on_put()
+        return httpx.Response(201, headers={"ETag": self.etag(etag)} if self.put_etag else {})
+
+    def etag(self, value: str) -> str:
+        return f"W/{value}" if self.weak else value
+
+    def ls(self, path, detail=True):
+        self.requests.append(("PROPFIND", "/" + path.lstrip("/")))
+        return [
+            {"name": p.lstrip("/"), "type": "file", "content_length": len(c), "etag": etag,
+             "modified": datetime(2024, 1, 1)}
+            for p, (c, etag) in self.files.items() if p.rsplit("/", 1)[0] == "/" + path.strip("/")
+        ]
+
+    def manifest(self) -> CacheManifest:
+        return CacheManifest.decode(self.files[MANIFEST_PATH][0])
+
+
+def make_wrapper(server: FakeServer, **config) -> WebDAVClientWrapper:
+    """辅助函数：请求转发到 FakeServer 的已连接客户端"""
+    client = MagicMock()
+    client.join_url.side_effect = lambda path: f"https://example.com/dav{path}"
+    client.http = httpx.Client(transport=httpx.MockTransport(server.handle))
+    client.ls.side_effect = server.ls
+    client.download.side_effect = lambda path: server.files[path][0]
+
+    wrapper = WebDAVClientWrapper(WebDAVConfig(serverUrl="https://example.com/dav", syncPath="/sync", **config), Logger())
+    wrapper.client = client
+    wrapper._connected = True
+    return wrapper
+
+
+def summaries(*names: str) -> dict:
+    return {f"/sync/{n}-完整摘要.md": "摘要".encode() for n in names}
+
+
+class TestCacheManifest:
+    """清单读写与重建测试"""
+
+    def test_skip_check_is_one_get(self):
+        """测试有清单时只需一次 GET，不列出同步目录"""
+        manifest = CacheManifest(entries={"a": ManifestEntry("h"), "b": ManifestEntry("h")})
+        server = FakeServer({**summaries("a", "b"), MANIFEST_PATH: manifest.encode()})
+        wrapper = make_wrapper(server)
+
+        assert wrapper.list_cache_files() == {"a-完整摘要.md", "b-完整摘要.md"}
+        assert server.requests == [("GET", MANIFEST_PATH)]
+
+        book = BookFile(name="b.epub", path="/books/b.epub", extension=".epub", size=0, last_modified=datetime.now())
+        assert wrapper.check_cache_exists(book)
+        assert len(server.requests) == 1
+
+    def test_falls_back_to_listing(self):
+        """测试没有清单或关闭清单时列出同步目录"""
+        server = FakeServer(summaries("a"))
+
+        assert make_wrapper(server).list_cache_files() == {"a-完整摘要.md"}
+        assert ("PROPFIND", "/sync") in server.requests
+
+        server.requests.clear()
+        assert make_wrapper(server, cacheManifest=False).list_cache_files() == {"a-完整摘要.md"}
+        assert server.requests == [("PROPFIND", "/sync")]
+
+    def test_first_record_keeps_existing_summaries(self):
+        """测试首次写入清单时包含同步目录中已有的摘要"""
+        server = FakeServer(summaries("old"))
+        wrapper = make_wrapper(server)
+
+        assert wrapper.record_manifest("new", ManifestEntry.for_content("内容", "gpt", "v2"))
+        assert wrapper.record_manifest("newer", ManifestEntry.for_content("内容2"))
+
+        entries = server.manifest().entries
+        assert set(entries) == {"old", "new", "newer"}
+        assert entries["new"].model == "gpt" and entries["new"].promptVersion == "v2"
+        # 第二次写入直接使用缓存的 ETag：不再 GET / PROPFIND
+        assert [m for m, _ in server.requests] == ["GET", "PROPFIND", "PUT", "PUT"]
+
+    def test_missing_put_etag_fetched_with_head(self):
+        """测试 PUT 响应没有 ETag 时用 HEAD 读取，后续写入仍为条件写入"""
+        server = FakeServer({MANIFEST_PATH: CacheManifest(entries={"a": ManifestEntry("1")}).encode()}, put_etag=False)
+        wrapper = make_wrapper(server)
+
+        assert wrapper.record_manifest("b", ManifestEntry("2"))
+        assert wrapper.record_manifest("c", ManifestEntry("3"))
+
+        assert set(server.manifest().entries) == {"a", "b", "c"}
+        assert [m for m, _ in server.requests] == ["GET", "PUT", "HEAD", "PUT", "HEAD"]
+
+    def test_weak_etag_falls_back_to_verified_write(self):
+        """测试服务器只提供弱 ETag 时不使用 If-Match，写入后重新读取核对"""
+        server = FakeServer({MANIFEST_PATH: CacheManifest(entries={"a": ManifestEntry("1")}).encode()}, weak=True)
+        wrapper = make_wrapper(server)
+        sent = []
+        handle = server.handle
+        wrapper.client.http = httpx.Client(transport=httpx.MockTransport(
+            lambda request: sent.append(request.headers.get("If-Match")) or handle(request)
+        ))
+
+        assert wrapper.record_manifest("b", ManifestEntry("2"))
+        assert wrapper.record_manifest("c", ManifestEntry("3"))
+
+        assert set(server.manifest().entries) == {"a", "b", "c"}
+        assert not any(sent)
+        assert [m for m, _ in server.requests] == ["GET", "PUT", "GET", "PUT", "GET"]
+
+    def test_weak_etag_overwritten_entry_is_retried(self):
+        """测试弱 ETag 模式下其他进程覆盖了本次写入时重新读取合并"""
+        server = FakeServer({MANIFEST_PATH: CacheManifest(entries={"a": ManifestEntry("1")}).encode()}, weak=True)
+        wrapper = make_wrapper(server)
+        assert wrapper.record_manifest("b", ManifestEntry("2"))
+
+        def overwrite():
+            server.on_put = None
+            server.store(MANIFEST_PATH, CacheManifest(entries={**server.manifest().entries, "c": ManifestEntry("0"), "x": ManifestEntry("9")}).encode())
+
+        server.on_put = overwrite
+        assert wrapper.record_manifest("c", ManifestEntry("3"))
+        entries = server.manifest().entries
+        assert set(entries) == {"a", "b", "c", "x"}
+        assert entries["c"] == ManifestEntry("3")
+
+    def test_concurrent_update_is_merged(self):
+        """测试其他进程抢先更新清单时重新读取后合并"""
+        server = FakeServer({MANIFEST_PATH: CacheManifest(entries={"a": ManifestEntry("1")}).encode()})
+        wrapper = make_wrapper(server)
+        assert wrapper.record_manifest("b", ManifestEntry("2"))
+
+        other = server.manifest()
+        other.entries["c"] = ManifestEntry("3")
+        server.store(MANIFEST_PATH, other.encode())
+
+        assert wrapper.record_manifest("d", ManifestEntry("4"))
+        assert set(server.manifest().entries) == {"a", "b", "c", "d"}
+
+    def test_rebuild(self):
+        """测试从完整列表重建清单并读取元数据"""
+        server = FakeServer({
+            **summaries("a", "b"),
+            "/sync/a.meta.json": json.dumps({"model": "gpt", "promptVersion": "v1"}).encode(),
+            "/sync/notes.txt": b"",
+            MANIFEST_PATH: CacheManifest(entries={"stale": ManifestEntry()}).encode(),
+        })
+
+        manifest = make_wrapper(server).rebuild_manifest()
+
+        entries = server.manifest().entries
+        assert set(entries) == set(manifest.entries) == {"a", "b"}
+        assert (entries["a"].model, entries["a"].promptVersion) == ("gpt", "v1")
+        assert entries["b"].hash and entries["b"].model == ""
+
+
+class TestUploadManifest:
+    """上传队列写入清单测试"""
+
+    def test_manifest_recorded_after_upload(self, tmp_path):
+        """测试摘要上传成功后写入清单，清单写入失败时整个任务重试"""
+        webdav = MagicMock()
+        webdav.upload_file.return_value = True
+        webdav.record_manifest.side_effect = [False, True]
+        entry = ManifestEntry.for_content("摘要", "gpt", "v2")
+
+        with patch('src.cli.upload_queue.RETRY_BASE_DELAY', 0.01):
+            queue = UploadQueue(webdav, Logger(), str(tmp_path / "journal"))
+            queue.submit("/sync/a-完整摘要.md", "摘要", manifest=("a", entry))
+            assert queue.close(timeout=5)
+
+        assert webdav.upload_file.call_count == 2
+        webdav.record_manifest.assert_called_with("a", entry)
+        assert queue.stats().retried == 1
+
+    def test_manifest_survives_restart(self, tmp_path):
+        """测试持久化的任务保留清单记录"""
+        failing = MagicMock()
+        failing.upload_file.return_value = False
+        entry = ManifestEntry.for_content("摘要", "gpt", "v2")
+        queue = UploadQueue(failing, Logger(), str(tmp_path / "journal"), max_retries=0)
+        queue.submit("/sync/a-完整摘要.md", "摘要", manifest=("a", entry))
+        queue.close(timeout=5)
+
+        webdav = MagicMock()
+        webdav.upload_file.return_value = True
+        webdav.record_manifest.return_value = True
+        restarted = UploadQueue(webdav, Logger(), str(tmp_path / "journal"))
+        assert restarted.resume() == 1
+        assert restarted.close(timeout=5)
+        webdav.record_manifest.assert_called_once_with("a", entry)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,166 @@
+"""
+录制 / 回放测试
+"""
+
+import io
+import sys
+import pytest
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import MagicMock
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.cli.ai_client import AIResponse, MockClient, PromptTemplates
+from src.cli.cassette import Cassette, CassetteAIClient, CassetteWebDAV, CassetteMissError
+from src.cli.config import AIProviderConfig
+from src.cli.logger import Logger
+from src.cli.models import BookFile, ChapterInfo
+
+
+def make_webdav(book_bytes: bytes):
+    """辅助函数：构造一个假的 WebDAV 客户端"""
+    webdav = MagicMock()
+    webdav.connect.return_value = True
+    webdav.list_books.return_value = [
+        BookFile(name="a.epub", path="/books/a.epub", extension=".epub", size=len(book_bytes),
+                 last_modified=datetime(2024, 1, 1))
+    ]
+    webdav.list_cache_files.return_value = {"b-完整摘要.md"}
+
+    def download_file(remote_path, local_path, *args):
+        Path(local_path).parent.mkdir(parents=True, exist_ok=True)
+        Path(local_path).write_bytes(book_bytes)
+        return True
+
+    webdav.download_file.side_effect = download_file
+    webdav.upload_file.return_value = True
+    return webdav
+
+
+class TestCassette:
+    """Cassette 录制与回放测试"""
+
+    def test_record_and_replay_roundtrip(self, tmp_path):
+        """测试录制后可以离线回放"""
+        cassette_path = tmp_path / "run.cassette.gz"
+        book_bytes = b"PK\x03\x04" + b"x" * 1000
+        chapter = ChapterInfo(id="1", title="第一章", content="内容" * 500)
+
+        # 录制
+        recorder = Cassette(str(cassette_path))
+        ai = MockClient(
+            AIProviderConfig(provider="mock", model="mock", customFields={'timeScale': 0, 'seed': 5}),
+            Logger(), PromptTemplates()
+        )
+        recording_ai = CassetteAIClient(ai, recorder)
+        recording_webdav = CassetteWebDAV(make_webdav(book_bytes), recorder)
+
+        assert recording_webdav.connect() is True
+        books = recording_webdav.list_books("/books")
+        cached = recording_webdav.list_cache_files()
+        assert recording_webdav.download_file(books[0].path, str(tmp_path / "live" / "a.epub"))
+        summary = recording_ai.summarize_chapter(chapter, "non-fiction", "zh")
+        assert recording_webdav.upload_file("/sync/a-完整摘要.md", summary.content)
+        recorder.save()
+
+        # 回放
+        cassette = Cassette.load(str(cassette_path))
+        replay_ai = CassetteAIClient(None, cassette, replay=True, time_scale=0)
+        replay_webdav = CassetteWebDAV(None, cassette, replay=True, time_scale=0)
+
+        assert replay_webdav.connect() is True
+        replayed_books = replay_webdav.list_books("/books")
+        assert replayed_books == books
+        assert replay_webdav.list_cache_files() == cached
+
+        local_path = tmp_path / "replay" / "a.epub"
+        assert replay_webdav.download_file(books[0].path, str(local_path))
+        assert local_path.read_bytes() == book_bytes
+
+        replayed = replay_ai.summarize_chapter(chapter, "non-fiction", "zh")
+        assert replayed == summary
+        assert replay_webdav.upload_file("/sync/a-完整摘要.md", "changed content") is True
+
+    def test_download_to_buffer_roundtrip(self, tmp_path):
+        """测试内存下载的录制与回放"""
+        cassette_path = tmp_path / "buffer.cassette.gz"
+        book_bytes = b"PK\x03\x04" + b"y" * 500
+        webdav = MagicMock()
+        webdav.download_to_buffer.side_effect = lambda path, max_memory, *args: io.BytesIO(book_bytes)
+
+        recorder = Cassette(str(cassette_path))
+        buffer = CassetteWebDAV(webdav, recorder).download_to_buffer("/books/a.epub", 1024)
+        assert buffer.read() == book_bytes
+        recorder.save()
+
+        replay_webdav = CassetteWebDAV(None, Cassette.load(str(cassette_path)), replay=True, time_scale=0)
+        assert replay_webdav.download_to_buffer("/books/a.epub", 1024).read() == book_bytes
+
+    def test_records_written_incrementally(self, tmp_path):
+        """测试录制中途崩溃（未调用 save）时已录制的记录与数据块仍可回放"""
+        cassette_path = tmp_path / "crash.cassette.gz"
+        book_bytes = b"%PDF" + bytes(range(256)) * 5000
+        webdav = MagicMock()
+        webdav.list_books.return_value = []
+        webdav.download_to_buffer.side_effect = lambda path, max_memory, *args: io.BytesIO(book_bytes)
+
+        recorder = Cassette(str(cassette_path))
+        recorder.BLOB_CHUNK = 4096
+        recording = CassetteWebDAV(webdav, recorder)
+        assert recording.list_books("/books") == []
+        recording.download_to_buffer("/books/a.pdf", 1024).close()
+
+        # 数据块保存在文件中而不是内存中
+        assert [p.read_bytes() for p in recorder.blob_dir.iterdir()] == [book_bytes]
+
+        replay = CassetteWebDAV(None, Cassette.load(str(cassette_path)), replay=True, time_scale=0)
+        assert replay.list_books("/books") == []
+        with replay.download_to_buffer("/books/a.pdf", 1024) as buffer:
+            assert buffer.read() == book_bytes
+
+    def test_overall_summary_keyed_by_summary_mode(self, tmp_path):
+        """测试全书总结的匹配键包含是否附带章节摘要"""
+        cassette_path = tmp_path / "overall.cassette.gz"
+        chapters = [ChapterInfo(id="1", title="第一章", content="内容")]
+        ai = MagicMock()
+        ai.generate_overall_summary.return_value = AIResponse(content="总结", success=True)
+
+        recorder = Cassette(str(cassette_path))
+        CassetteAIClient(ai, recorder).generate_overall_summary("书", chapters, "", "zh", with_summaries=True)
+        recorder.save()
+
+        replay = CassetteAIClient(None, Cassette.load(str(cassette_path)), replay=True, time_scale=0)
+        with pytest.raises(CassetteMissError):
+            replay.generate_overall_summary("书", chapters, "", "zh")
+        assert replay.generate_overall_summary("书", chapters, "", "zh", with_summaries=True).content == "总结"
+
+    def test_replay_miss_raises(self, tmp_path):
+        """测试回放时请求与录制不匹配"""
+        cassette_path = tmp_path / "empty.cassette.gz"
+        Cassette(str(cassette_path)).save()
+
+        replay_ai = CassetteAIClient(None, Cassette.load(str(cassette_path)), replay=True, time_scale=0)
+        with pytest.raises(CassetteMissError):
+            replay_ai.summarize_chapter(ChapterInfo(id="1", title="T", content="c"), "fiction", "zh")
+
+    def test_recorded_errors_are_replayed(self, tmp_path):
+        """测试录制的异常在回放时重新抛出"""
+        cassette_path = tmp_path / "err.cassette.gz"
+        recorder = Cassette(str(cassette_path))
+        webdav = MagicMock()
+        webdav.list_books.side_effect = RuntimeError("503 Service Unavailable")
+
+        with pytest.raises(RuntimeError):
+            CassetteWebDAV(webdav, recorder).list_books("/books")
+        recorder.save()
+
+        replay_webdav = CassetteWebDAV(None, Cassette.load(str(cassette_path)), replay=True, time_scale=0)
+        with pytest.raises(RuntimeError, match="503"):
+            replay_webdav.list_books("/books")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,486 @@
+"""
+章节提取器测试
+"""
+
+import io
+import sys
+import time
+import zipfile
+import pytest
+from pathlib import Path
+from unittest.mock import patch
+from pypdf import PageObject, PdfReader, PdfWriter
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.cli import chapter_extractor
+from src.cli.chapter_extractor import EPUBExtractor, PDFExtractor, PageSpool, ChapterExtractorFactory
+
+
+CONTAINER_XML = """<?xml version="1.0"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+  <rootfiles>
+    <rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>
+  </rootfiles>
+</container>"""
+
+
+def make_xhtml(title: str, body: str) -> str:
+    """辅助函数：生成章节 XHTML"""
+    return f"""<?xml version="1.0" encoding="utf-8"?>
+<html xmlns="http://www.w3.org/1999/xhtml">
+<head><title>{title}</title></head>
+<body><h1>{title}</h1>{body}</body>
+</html>"""
+
+
+def build_epub(path: Path, chapters: list, spine_order: list = None, image_size: int = 0,
+               title: str = "测试书籍", author: str = "测试作者", toc: list = None, ncx: bool = False) -> Path:
+    """
+    辅助函数：构造 EPUB 文件
+
+    Args:
+        chapters: [(标题, 正文 HTML)]，按清单（manifest）顺序
+        spine_order: spine 中的章节下标顺序，默认与清单一致
+        image_size: 附带图片的大小（字节）
+        toc: 目录 [(章节下标, 标题)]，写入 EPUB 3 导航文档（ncx=True 时写入 EPUB 2 的 NCX）
+    """
+    spine_order = spine_order if spine_order is not None else list(range(len(chapters)))
+
+    manifest = "\n".join(
+        f'<item id="c{i}" href="text/ch{i}.xhtml" media-type="application/xhtml+xml"/>'
+        for i in range(len(chapters))
+    )
+    if image_size:
+        manifest += '\n<item id="img" href="images/cover.jpg" media-type="image/jpeg"/>'
+    if toc and ncx:
+        manifest += '\n<item id="ncx" href="toc.ncx" media-type="application/x-dtbncx+xml"/>'
+    elif toc:
+        manifest += '\n<item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>'
+    spine = "\n".join(f'<itemref idref="c{i}"/>' for i in spine_order)
+
+    opf = f"""<?xml version="1.0" encoding="utf-8"?>
+<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="id">
+  <metadata xmlns:dc="http://purl.org/dc/elements/1.1/">
+    <dc:title>{title}</dc:title>
+    <dc:creator>{author}</dc:creator>
+  </metadata>
+  <manifest>
+{manifest}
+  </manifest>
+  <spine{' toc="ncx"' if toc and ncx else ''}>
+{spine}
+  </spine>
+</package>"""
+
+    with zipfile.ZipFile(path, 'w') as archive:
+        archive.writestr('mimetype', 'application/epub+zip', compress_type=zipfile.ZIP_STORED)
+        archive.writestr('META-INF/container.xml', CONTAINER_XML)
+        archive.writestr('OEBPS/content.opf', opf)
+        for i, (chapter_title, body) in enumerate(chapters):
+            archive.writestr(f'OEBPS/text/ch{i}.xhtml', make_xhtml(chapter_title, body),
+                             compress_type=zipfile.ZIP_DEFLATED)
+        if image_size:
+            archive.writestr('OEBPS/images/cover.jpg', b'\xff' * image_size)
+        if toc and ncx:
+            points = "".join(
+                f'<navPoint id="p{n}"><navLabel><text>{label}</text></navLabel>'
+                f'<content src="text/ch{i}.xhtml"/></navPoint>'
+                for n, (i, label) in enumerate(toc)
+            )
+            archive.writestr('OEBPS/toc.ncx', '<?xml version="1.0" encoding="utf-8"?>'
+                             '<ncx xmlns="http://www.daisy.org/z3986/2005/ncx/" version="2005-1">'
+                             f'<navMap>{points}</navMap></ncx>')
+        elif toc:
+            items = "".join(f'<li><a href="text/ch{i}.xhtml#top">{label}</a></li>' for i, label in toc)
+            archive.writestr('OEBPS/nav.xhtml', '<?xml version="1.0" encoding="utf-8"?>'
+                             '<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops">'
+                             f'<body><nav epub:type="toc"><ol>{items}</ol></nav></body></html>')
+
+    return path
+
+
+def paragraph(text: str, repeat: int = 20) -> str:
+    """辅助函数：生成足够长的段落"""
+    return "".join(f"<p>{text} {i}</p>" for i in range(repeat))
+
+
+def identity_to_unicode(chars: set) -> bytes:
+    """辅助函数：码位即 Unicode 的 ToUnicode 映射（只列出用到的字符），使 CJK 文本无需嵌入字体即可被提取"""
+    codes = [f"<{ord(c):04x}> <{ord(c):04x}>" for c in sorted(chars)]
+    chunks = [codes[i:i + 100] for i in range(0, len(codes), 100)]
+    entries = "\n".join(f"{len(chunk)} beginbfchar\n" + "\n".join(chunk) + "\nendbfchar" for chunk in chunks)
+    return ("/CIDInit /ProcSet findresource begin\n12 dict begin\nbegincmap\n"
+            "/CMapName /Identity-UCS def\n/CMapType 2 def\n"
+            "1 begincodespacerange\n<0000> <FFFF>\nendcodespacerange\n"
+            f"{entries}\nendcmap\nCMapName currentdict /CMap defineresource pop\nend\nend").encode("ascii")
+
+
+def build_pdf(path: Path, pages: list[list[str]], images: dict = None) -> Path:
+    """
+    辅助函数：构造包含文本的 PDF（每页若干行文本；非 Latin-1 的行使用 Identity-H 编码的 CJK 字体）
+
+    Args:
+        pages: 每页的文本行
+        images: {页下标: 图片大小（字节）}，在对应页面绘制一张灰度图
+    """
+    images = images or {}
+    wide_chars = {c for lines in pages for line in lines if max(line, default='') > '\xff' for c in line}
+    to_unicode = identity_to_unicode(wide_chars)
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # 页面树，待页面生成后填充
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+        b"<< /Type /Font /Subtype /Type0 /BaseFont /CJK /Encoding /Identity-H "
+        b"/DescendantFonts [5 0 R] /ToUnicode 6 0 R >>",
+        b"<< /Type /Font /Subtype /CIDFontType2 /BaseFont /CJK "
+        b"/CIDSystemInfo << /Registry (Adobe) /Ordering (Identity) /Supplement 0 >> /DW 1000 >>",
+        b"<< /Length %d >>\nstream\n" % len(to_unicode) + to_unicode + b"\nendstream",
+    ]
+    kids = []
+    for page_index, lines in enumerate(pages):
+        ops = ["BT", "/F1 10 Tf", "14 TL", "50 780 Td"]
+        fonts = b"/F1 3 0 R"
+        xobjects = b""
+        for line in lines:
+            if max(line, default='') > '\xff':
+                ops.append(f"/F2 10 Tf <{line.encode('utf-16-be').hex()}> Tj T* /F1 10 Tf")
+                fonts = b"/F1 3 0 R /F2 4 0 R"
+                continue
+            escaped = line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+            ops.append(f"({escaped}) Tj T*")
+        ops.append("ET")
+        if images.get(page_index):
+            height = max(images[page_index] // 1024, 1)
+            objects.append(
+                b"<< /Type /XObject /Subtype /Image /Width 1024 /Height %d /ColorSpace /DeviceGray "
+                b"/BitsPerComponent 8 /Length %d >>\nstream\n" % (height, 1024 * height)
+                + b"\x80" * (1024 * height) + b"\nendstream"
+            )
+            xobjects = b" /XObject << /Im1 %d 0 R >>" % len(objects)
+            ops.append("q 200 0 0 100 50 50 cm /Im1 Do Q")
+        stream = "\n".join(ops).encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << %s >>%s >> /Contents %d 0 R >>" % (fonts, xobjects, content_id)
+        )
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % k for k in kids), len(kids)
+    )
+
+    data = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objects):
+        offsets.append(len(data))
+        data += b"%d 0 obj\n" % (i + 1) + body + b"\nendobj\n"
+    xref = len(data)
+    data += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        data += b"%010d 00000 n \n" % offset
+    data += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+
+    path.write_bytes(bytes(data))
+    return path
+
+
+def book_pages(count: int) -> list[list[str]]:
+    """辅助函数：生成逐页编号的正文"""
+    return [[f"Page body {i + 1} line {j}" for j in range(12)] for i in range(count)]
+
+
+class TestEPUBExtractor:
+    """EPUB 提取测试"""
+
+    def test_extract_metadata_and_chapters(self, tmp_path):
+        """测试提取元数据与章节"""
+        path = build_epub(tmp_path / "book.epub", [
+            ("第一章 开端", paragraph("这是第一章的内容")),
+            ("第二章 发展", paragraph("这是第二章的内容")),
+        ])
+
+        book = ChapterExtractorFactory.extract(str(path))
+
+        assert book.title == "测试书籍"
+        assert book.author == "测试作者"
+        assert book.file_type == 'epub'
+        assert [c.title for c in book.chapters] == ["第一章 开端", "第二章 发展"]
+        assert "这是第一章的内容 0" in book.chapters[0].content
+        assert [c.index for c in book.chapters] == [0, 1]
+
+    def test_spine_order_not_manifest_order(self, tmp_path):
+        """测试按 spine 顺序而非清单顺序输出"""
+        path = build_epub(tmp_path / "book.epub", [
+            ("第三章", paragraph("第三章的正文内容")),
+            ("第一章", paragraph("第一章的正文内容")),
+            ("第二章", paragraph("第二章的正文内容")),
+        ], spine_order=[1, 2, 0])
+
+        book = EPUBExtractor().extract(str(path))
+        assert [c.title for c in book.chapters] == ["第一章", "第二章", "第三章"]
+
+    def test_only_text_documents_are_read(self, tmp_path):
+        """测试不会解压图片等资源"""
+        path = build_epub(tmp_path / "book.epub", [("第一章", paragraph("内容"))], image_size=100_000)
+
+        read_names = []
+        original_read = zipfile.ZipFile.read
+
+        def tracking_read(self, name, *args, **kwargs):
+            read_names.append(name if isinstance(name, str) else name.filename)
+            return original_read(self, name, *args, **kwargs)
+
+        with patch.object(zipfile.ZipFile, 'read', tracking_read):
+            chapters = list(EPUBExtractor().iter_chapters(str(path)))
+
+        assert len(chapters) == 1
+        assert not any(name.endswith('.jpg') for name in read_names)
+
+    def test_skip_keywords(self, tmp_path):
+        """测试跳过目录、版权页等章节"""
+        path = build_epub(tmp_path / "book.epub", [
+            ("版权页", paragraph("版权信息")),
+            ("第一章", paragraph("正文")),
+        ])
+
+        book = EPUBExtractor().extract(str(path))
+        assert [c.title for c in book.chapters] == ["第一章"]
+
+    def test_notes_removed_and_counted(self, tmp_path):
+        """测试删除脚注与独立的注释章节，并统计去除的字符"""
+        footnote = '<aside epub:type="footnote"><p>' + "脚注内容" * 30 + '</p></aside>'
+        chapters = [
+            ("第一章", paragraph("正文内容") + footnote),
+            ("注释", paragraph("第一章的尾注条目")),
+        ]
+        path = build_epub(tmp_path / "book.epub", chapters)
+
+        book = EPUBExtractor().extract(str(path))
+        kept = EPUBExtractor(notes='keep').extract(str(path))
+        compact = ChapterExtractorFactory.extract(str(path), epub_notes='compact')
+
+        assert [c.title for c in book.chapters] == ["第一章"]
+        assert "脚注内容" not in book.chapters[0].content
+        chars = [len(c.content.replace('\n', '')) for c in kept.chapters + book.chapters]
+        assert book.noise.chars == chars[0] - chars[2] + chars[1]
+        assert kept.noise.chars == 0
+        assert [c.title for c in compact.chapters] == ["第一章", "注释"]
+        assert 0 < compact.noise.chars < book.noise.chars
+
+        with pytest.raises(ValueError, match="注释处理方式"):
+            EPUBExtractor(notes='hide')
+
+    def test_extract_from_memory(self, tmp_path):
+        """测试从字节与文件对象提取，结果与按路径提取一致"""
+        path = build_epub(tmp_path / "book.epub", [("第一章", paragraph("正文内容"))])
+        data = path.read_bytes()
+
+        expected = EPUBExtractor().extract(str(path))
+        from_bytes = EPUBExtractor().extract(data)
+        with open(path, 'rb') as f:
+            f.read(10)  # 未定位到开头的文件对象
+            from_file = ChapterExtractorFactory.extract("book.epub", source=f)
+
+        assert from_bytes.chapters == from_file.chapters == expected.chapters
+        assert from_bytes.file_path == ""
+        assert from_file.file_path == "book.epub"
+
+    def test_invalid_epub(self, tmp_path):
+        """测试无效 EPUB"""
+        path = tmp_path / "broken.epub"
+        path.write_bytes(b"not a zip")
+
+        with pytest.raises(Exception, match="EPUB 解析失败"):
+            EPUBExtractor().extract(str(path))
+
+
+class TestPDFExtractor:
+    """PDF 提取测试"""
+
+    def test_parallel_matches_sequential(self, tmp_path):
+        """测试并行提取与顺序提取结果一致且按页序组装"""
+        path = build_pdf(tmp_path / "book.pdf", book_pages(12))
+
+        sequential = PDFExtractor(workers=1)
+        parallel = PDFExtractor(workers=3)
+        parallel.PAGES_PER_TASK = 2
+
+        seq_texts, seq_failures = sequential._extract_pages(str(path), 12)
+        par_texts, par_failures = parallel._extract_pages(str(path), 12)
+
+        assert par_texts == seq_texts
+        assert "Page body 1 line 0" in par_texts[0]
+        assert "Page body 12 line 0" in par_texts[11]
+        assert seq_failures == par_failures == []
+
+    def test_extract_from_memory(self, tmp_path):
+        """测试从字节提取 PDF（在当前进程内顺序提取）"""
+        path = build_pdf(tmp_path / "book.pdf", book_pages(30))
+
+        expected = PDFExtractor(workers=1).extract(str(path))
+        with patch.object(chapter_extractor, 'ProcessPoolExecutor', side_effect=AssertionError("不应启动进程池")):
+            book = PDFExtractor(workers=4).extract(path.read_bytes())
+
+        assert book.chapters == expected.chapters
+        assert PDFExtractor.count_pages(io.BytesIO(path.read_bytes())) == 30
+
+    def test_page_failure_report(self, tmp_path):
+        """测试单页失败被记录而不是中断整本书"""
+        path = build_pdf(tmp_path / "book.pdf", book_pages(4))
+        original = PageObject.extract_text
+
+        def flaky(self, *args, **kwargs):
+            text = original(self, *args, **kwargs)
+            if "Page body 3 " in text:
+                raise ValueError("bad content stream")
+            return text
+
+        with patch.object(PageObject, 'extract_text', flaky):
+            book = PDFExtractor(workers=1).extract(str(path))
+
+        assert [f.page for f in book.page_failures] == [3]
+        assert "bad content stream" in book.page_failures[0].error
+        assert book.chapters
+
+    def test_page_timeout(self, tmp_path):
+        """测试单页超时"""
+        path = build_pdf(tmp_path / "book.pdf", book_pages(3))
+        original = PageObject.extract_text
+
+        def slow(self, *args, **kwargs):
+            text = original(self, *args, **kwargs)
+            if "Page body 2 " in text:
+                time.sleep(5)
+            return text
+
+        start = time.time()
+        with patch.object(PageObject, 'extract_text', slow):
+            texts, failures = PDFExtractor(workers=1, page_timeout=0.2)._extract_pages(str(path), 3)
+
+        assert time.time() - start < 3
+        assert [f.page for f in failures] == [2]
+        assert "PageTimeoutError" in failures[0].error
+        assert "Page body 3 line 0" in texts[2]
+
+    def test_split_by_outline(self, tmp_path):
+        """测试按书签分章，章节包含页面正文"""
+        path = build_pdf(tmp_path / "plain.pdf", book_pages(6))
+        writer = PdfWriter(clone_from=PdfReader(str(path)))
+        root = writer.add_outline_item("全书", 0)
+        writer.add_outline_item("Opening", 1, parent=root)
+        writer.add_outline_item("Middle", 3, parent=root)
+        outlined = tmp_path / "outlined.pdf"
+        with open(outlined, 'wb') as f:
+            writer.write(f)
+
+        book = PDFExtractor(workers=1).extract(str(outlined))
+
+        # 第 1 页（书签之前）单独成块
+        assert [c.title for c in book.chapters] == ["Page body 1 line 0", "Opening", "Middle"]
+        assert "Page body 2 line 0" in book.chapters[1].content
+        assert "Page body 3 line 11" in book.chapters[1].content
+        assert "Page body 4 line 0" not in book.chapters[1].content
+        assert "Page body 6 line 11" in book.chapters[2].content
+
+    def test_split_by_heading_pattern(self):
+        """测试没有书签时按页首标题分章"""
+        body = ["正文内容" * 20] * 3
+        texts = [
+            "前言\n" + "\n".join(body),
+            "第一章 开端\n" + "\n".join(body),
+            "\n".join(body) + "\n如第二章所述",
+            "Chapter 2 Growth\n" + "\n".join(body),
+        ]
+
+        chapters = PDFExtractor(workers=1)._split_into_chapters(texts)
+
+        assert [c.title for c in chapters] == ["前言", "第一章 开端", "Chapter 2 Growth"]
+        assert "如第二章所述" in chapters[1].content
+        assert [c.index for c in chapters] == [0, 1, 2]
+
+    def test_split_is_linear(self):
+        """测试大量页面分章不会出现二次方开销"""
+        texts = [f"Chapter {i // 10 + 1}\n" + "text " * 100 if i % 10 == 0 else "text " * 100 for i in range(20000)]
+
+        start = time.time()
+        chapters = PDFExtractor(workers=1)._split_into_chapters(texts)
+
+        assert len(chapters) == 2000
+        assert time.time() - start < 5
+
+
+class TestPDFStreaming:
+    """PDF 流式提取测试"""
+
+    def make_chaptered_pdf(self, path: Path, chapters: int = 4, pages_per_chapter: int = 3) -> Path:
+        pages = []
+        for c in range(chapters):
+            for p in range(pages_per_chapter):
+                lines = [f"Chapter {c + 1}"] if p == 0 else []
+                lines += [f"Body text of part {c + 1}, page {p}, line {j}" for j in range(10)]
+                pages.append(lines)
+        return build_pdf(path, pages)
+
+    def test_page_spool(self):
+        """测试页面暂存区按区间读回"""
+        with PageSpool() as spool:
+            for text in ["第一页", "page two", "", "第四页"]:
+                spool.append(text)
+            assert len(spool) == 4
+            assert spool.read(1, 2) == "page two\n"
+            assert spool.read(0, 4) == "第一页\npage two\n\n第四页\n"
+
+    def test_stream_matches_extract(self, tmp_path):
+        """测试流式提取与完整提取结果一致"""
+        path = self.make_chaptered_pdf(tmp_path / "book.pdf")
+
+        book = PDFExtractor(workers=1).extract(str(path))
+        stream = ChapterExtractorFactory.stream(str(path), pdf_workers=2)
+
+        assert stream.title == book.title
+        assert list(stream.chapters) == book.chapters
+        assert [c.title for c in book.chapters] == ["Chapter 1", "Chapter 2", "Chapter 3", "Chapter 4"]
+
+    def test_chapters_yielded_incrementally(self, tmp_path):
+        """测试章节在整本书提取完成前就开始生成"""
+        path = self.make_chaptered_pdf(tmp_path / "book.pdf", chapters=3)
+        extracted = []
+        original = chapter_extractor._extract_page_range
+
+        def tracking(file_path, start, end, *args):
+            extracted.extend(range(start, end))
+            return original(file_path, start, end, *args)
+
+        extractor = PDFExtractor(workers=1)
+        extractor.PAGES_PER_TASK = 1
+        extractor.RUNNING_LINE_LOOKAHEAD = 0
+        with patch.object(chapter_extractor, '_extract_page_range', tracking):
+            chapters = extractor.stream(str(path)).chapters
+            first = next(chapters)
+            pages_at_first = len(extracted)
+            rest = list(chapters)
+
+        assert first.title == "Chapter 1"
+        # 第一章在读到第二章首页时即生成
+        assert pages_at_first == 4
+        assert len(rest) == 2
+
+    def test_epub_stream(self, tmp_path):
+        """测试 EPUB 流式提取"""
+        path = build_epub(tmp_path / "book.epub", [
+            ("第一章", paragraph("第一章的正文内容")),
+            ("第二章", paragraph("第二章的正文内容")),
+        ])
+
+        stream = ChapterExtractorFactory.stream(str(path))
+
+        assert stream.title == "测试书籍"
+        assert [c.title for c in stream.chapters] == ["第一章", "第二章"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
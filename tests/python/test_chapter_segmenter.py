@@ -0,0 +1,171 @@
+"""
+分章模式测试
+"""
+
+import sys
+import pytest
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.cli.chapter_extractor import Chapter, ChapterExtractorFactory, EPUBExtractor
+from src.cli.chapter_segmenter import _split_text, balance_chapters, normalize_detection_mode
+from src.cli.config import (
+    AdvancedConfig, AIConfig, BatchConfig, Config, OutputConfig, ProcessingConfig, WebDAVConfig, validate_config
+)
+from src.cli.extraction_cache import ExtractionCache
+
+from test_chapter_extractor import build_epub, paragraph
+
+
+def chapters(*lengths: int) -> list[Chapter]:
+    """辅助函数：按给定长度生成多行章节"""
+    return [
+        Chapter(title=f"C{i}", content="\n".join(["x" * 99] * (n // 100)), index=i)
+        for i, n in enumerate(lengths)
+    ]
+
+
+class TestBalanceChapters:
+    """目标大小分段测试"""
+
+    def test_merges_small_chapters(self):
+        """测试连续的短章节合并到接近目标大小"""
+        result = list(balance_chapters(chapters(200, 200, 200, 200, 1000, 300), target_tokens=500))
+
+        assert [c.title for c in result] == ["C0 ~ C3", "C4", "C5"]
+        assert [c.index for c in result] == [0, 1, 2]
+        assert result[0].content.count("x" * 99) == 8
+
+    def test_splits_giant_chapter(self):
+        """测试超长章节按行拆分为长度接近的几段"""
+        result = list(balance_chapters(chapters(10_000), target_tokens=1000))
+
+        assert [c.title for c in result] == [f"C0（{i}/5）" for i in range(1, 6)]
+        sizes = [len(c.content) for c in result]
+        assert max(sizes) - min(sizes) <= 100
+        assert "\n".join(c.content for c in result) == chapters(10_000)[0].content
+
+    def test_splits_single_long_line(self):
+        """测试没有换行的超长章节在行内切分"""
+        giant = Chapter(title="G", content="y" * 9000, index=0)
+
+        result = list(balance_chapters([giant], target_tokens=1000))
+
+        assert len(result) == 4
+        assert "".join(c.content for c in result) == giant.content
+
+    def test_split_respects_size(self):
+        """测试整行恰好填满一段后紧跟超长行时，每段仍不超过目标长度"""
+        content = "a" * 9 + "\n" + "b" * 35
+        chunks = _split_text(content, 5)
+
+        assert max(len(c) for c in chunks) <= 9
+        assert "".join(chunks) == content.replace("\n", "")
+
+        lines = "\n".join("x" * n for n in (7, 30, 1, 12, 3))
+        assert all(len(c) <= 8 for c in _split_text(lines, -(-len(lines) // 8)))
+
+    def test_streaming(self):
+        """测试逐个消费输入，不预先读完全部章节"""
+        consumed = []
+
+        def source():
+            for chapter in chapters(3000, 3000, 3000):
+                consumed.append(chapter.index)
+                yield chapter
+
+        first = next(balance_chapters(source(), target_tokens=1500))
+
+        assert first.title == "C0"
+        assert consumed == [0, 1]
+
+    def test_normalize_mode(self):
+        """测试兼容前端的模式名称与未知模式"""
+        assert normalize_detection_mode('epub-toc') == 'toc'
+        assert normalize_detection_mode('smart') == 'normal'
+        assert normalize_detection_mode('Balanced') == 'balanced'
+        with pytest.raises(ValueError, match="未知的分章模式"):
+            normalize_detection_mode('chapters')
+
+    def test_config_validation(self):
+        """测试配置中的未知分章模式"""
+        config = Config(WebDAVConfig(), AIConfig(), ProcessingConfig(chapterDetectionMode='fancy'),
+                        BatchConfig(), OutputConfig(), AdvancedConfig())
+        assert any("分章模式" in e for e in validate_config(config))
+
+    def test_extractor_options_validation(self):
+        """测试配置中的未知 PDF 引擎与注释处理方式在加载时报错"""
+        config = Config(WebDAVConfig(), AIConfig(), ProcessingConfig(), BatchConfig(), OutputConfig(),
+                        AdvancedConfig(pdfEngine='pymupfd', epubNotes='remove'))
+        errors = validate_config(config)
+        assert any("PDF 文本引擎" in e for e in errors)
+        assert any("注释处理方式" in e for e in errors)
+
+
+class TestTocMode:
+    """按目录分章测试"""
+
+    BOOK = [
+        ("引子", paragraph("引子文字")),
+        ("第一部分 起", paragraph("第一部分正文")),
+        ("一之续", paragraph("第一部分续篇")),
+        ("第二部分 承", paragraph("第二部分正文")),
+    ]
+    TOC = [(1, "第一部分"), (3, "第二部分")]
+
+    @pytest.mark.parametrize("ncx", [False, True])
+    def test_groups_documents_by_toc(self, tmp_path, ncx):
+        """测试导航文档 / NCX 条目之间的文档合并为一章"""
+        path = build_epub(tmp_path / "book.epub", self.BOOK, toc=self.TOC, ncx=ncx)
+
+        book = EPUBExtractor(toc=True).extract(str(path))
+
+        assert [c.title for c in book.chapters] == ["引子", "第一部分", "第二部分"]
+        assert "第一部分续篇" in book.chapters[1].content
+
+    def test_normal_mode_ignores_toc(self, tmp_path):
+        """测试常规模式仍按文档分章"""
+        path = build_epub(tmp_path / "book.epub", self.BOOK, toc=self.TOC)
+
+        book = ChapterExtractorFactory.extract(str(path), detection='normal')
+
+        assert len(book.chapters) == 4
+
+    def test_without_toc_falls_back(self, tmp_path):
+        """测试没有目录时按文档分章"""
+        path = build_epub(tmp_path / "book.epub", self.BOOK)
+
+        book = ChapterExtractorFactory.extract(str(path), detection='epub-toc')
+
+        assert len(book.chapters) == 4
+
+    def test_balanced_cache_variant(self, tmp_path):
+        """测试不同分章模式使用不同的提取缓存条目"""
+        path = build_epub(tmp_path / "book.epub", self.BOOK, toc=self.TOC)
+        cache = ExtractionCache(str(tmp_path / "cache"), max_bytes=10 * 1024 * 1024)
+
+        normal = ChapterExtractorFactory.extract(str(path), cache=cache)
+        balanced = ChapterExtractorFactory.extract(str(path), cache=cache, detection='balanced', target_tokens=100_000)
+        again = ChapterExtractorFactory.extract(str(path), cache=cache, detection='balanced', target_tokens=100_000)
+
+        assert len(normal.chapters) == 4
+        assert [c.title for c in balanced.chapters] == ["引子 ~ 第二部分"]
+        assert cache.hits == 1
+        assert [c.title for c in again.chapters] == ["引子 ~ 第二部分"]
+
+    def test_balanced_stream(self, tmp_path):
+        """测试流式提取同样按目标大小分段"""
+        path = build_epub(tmp_path / "book.epub", self.BOOK)
+
+        book = ChapterExtractorFactory.stream(str(path), detection='balanced', target_tokens=50)
+
+        titles = [c.title for c in book.chapters]
+        assert len(titles) > 4
+        assert titles[0].startswith("引子（1/")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
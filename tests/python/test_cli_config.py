@@ -137,16 +137,16 @@ currentPromptVersion: v2
 promptVersionConfig:
   v1:
     chapterSummary:
-      fiction: " fiction prompt v1"
-      nonFiction: "non-fiction prompt v1"
-    connectionAnalysis: "connection prompt v1"
-    overallSummary: "summary prompt v1"
+      fiction: " fiction prompt v1 {{content}}"
+      nonFiction: "non-fiction prompt v1 {{content}}"
+    connectionAnalysis: "connection prompt v1 {{chapterSummaries}}"
+    overallSummary: "summary prompt v1 {{chapterInfo}}"
   v2:
     chapterSummary:
-      fiction: "fiction prompt v2"
-      nonFiction: "non-fiction prompt v2"
-    connectionAnalysis: "connection prompt v2"
-    overallSummary: "summary prompt v2"
+      fiction: "fiction prompt v2 {{content}}"
+      nonFiction: "non-fiction prompt v2 {{content}}"
+    connectionAnalysis: "connection prompt v2 {{chapterSummaries}}"
+    overallSummary: "summary prompt v2 {{chapterInfo}}"
 """
         f_name = write_config_file(config_content)
         try:
@@ -308,13 +308,13 @@ currentPromptVersion: v1
 promptVersionConfig:
   v1:
     chapterSummary:
-      nonFiction: "CUSTOM NON-FICTION PROMPT v1"
-      fiction: "CUSTOM FICTION PROMPT v1"
-    connectionAnalysis: "CUSTOM CONNECTION PROMPT"
-    overallSummary: "CUSTOM SUMMARY PROMPT"
+      nonFiction: "CUSTOM NON-FICTION PROMPT v1 {{content}}"
+      fiction: "CUSTOM FICTION PROMPT v1 {{content}}"
+    connectionAnalysis: "CUSTOM CONNECTION PROMPT {{chapterSummaries}}"
+    overallSummary: "CUSTOM SUMMARY PROMPT {{chapterInfo}}"
   v2:
     chapterSummary:
-      nonFiction: "CUSTOM NON-FICTION PROMPT v2"
+      nonFiction: "CUSTOM NON-FICTION PROMPT v2 {{content}}"
 """
         f_name = write_config_file(config_content)
         try:
@@ -342,6 +342,48 @@ promptVersionConfig:
         assert "95" in formatted
         assert "{{name}}" not in formatted
 
+    def test_unknown_placeholder_fails_config_load(self):
+        """测试配置中的未知占位符在加载时被发现"""
+        config_content = """
+webdavConfig:
+  serverUrl: "https://example.com/dav/"
+
+currentPromptVersion: v2
+
+promptVersionConfig:
+  v2:
+    chapterSummary:
+      nonFiction: "标题：{{title}} 内容：{{chapterContent}}"
+"""
+        f_name = write_config_file(config_content)
+        try:
+            loader = ConfigLoader(f_name)
+            config = loader.load()
+            assert config is None
+        finally:
+            cleanup_config_file(f_name)
+
+    def test_missing_content_placeholder_fails_config_load(self):
+        """测试章节总结模板缺少 {{content}} 时加载失败"""
+        config_content = """
+webdavConfig:
+  serverUrl: "https://example.com/dav/"
+
+currentPromptVersion: v2
+
+promptVersionConfig:
+  v2:
+    chapterSummary:
+      nonFiction: "请总结章节：{{title}}"
+"""
+        f_name = write_config_file(config_content)
+        try:
+            loader = ConfigLoader(f_name)
+            config = loader.load()
+            assert config is None
+        finally:
+            cleanup_config_file(f_name)
+
 
 class TestConfigValidation:
     """配置验证测试"""
@@ -0,0 +1,150 @@
+"""
+派生处理测试
+基于已有章节摘要派生新输出
+"""
+
+import sys
+import pytest
+from pathlib import Path
+from unittest.mock import patch
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.cli.ai_client import MockClient, PromptTemplates
+from src.cli.config import (
+    Config, WebDAVConfig, AIConfig, AIProviderConfig, ProcessingConfig,
+    BatchConfig, OutputConfig, AdvancedConfig
+)
+from src.cli.derivation import SummaryDeriver, parse_summary_markdown
+from src.cli.formatter import ResultFormatter
+from src.cli.logger import Logger
+
+
+def make_summary_markdown(with_metadata: bool = False) -> str:
+    """辅助函数：生成与 batch 输出一致的完整摘要"""
+    formatter = ResultFormatter(Logger())
+    content = formatter.format_result(
+        title="测试之书",
+        author="作者甲",
+        chapters={
+            "1": "第一章摘要\n\n### 要点\n- 观点一",
+            "2": "第二章摘要",
+        },
+        overall_summary="全书总结内容",
+        mode="summary",
+    )
+    if with_metadata:
+        content = formatter.format_with_metadata(content, {"fileName": "测试之书.epub", "costRMB": 0.1})
+    return content
+
+
+def make_config(local_dir: str) -> Config:
+    """辅助函数：构造仅使用本地缓存的配置"""
+    return Config(
+        webdav=WebDAVConfig(),
+        ai=AIConfig(model="mock"),
+        processing=ProcessingConfig(),
+        batch=BatchConfig(),
+        output=OutputConfig(localDir=local_dir, syncToWebDAV=False),
+        advanced=AdvancedConfig(),
+    )
+
+
+class TestParseSummaryMarkdown:
+    """完整摘要解析测试"""
+
+    def test_parse_cli_output(self):
+        """测试解析 CLI 生成的完整摘要"""
+        cached = parse_summary_markdown(make_summary_markdown())
+
+        assert cached.title == "测试之书"
+        assert cached.author == "作者甲"
+        assert cached.overall_summary == "全书总结内容"
+        assert [c.title for c in cached.chapters] == ["第1章", "第2章"]
+        # 章节内的三级标题不会被当作章节边界
+        assert "### 要点" in cached.chapters[0].content
+        assert cached.chapters[1].content == "第二章摘要"
+
+    def test_parse_metadata_header(self):
+        """测试解析 WebDAV 版本的元数据头"""
+        cached = parse_summary_markdown(make_summary_markdown(with_metadata=True))
+        assert cached.metadata["fileName"] == "测试之书.epub"
+        assert len(cached.chapters) == 2
+
+
+class TestSummaryDeriver:
+    """派生流程测试"""
+
+    def make_ai(self):
+        return MockClient(
+            AIProviderConfig(provider="mock", model="mock", customFields={'timeScale': 0}),
+            Logger(), PromptTemplates()
+        )
+
+    def test_derive_combined_mindmap_from_local_cache(self, tmp_path):
+        """测试从本地缓存派生综合思维导图"""
+        (tmp_path / "测试之书-完整摘要.md").write_text(make_summary_markdown(), encoding='utf-8')
+
+        deriver = SummaryDeriver(make_config(str(tmp_path)), Logger(), self.make_ai())
+        assert deriver.list_sources() == ["测试之书-完整摘要.md"]
+
+        result = deriver.derive("测试之书-完整摘要.md", "combined-mindmap", "en")
+
+        assert result.success is True
+        assert result.input_tokens > 0
+        output = tmp_path / "测试之书-完整摘要-combined-mindmap-en.md"
+        assert output.exists()
+        assert "```json" in output.read_text(encoding='utf-8')
+        assert (tmp_path / "测试之书-combined-mindmap-en.meta.json").exists()
+
+        # 派生结果不会被再次当作输入
+        assert deriver.list_sources() == ["测试之书-完整摘要.md"]
+
+    def test_derive_translation(self, tmp_path):
+        """测试翻译章节摘要"""
+        (tmp_path / "测试之书-完整摘要.md").write_text(make_summary_markdown(), encoding='utf-8')
+
+        deriver = SummaryDeriver(make_config(str(tmp_path)), Logger(), self.make_ai())
+        result = deriver.run("summary", "en", translate=True)
+
+        assert result.total == 1
+        assert result.success == 1
+        assert (tmp_path / "测试之书-完整摘要-summary-en.md").exists()
+
+    def test_overall_summary_reads_chapter_summaries(self, tmp_path):
+        """测试新的全书总结以各章摘要正文为输入，而不只是章节标题"""
+        (tmp_path / "测试之书-完整摘要.md").write_text(make_summary_markdown(), encoding='utf-8')
+        ai = self.make_ai()
+
+        with patch.object(ai, '_request', wraps=ai._request) as request:
+            result = SummaryDeriver(make_config(str(tmp_path)), Logger(), ai).derive(
+                "测试之书-完整摘要.md", "summary", "zh")
+
+        assert result.success is True
+        assert request.call_count == 1
+        prompt = request.call_args.args[0]
+        assert "第一章摘要" in prompt and "- 观点一" in prompt and "第二章摘要" in prompt
+
+    def test_mindmap_skips_connection_analysis(self, tmp_path):
+        """测试只生成章节思维导图时不调用章节关联分析"""
+        (tmp_path / "测试之书-完整摘要.md").write_text(make_summary_markdown(), encoding='utf-8')
+        ai = self.make_ai()
+
+        with patch.object(ai, 'analyze_connections', wraps=ai.analyze_connections) as analyze:
+            result = SummaryDeriver(make_config(str(tmp_path)), Logger(), ai).derive(
+                "测试之书-完整摘要.md", "mindmap", "zh")
+
+        assert result.success is True
+        analyze.assert_not_called()
+
+    def test_missing_source(self, tmp_path):
+        """测试找不到摘要时返回失败"""
+        deriver = SummaryDeriver(make_config(str(tmp_path)), Logger(), self.make_ai())
+        result = deriver.derive("不存在-完整摘要.md", "summary", "zh")
+        assert result.success is False
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,110 @@
+"""
+章节提取缓存测试
+"""
+
+import os
+import sys
+import pytest
+from pathlib import Path
+from unittest.mock import patch
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.cli.chapter_extractor import (
+    BookContent, Chapter, ChapterExtractorFactory, EPUBExtractor, PageFailure
+)
+from src.cli.extraction_cache import ExtractionCache
+
+from test_chapter_extractor import build_epub, paragraph
+
+
+def make_book(file_path: str = "book.pdf") -> BookContent:
+    """辅助函数：构造提取结果"""
+    return BookContent(
+        title="缓存之书",
+        author="作者",
+        chapters=[Chapter(title="第一章", content="内容" * 50, index=0)],
+        file_path=file_path,
+        file_type='pdf',
+        page_failures=[PageFailure(page=3, error="ValueError: bad")],
+    )
+
+
+class TestExtractionCache:
+    """提取缓存测试"""
+
+    def test_round_trip(self, tmp_path):
+        """测试写入与读取"""
+        source = tmp_path / "book.pdf"
+        source.write_bytes(b"%PDF-1.4 fake content")
+        cache = ExtractionCache(str(tmp_path / "cache"), 10 * 1024 * 1024)
+
+        assert cache.get(str(source)) is None
+        cache.put(str(source), make_book(str(source)))
+
+        # 内容相同、路径不同的文件同样命中
+        moved = tmp_path / "moved.pdf"
+        moved.write_bytes(source.read_bytes())
+        book = cache.get(str(moved))
+
+        assert book == make_book(str(moved))
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_version_and_content_change_miss(self, tmp_path):
+        """测试提取器版本或文件内容变化时不命中"""
+        source = tmp_path / "book.pdf"
+        source.write_bytes(b"version one")
+        cache = ExtractionCache(str(tmp_path / "cache"), 10 * 1024 * 1024, version="1")
+        cache.put(str(source), make_book())
+
+        assert ExtractionCache(str(tmp_path / "cache"), 10 * 1024 * 1024, version="2").get(str(source)) is None
+        source.write_bytes(b"version two")
+        assert cache.get(str(source)) is None
+
+    def test_key_from_memory(self, tmp_path):
+        """测试字节与文件对象的缓存键与按路径相同，且不改变文件对象位置"""
+        source = tmp_path / "book.pdf"
+        source.write_bytes(b"%PDF-1.4 in memory" * 1000)
+        cache = ExtractionCache(str(tmp_path / "cache"), 10 * 1024 * 1024)
+
+        with open(source, 'rb') as f:
+            assert cache.key(f) == cache.key(str(source)) == cache.key(source.read_bytes())
+            assert f.tell() == 0
+
+    def test_lru_eviction(self, tmp_path):
+        """测试按最近使用时间淘汰"""
+        cache = ExtractionCache(str(tmp_path / "cache"), 10 * 1024 * 1024)
+        sources = []
+        for i in range(3):
+            source = tmp_path / f"book{i}.pdf"
+            source.write_bytes(f"book {i}".encode())
+            cache.put(str(source), make_book())
+            os.utime(cache._path(cache.key(str(source))), (1000 + i, 1000 + i))
+            sources.append(source)
+
+        # 访问最旧的条目，使其成为最近使用
+        assert cache.get(str(sources[0])) is not None
+        entry_size = cache._path(cache.key(str(sources[0]))).stat().st_size
+        cache.max_bytes = entry_size * 2
+
+        assert cache.evict() == 1
+        assert cache.get(str(sources[1])) is None
+        assert cache.get(str(sources[0])) is not None
+        assert cache.get(str(sources[2])) is not None
+
+    def test_factory_skips_parsing_on_hit(self, tmp_path):
+        """测试命中缓存时不再解析"""
+        path = build_epub(tmp_path / "book.epub", [("第一章", paragraph("正文内容"))])
+        cache = ExtractionCache(str(tmp_path / "cache"), 10 * 1024 * 1024)
+
+        first = ChapterExtractorFactory.extract(str(path), cache=cache)
+        with patch.object(EPUBExtractor, 'extract', side_effect=AssertionError("不应解析")):
+            second = ChapterExtractorFactory.extract(str(path), cache=cache)
+
+        assert second == first
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,196 @@
+"""
+提取沙箱测试
+"""
+
+import os
+import sys
+import threading
+import time
+import pytest
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import patch
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.cli.batch_processor import BatchProcessor
+from src.cli.chapter_extractor import BookStream, ChapterExtractorFactory, PDFExtractor
+from src.cli.config import AdvancedConfig, ProcessingConfig
+from src.cli.extraction_cache import ExtractionCache
+from src.cli.extraction_sandbox import (
+    FAILURE_CRASH, FAILURE_MEMORY, FAILURE_PARSE, FAILURE_TIMEOUT, ExtractionError, iter_sandboxed,
+    run_sandboxed, sandbox_available
+)
+from src.cli.models import BookFile
+
+from test_chapter_extractor import build_pdf, book_pages
+
+pytestmark = pytest.mark.skipif(not sandbox_available(), reason="平台不支持 forkserver")
+
+# 子进程中执行的函数需要是模块级函数（按名称序列化传给 fork 服务器）
+LOCK = threading.Lock()
+
+
+def corrupt():
+    raise ValueError("broken xref table")
+
+
+def acquire_lock() -> bool:
+    return LOCK.acquire(timeout=2)
+
+
+def count_up(n: int):
+    for i in range(n):
+        yield i
+    raise ValueError("broken after items")
+
+
+def hang(*args):
+    time.sleep(30)
+
+
+def make_processor(tmp_path, **advanced) -> BatchProcessor:
+    """辅助函数：只带提取相关配置的批量处理器"""
+    processor = BatchProcessor.__new__(BatchProcessor)
+    processor.config = type('Config', (), {})()
+    processor.config.advanced = AdvancedConfig(pdfWorkers=1, **advanced)
+    processor.config.processing = ProcessingConfig()
+    processor.extraction_cache = ExtractionCache(str(tmp_path / "cache"), max_bytes=10 * 1024 * 1024)
+    return processor
+
+
+def pdf_book(name: str = "book.pdf") -> BookFile:
+    return BookFile(name=name, path=f"/books/{name}", extension=".pdf", size=0, last_modified=datetime.now())
+
+
+class TestRunSandboxed:
+    """子进程执行与失败分类测试"""
+
+    def test_returns_result(self):
+        """测试返回子进程中的结果"""
+        assert run_sandboxed(os.getpid) != os.getpid()
+
+    def test_not_forked_from_threaded_parent(self):
+        """测试子进程不继承本进程其他线程持有的锁"""
+        held, release = threading.Event(), threading.Event()
+
+        def holder():
+            with LOCK:
+                held.set()
+                release.wait(5)
+
+        thread = threading.Thread(target=holder)
+        thread.start()
+        held.wait(5)
+        try:
+            assert run_sandboxed(acquire_lock, timeout=10) is True
+        finally:
+            release.set()
+            thread.join()
+
+    def test_timeout(self):
+        """测试超时终止子进程"""
+        start = time.time()
+        with pytest.raises(ExtractionError) as info:
+            run_sandboxed(time.sleep, (30,), timeout=0.3)
+
+        assert info.value.kind == FAILURE_TIMEOUT
+        assert time.time() - start < 5
+
+    def test_memory_limit(self):
+        """测试超出地址空间上限"""
+        with pytest.raises(ExtractionError) as info:
+            run_sandboxed(bytearray, (1024 ** 3,), max_memory_mb=256)
+
+        assert info.value.kind == FAILURE_MEMORY
+
+    def test_parse_error(self):
+        """测试解析异常"""
+        with pytest.raises(ExtractionError, match="broken xref") as info:
+            run_sandboxed(corrupt)
+
+        assert info.value.kind == FAILURE_PARSE
+
+    def test_crash(self):
+        """测试子进程意外退出"""
+        with pytest.raises(ExtractionError) as info:
+            run_sandboxed(os._exit, (3,))
+
+        assert info.value.kind == FAILURE_CRASH
+
+    def test_iterate_results(self):
+        """测试逐条返回生成器的结果，之后的异常照常分类"""
+        items = []
+        with pytest.raises(ExtractionError) as info:
+            for item in iter_sandboxed(count_up, (3,)):
+                items.append(item)
+
+        assert items == [0, 1, 2]
+        assert info.value.kind == FAILURE_PARSE
+
+
+class TestBatchSandbox:
+    """批量处理中的隔离提取测试"""
+
+    def test_extract_in_sandbox(self, tmp_path):
+        """测试沙箱提取结果与缓存统计"""
+        path = build_pdf(tmp_path / "book.pdf", book_pages(3))
+        processor = make_processor(tmp_path)
+
+        first = processor._extract_book(pdf_book(), str(path))
+        second = processor._extract_book(pdf_book(), str(path))
+
+        assert first.chapters and first.chapters == second.chapters
+        assert processor.extraction_cache.misses == 1
+        assert processor.extraction_cache.hits == 1
+
+    def test_hanging_pdf_times_out(self, tmp_path):
+        """测试卡死的 PDF 被记为超时，不影响当前进程"""
+        path = build_pdf(tmp_path / "book.pdf", book_pages(3))
+        processor = make_processor(tmp_path, extractionTimeout=0.5)
+
+        with patch('src.cli.batch_processor.book_task', hang):
+            with pytest.raises(ExtractionError) as info:
+                processor._extract_book(pdf_book(), str(path))
+
+        assert info.value.kind == FAILURE_TIMEOUT
+
+    def test_corrupt_pdf_is_parse_error(self, tmp_path):
+        """测试损坏的 PDF 归类为解析失败"""
+        processor = make_processor(tmp_path)
+
+        with pytest.raises(ExtractionError) as info:
+            processor._extract_book(pdf_book(), b"%PDF-1.4 garbage")
+
+        assert info.value.kind == FAILURE_PARSE
+
+    def test_streamed_pdf_in_sandbox(self, tmp_path):
+        """测试超大 PDF 的页数读取与流式提取都在子进程中进行"""
+        path = build_pdf(tmp_path / "book.pdf", book_pages(3))
+        processor = make_processor(tmp_path, pdfStreamingPages=2)
+
+        # 当前进程不解析 PDF
+        with patch.object(PDFExtractor, 'count_pages', side_effect=AssertionError("parsed in parent")):
+            book = processor._extract_book(pdf_book(), path.read_bytes())
+            assert isinstance(book, BookStream)
+            chapters = list(book.chapters)
+
+        expected = ChapterExtractorFactory.stream("book.pdf", pdf_workers=1, source=str(path))
+        assert chapters == list(expected.chapters)
+        assert book.title == expected.title
+        assert processor.extraction_cache.misses == 0
+
+    def test_sandbox_disabled(self, tmp_path):
+        """测试关闭沙箱时在当前进程内提取"""
+        processor = make_processor(tmp_path, extractionSandbox=False)
+
+        with pytest.raises(Exception, match="PDF 解析失败") as info:
+            processor._extract_book(pdf_book(), b"%PDF-1.4 garbage")
+
+        assert not isinstance(info.value, ExtractionError)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,132 @@
+"""
+提取器性能基准测试（需要 pytest-benchmark）
+
+    pytest tests/python/test_extractor_perf.py --benchmark-only \
+        --benchmark-storage=tests/python/benchmarks --benchmark-save=baseline
+    pytest tests/python/test_extractor_perf.py --benchmark-only \
+        --benchmark-storage=tests/python/benchmarks --benchmark-compare --benchmark-compare-fail=mean:25%
+
+吞吐量（MB/s、页/s）与峰值内存记录在基准 JSON 的 extra_info 中；BENCH_SCALE 环境变量放大语料
+"""
+
+import os
+import sys
+import tracemalloc
+import pytest
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.cli.chapter_extractor import EPUBExtractor, PDFExtractor
+
+from bench_corpus import DEFAULT_CORPUS, CorpusSpec, build_book
+
+try:
+    import pytest_benchmark
+except ImportError:
+    pytest_benchmark = None
+
+
+BENCH_SCALE = float(os.environ.get('BENCH_SCALE', '1'))
+
+requires_benchmark = pytest.mark.skipif(pytest_benchmark is None, reason="pytest-benchmark 未安装")
+
+
+@pytest.fixture(scope="module")
+def corpus(tmp_path_factory):
+    """生成基准语料（模块内共享）"""
+    out_dir = tmp_path_factory.mktemp("corpus")
+    return {spec.name: build_book(spec.scaled(BENCH_SCALE), out_dir) for spec in DEFAULT_CORPUS}
+
+
+def peak_memory_mb(func) -> float:
+    """执行一次 func 的 Python 堆峰值（MB）"""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def run_benchmark(benchmark, path: Path, extract, pages: int = 0):
+    """测量提取耗时，并把吞吐量与峰值内存写入基准结果"""
+    peak = peak_memory_mb(lambda: extract(str(path)))
+    book = benchmark.pedantic(extract, args=(str(path),), rounds=3, iterations=1, warmup_rounds=1)
+
+    mean = benchmark.stats.stats.mean
+    size_mb = path.stat().st_size / 1024 / 1024
+    benchmark.extra_info.update({
+        'size_mb': round(size_mb, 2),
+        'mb_per_s': round(size_mb / mean, 2),
+        'peak_memory_mb': round(peak, 2),
+        'chapters': len(book.chapters),
+    })
+    if pages:
+        benchmark.extra_info['pages_per_s'] = round(pages / mean, 1)
+    return book
+
+
+class TestCorpus:
+    """语料生成测试"""
+
+    def test_epub_spec(self, tmp_path):
+        """测试 EPUB 章节数、图片体积与中文比例"""
+        spec = CorpusSpec("cjk", "epub", chapters=4, chapter_chars=2000, image_kb=256, cjk_ratio=1.0)
+        path = build_book(spec, tmp_path)
+
+        book = EPUBExtractor().extract(str(path))
+
+        assert [c.title for c in book.chapters] == [f"第 {i} 章" for i in range(1, 5)]
+        assert all(len(c.content) >= 2000 for c in book.chapters)
+        assert path.stat().st_size > 256 * 1024
+        assert not any(c.isascii() and c.isalpha() for c in book.chapters[0].content)
+
+    def test_pdf_spec(self, tmp_path):
+        """测试 PDF 按章节标题分章，中英文均可提取"""
+        spec = CorpusSpec("mixed", "pdf", chapters=3, chapter_chars=3000, image_kb=96, cjk_ratio=0.5, seed=1)
+        path = build_book(spec, tmp_path)
+
+        book = PDFExtractor(workers=1).extract(str(path))
+
+        assert [c.title for c in book.chapters] == ["第 1 章", "第 2 章", "第 3 章"]
+        content = "".join(c.content for c in book.chapters)
+        assert any('一' <= c <= '鿿' for c in content)
+        assert any(c.isascii() and c.isalpha() for c in content)
+        assert path.stat().st_size > 96 * 1024
+
+    def test_deterministic(self, tmp_path):
+        """测试相同规格生成相同文件"""
+        spec = CorpusSpec("same", "pdf", chapters=2, chapter_chars=1000)
+        (tmp_path / "a").mkdir()
+        (tmp_path / "b").mkdir()
+        first = build_book(spec, tmp_path / "a")
+        second = build_book(spec, tmp_path / "b")
+
+        assert first.read_bytes() == second.read_bytes()
+
+
+@requires_benchmark
+class TestExtractorBenchmark:
+    """提取吞吐量与峰值内存基准"""
+
+    @pytest.mark.parametrize("name", [s.name for s in DEFAULT_CORPUS if s.format == 'epub'])
+    def test_epub(self, benchmark, corpus, name):
+        """EPUB 提取"""
+        benchmark.group = "epub"
+        book = run_benchmark(benchmark, corpus[name], EPUBExtractor().extract)
+        assert book.chapters
+
+    @pytest.mark.parametrize("name", [s.name for s in DEFAULT_CORPUS if s.format == 'pdf'])
+    def test_pdf(self, benchmark, corpus, name):
+        """PDF 提取（单进程，排除进程池启动开销）"""
+        benchmark.group = "pdf"
+        path = corpus[name]
+        book = run_benchmark(benchmark, path, PDFExtractor(workers=1).extract, PDFExtractor.count_pages(str(path)))
+        assert book.chapters
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,204 @@
+"""
+HTML 文本提取测试
+包括与旧版正则清理流程的对比基准
+"""
+
+import os
+import re
+import sys
+import timeit
+import zipfile
+import pytest
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.cli.html_text import html_to_text, decode_html, compact_note, NOTE_COMPACT_LENGTH
+from src.cli.chapter_extractor import EPUBExtractor
+
+
+def legacy_extract(content: bytes) -> tuple[str, str]:
+    """旧版实现：_extract_title + _clean_content（仅用于对比）"""
+    html_content = content.decode('utf-8', errors='ignore')
+    title = ""
+    for pattern in (r'<h[1-6][^>]*>([^<]+)</h[1-6]>', r'<title>([^<]+)</title>',
+                    r'<p[^>]*class="title"[^>]*>([^<]+)</p>'):
+        match = re.search(pattern, html_content, re.IGNORECASE)
+        if match:
+            title = match.group(1).strip()
+            break
+
+    html_content = content.decode('utf-8', errors='ignore')
+    text = re.sub(r'<br\s*/?>', '\n', html_content, flags=re.IGNORECASE)
+    text = re.sub(r'</p>', '\n\n', text)
+    text = re.sub(r'</div>', '\n', text)
+    text = re.sub(r'</h[1-6]>', '\n', text)
+    text = re.sub(r'<[^>]+>', '', text)
+    text = text.replace('&nbsp;', ' ').replace('&amp;', '&').replace('&lt;', '<')
+    text = text.replace('&gt;', '>').replace('&quot;', '"')
+    return title, '\n'.join(line.strip() for line in text.split('\n') if line.strip())
+
+
+def make_document(index: int, paragraphs: int = 150) -> bytes:
+    """辅助函数：生成接近真实电子书的 XHTML 章节（长段落、少量行内标签与实体）"""
+    body = "".join(
+        f'<p class="txt">&nbsp;&nbsp;{"这是第" + str(index) + "章中比较长的正文内容，模拟真实书籍中的段落文字。" * 10}'
+        f'<span class="kt">强调</span>与&ldquo;引号&rdquo;{"English words and symbols. " * 5}</p>\n'
+        for i in range(paragraphs)
+    )
+    return (
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        '<html xmlns="http://www.w3.org/1999/xhtml">'
+        f'<head><title>第{index}章</title><link rel="stylesheet" href="style.css"/></head>'
+        f'<body><div class="chapter"><h2 class="h"><span>第{index}章</span> 标题</h2>{body}</div></body></html>'
+    ).encode('utf-8')
+
+
+def load_corpus() -> list[bytes]:
+    """基准语料：FASTREADER_EPUB_CORPUS 目录中的真实 EPUB，未设置时使用合成文档"""
+    corpus_dir = os.environ.get('FASTREADER_EPUB_CORPUS')
+    if not corpus_dir:
+        return [make_document(i) for i in range(20)]
+
+    documents = []
+    extractor = EPUBExtractor()
+    for path in sorted(Path(corpus_dir).glob('*.epub')):
+        with zipfile.ZipFile(path) as archive:
+            package = extractor._read_package(archive)
+            documents.extend(archive.read(name) for name in package.spine)
+    return documents
+
+
+NOTED_DOCUMENT = (
+    '<html><body><h1>第一章</h1>'
+    '<p>正文<a epub:type="noteref" href="#n1"><sup>1</sup></a>继续<sup><a href="notes.xhtml#n2">[2]</a></sup>结束。</p>'
+    '<p>参见<a href="ch2.xhtml">第二章</a>的讨论与更多正文内容。</p>'
+    '<aside epub:type="footnote" id="n1"><p>这是一条很长的脚注，' + '解释' * 40 + '</p></aside>'
+    '<ol class="duokan-footnote-content"><li>多看格式的注释</li></ol>'
+    '<p><a href="#back1">↩</a> <a href="#back2">↩</a></p>'
+    '<section role="doc-bibliography"><h2>参考文献</h2><p>某某. 某书. 1999.</p></section>'
+    '<p>最后一段。</p></body></html>'
+)
+
+
+class TestHTMLToText:
+    """HTML 转文本测试"""
+
+    def test_blocks_and_text(self):
+        """测试按块输出正文"""
+        doc = html_to_text(b'<html><body><h1>Title</h1><p>First\n  para</p><div>Second</div></body></html>')
+
+        assert doc.title == "Title"
+        assert doc.text == "Title\nFirst para\nSecond"
+        assert [b.tag for b in doc.blocks] == ['h1', 'p', 'div']
+
+    def test_full_entity_decoding(self):
+        """测试完整的实体解码"""
+        doc = html_to_text('<p>&ldquo;A&rdquo; &mdash; &#169; &#x4E2D; &eacute; &amp;&nbsp;b</p>')
+        assert doc.text == '“A” — © 中 é & b'
+
+    def test_entities_decoded_once(self):
+        """测试转义后的实体只解码一次（与同一文档中的未转义实体互不影响）"""
+        doc = html_to_text('<p>A &#38;lt;b&#38;gt; and &lt;x&gt; &amp;amp;</p>')
+        assert doc.text == 'A &lt;b&gt; and <x> &amp;'
+
+    def test_title_with_nested_markup(self):
+        """测试标题中包含嵌套标签"""
+        doc = html_to_text('<h2><span class="num">第一章</span> 开端</h2><p>正文</p>')
+        assert doc.title == "第一章 开端"
+
+    def test_title_fallbacks(self):
+        """测试标题的回退顺序"""
+        assert html_to_text('<head><title>页面标题</title></head><p>正文内容</p>').title == "页面标题"
+        assert html_to_text('<p class="chapter title">类名标题</p>').title == "类名标题"
+        assert html_to_text('<p>短</p><p>这是一个足够长的段落文本</p>').title == "这是一个足够长的段落文本"
+
+    def test_skip_script_style_and_comments(self):
+        """测试忽略脚本、样式与注释"""
+        doc = html_to_text(
+            '<head><style>p{}</style></head><body><script>var a = "<p>x</p>";</script>'
+            '<!-- <p>comment</p> --><p>visible</p></body>'
+        )
+        assert doc.text == "visible"
+
+    def test_br_and_pre(self):
+        """测试换行与预格式化文本"""
+        doc = html_to_text('<p>line1<br/>line2</p><pre>  code\n  more</pre>')
+        assert doc.text == "line1\nline2\ncode\nmore"
+
+    def test_uppercase_tags(self):
+        """测试大写标签名与小写一致处理"""
+        doc = html_to_text('<HEAD><TITLE>标题</TITLE></HEAD><BODY><SCRIPT>x()</SCRIPT><P>第一段</P><Div>第二段</Div></BODY>')
+        assert doc.title == "标题"
+        assert doc.text == "第一段\n第二段"
+        assert [block.tag for block in doc.blocks] == ['p', 'div']
+
+    def test_block_attributes(self):
+        """测试记录块级元素属性"""
+        doc = html_to_text('<aside epub:type="footnote" class="note"><p>注释</p></aside><aside epub:type="rearnote">尾注</aside>')
+        assert doc.blocks[-1].tag == 'aside'
+        assert doc.blocks[-1].attrs['epub:type'] == 'rearnote'
+
+    def test_notes_kept_by_default(self):
+        """测试默认保留注释"""
+        doc = html_to_text(NOTED_DOCUMENT)
+        assert "脚注" in doc.text
+        assert "正文1继续[2]结束。" in doc.text
+        assert doc.removed_blocks == doc.removed_chars == 0
+
+    def test_drop_notes(self):
+        """测试删除注释引用、注释块、参考文献与纯链接块"""
+        doc = html_to_text(NOTED_DOCUMENT, notes='drop')
+
+        assert doc.text == "第一章\n正文继续结束。\n参见第二章的讨论与更多正文内容。\n最后一段。"
+        assert doc.title == "第一章"
+        assert doc.removed_blocks == 5
+        # 注释块全文 + 注释引用 "1" 与 "[2]"
+        assert doc.removed_chars == sum(len(b.text) for b in doc.blocks if b.note) + 4
+
+    def test_compact_notes(self):
+        """测试压缩注释"""
+        doc = html_to_text(NOTED_DOCUMENT, notes='compact')
+
+        note = next(line for line in doc.text.split('\n') if line.startswith("这是一条很长的脚注"))
+        assert len(note) == NOTE_COMPACT_LENGTH + 1
+        assert "多看格式的注释" in doc.text
+        assert "正文继续结束。" in doc.text
+        assert compact_note("短\n注释") == "短 注释"
+
+    def test_declared_encoding(self):
+        """测试按 XML 声明解码"""
+        data = '<?xml version="1.0" encoding="gbk"?><p>中文内容</p>'.encode('gbk')
+        assert decode_html(data).endswith('<p>中文内容</p>')
+        assert html_to_text(data).text == "中文内容"
+
+    def test_matches_legacy_output(self):
+        """测试常规文档与旧版输出一致"""
+        data = make_document(1, paragraphs=5).replace(b'&ldquo;', b'"').replace(b'&rdquo;', b'"')
+        legacy_title, legacy_text = legacy_extract(data)
+        doc = html_to_text(data)
+
+        # 旧版会把 <head> 中的 <title> 文本混入正文首行
+        assert legacy_text == "第1章" + doc.text
+        # 旧版无法处理带嵌套标签的标题，会退回到 <title>
+        assert legacy_title == "第1章"
+        assert doc.title == "第1章 标题"
+
+    def test_benchmark_against_legacy(self):
+        """基准：单次扫描 vs 旧版多次正则替换"""
+        corpus = load_corpus()
+
+        legacy_time = min(timeit.repeat(lambda: [legacy_extract(d) for d in corpus], number=1, repeat=5))
+        single_time = min(timeit.repeat(lambda: [html_to_text(d) for d in corpus], number=1, repeat=5))
+        total_mb = sum(len(d) for d in corpus) / 1024 / 1024
+        print(f"\ncorpus: {len(corpus)} docs / {total_mb:.1f}MB, "
+              f"legacy: {legacy_time * 1000:.1f}ms, single-pass: {single_time * 1000:.1f}ms")
+
+        # 单次扫描额外完成了完整实体解码与块结构输出，耗时应与旧版相当
+        assert single_time <= legacy_time * 2
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
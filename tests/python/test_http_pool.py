@@ -0,0 +1,129 @@
+"""
+HTTP 连接池测试
+"""
+
+import sys
+import threading
+import time
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest.mock import patch
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.cli.config import WebDAVConfig
+from src.cli.http_pool import PooledTransport, create_timeout, create_transport
+from src.cli.logger import Logger
+from src.cli.webdav_client import WebDAVClientWrapper
+
+httpx = pytest.importorskip("httpx")
+
+
+class SlowHandler(BaseHTTPRequestHandler):
+    """测试用处理器：HTTP/1.1 keep-alive，每个请求耗时 20ms"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        time.sleep(0.02)
+        self.send_response(200)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    """本地 HTTP 服务器"""
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), SlowHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_port}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+class TestPooledTransport:
+    """连接复用与统计测试"""
+
+    def test_keepalive_reuses_connection(self, server):
+        """测试顺序请求复用同一个连接"""
+        transport = create_transport(max_connections=4)
+        with httpx.Client(transport=transport, base_url=server) as client:
+            for _ in range(5):
+                assert client.get('/').text == 'ok'
+
+        stats = transport.stats()
+        assert (stats.requests, stats.opened, stats.reused, stats.waited) == (5, 1, 4, 0)
+        assert stats.reuse_rate == 0.8
+
+    def test_concurrent_workers_share_pool(self, server):
+        """测试多线程共用客户端：连接数不超过上限，超出的请求计为等待"""
+        transport = create_transport(max_connections=2, max_keepalive=2)
+        client = httpx.Client(transport=transport, base_url=server)
+
+        def worker():
+            for _ in range(5):
+                client.get('/')
+
+        threads = [threading.Thread(target=worker) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        stats = transport.stats()
+        client.close()
+        assert stats.requests == 30
+        assert stats.opened <= 2
+        assert stats.reused == stats.requests - stats.opened
+        assert stats.waited > 0
+        assert stats.open <= 2
+
+    def test_timeout(self):
+        """测试连接 / 读取超时，0 表示不限制"""
+        timeout = create_timeout(connect=3, read=0)
+        assert timeout.connect == 3
+        assert timeout.read is None
+
+
+class TestWrapperPool:
+    """WebDAVClientWrapper 连接池配置测试"""
+
+    def test_connect_uses_configured_pool(self):
+        """测试连接时传入连接池与超时配置"""
+        config = WebDAVConfig(serverUrl="https://example.com/dav/", username="u", password="p",
+                              maxConnections=5, connectTimeout=2, readTimeout=30)
+
+        with patch('src.cli.webdav_client._WebDAVClient') as mock_client:
+            mock_client.return_value.exists.return_value = True
+            wrapper = WebDAVClientWrapper(config, Logger())
+            assert wrapper.connect()
+
+        kwargs = mock_client.call_args[1]
+        assert isinstance(kwargs['transport'], PooledTransport)
+        assert kwargs['transport'].tracer.max_connections == 5
+        assert kwargs['timeout'].connect == 2
+        assert kwargs['timeout'].read == 30
+        assert wrapper.pool_stats().requests == 0
+
+    def test_disconnect_closes_client(self):
+        """测试断开连接时关闭连接池"""
+        with patch('src.cli.webdav_client._WebDAVClient') as mock_client:
+            mock_client.return_value.exists.return_value = True
+            wrapper = WebDAVClientWrapper(WebDAVConfig(serverUrl="https://example.com/dav/"), Logger())
+            wrapper.connect()
+            wrapper.disconnect()
+
+        mock_client.return_value.http.close.assert_called_once()
+        assert wrapper.client is None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,307 @@
+"""
+递归书库扫描测试
+"""
+
+import sys
+import threading
+import time
+import pytest
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.cli.batch_processor import BatchProcessor
+from src.cli.cassette import Cassette, CassetteWebDAV
+from src.cli.config import BatchConfig, WebDAVConfig
+from src.cli.library_snapshot import LibrarySnapshot
+from src.cli.logger import Logger
+from src.cli.models import BookFile
+from src.cli.webdav_client import WebDAVClientWrapper
+
+
+TREE = {
+    "books": ["a.epub", "notes.txt", "小说/", "技术/", "@eaDir/"],
+    "books/小说": ["b.epub", "c.pdf", "外国/"],
+    "books/小说/外国": ["d.epub"],
+    "books/技术": ["e.pdf"],
+    "books/@eaDir": ["a.epub"],
+}
+
+
+class FakeLs:
+    """按目录树模拟 webdav4 的 ls（PROPFIND Depth: 1），记录并发数"""
+
+    def __init__(self, tree: dict, delay: float = 0.0, etags: dict = None):
+        self.tree = tree
+        self.delay = delay
+        self.etags = etags if etags is not None else {}
+        self.calls = []
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, path, detail=True):
+        with self._lock:
+            self.calls.append(path)
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(self.delay)
+        with self._lock:
+            self.active -= 1
+        if path not in self.tree:
+            raise RuntimeError(f"404 {path}")
+        return [
+            {
+                "name": f"{path}/{entry.rstrip('/')}",
+                "type": "directory" if entry.endswith("/") else "file",
+                "size": 100,
+                "modified": datetime(2024, 1, 1),
+                "etag": self.etags.get(f"{path}/{entry.rstrip('/')}"),
+            }
+            for entry in self.tree[path]
+        ]
+
+
+def make_wrapper(ls: FakeLs) -> WebDAVClientWrapper:
+    """辅助函数：已连接的 WebDAV 客户端"""
+    with patch('src.cli.webdav_client._WebDAVClient') as mock_client:
+        mock_client.return_value.exists.return_value = True
+        mock_client.return_value.ls.side_effect = ls
+        wrapper = WebDAVClientWrapper(WebDAVConfig(serverUrl="https://example.com/dav/"), Logger())
+        wrapper.connect()
+    return wrapper
+
+
+class TestScanBooks:
+    """递归扫描测试"""
+
+    def test_recursive(self):
+        """测试递归发现子文件夹中的电子书"""
+        books = make_wrapper(FakeLs(TREE)).scan_books("/books")
+
+        paths = sorted(b.path for b in books)
+        assert paths == [
+            "/books/@eaDir/a.epub", "/books/a.epub", "/books/小说/b.epub", "/books/小说/c.pdf",
+            "/books/小说/外国/d.epub", "/books/技术/e.pdf",
+        ]
+
+    def test_max_depth(self):
+        """测试最大层数：1 表示只扫描源路径本身"""
+        ls = FakeLs(TREE)
+        wrapper = make_wrapper(ls)
+
+        assert [b.name for b in wrapper.scan_books("/books", max_depth=1)] == ["a.epub"]
+        assert ls.calls == ["books"]
+        assert wrapper.list_books("/books") == list(wrapper.scan_books("books/", max_depth=1))
+        assert "d.epub" not in {b.name for b in wrapper.scan_books("/books", max_depth=2)}
+
+    def test_include_exclude(self):
+        """测试 glob 过滤：排除的文件夹不再列出"""
+        ls = FakeLs(TREE)
+        wrapper = make_wrapper(ls)
+
+        books = list(wrapper.scan_books("/books", include=["*.epub"], exclude=["@eaDir", "小说/外国"]))
+
+        assert sorted(b.path for b in books) == ["/books/a.epub", "/books/小说/b.epub"]
+        assert "books/@eaDir" not in ls.calls
+        assert "books/小说/外国" not in ls.calls
+
+        only_fiction = wrapper.scan_books("/books", include=["小说/*"])
+        assert sorted(b.name for b in only_fiction) == ["b.epub", "c.pdf", "d.epub"]
+
+    def test_parallel_with_cap(self):
+        """测试子文件夹并行列出且不超过并发上限"""
+        tree = {"lib": [f"d{i}/" for i in range(8)], **{f"lib/d{i}": [f"{i}.epub"] for i in range(8)}}
+        ls = FakeLs(tree, delay=0.05)
+
+        start = time.time()
+        books = list(make_wrapper(ls).scan_books("/lib", concurrency=4))
+
+        assert len(books) == 8
+        assert ls.peak == 4
+        assert time.time() - start < 0.05 * 8
+
+    def test_streams_before_scan_finishes(self):
+        """测试先列出的文件夹中的书籍立即返回"""
+        tree = {"lib": ["first.epub", "slow/"], "lib/slow": ["late.epub"]}
+        ls = FakeLs(tree, delay=0.2)
+        scan = make_wrapper(ls).scan_books("/lib")
+
+        assert next(scan).name == "first.epub"
+        time.sleep(0.25)  # 模拟处理第一本书，期间子文件夹在后台列出
+
+        start = time.time()
+        assert next(scan).name == "late.epub"
+        assert time.time() - start < 0.1
+
+    def test_unreadable_folder_is_skipped(self):
+        """测试无法列出的文件夹不影响其他结果"""
+        tree = {"books": ["a.epub", "gone/"]}
+
+        books = list(make_wrapper(FakeLs(tree)).scan_books("/books"))
+
+        assert [b.name for b in books] == ["a.epub"]
+
+    def test_cassette_roundtrip(self, tmp_path):
+        """测试扫描结果的录制与回放"""
+        recorder = Cassette(str(tmp_path / "scan.cassette.gz"))
+        recorded = list(CassetteWebDAV(make_wrapper(FakeLs(TREE)), recorder).scan_books("/books", exclude=["@eaDir"]))
+        recorder.save()
+
+        replay = CassetteWebDAV(None, Cassette.load(str(recorder.path)), replay=True, time_scale=0)
+        assert list(replay.scan_books("/books", exclude=["@eaDir"], concurrency=1)) == recorded
+
+
+OPTIONS = {"maxDepth": 0, "include": [], "exclude": []}
+
+
+def etags_for(tree: dict) -> dict:
+    """辅助函数：为目录树中的每个条目生成初始 ETag"""
+    return {
+        f"{folder}/{entry.rstrip('/')}": "v1" for folder, entries in tree.items() for entry in entries
+    }
+
+
+class TestLibrarySnapshot:
+    """增量快照测试"""
+
+    def scan(self, ls: FakeLs, snapshot_file, changed_only=False, options=OPTIONS, reuse_dirs=True, **kwargs):
+        snapshot = LibrarySnapshot.load(str(snapshot_file), "/books", options, reuse_dirs=reuse_dirs)
+        books = list(make_wrapper(ls).scan_books("/books", snapshot=snapshot, changed_only=changed_only, **kwargs))
+        return sorted(b.path for b in books), snapshot
+
+    def test_unchanged_folders_are_not_listed(self, tmp_path):
+        """测试未变化的文件夹沿用快照，结果与完整扫描一致"""
+        etags = etags_for(TREE)
+        full, first = self.scan(FakeLs(TREE, etags=etags), tmp_path / "s.json")
+
+        ls = FakeLs(TREE, etags=etags)
+        again, second = self.scan(ls, tmp_path / "s.json")
+
+        assert again == full and len(full) == 6
+        assert ls.calls == ["books"]
+        assert (second.diff.skipped_dirs, second.diff.listed_dirs) == (3, 1)
+        assert (second.diff.new, second.diff.changed, second.diff.unchanged) == (0, 0, 6)
+        assert first.diff.new == 6
+
+    def test_changed_only(self, tmp_path):
+        """测试差异模式只返回新增与修改的书籍（ETag 变化向上传播到父文件夹）"""
+        etags = etags_for(TREE)
+        self.scan(FakeLs(TREE, etags=etags), tmp_path / "s.json")
+
+        tree = {**TREE, "books/小说/外国": ["d.epub", "new.epub"], "books/技术": []}
+        etags.update({"books/小说": "v2", "books/小说/外国": "v2", "books/小说/外国/d.epub": "v2",
+                      "books/技术": "v2"})
+        ls = FakeLs(tree, etags=etags)
+        changed, snapshot = self.scan(ls, tmp_path / "s.json", changed_only=True)
+
+        assert changed == ["/books/小说/外国/d.epub", "/books/小说/外国/new.epub"]
+        assert sorted(ls.calls) == ["books", "books/小说", "books/小说/外国", "books/技术"]
+        assert (snapshot.diff.new, snapshot.diff.changed, snapshot.diff.removed) == (1, 1, 1)
+
+    def test_modified_time_without_etag(self, tmp_path):
+        """测试服务器不提供 ETag 时文件按修改时间与大小比较，文件夹始终重新列出"""
+        self.scan(FakeLs(TREE), tmp_path / "s.json")
+
+        ls = FakeLs(TREE)
+        changed, snapshot = self.scan(ls, tmp_path / "s.json", changed_only=True)
+
+        assert changed == []
+        assert len(ls.calls) == 5
+        assert snapshot.diff.skipped_dirs == 0
+
+    def test_nested_change_found_by_default(self, tmp_path):
+        """测试默认不沿用子树：父文件夹 ETag 未变时深层新增的书籍仍会被发现"""
+        etags = etags_for(TREE)
+        self.scan(FakeLs(TREE, etags=etags), tmp_path / "s.json", reuse_dirs=False)
+
+        # 服务器没有把 外国/ 的变化传播到 小说/
+        tree = {**TREE, "books/小说/外国": ["d.epub", "new.epub"]}
+        ls = FakeLs(tree, etags=etags)
+        changed, _ = self.scan(ls, tmp_path / "s.json", changed_only=True, reuse_dirs=False)
+
+        assert changed == ["/books/小说/外国/new.epub"]
+        assert len(ls.calls) == 5
+
+    def test_reuse_disabled(self, tmp_path):
+        """测试未开启文件夹沿用或扫描参数变化时重新列出全部文件夹"""
+        etags = etags_for(TREE)
+        self.scan(FakeLs(TREE, etags=etags), tmp_path / "s.json")
+
+        snapshot = LibrarySnapshot.load(str(tmp_path / "s.json"), "/books", OPTIONS)
+        ls = FakeLs(TREE, etags=etags)
+        list(make_wrapper(ls).scan_books("/books", snapshot=snapshot))
+        assert len(ls.calls) == 5
+
+        ls = FakeLs(TREE, etags=etags)
+        self.scan(ls, tmp_path / "s.json", options={**OPTIONS, "exclude": ["@eaDir"]}, exclude=["@eaDir"])
+        assert len(ls.calls) == 4
+
+    def test_incomplete_scan_keeps_old_snapshot(self, tmp_path):
+        """测试提前停止或文件夹无法列出时不更新快照"""
+        snapshot = LibrarySnapshot.load(str(tmp_path / "s.json"), "/books", OPTIONS)
+        scan = make_wrapper(FakeLs(TREE)).scan_books("/books", snapshot=snapshot)
+        next(scan)
+        scan.close()
+        assert not (tmp_path / "s.json").exists()
+
+        _, snapshot = self.scan(FakeLs({"books": ["a.epub", "gone/"]}), tmp_path / "s.json")
+        assert not snapshot.diff.complete
+        assert not (tmp_path / "s.json").exists()
+
+    def test_other_root_starts_empty(self, tmp_path):
+        """测试源路径不同的快照不会被误用"""
+        self.scan(FakeLs(TREE), tmp_path / "s.json")
+
+        assert LibrarySnapshot.load(str(tmp_path / "s.json"), "/other", OPTIONS).entries == {}
+
+
+def book(name: str) -> BookFile:
+    return BookFile(name=name, path=f"/books/{name}", extension=".epub", size=0, last_modified=datetime.now())
+
+
+class TestStreamOrder:
+    """边扫描边处理测试"""
+
+    def make_processor(self, **batch) -> BatchProcessor:
+        processor = BatchProcessor.__new__(BatchProcessor)
+        processor.config = type('Config', (), {})()
+        processor.config.batch = BatchConfig(sourcePath="/books", order="stream", **batch)
+        return processor
+
+    def test_filters_and_limits_lazily(self):
+        """测试按发现顺序跳过已处理书籍并在达到数量上限后停止扫描"""
+        consumed = []
+
+        def source():
+            for name in ["a.epub", "b.epub", "c.epub", "d.epub", "e.epub"]:
+                consumed.append(name)
+                yield book(name)
+
+        stats = {"found": 0, "skipped": 0, "queued": 0}
+        processor = self.make_processor(maxFiles=2)
+
+        books = processor._stream_books(source(), {"b-完整摘要.md"}, stats)
+
+        assert [b.name for b in books] == ["a.epub", "c.epub"]
+        assert consumed == ["a.epub", "b.epub", "c.epub"]
+        assert stats == {"found": 3, "skipped": 1, "queued": 2}
+
+    def test_process_books_counts_streamed_total(self, tmp_path):
+        """测试总数未知时按实际处理数量统计"""
+        processor = self.make_processor()
+        processor._start_time = time.time()
+        processor._process_single_book = MagicMock(return_value=MagicMock(success=False, error="x", error_kind=None))
+
+        result = processor._process_books(iter([book("a.epub"), book("b.epub")]), str(tmp_path / "log.md"), set())
+
+        assert result.total == 2
+        assert result.failed == 2
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,155 @@
+"""
+PDF 页眉页脚清理测试
+"""
+
+import sys
+import pytest
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.cli.chapter_extractor import ChapterExtractorFactory, PDFExtractor
+from src.cli.pdf_cleanup import NoiseStats, RunningLineDetector, strip_running_lines
+
+from test_chapter_extractor import build_pdf
+
+
+def body(chapter: int, page: int) -> list[str]:
+    """辅助函数：生成互不重复的正文行"""
+    words = ["alpha", "beta", "gamma", "delta", "epsilon", "zeta", "eta", "theta"]
+    return [f"{words[(chapter + page + j) % 8]} paragraph about topic {chapter}-{page}-{j} continues here"
+            for j in range(8)]
+
+
+def book_with_furniture(chapters: int = 3, pages_per_chapter: int = 8) -> list[list[str]]:
+    """辅助函数：章节首页之外带页眉（"页码 书名" / 章节名交替）、所有页带页码页脚的页面"""
+    pages = []
+    number = 1
+    for c in range(chapters):
+        for p in range(pages_per_chapter):
+            if p == 0:
+                lines = [f"Chapter {c + 1}"]
+            elif number % 2 == 0:
+                lines = [f"{number}   The Example Book"]
+            else:
+                lines = [f"Chapter {c + 1} · Lessons of part {c + 1}"]
+            lines += body(c, p)
+            lines.append(f"- {number} -")
+            pages.append(lines)
+            number += 1
+    return pages
+
+
+class TestRunningLineDetector:
+    """页眉页脚检测测试"""
+
+    def test_normalize(self):
+        """测试大小写、空白与行首行尾数字的归一化"""
+        assert RunningLineDetector.normalize("  Chapter 3  ·  Title ") == "chapter 3 · title"
+        assert RunningLineDetector.numbered_key("12 chapter 3 · title") == ("# chapter 3 · title", 12)
+        assert RunningLineDetector.numbered_key("title 47") == ("title #", 47)
+        assert RunningLineDetector.numbered_key("chapter 3 · title") is None
+        assert RunningLineDetector.page_number_key("xiv") == ("roman", 14)
+        assert RunningLineDetector.page_number_key("page 3 of 300") == ("page # of #", 3)
+        assert RunningLineDetector.page_number_key("civic") is None
+        assert RunningLineDetector.page_number_key("chapter 3") is None
+
+    def test_page_numbers_removed(self):
+        """测试常见页码格式在连续页面的首尾行同步递增时被去除"""
+        numerals = ["x", "xi", "xii", "xiii", "xiv", "xv"]
+        for fmt in ["{}", "- {} -", "Page {}", "page {} of 300", "第 {} 页", "{} / 300", "[{}]", "roman"]:
+            lines = [numerals[i] if fmt == "roman" else fmt.format(i + 12) for i in range(6)]
+            pages = [f"{line}\nbody {i} line\nmore body\nend {i} of body\n{line}" for i, line in enumerate(lines)]
+            cleaned = strip_running_lines(pages)
+            assert cleaned == [f"body {i} line\nmore body\nend {i} of body" for i in range(6)], fmt
+
+    def test_isolated_numbers_and_words_kept(self):
+        """测试不重复的年份、章节编号与形似罗马数字的单词不被当作页码"""
+        pages = [f"body {i} line\nmore body\nend {i} of body\n- {i + 1} -" for i in range(8)]
+        pages[1] = "1\n" + pages[1]
+        pages[3] = pages[3].replace("end 3 of body", "1984")
+        pages[5] = "mix\n" + pages[5]
+        pages[6] = "liv\n" + pages[6].replace("end 6 of body", "vi")
+
+        cleaned = strip_running_lines(pages)
+
+        assert cleaned[1].startswith("1\nbody 1 line")
+        assert "1984" in cleaned[3]
+        assert cleaned[5].startswith("mix\n")
+        assert cleaned[6].startswith("liv\n") and cleaned[6].endswith("\nvi")
+        assert all("- " not in text for text in cleaned)
+
+    def test_numbers_inside_body_kept(self):
+        """测试正文中间的数字行不被去除"""
+        detector = RunningLineDetector()
+        text = "first line\nsecond line\n42\nthird line\nlast line"
+        assert detector.strip(text, 0) == text
+
+    def test_repeated_headers_removed(self):
+        """测试重复的页眉页脚被去除，并统计节省的 token"""
+        stats = NoiseStats()
+        pages = ['\n'.join(lines) for lines in book_with_furniture()]
+
+        cleaned = strip_running_lines(pages, stats)
+
+        joined = '\n'.join(cleaned)
+        assert "The Example Book" not in joined
+        assert "Lessons of part" not in joined
+        assert "- 5 -" not in joined
+        assert "alpha paragraph about topic 0-0-0 continues here" in joined
+        assert stats.lines == 24 + 21
+        assert stats.tokens == stats.chars // 2 > 0
+
+    def test_chapter_headings_kept(self):
+        """测试稀疏出现的章节标题不被当作页眉"""
+        pages = ['\n'.join(lines) for lines in book_with_furniture(chapters=6, pages_per_chapter=4)]
+
+        cleaned = strip_running_lines(pages)
+
+        assert [text.split('\n', 1)[0] for text in cleaned[::4]] == [f"Chapter {c + 1}" for c in range(6)]
+
+    def test_lookahead_bounds_buffer(self):
+        """测试流式清理最多缓存 lookahead 页"""
+        detector = RunningLineDetector()
+        pulled = []
+
+        def pages():
+            for i, lines in enumerate(book_with_furniture()):
+                pulled.append(i)
+                yield i, '\n'.join(lines)
+
+        stream = detector.strip_pages(pages(), lookahead=5)
+        first_page, _ = next(stream)
+
+        assert first_page == 0
+        assert len(pulled) == 6
+
+
+class TestPDFCleanup:
+    """PDF 提取集成测试"""
+
+    def test_extract_strips_headers_before_chapter_split(self, tmp_path):
+        """测试页眉中的 "Chapter N" 不会被误识别为章节起点"""
+        path = build_pdf(tmp_path / "book.pdf", book_with_furniture())
+
+        book = PDFExtractor(workers=1).extract(str(path))
+
+        assert [c.title for c in book.chapters] == ["Chapter 1", "Chapter 2", "Chapter 3"]
+        assert all("The Example Book" not in c.content for c in book.chapters)
+        assert book.noise.lines == 45
+
+    def test_stream_matches_extract(self, tmp_path):
+        """测试流式提取的清理结果与完整提取一致"""
+        path = build_pdf(tmp_path / "book.pdf", book_with_furniture())
+
+        book = PDFExtractor(workers=1).extract(str(path))
+        stream = ChapterExtractorFactory.stream(str(path), pdf_workers=1)
+
+        assert list(stream.chapters) == book.chapters
+        assert stream.noise == book.noise
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
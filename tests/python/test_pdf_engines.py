@@ -0,0 +1,124 @@
+"""
+PDF 文本引擎测试
+"""
+
+import sys
+import argparse
+import pytest
+from pathlib import Path
+from unittest.mock import patch
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.cli import pdf_engines
+from src.cli.pdf_engines import (
+    ENGINES, PypdfEngine, available_engines, benchmark_engines, get_engine, text_similarity
+)
+from src.cli.chapter_extractor import PDFExtractor
+from src.cli.main import cmd_bench_pdf
+
+from test_chapter_extractor import build_pdf, book_pages
+
+
+class UpperEngine(PypdfEngine):
+    """测试用引擎：输出转为大写"""
+
+    name = 'upper'
+
+    def page_text(self, document, index: int) -> str:
+        return super().page_text(document, index).upper()
+
+
+class TestEngineRegistry:
+    """引擎注册与选择测试"""
+
+    def test_pypdf_always_available(self):
+        """测试 pypdf 始终可用且排在最后"""
+        assert available_engines()[-1] == 'pypdf'
+        assert isinstance(get_engine(), PypdfEngine)
+
+    def test_auto_picks_fastest_available(self):
+        """测试 auto 选择第一个可用引擎"""
+        assert get_engine('auto').name == available_engines()[0]
+
+    def test_unknown_or_missing_engine(self):
+        """测试未知或未安装的引擎"""
+        with pytest.raises(ValueError, match="未知"):
+            get_engine('nope')
+        with patch.object(pdf_engines, 'fitz', None):
+            with pytest.raises(ValueError, match="未安装"):
+                get_engine('pymupdf')
+
+    def test_extractor_uses_engine(self, tmp_path):
+        """测试 PDFExtractor 通过引擎提取页面"""
+        path = build_pdf(tmp_path / "book.pdf", book_pages(3))
+
+        with patch.dict(ENGINES, {'upper': UpperEngine}):
+            texts, failures = PDFExtractor(workers=1, engine='upper')._extract_pages(str(path), 3)
+
+        assert "PAGE BODY 2 LINE 0" in texts[1]
+        assert failures == []
+
+    def test_document_opened_once_per_book(self, tmp_path):
+        """测试各页区间复用同一个已打开的文档，提取结束后关闭"""
+        path = build_pdf(tmp_path / "book.pdf", book_pages(5))
+        opened, closed = [], []
+
+        class CountingEngine(PypdfEngine):
+            name = 'counting'
+
+            def open(self, file_path):
+                opened.append(file_path)
+                return super().open(file_path)
+
+            def close(self, document):
+                closed.append(document)
+
+        with patch.dict(ENGINES, {'counting': CountingEngine}):
+            extractor = PDFExtractor(workers=1, engine='counting')
+            extractor.PAGES_PER_TASK = 1
+            texts, failures = extractor._extract_pages(str(path), 5)
+            with open(path, 'rb') as f:
+                extractor._extract_pages(f, 5)
+
+        assert "Page body 4 line 0" in texts[3] and failures == []
+        assert len(opened) == 2
+        assert len(closed) == 2
+
+
+class TestBenchmark:
+    """引擎基准测试"""
+
+    def test_text_similarity(self):
+        """测试忽略空白的相似度"""
+        assert text_similarity("a b\nc", "abc") == 1.0
+        assert text_similarity("", "") == 1.0
+        assert 0 < text_similarity("abcd", "abxy") < 1
+
+    def test_benchmark_engines(self, tmp_path):
+        """测试基准输出页数、速度与相似度"""
+        path = build_pdf(tmp_path / "book.pdf", book_pages(4))
+
+        with patch.dict(ENGINES, {'upper': UpperEngine}):
+            results = {r.engine: r for r in benchmark_engines([str(path)], ['pypdf', 'upper', 'nope'], max_pages=3)}
+
+        assert results['pypdf'].pages == 3
+        assert results['pypdf'].similarity == 1.0
+        assert results['pypdf'].pages_per_sec > 0
+        assert results['upper'].similarity < 1.0
+        assert results['nope'].errors
+
+    def test_bench_command(self, tmp_path, capsys):
+        """测试 bench-pdf 命令"""
+        path = build_pdf(tmp_path / "book.pdf", book_pages(2))
+
+        code = cmd_bench_pdf(argparse.Namespace(files=[str(path)], engines='pypdf', pages=0))
+
+        assert code == 0
+        assert "pypdf" in capsys.readouterr().out
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
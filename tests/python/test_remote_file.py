@@ -0,0 +1,173 @@
+"""
+远程随机访问文件测试
+"""
+
+import io
+import sys
+import pytest
+from pathlib import Path
+from unittest.mock import MagicMock
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.cli.cassette import Cassette, CassetteWebDAV
+from src.cli.chapter_extractor import EPUBExtractor
+from src.cli.extraction_cache import file_sha256
+from src.cli.remote_file import RangeNotSupportedError, RemoteFile, open_remote_file
+from src.cli.webdav_client import WebDAVClientWrapper
+
+from test_chapter_extractor import build_epub, paragraph
+
+
+class FakeRangeServer:
+    """测试用 Range 服务器：记录每次请求的范围"""
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.calls = []
+
+    def read_range(self, remote_path: str, start: int, end: int) -> bytes:
+        self.calls.append((start, end))
+        return self.data[start:end]
+
+    def get_file_info(self, path: str) -> dict:
+        return {'size': len(self.data)}
+
+
+def remote(data: bytes) -> tuple[RemoteFile, FakeRangeServer]:
+    server = FakeRangeServer(data)
+    return RemoteFile(lambda start, end: server.read_range('/a', start, end), len(data), name='/a'), server
+
+
+class TestRemoteFile:
+    """块缓存与预读测试"""
+
+    def test_random_access_matches_bytes(self):
+        """测试任意位置读取与本地字节一致"""
+        data = bytes(range(256)) * 1000
+        file, _ = remote(data)
+
+        file.seek(100_000)
+        assert file.read(10) == data[100_000:100_010]
+        file.seek(-5, io.SEEK_END)
+        assert file.read() == data[-5:]
+        file.seek(0)
+        assert file.read() == data
+
+    def test_blocks_are_cached(self):
+        """测试已缓存的块不再请求"""
+        file, server = remote(b"x" * (RemoteFile.BLOCK_SIZE * 8))
+
+        file.seek(10)
+        file.read(100)
+        file.seek(20)
+        file.read(100)
+
+        assert len(server.calls) == 1
+
+    def test_sequential_read_ahead_grows(self):
+        """测试顺序读取时预读范围翻倍"""
+        file, server = remote(b"x" * (RemoteFile.BLOCK_SIZE * 64))
+
+        while file.read(RemoteFile.BLOCK_SIZE):
+            pass
+
+        sizes = [(end - start) // RemoteFile.BLOCK_SIZE for start, end in server.calls]
+        assert sizes[:4] == [2, 4, 8, 16]
+        assert max(sizes) <= RemoteFile.MAX_READ_AHEAD
+
+    def test_lru_eviction(self):
+        """测试缓存块数超过上限时淘汰最久未用的块"""
+        file, _ = remote(b"x" * (RemoteFile.BLOCK_SIZE * 16))
+        file.MAX_BLOCKS = 4
+
+        file.read()
+
+        assert len(file._blocks) == 4
+
+    def test_short_response_raises(self):
+        """测试服务器返回字节数不符"""
+        file = RemoteFile(lambda start, end: b"short", 1000)
+        with pytest.raises(IOError, match="Range"):
+            file.read()
+
+
+class TestOpenRemoteFile:
+    """打开远程文件测试"""
+
+    def test_epub_reads_only_text_entries(self, tmp_path):
+        """测试按需读取 EPUB 时不下载图片"""
+        path = build_epub(tmp_path / "book.epub",
+                          [("第一章", paragraph("内容一")), ("第二章", paragraph("内容二"))],
+                          image_size=2_000_000)
+        data = path.read_bytes()
+        server = FakeRangeServer(data)
+
+        file = open_remote_file(server, '/books/book.epub')
+        book = EPUBExtractor().extract(file)
+
+        assert [c.title for c in book.chapters] == [c.title for c in EPUBExtractor().extract(data).chapters]
+        assert file.bytes_fetched < len(data) / 10
+
+    def test_range_not_supported(self):
+        """测试服务器不支持 Range 请求时返回 None"""
+        webdav = MagicMock()
+        webdav.read_range.side_effect = RangeNotSupportedError("no range")
+
+        assert open_remote_file(webdav, '/a.epub', size=100) is None
+
+    def test_cache_id_is_stable(self):
+        """测试提取缓存使用远程标识，不读取内容"""
+        server = FakeRangeServer(b"x" * 100)
+        first = open_remote_file(server, '/a.epub', modified='2024-01-01')
+        second = open_remote_file(server, '/a.epub', modified='2024-01-01')
+        changed = open_remote_file(server, '/a.epub', modified='2024-02-01')
+        calls = len(server.calls)
+
+        assert file_sha256(first) == file_sha256(second) != file_sha256(changed)
+        assert len(server.calls) == calls
+
+    def test_cassette_roundtrip(self, tmp_path):
+        """测试 Range 请求的录制与回放"""
+        cassette_path = tmp_path / "range.cassette.gz"
+        server = FakeRangeServer(b"0123456789" * 50)
+
+        recorder = Cassette(str(cassette_path))
+        assert CassetteWebDAV(server, recorder).read_range('/a.epub', 10, 20) == b"0123456789"
+        recorder.save()
+
+        replay = CassetteWebDAV(None, Cassette.load(str(cassette_path)), replay=True, time_scale=0)
+        assert replay.read_range('/a.epub', 10, 20) == b"0123456789"
+
+
+class TestReadRange:
+    """WebDAVClientWrapper.read_range 测试"""
+
+    def make_wrapper(self, status_code: int, body: bytes = b""):
+        wrapper = WebDAVClientWrapper.__new__(WebDAVClientWrapper)
+        wrapper.client = MagicMock()
+        wrapper.is_connected = lambda: True
+        response = wrapper.client.http.stream.return_value.__enter__.return_value
+        response.status_code = status_code
+        response.read.return_value = body
+        return wrapper
+
+    def test_partial_content(self):
+        """测试 206 响应返回请求范围的字节并发送 Range 头"""
+        wrapper = self.make_wrapper(206, b"abc")
+
+        assert wrapper.read_range('/a.epub', 5, 8) == b"abc"
+        _, kwargs = wrapper.client.http.stream.call_args
+        assert kwargs['headers'] == {"Range": "bytes=5-7"}
+
+    def test_full_response_raises(self):
+        """测试服务器忽略 Range 头"""
+        wrapper = self.make_wrapper(200)
+        with pytest.raises(RangeNotSupportedError):
+            wrapper.read_range('/a.epub', 0, 10)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,214 @@
+"""
+分块续传下载测试
+"""
+
+import io
+import sys
+import threading
+import pytest
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest.mock import patch
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.cli.batch_processor import BatchProcessor
+from src.cli.config import AdvancedConfig, WebDAVConfig
+from src.cli.logger import Logger
+from src.cli.models import BookFile
+from src.cli.webdav_client import IncompleteDownloadError, WebDAVClientWrapper
+
+webdav4_client = pytest.importorskip("webdav4.client")
+
+BOOK = bytes(range(256)) * 800  # 200 KB
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """支持 Range 请求的文件服务器，可按配置在中途断开连接"""
+
+    protocol_version = 'HTTP/1.1'
+    content = BOOK
+    drops: list = []          # 依次消耗：每个请求发送多少字节后断开（None 表示完整发送）
+    honor_range = True
+    report_total = True       # 416 响应是否带 Content-Range: bytes */总大小
+    ranges: list = []
+
+    def do_GET(self):
+        header = self.headers.get('Range')
+        type(self).ranges.append(header)
+        start = int(header[6:].split('-')[0]) if header and self.honor_range else 0
+        if start >= len(self.content):
+            self.send_response(416)
+            if self.report_total:
+                self.send_header('Content-Range', f"bytes */{len(self.content)}")
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        body = self.content[start:]
+        self.send_response(206 if start else 200)
+        if start:
+            self.send_header('Content-Range', f"bytes {start}-{len(self.content) - 1}/{len(self.content)}")
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+
+        drop = type(self).drops.pop(0) if type(self).drops else None
+        if drop is None:
+            self.wfile.write(body)
+        else:
+            self.wfile.write(body[:drop])
+            self.wfile.flush()
+            self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    """本地文件服务器（每个测试重置断开计划）"""
+    RangeHandler.drops, RangeHandler.ranges, RangeHandler.honor_range = [], [], True
+    RangeHandler.report_total = True
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), RangeHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_port}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def make_wrapper(url: str, **config) -> WebDAVClientWrapper:
+    """辅助函数：直接指向本地服务器的已连接客户端"""
+    wrapper = WebDAVClientWrapper(WebDAVConfig(serverUrl=url, **config), Logger())
+    wrapper.client = webdav4_client.Client(url)
+    wrapper._connected = True
+    return wrapper
+
+
+@pytest.fixture(autouse=True)
+def no_backoff():
+    with patch('src.cli.webdav_client.time.sleep'):
+        yield
+
+
+class TestResumableDownload:
+    """中断续传与完整性检查测试"""
+
+    def test_resumes_after_drop(self, server):
+        """测试连接中断后用 Range 请求从已下载位置继续"""
+        RangeHandler.drops = [50_000, 30_000]
+        progress = []
+
+        buffer = make_wrapper(server, downloadChunkKB=16).download_to_buffer(
+            "/a.pdf", 10 * 1024 * 1024, expected_size=len(BOOK), progress=lambda done, total: progress.append((done, total))
+        )
+
+        assert buffer.read() == BOOK
+        # 断开前未凑满一个分块的数据不会写入，从最后写入的分块边界续传
+        assert RangeHandler.ranges == [None, "bytes=49152-", "bytes=65536-"]
+        assert progress[-1] == (len(BOOK), len(BOOK))
+        assert [d for d, _ in progress] == sorted(d for d, _ in progress)
+
+    def test_server_ignores_range(self, server):
+        """测试服务器忽略 Range 时从头重新下载"""
+        RangeHandler.drops = [50_000]
+        RangeHandler.honor_range = False
+
+        buffer = make_wrapper(server).download_to_buffer("/a.pdf", 1024, expected_size=len(BOOK))
+
+        assert buffer.read() == BOOK
+        assert len(RangeHandler.ranges) == 2
+
+    def test_download_file_resumes_part_file(self, server, tmp_path):
+        """测试失败后保留 .part 文件，再次下载时续传"""
+        RangeHandler.drops = [70_000]
+        local = tmp_path / "a.pdf"
+
+        assert not make_wrapper(server, downloadRetries=0, downloadChunkKB=4).download_file(
+            "/a.pdf", str(local), len(BOOK))
+        partial = (tmp_path / "a.pdf.part").stat().st_size
+        assert 0 < partial <= 70_000
+        assert not local.exists()
+
+        assert make_wrapper(server).download_file("/a.pdf", str(local), len(BOOK))
+        assert local.read_bytes() == BOOK
+        assert RangeHandler.ranges[-1] == f"bytes={partial}-"
+        assert not (tmp_path / "a.pdf.part").exists()
+
+    def test_complete_part_file_checked_against_range_total(self, server, tmp_path):
+        """测试 416 只有在本地大小等于 Content-Range 总大小时才算下载完成"""
+        local = tmp_path / "a.pdf"
+        wrapper = make_wrapper(server)
+        wrapper.get_file_info = lambda path: {}
+
+        (tmp_path / "a.pdf.part").write_bytes(BOOK)
+        assert wrapper.download_file("/a.pdf", str(local))
+        assert local.read_bytes() == BOOK
+        assert RangeHandler.ranges == [f"bytes={len(BOOK)}-"]
+
+        # 未报告总大小时无法确认，视为失败
+        RangeHandler.report_total = False
+        local.unlink()
+        (tmp_path / "a.pdf.part").write_bytes(BOOK)
+        assert not wrapper.download_file("/a.pdf", str(local))
+        assert not local.exists()
+
+    def test_size_mismatch_is_rejected(self, server):
+        """测试与 getcontentlength 不一致的下载不会交给提取"""
+        wrapper = make_wrapper(server, downloadRetries=1)
+
+        with pytest.raises(IncompleteDownloadError, match="下载不完整"):
+            wrapper._download_to("/a.pdf", io.BytesIO(), expected_size=len(BOOK) + 10)
+
+        assert wrapper.download_to_buffer("/a.pdf", 1024, expected_size=len(BOOK) - 10) is None
+
+    def test_gives_up_after_retries(self, server):
+        """测试超过续传次数后放弃"""
+        RangeHandler.drops = [1000, 1000, 1000]
+
+        assert make_wrapper(server, downloadRetries=2).download_to_buffer("/a.pdf", 1024, len(BOOK)) is None
+        assert len(RangeHandler.ranges) == 3
+
+
+class TestBatchDownloadDir:
+    """批处理下载目录测试"""
+
+    def make_processor(self, server: str, download_dir: str, **config) -> BatchProcessor:
+        processor = BatchProcessor.__new__(BatchProcessor)
+        processor.config = type('Config', (), {})()
+        processor.config.advanced = AdvancedConfig(inMemoryMaxMB=0, downloadDir=download_dir)
+        processor.config.webdav = WebDAVConfig(serverUrl=server)
+        processor.webdav = make_wrapper(server, **config)
+        processor.logger = Logger()
+        processor._replay = False
+        processor._temp_dir = None
+        return processor
+
+    def test_part_file_resumed_in_next_run(self, server, tmp_path):
+        """测试中断留下的 .part 保存在下载目录中，下次运行续传"""
+        book = BookFile(name="a.pdf", path="/a.pdf", extension=".pdf", size=len(BOOK),
+                        last_modified=datetime(2024, 1, 1))
+        RangeHandler.drops = [70_000]
+
+        first = self.make_processor(server, str(tmp_path), downloadRetries=0, downloadChunkKB=4)
+        assert first._download_book(book) is None
+        partial = list(tmp_path.glob("*.part"))
+        assert len(partial) == 1
+
+        second = self.make_processor(server, str(tmp_path))
+        local_path = second._download_book(book)
+        assert Path(local_path).read_bytes() == BOOK
+        assert Path(local_path).parent == tmp_path
+        assert RangeHandler.ranges[-1].startswith("bytes=") and RangeHandler.ranges[-1] != "bytes=0-"
+
+        # 远程文件变化后使用新的文件名，不会续传到旧版本上
+        changed = BookFile(name="a.pdf", path="/a.pdf", extension=".pdf", size=len(BOOK),
+                           last_modified=datetime(2024, 2, 1))
+        assert second._download_path(changed) != local_path
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
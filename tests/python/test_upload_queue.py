@@ -0,0 +1,203 @@
+"""
+后台上传队列测试
+"""
+
+import sys
+import threading
+import time
+import pytest
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.cli.batch_processor import BatchProcessor
+from src.cli.config import BatchConfig, OutputConfig
+from src.cli.logger import Logger
+from src.cli.upload_queue import UploadQueue
+
+
+class FakeWebDAV:
+    """记录上传内容的假 WebDAV 客户端，可配置前几次上传失败或阻塞"""
+
+    def __init__(self, failures: int = 0, delay: float = 0.0):
+        self.failures = failures
+        self.delay = delay
+        self.files = {}
+        self.calls = 0
+        self.gate = threading.Event()
+        self.gate.set()
+        self._lock = threading.Lock()
+
+    def upload_file(self, remote_path: str, content: str) -> bool:
+        self.gate.wait()
+        time.sleep(self.delay)
+        with self._lock:
+            self.calls += 1
+            if self.failures > 0:
+                self.failures -= 1
+                return False
+            self.files[remote_path] = content
+        return True
+
+
+@pytest.fixture(autouse=True)
+def fast_retry():
+    with patch('src.cli.upload_queue.RETRY_BASE_DELAY', 0.01):
+        yield
+
+
+class TestUploadQueue:
+    """上传、重试与持久化测试"""
+
+    def test_submit_does_not_block(self, tmp_path):
+        """测试提交立即返回，上传在后台并行完成"""
+        webdav = FakeWebDAV(delay=0.2)
+        queue = UploadQueue(webdav, Logger(), str(tmp_path / "journal"), workers=2)
+
+        start = time.time()
+        queue.submit("/sync/a-完整摘要.md", "摘要")
+        queue.submit("/sync/a.meta.json", "{}")
+        assert time.time() - start < 0.1
+
+        assert queue.close(timeout=5)
+        assert time.time() - start < 0.35
+        assert webdav.files == {"/sync/a-完整摘要.md": "摘要", "/sync/a.meta.json": "{}"}
+        assert queue.stats().uploaded == 2
+        assert list((tmp_path / "journal").iterdir()) == []
+
+    def test_retries_until_success(self, tmp_path):
+        """测试失败后按退避间隔重试"""
+        webdav = FakeWebDAV(failures=2)
+        queue = UploadQueue(webdav, Logger(), str(tmp_path / "journal"), max_retries=3)
+
+        queue.submit("/sync/a-完整摘要.md", "摘要")
+        assert queue.close(timeout=5)
+
+        stats = queue.stats()
+        assert (stats.uploaded, stats.retried, stats.failed) == (1, 2, 0)
+        assert webdav.calls == 3
+
+    def test_failed_upload_survives_restart(self, tmp_path):
+        """测试超过重试次数的上传保留到下次运行"""
+        queue = UploadQueue(FakeWebDAV(failures=10), Logger(), str(tmp_path / "journal"), max_retries=1)
+        queue.submit("/sync/a-完整摘要.md", "摘要")
+        queue.close(timeout=5)
+        assert queue.stats().failed == 1
+        assert queue.pending_names() == {"a-完整摘要.md"}
+
+        webdav = FakeWebDAV()
+        restarted = UploadQueue(webdav, Logger(), str(tmp_path / "journal"))
+        assert restarted.resume() == 1
+        assert restarted.close(timeout=5)
+        assert webdav.files == {"/sync/a-完整摘要.md": "摘要"}
+        assert restarted.pending_names() == set()
+
+    def test_flush_timeout_keeps_journal(self, tmp_path):
+        """测试结束时等待超时，未完成的上传仍在持久化目录中"""
+        webdav = FakeWebDAV()
+        webdav.gate.clear()
+        queue = UploadQueue(webdav, Logger(), str(tmp_path / "journal"), workers=1)
+
+        queue.submit("/sync/a-完整摘要.md", "摘要")
+        assert queue.close(timeout=0.1) is False
+
+        assert queue.pending_names() == {"a-完整摘要.md"}
+        webdav.gate.set()
+
+    def test_newer_content_is_not_lost(self, tmp_path):
+        """测试同一路径的旧上传完成时不会删除新内容的记录"""
+        webdav = FakeWebDAV()
+        webdav.gate.clear()
+        queue = UploadQueue(webdav, Logger(), str(tmp_path / "journal"), workers=1)
+
+        queue.submit("/sync/a-完整摘要.md", "旧")
+        time.sleep(0.05)
+        queue.submit("/sync/a-完整摘要.md", "新")
+        webdav.gate.set()
+        assert queue.close(timeout=5)
+
+        assert webdav.files["/sync/a-完整摘要.md"] == "新"
+        assert queue.pending_names() == set()
+
+    def test_same_path_is_serialized(self, tmp_path):
+        """测试同一路径不会并发上传，排队中的旧内容被新内容取代"""
+        webdav = FakeWebDAV(delay=0.05)
+        active, overlaps = set(), []
+        upload = webdav.upload_file
+
+        def tracking(remote_path, content):
+            if remote_path in active:
+                overlaps.append(remote_path)
+            active.add(remote_path)
+            try:
+                return upload(remote_path, content)
+            finally:
+                active.discard(remote_path)
+
+        webdav.upload_file = tracking
+        webdav.gate.clear()
+        queue = UploadQueue(webdav, Logger(), str(tmp_path / "journal"), workers=3)
+
+        for version in ("1", "2", "3", "4"):
+            queue.submit("/sync/a-完整摘要.md", version)
+            time.sleep(0.02)
+        webdav.gate.set()
+        assert queue.close(timeout=5)
+
+        assert overlaps == []
+        assert webdav.files["/sync/a-完整摘要.md"] == "4"
+        # 第一个任务已开始上传，2、3 在排队时被取代
+        assert webdav.calls == 2
+
+    def test_pending_names_skip_journal_content(self, tmp_path):
+        """测试列出待上传文件名时不解析上传内容"""
+        webdav = FakeWebDAV()
+        webdav.gate.clear()
+        queue = UploadQueue(webdav, Logger(), str(tmp_path / "journal"), workers=1)
+        queue.submit("/sync/a-完整摘要.md", "摘要" * 10000)
+
+        with patch('src.cli.upload_queue.json.loads', side_effect=AssertionError):
+            assert queue.pending_names() == {"a-完整摘要.md"}
+        webdav.gate.set()
+        assert queue.close(timeout=5)
+
+    def test_in_memory_queue(self):
+        """测试不持久化的队列（回放模式）"""
+        webdav = FakeWebDAV()
+        queue = UploadQueue(webdav, Logger(), journal_dir=None)
+
+        queue.submit("/sync/a-完整摘要.md", "摘要")
+        assert queue.close(timeout=5)
+        assert queue.resume() == 0
+        assert webdav.files
+
+
+class TestBatchUploads:
+    """批量处理中的上传队列测试"""
+
+    def test_pending_uploads_count_as_processed(self, tmp_path):
+        """测试等待上传的摘要视为已处理，不会重复处理"""
+        queue = UploadQueue(FakeWebDAV(failures=10), Logger(), str(tmp_path / "journal"), max_retries=0)
+        queue.submit("/sync/b-完整摘要.md", "摘要")
+        queue.submit("/sync/b.meta.json", "{}")
+        queue.close(timeout=5)
+
+        processor = BatchProcessor.__new__(BatchProcessor)
+        processor.config = type('Config', (), {})()
+        processor.config.batch = BatchConfig(sourcePath="/books")
+        processor.config.output = OutputConfig()
+        processor.webdav = MagicMock()
+        processor.webdav.list_cache_files.return_value = {"a-完整摘要.md"}
+        processor.uploader = UploadQueue(FakeWebDAV(), Logger(), str(tmp_path / "journal"))
+
+        assert processor._load_cached_file_names() == {"a-完整摘要.md", "b-完整摘要.md"}
+
+        processor._close_uploader()
+        assert processor.uploader is None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
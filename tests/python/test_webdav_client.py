@@ -7,6 +7,7 @@ import os
 import sys
 import tempfile
 import pytest
+import httpx
 from pathlib import Path
 from unittest.mock import Mock, patch, MagicMock
 
@@ -14,7 +15,7 @@ from unittest.mock import Mock, patch, MagicMock
 project_root = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(project_root))
 
-from src.cli.config import ConfigLoader, Config
+from src.cli.config import ConfigLoader, Config, WebDAVConfig
 from src.cli.webdav_client import WebDAVClientWrapper
 from src.cli.logger import Logger
 from src.cli.batch_processor import BatchProcessor
@@ -35,7 +36,7 @@ class TestWebDAVClient:
 
     def test_webdav_client_creation_with_mock(self):
         """测试 WebDAV 客户端创建（使用 Mock）"""
-        config = Mock()
+        config = WebDAVConfig()
         config.serverUrl = "https://example.com/dav/"
         config.username = "testuser"
         config.password = "testpass"
@@ -63,7 +64,7 @@ class TestWebDAVClient:
 
     def test_webdav_client_connection_failure_path_not_exists(self):
         """测试 WebDAV 客户端连接失败（路径不存在）"""
-        config = Mock()
+        config = WebDAVConfig()
         config.serverUrl = "https://example.com/dav/"
         config.username = "testuser"
         config.password = "testpass"
@@ -84,7 +85,7 @@ class TestWebDAVClient:
 
     def test_webdav_client_list_files(self):
         """测试 WebDAV 客户端列出文件"""
-        config = Mock()
+        config = WebDAVConfig()
         config.serverUrl = "https://example.com/dav/"
         config.username = "testuser"
         config.password = "testpass"
@@ -108,6 +109,38 @@ class TestWebDAVClient:
             assert 'books/book1.epub' in files
             assert 'books/folder/' in files
 
+    def test_download_to_buffer(self):
+        """测试流式下载到内存缓冲区，超过上限时转存到临时文件"""
+        config = WebDAVConfig()
+        config.serverUrl = "https://example.com/dav/"
+        config.username = "testuser"
+        config.password = "testpass"
+        config.syncPath = "/books"
+
+        with patch('src.cli.webdav_client._WebDAVClient') as mock_client:
+            mock_instance = MagicMock()
+            mock_client.return_value = mock_instance
+            mock_instance.exists.return_value = True
+            mock_instance.info.return_value = {'content_length': 2048}
+            mock_instance.join_url.side_effect = lambda path: f"https://example.com/dav{path}"
+            mock_instance.http = httpx.Client(transport=httpx.MockTransport(
+                lambda request: httpx.Response(404 if request.url.path.endswith("c.epub") else 200,
+                                               content=b"x" * 2048)
+            ))
+
+            wrapper = WebDAVClientWrapper(config, Logger())
+            wrapper.connect()
+
+            small = wrapper.download_to_buffer('/books/a.epub', max_memory=4096)
+            large = wrapper.download_to_buffer('/books/b.epub', max_memory=1024)
+
+            assert small.read() == b"x" * 2048
+            assert not small._rolled
+            assert large.read() == b"x" * 2048
+            assert large._rolled
+
+            assert wrapper.download_to_buffer('/books/c.epub', max_memory=1024) is None
+
 
 class TestWebDAVClientWithRealConfig:
     """使用真实配置文件测试 WebDAV 客户端"""
@@ -293,7 +326,7 @@ batch:
                 mock_webdav_instance = MagicMock()
                 mock_webdav.return_value = mock_webdav_instance
                 mock_webdav_instance.connect.return_value = True
-                mock_webdav_instance.list_books.return_value = []  # 没有找到书籍
+                mock_webdav_instance.scan_books.return_value = iter([])  # 没有找到书籍
 
                 mock_ai_instance = MagicMock()
                 mock_ai.return_value = mock_ai_instance